@@ -17,6 +17,6 @@ class Command(BaseCommand):
         notification_helper = NotificationHelper()
         title = 'Test Notification'
         body = 'This is a test push notification.'
-        res = notification_helper.send_to_users_with_executor(users, title, body)
+        res = notification_helper.send_to_users_with_executor(users, title, body, wait=True)
         self.stdout.write(self.style.SUCCESS(f'Push notification send result: {res}'))
         self.stdout.write(self.style.SUCCESS(f'Test push notification sent to {email}'))
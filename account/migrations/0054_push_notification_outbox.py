@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:55
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0053_staffpagepermission_delivery_settings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushNotificationOutbox',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('image_url', models.TextField(blank=True, null=True)),
+                ('dedup_key', models.CharField(blank=True, max_length=255, null=True)),
+                ('coalesce_key', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='push_outbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='push_outbox_due_idx'), models.Index(fields=['user', 'coalesce_key', 'status'], name='push_outbox_coalesce_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'dedup_key'), name='push_outbox_user_dedup_key')],
+            },
+        ),
+    ]
@@ -807,20 +807,15 @@ class Rider(models.Model):
     def __str__(self):
         return f"Rider: "
 
-    def update_location(self, latitude, longitude):
-        from helpers.redis_rider_geo import geo_add_rider
-        """Update the rider's current location and propagate to active deliveries."""
-        self.current_latitude = latitude
-        self.current_longitude = longitude
-        self.location_updated_at = timezone.now()
-        self.save()
-        self.refresh_from_db()  # Ensure we have the latest data after save()
-        if self.is_online:
-            geo_add_rider(self)
+    def update_location(self, latitude, longitude, speed=None, heading=None):
+        """
+        Record a GPS fix through the location-ingest pipeline
+        (helpers/rider_location.py): Redis on every ping, throttled
+        update_fields writes to this row. Returns the RiderPosition.
+        """
+        from helpers.rider_location import ingest_rider_location
 
-        print(
-            "Rider updated location :: ", self.current_latitude, self.current_longitude, self.location_updated_at
-        )
+        return ingest_rider_location(self, latitude, longitude, speed=speed, heading=heading)
         # Update all active delivery trackings for this rider
         # for order in active_orders:
         #     try:
@@ -1091,6 +1086,53 @@ class PushNotificationLog(models.Model):
         return f"{self.title} - {self.user.username}"
 
 
+class PushNotificationOutbox(models.Model):
+    """
+    A push notification waiting to be delivered.
+
+    Rows are written in the same transaction as the change they announce
+    and delivered by the ``helpers.drain_notification_outbox`` Celery task
+    (helpers/notification_outbox.py), so a request never waits on Firebase
+    and a worker restart does not lose the push.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='push_outbox')
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    data = models.JSONField(default=dict, blank=True)
+    image_url = models.TextField(blank=True, null=True)
+    # At most one row per user and dedup_key is ever queued.
+    dedup_key = models.CharField(max_length=255, blank=True, null=True)
+    # A newer push with the same user and coalesce_key replaces a pending one.
+    coalesce_key = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dedup_key'], name='push_outbox_user_dedup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='push_outbox_due_idx'),
+            models.Index(fields=['user', 'coalesce_key', 'status'], name='push_outbox_coalesce_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} -> {self.user_id} ({self.status})"
+
+
 class VendorIssueReporting(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
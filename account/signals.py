@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 from wallet.models import Wallet
-from .models import User, Profile
+from .models import Address, User, Profile
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -12,3 +14,19 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
         Wallet.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def mark_signup_rollup_day_stale(sender, instance, **kwargs):
+    """
+    Signups are placed by their addresses in the analytics rollups, so an
+    address change restates the day its user signed up.
+    """
+    from admin_manager.rollups import mark_day_stale
+
+    signed_up = User.objects.filter(pk=instance.user_id).values_list('created_at', flat=True).first()
+    if signed_up is None:
+        return
+    day = timezone.localdate(signed_up)
+    transaction.on_commit(lambda: mark_day_stale(day))
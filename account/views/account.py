@@ -23,6 +23,7 @@ from helpers.flutterwave import FlutterwaveManager
 from helpers.paystack import PaystackManager
 from helpers.response.response_format import bad_request_response, success_response, internal_server_error_response
 from helpers.backblaze import upload_to_backblaze
+from wallet import ledger
 from wallet.models import Wallet, WalletTransaction
 from django.db import transaction
 import logging,time
@@ -907,23 +908,16 @@ class AccountWithdrawalInitiate(generics.GenericAPIView):
 
         # Create a wallet transaction and hold the funds so the balance
         # reflects the pending withdrawal immediately.
-        withdrawal_transaction = WalletTransaction.objects.create(
-            wallet=wallet,
-            user=user,
-            amount=amount,
-            transaction_type='withdrawal',
-            status='pending',
-            description='Withdrawal from wallet'
-        )
-        wallet.withdraw(amount)
+        try:
+            withdrawal_transaction = ledger.debit(wallet, amount, user=user, description='Withdrawal from wallet')
+        except ledger.InsufficientFunds:
+            return bad_request_response(message="Insufficient funds in wallet.")
 
         klass = PaystackManager()
         response = klass.make_withdrawal(request, vendor, amount, withdrawal_transaction)
         if response.status_code >= 400:
             # Transfer could not be initiated — release the held funds.
-            withdrawal_transaction.status = 'failed'
-            withdrawal_transaction.save()
-            wallet.deposit(amount)
+            ledger.release(wallet, withdrawal_transaction)
         return response
 
 
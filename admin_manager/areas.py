@@ -0,0 +1,166 @@
+"""
+Grouping addresses and orders into the areas the location analytics report.
+
+An area is a delivery zone when a row falls in one, else the city/state it
+names. Shared by the analytics views (admin_manager/views/analytics.py) and
+the daily area rollups (admin_manager/rollups.py).
+"""
+
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def round_coord(value, precision=2):
+    """Round a coordinate to 'precision' decimals for geo-bucketing."""
+    try:
+        return round(float(value), precision)
+    except (TypeError, ValueError):
+        return None
+
+
+def area_from_row(row, zone_index, match_location=True):
+    """
+    (city, state, area_label) for an address-like row: the delivery zone
+    containing its coordinates, else the zone its text names, else its
+    city/state. ``zone_index`` is the shared ZoneIndex (helpers/zone_index.py),
+    so neither test rescans the zone list per row.
+    """
+    zone = zone_index.zone_for(
+        row.get('delivery_latitude') or row.get('location_latitude'),
+        row.get('delivery_longitude') or row.get('location_longitude'),
+    ) if match_location else None
+    if not zone:
+        zone = zone_index.zone_for_text(
+            row.get('address'),
+            row.get('city'),
+            row.get('state'),
+            row.get('area_label'),
+            row.get('name'),
+        )
+    if zone:
+        return zone.name, 'Delivery Zone', zone.name
+
+    city = (row.get('city') or '').strip()
+    state = (row.get('state') or '').strip()
+    if city and state:
+        return city, state, f"{city}, {state}"
+    if city:
+        return city, '', city
+    if state:
+        return '', state, state
+    return 'Unknown', 'Unknown', 'Unknown'
+
+
+# Orders carry their delivery zone (Order.delivery_zone, resolved on save and
+# by backfill_order_delivery_zones), so they are never polygon-tested here.
+ORDER_ZONE_FIELDS = ('delivery_zone__name', 'delivery_zone__is_active')
+
+
+def order_area_from_row(row, zone_index):
+    if row.get('delivery_zone__name') and row.get('delivery_zone__is_active'):
+        name = row['delivery_zone__name']
+        return name, 'Delivery Zone', name
+    return area_from_row(row, zone_index, match_location=False)
+
+
+def order_area_rollup(order_qs, zone_index):
+    """
+    Orders grouped by area: {area_label: {city, state, area_label,
+    order_count, total_revenue, lat_total, lon_total, coord_count}}.
+
+    Orders in an active delivery zone are rolled up with one GROUP BY on the
+    zone; only the rest are labelled row by row from their address text.
+    """
+    has_coords = (
+        Q(delivery_latitude__isnull=False, delivery_longitude__isnull=False) |
+        Q(location_latitude__isnull=False, location_longitude__isnull=False)
+    )
+    latitude = Coalesce('delivery_latitude', 'location_latitude')
+    longitude = Coalesce('delivery_longitude', 'location_longitude')
+    area_map = {}
+
+    def entry_for(city, state, area_label):
+        return area_map.setdefault(area_label, {
+            'city': city,
+            'state': state,
+            'area_label': area_label,
+            'order_count': 0,
+            'total_revenue': 0,
+            'lat_total': 0,
+            'lon_total': 0,
+            'coord_count': 0,
+        })
+
+    zoned = order_qs.filter(delivery_zone__is_active=True).values('delivery_zone__name').annotate(
+        order_count=Count('id'),
+        revenue=Sum('total_amount'),
+        lat_total=Sum(latitude, filter=has_coords),
+        lon_total=Sum(longitude, filter=has_coords),
+        coord_count=Count('id', filter=has_coords),
+    ).order_by()
+    for row in zoned:
+        name = row['delivery_zone__name']
+        entry = entry_for(name, 'Delivery Zone', name)
+        entry['order_count'] += row['order_count']
+        entry['total_revenue'] += float(row['revenue'] or 0)
+        entry['lat_total'] += float(row['lat_total'] or 0)
+        entry['lon_total'] += float(row['lon_total'] or 0)
+        entry['coord_count'] += row['coord_count']
+
+    unzoned = order_qs.filter(Q(delivery_zone__isnull=True) | Q(delivery_zone__is_active=False)).values(
+        'city',
+        'state',
+        'address',
+        'location_latitude',
+        'location_longitude',
+        'delivery_latitude',
+        'delivery_longitude',
+        'total_amount',
+    )
+    for row in unzoned:
+        entry = entry_for(*area_from_row(row, zone_index, match_location=False))
+        entry['order_count'] += 1
+        entry['total_revenue'] += float(row['total_amount'] or 0)
+        lat = round_coord(row.get('delivery_latitude') or row.get('location_latitude'), 5)
+        lon = round_coord(row.get('delivery_longitude') or row.get('location_longitude'), 5)
+        if lat is not None and lon is not None:
+            entry['lat_total'] += lat
+            entry['lon_total'] += lon
+            entry['coord_count'] += 1
+    return area_map
+
+
+def address_area_rollup(address_qs, zone_index):
+    """
+    Addresses grouped by area: {area_label: {city, state, area_label,
+    user_ids, address_count, lat_total, lon_total, coord_count}}.
+    """
+    area_map = {}
+    for row in address_qs.values(
+        'user_id',
+        'city',
+        'state',
+        'address',
+        'location_latitude',
+        'location_longitude',
+    ):
+        city, state, area_label = area_from_row(row, zone_index)
+        entry = area_map.setdefault(area_label, {
+            'city': city,
+            'state': state,
+            'area_label': area_label,
+            'user_ids': set(),
+            'address_count': 0,
+            'lat_total': 0,
+            'lon_total': 0,
+            'coord_count': 0,
+        })
+        entry['user_ids'].add(row['user_id'])
+        entry['address_count'] += 1
+        lat = round_coord(row.get('location_latitude'), 5)
+        lon = round_coord(row.get('location_longitude'), 5)
+        if lat is not None and lon is not None:
+            entry['lat_total'] += lat
+            entry['lon_total'] += lon
+            entry['coord_count'] += 1
+    return area_map
@@ -0,0 +1,52 @@
+"""
+Re-roll the dashboard fact tables for a date range.
+
+The beat job restates the last few days and any day an order save marked
+stale, so use this after correcting older rows in bulk (queryset updates and
+wallet rows mark nothing), or to backfill history in one go:
+
+    python manage.py rebuild_daily_rollups --since 2025-01-01
+    python manage.py rebuild_daily_rollups --since 2025-03-01 --until 2025-03-31
+"""
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from admin_manager.rollups import rollup_day
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily analytics rollups for a range of closed days."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=str, required=True,
+            help='First day to roll (YYYY-MM-DD).')
+        parser.add_argument(
+            '--until', type=str, default=None,
+            help='Last day to roll (YYYY-MM-DD); defaults to yesterday.')
+
+    def handle(self, *args, **options):
+        try:
+            since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            until = (
+                datetime.strptime(options['until'], '%Y-%m-%d').date()
+                if options['until'] else None
+            )
+        except ValueError:
+            self.stderr.write(self.style.ERROR('--since and --until must be YYYY-MM-DD'))
+            return
+
+        yesterday = timezone.localdate() - timedelta(days=1)
+        until = min(until or yesterday, yesterday)
+
+        rolled = 0
+        day = since
+        while day <= until:
+            rollup_day(day)
+            rolled += 1
+            day += timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled {rolled} days ({since} to {until})."))
@@ -0,0 +1,88 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0053_staffpagepermission_delivery_settings'),
+        ('admin_manager', '0004_popupannouncement_popupannouncementview_and_more'),
+        ('product', '0062_order_delivery_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollupDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('rolled_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'analytics_rollup_days',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRiderStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('delivery_count', models.PositiveIntegerField(default=0)),
+                ('delivery_fees', models.DecimalField(decimal_places=2, default=0, help_text='delivery_fee of paid, delivered orders.', max_digits=14)),
+                ('balance_credits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payouts_completed', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payout_count', models.PositiveIntegerField(default=0)),
+                ('rider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='account.rider')),
+            ],
+            options={
+                'db_table': 'analytics_daily_rider_stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'rider'], name='daily_rider_stats_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyVendorStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('active_order_count', models.PositiveIntegerField(default=0)),
+                ('completed_order_count', models.PositiveIntegerField(default=0)),
+                ('canceled_order_count', models.PositiveIntegerField(default=0)),
+                ('paid_order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='total_amount of paid orders.', max_digits=14)),
+                ('platform_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('vendor_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance_credits', models.DecimalField(decimal_places=2, default=0, help_text='Completed wallet earnings credited that day.', max_digits=14)),
+                ('payouts_completed', models.DecimalField(decimal_places=2, default=0, help_text='Withdrawals completed that day (by updated_at).', max_digits=14)),
+                ('payout_count', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='account.vendor')),
+            ],
+            options={
+                'db_table': 'analytics_daily_vendor_stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'vendor'], name='daily_vendor_stats_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyZoneStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('paid_order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('signup_count', models.PositiveIntegerField(default=0, help_text='Users created that day, zoned by their first active address.')),
+                ('buyer_signup_count', models.PositiveIntegerField(default=0)),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='product.deliveryzone')),
+            ],
+            options={
+                'db_table': 'analytics_daily_zone_stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'zone'], name='daily_zone_stats_idx')],
+            },
+        ),
+    ]
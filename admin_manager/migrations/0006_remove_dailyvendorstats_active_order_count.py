@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_manager', '0005_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dailyvendorstats',
+            name='active_order_count',
+        ),
+    ]
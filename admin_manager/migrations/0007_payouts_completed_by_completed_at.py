@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_manager', '0006_remove_dailyvendorstats_active_order_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dailyvendorstats',
+            name='payouts_completed',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Withdrawals completed that day (by completed_at).', max_digits=14),
+        ),
+    ]
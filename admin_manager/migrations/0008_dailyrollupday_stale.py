@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_manager', '0007_payouts_completed_by_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyrollupday',
+            name='dirtied_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='dailyrollupday',
+            name='stale',
+            field=models.BooleanField(default=False, help_text='An order of this day changed since it was rolled; read live until re-rolled.'),
+        ),
+    ]
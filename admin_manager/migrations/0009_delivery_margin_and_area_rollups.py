@@ -0,0 +1,77 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:57
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_rolled_days_stale(apps, schema_editor):
+    # Days rolled before these facts existed hold zeros for them: read those
+    # days live until the refresh job re-rolls them.
+    DailyRollupDay = apps.get_model("admin_manager", "DailyRollupDay")
+    DailyRollupDay.objects.update(stale=True, dirtied_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_manager', '0008_dailyrollupday_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailyvendorstats',
+            name='legacy_delivery_margin',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='rider_commission_amount of orders without a service fee.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailyvendorstats',
+            name='marketplace_delivery_recorded',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='platform_marketplace_delivery_amount.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailyvendorstats',
+            name='service_fees',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailyvendorstats',
+            name='unsnapshotted_delivery_fees',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='delivery_fee of delivered orders with neither a service fee nor a commission snapshot.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailyvendorstats',
+            name='unsnapshotted_marketplace_delivery',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='delivery_fee of orders without a platform_marketplace_delivery_amount snapshot.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='dailyzonestats',
+            name='buyers_with_address',
+            field=models.PositiveIntegerField(default=0, help_text='Buyer signups with an active address.'),
+        ),
+        migrations.CreateModel(
+            name='DailyAreaStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('area_label', models.CharField(max_length=255)),
+                ('city', models.CharField(blank=True, max_length=255)),
+                ('state', models.CharField(blank=True, max_length=255)),
+                ('paid_order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('order_lat_total', models.FloatField(default=0)),
+                ('order_lon_total', models.FloatField(default=0)),
+                ('order_coord_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0, help_text='Buyers created that day with an active address here.')),
+                ('address_count', models.PositiveIntegerField(default=0)),
+                ('address_lat_total', models.FloatField(default=0)),
+                ('address_lon_total', models.FloatField(default=0)),
+                ('address_coord_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'analytics_daily_area_stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'area_label'], name='daily_area_stats_idx')],
+            },
+        ),
+        migrations.RunPython(mark_rolled_days_stale, migrations.RunPython.noop),
+    ]
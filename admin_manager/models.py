@@ -303,3 +303,126 @@ class PopupAnnouncementView(models.Model):
 
     def __str__(self):
         return f"{self.user.email} viewed popup {self.popup.title}"
+
+
+# ---------------------------------------------------------------------------
+# Daily analytics rollups (see admin_manager/rollups.py)
+# ---------------------------------------------------------------------------
+
+class DailyRollupDay(models.Model):
+    """A local calendar day whose rollup rows are complete, unless stale."""
+
+    date = models.DateField(unique=True)
+    rolled_at = models.DateTimeField(auto_now=True)
+    stale = models.BooleanField(default=False,
+                                help_text="An order of this day changed since it was rolled; read live until re-rolled.")
+    dirtied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'analytics_rollup_days'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Rollup {self.date}"
+
+
+class DailyVendorStats(models.Model):
+    """Orders (by created_at) and wallet movements of one vendor on one day; vendor None is vendor-less orders."""
+
+    date = models.DateField()
+    vendor = models.ForeignKey('account.Vendor', on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='daily_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    completed_order_count = models.PositiveIntegerField(default=0)
+    canceled_order_count = models.PositiveIntegerField(default=0)
+    paid_order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                  help_text="total_amount of paid orders.")
+    platform_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    vendor_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Delivery margin inputs, all over paid orders.
+    service_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    legacy_delivery_margin = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                                 help_text="rider_commission_amount of orders without a service fee.")
+    unsnapshotted_delivery_fees = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="delivery_fee of delivered orders with neither a service fee nor a commission snapshot.")
+    marketplace_delivery_recorded = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                                        help_text="platform_marketplace_delivery_amount.")
+    unsnapshotted_marketplace_delivery = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="delivery_fee of orders without a platform_marketplace_delivery_amount snapshot.")
+    balance_credits = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                          help_text="Completed wallet earnings credited that day.")
+    payouts_completed = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                            help_text="Withdrawals completed that day (by completed_at).")
+    payout_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_daily_vendor_stats'
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date', 'vendor'], name='daily_vendor_stats_idx')]
+
+
+class DailyRiderStats(models.Model):
+    """Delivered orders (by created_at) and wallet movements of one rider on one day."""
+
+    date = models.DateField()
+    rider = models.ForeignKey('account.Rider', on_delete=models.CASCADE, related_name='daily_stats')
+    delivery_count = models.PositiveIntegerField(default=0)
+    delivery_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                        help_text="delivery_fee of paid, delivered orders.")
+    balance_credits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payouts_completed = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payout_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_daily_rider_stats'
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date', 'rider'], name='daily_rider_stats_idx')]
+
+
+class DailyZoneStats(models.Model):
+    """Orders and signups per delivery zone and day; zone None is outside every zone."""
+
+    date = models.DateField()
+    zone = models.ForeignKey('product.DeliveryZone', on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='daily_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    paid_order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    signup_count = models.PositiveIntegerField(default=0,
+                                               help_text="Users created that day, zoned by their first active address.")
+    buyer_signup_count = models.PositiveIntegerField(default=0)
+    buyers_with_address = models.PositiveIntegerField(default=0,
+                                                      help_text="Buyer signups with an active address.")
+
+    class Meta:
+        db_table = 'analytics_daily_zone_stats'
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date', 'zone'], name='daily_zone_stats_idx')]
+
+
+class DailyAreaStats(models.Model):
+    """Paid orders and new buyers' addresses per analytics area (admin_manager/areas.py) and day."""
+
+    date = models.DateField()
+    area_label = models.CharField(max_length=255)
+    city = models.CharField(max_length=255, blank=True)
+    state = models.CharField(max_length=255, blank=True)
+    paid_order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_lat_total = models.FloatField(default=0)
+    order_lon_total = models.FloatField(default=0)
+    order_coord_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0,
+                                             help_text="Buyers created that day with an active address here.")
+    address_count = models.PositiveIntegerField(default=0)
+    address_lat_total = models.FloatField(default=0)
+    address_lon_total = models.FloatField(default=0)
+    address_coord_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'analytics_daily_area_stats'
+        ordering = ['-date']
+        indexes = [models.Index(fields=['date', 'area_label'], name='daily_area_stats_idx')]
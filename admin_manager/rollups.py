@@ -0,0 +1,450 @@
+"""
+Daily analytics rollups for the admin dashboard.
+
+AdminDashboardOverviewAPIView used to aggregate raw Order, WalletTransaction
+and User rows for the whole window on every load, including a dozen payout
+aggregates each filtering on ``user_id__in`` subqueries over every vendor and
+rider. A year view scanned a year of orders. Instead:
+
+- compute_facts(start, end) sums one time window into four fact tables:
+  per vendor (DailyVendorStats: orders by created_at, paid revenue,
+  settlement amounts and delivery margin inputs, wallet credits and completed
+  withdrawals), per rider (DailyRiderStats: deliveries and wallet movements),
+  per delivery zone (DailyZoneStats: orders, revenue and signups) and per
+  analytics area (DailyAreaStats: paid orders and buyer addresses, grouped
+  as admin_manager/areas.py does for the location analytics views). Each is
+  a handful of GROUP BY queries.
+- rollup_day writes those rows for one closed local day and marks the day in
+  DailyRollupDay, atomically. The ``admin_manager.refresh_daily_rollups`` beat
+  job rolls yesterday, re-rolls the previous ANALYTICS_ROLLUP_RESTATE_DAYS
+  (orders still change status and payment after the day they were placed),
+  re-rolls days marked stale and backfills never-rolled days, up to
+  ANALYTICS_ROLLUP_MAX_DAYS_PER_RUN of those two per run.
+- Saving or deleting an order whose rollup fields changed marks its
+  created_at day stale, as does a buyer's address change for their signup day (mark_day_stale, from product/signals.py). A stale day
+  is read live until the job re-rolls it, so late status and payment changes
+  are never lost, however old the order.
+- range_totals / range_by_key answer "any window": whole days that are
+  marked come from the rollup rows, everything else (the open current day,
+  partial edge days, days not rolled yet) is computed live with the same
+  compute_facts. Answers therefore never depend on the backfill being done;
+  it only makes them cheaper.
+
+Figures that describe current state rather than history (active orders,
+pending payouts, active users, Paystack fees) are still read live by the
+views. Raw edits that bypass Order.save (queryset updates, SQL) older than
+the restatement window are not picked up automatically; run
+``rebuild_daily_rollups`` for the affected dates.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESTATE_DAYS = 3
+DEFAULT_MAX_DAYS_PER_RUN = 31
+
+COMPLETED_ORDER_STATUSES = ['delivered']
+CANCELED_ORDER_STATUSES = ['canceled', 'cancelled', 'rejected', 'failed', 'payment_failed']
+
+VENDOR_FIELDS = (
+    'order_count', 'completed_order_count', 'canceled_order_count',
+    'paid_order_count', 'revenue', 'platform_amount', 'vendor_amount',
+    'service_fees', 'legacy_delivery_margin', 'unsnapshotted_delivery_fees',
+    'marketplace_delivery_recorded', 'unsnapshotted_marketplace_delivery',
+    'balance_credits', 'payouts_completed', 'payout_count',
+)
+RIDER_FIELDS = ('delivery_count', 'delivery_fees', 'balance_credits', 'payouts_completed', 'payout_count')
+ZONE_FIELDS = (
+    'order_count', 'paid_order_count', 'revenue', 'signup_count', 'buyer_signup_count', 'buyers_with_address',
+)
+AREA_FIELDS = (
+    'paid_order_count', 'revenue', 'order_lat_total', 'order_lon_total', 'order_coord_count',
+    'user_count', 'address_count', 'address_lat_total', 'address_lon_total', 'address_coord_count',
+)
+AREA_KEY = ('area_label', 'city', 'state')
+
+TABLES = ('vendor', 'rider', 'zone', 'area')
+
+
+def _tables():
+    from admin_manager.models import DailyAreaStats, DailyRiderStats, DailyVendorStats, DailyZoneStats
+
+    # table name -> (model, key field or fields, fact fields)
+    return {
+        'vendor': (DailyVendorStats, 'vendor_id', VENDOR_FIELDS),
+        'rider': (DailyRiderStats, 'rider_id', RIDER_FIELDS),
+        'zone': (DailyZoneStats, 'zone_id', ZONE_FIELDS),
+        'area': (DailyAreaStats, AREA_KEY, AREA_FIELDS),
+    }
+
+
+def _key_fields(key_field):
+    return key_field if isinstance(key_field, tuple) else (key_field,)
+
+
+def _key_values(key_field, key):
+    """Model kwargs for a fact key; tuple keys belong to tables keyed on several fields."""
+    if isinstance(key_field, tuple):
+        return dict(zip(key_field, key))
+    return {key_field: key}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def day_bounds(day):
+    """[start, end) of a local calendar day as aware datetimes."""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+
+
+def _window(field, start, end):
+    bounds = {f'{field}__lt': end}
+    if start is not None:
+        bounds[f'{field}__gte'] = start
+    return bounds
+
+
+# ---------------------------------------------------------------------------
+# Computing facts for a window
+# ---------------------------------------------------------------------------
+
+def _wallet_movements(start, end):
+    """{recipient user id: {balance_credits, payouts_completed, payout_count}}."""
+    from wallet.models import WalletTransaction
+
+    # A transaction belongs to its user, or to its wallet's owner when the
+    # user column was left empty, as in the dashboard's recipient filter.
+    transactions = WalletTransaction.objects.annotate(recipient=Coalesce('user', 'wallet__user'))
+    movements = defaultdict(dict)
+    for row in transactions.filter(
+        transaction_type='earning', status='completed', **_window('created_at', start, end),
+    ).values('recipient').annotate(total=Sum('amount')).order_by():
+        movements[row['recipient']]['balance_credits'] = row['total']
+    for row in transactions.filter(
+        transaction_type='withdrawal', status='completed', **_window('completed_at', start, end),
+    ).values('recipient').annotate(total=Sum('amount'), count=Count('id')).order_by():
+        movements[row['recipient']]['payouts_completed'] = row['total']
+        movements[row['recipient']]['payout_count'] = row['count']
+    movements.pop(None, None)
+    return movements
+
+
+def _vendor_facts(orders, movements):
+    from account.models import Vendor
+
+    paid = Q(payment_status='paid')
+    # Delivery margin inputs for the dashboard; see AdminDashboardOverviewAPIView.
+    no_service_fee = paid & (Q(service_fee__isnull=True) | Q(service_fee=0))
+    facts = {
+        row.pop('vendor_id'): row
+        for row in orders.values('vendor_id').annotate(
+            order_count=Count('id'),
+            completed_order_count=Count('id', filter=(
+                Q(status__in=COMPLETED_ORDER_STATUSES) | Q(delivery_status__in=COMPLETED_ORDER_STATUSES)
+            )),
+            canceled_order_count=Count('id', filter=(
+                Q(status__in=CANCELED_ORDER_STATUSES) | Q(delivery_status__in=CANCELED_ORDER_STATUSES)
+            )),
+            paid_order_count=Count('id', filter=paid),
+            revenue=Sum('total_amount', filter=paid),
+            platform_amount=Sum('platform_amount', filter=paid),
+            vendor_amount=Sum('vendor_amount', filter=paid),
+            service_fees=Sum('service_fee', filter=paid),
+            legacy_delivery_margin=Sum('rider_commission_amount', filter=no_service_fee),
+            unsnapshotted_delivery_fees=Sum('delivery_fee', filter=no_service_fee & (
+                Q(status='delivered') | Q(delivery_status='delivered')
+            ) & Q(rider_commission_amount__isnull=True, rider_commission_percentage_applied__isnull=True)),
+            marketplace_delivery_recorded=Sum('platform_marketplace_delivery_amount', filter=paid),
+            unsnapshotted_marketplace_delivery=Sum('delivery_fee', filter=paid & Q(
+                platform_marketplace_delivery_amount__isnull=True,
+            )),
+        ).order_by()
+    }
+    if movements:
+        for user_id, vendor_id in Vendor.objects.filter(user_id__in=list(movements)).values_list('user_id', 'id'):
+            facts.setdefault(vendor_id, {}).update(movements[user_id])
+    return facts
+
+
+def _rider_facts(orders, movements):
+    from account.models import Rider
+
+    delivered = orders.filter(rider__isnull=False).filter(
+        Q(status__in=COMPLETED_ORDER_STATUSES) | Q(delivery_status__in=COMPLETED_ORDER_STATUSES)
+    )
+    facts = {
+        row.pop('rider_id'): row
+        for row in delivered.values('rider_id').annotate(
+            delivery_count=Count('id'),
+            delivery_fees=Sum('delivery_fee', filter=Q(payment_status='paid')),
+        ).order_by()
+    }
+    if movements:
+        for user_id, rider_id in Rider.objects.filter(user_id__in=list(movements)).values_list('user_id', 'id'):
+            facts.setdefault(rider_id, {}).update(movements[user_id])
+    return facts
+
+
+def _zone_facts(orders, start, end):
+    from account.models import Address, User
+    from helpers.zone_index import get_zone_index
+
+    paid = Q(payment_status='paid')
+    facts = {
+        row.pop('delivery_zone_id'): row
+        for row in orders.values('delivery_zone_id').annotate(
+            order_count=Count('id'),
+            paid_order_count=Count('id', filter=paid),
+            revenue=Sum('total_amount', filter=paid),
+        ).order_by()
+    }
+
+    # Users have no zone of their own; place each signup by its first active
+    # address, the same address the location analytics group by.
+    first_address = Address.objects.filter(user=OuterRef('pk'), is_active=True).order_by('-is_primary', 'created_at')
+    signups = User.objects.filter(**_window('created_at', start, end)).annotate(
+        address_id=Subquery(first_address.values('pk')[:1]),
+        address_latitude=Subquery(first_address.values('location_latitude')[:1]),
+        address_longitude=Subquery(first_address.values('location_longitude')[:1]),
+    ).values_list('role', 'address_id', 'address_latitude', 'address_longitude')
+
+    index = get_zone_index()
+    for role, address_id, latitude, longitude in signups.iterator(chunk_size=2000):
+        zone = index.zone_for(latitude, longitude) if latitude and longitude else None
+        entry = facts.setdefault(zone.pk if zone else None, {})
+        entry['signup_count'] = entry.get('signup_count', 0) + 1
+        if role == 'buyer':
+            entry['buyer_signup_count'] = entry.get('buyer_signup_count', 0) + 1
+            if address_id:
+                entry['buyers_with_address'] = entry.get('buyers_with_address', 0) + 1
+    return facts
+
+
+def _area_facts(orders, start, end):
+    from account.models import Address
+    from admin_manager.areas import address_area_rollup, order_area_rollup
+    from helpers.zone_index import get_zone_index
+
+    index = get_zone_index()
+    facts = {}
+    for area in order_area_rollup(orders.filter(payment_status='paid'), index).values():
+        facts[tuple(area[field] for field in AREA_KEY)] = {
+            'paid_order_count': area['order_count'],
+            'revenue': area['total_revenue'],
+            'order_lat_total': area['lat_total'],
+            'order_lon_total': area['lon_total'],
+            'order_coord_count': area['coord_count'],
+        }
+
+    # Buyers by signup day, each counted once per area they have an active
+    # address in, as AdminUserLocationAnalyticsView counts them.
+    addresses = Address.objects.filter(
+        is_active=True, user__role='buyer',
+        **{f'user__{lookup}': value for lookup, value in _window('created_at', start, end).items()},
+    )
+    for area in address_area_rollup(addresses, index).values():
+        facts.setdefault(tuple(area[field] for field in AREA_KEY), {}).update({
+            'user_count': len(area['user_ids']),
+            'address_count': area['address_count'],
+            'address_lat_total': area['lat_total'],
+            'address_lon_total': area['lon_total'],
+            'address_coord_count': area['coord_count'],
+        })
+    return facts
+
+
+def compute_facts(start, end, tables=TABLES):
+    """
+    {table: {key: {field: value}}} for activity in [start, end).
+
+    ``start`` may be None for "since the beginning". Missing fields mean zero.
+    """
+    from product.models import Order
+
+    orders = Order.objects.filter(**_window('created_at', start, end))
+    movements = _wallet_movements(start, end) if {'vendor', 'rider'} & set(tables) else {}
+    facts = {}
+    if 'vendor' in tables:
+        facts['vendor'] = _vendor_facts(orders, movements)
+    if 'rider' in tables:
+        facts['rider'] = _rider_facts(orders, movements)
+    if 'zone' in tables:
+        facts['zone'] = _zone_facts(orders, start, end)
+    if 'area' in tables:
+        facts['area'] = _area_facts(orders, start, end)
+    return facts
+
+
+# ---------------------------------------------------------------------------
+# Writing rollups
+# ---------------------------------------------------------------------------
+
+def rollup_day(day):
+    """(Re)write every rollup row for one closed local day and mark it complete."""
+    from admin_manager.models import DailyRollupDay
+
+    started = timezone.now()
+    facts = compute_facts(*day_bounds(day))
+    with transaction.atomic():
+        for name, (model, key_field, fields) in _tables().items():
+            model.objects.filter(date=day).delete()
+            model.objects.bulk_create([
+                model(date=day, **_key_values(key_field, key), **{field: values.get(field) or 0 for field in fields})
+                for key, values in facts[name].items()
+            ])
+        DailyRollupDay.objects.update_or_create(date=day)
+        # A change marked while the facts were being read is not in them;
+        # leave that day stale for the next run.
+        DailyRollupDay.objects.filter(date=day).filter(
+            Q(dirtied_at__isnull=True) | Q(dirtied_at__lt=started)
+        ).update(stale=False)
+
+
+def mark_day_stale(day):
+    """Mark a closed day's rollup rows out of date so they are read live and re-rolled.
+
+    The open current day is always read live and is rolled only after it
+    closes, so it needs no mark.
+    """
+    from admin_manager.models import DailyRollupDay
+
+    if day >= timezone.localdate():
+        return
+    # Create the row if need be: a backfill of this day may be reading the
+    # orders right now and must not mark it clean afterwards.
+    DailyRollupDay.objects.update_or_create(date=day, defaults={'stale': True, 'dirtied_at': timezone.now()})
+
+
+def _first_activity_day():
+    from account.models import User
+    from product.models import Order
+
+    firsts = [
+        model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        for model in (Order, User)
+    ]
+    firsts = [first for first in firsts if first is not None]
+    return timezone.localdate(min(firsts)) if firsts else None
+
+
+def days_to_roll(today=None):
+    """Recent days to restate, then stale days, then the newest days never rolled, oldest last."""
+    from admin_manager.models import DailyRollupDay
+
+    today = today or timezone.localdate()
+    yesterday = today - timedelta(days=1)
+    first_day = _first_activity_day()
+    if first_day is None or first_day > yesterday:
+        return []
+
+    restate_days = max(_setting('ANALYTICS_ROLLUP_RESTATE_DAYS', DEFAULT_RESTATE_DAYS), 1)
+    days = [yesterday - timedelta(days=offset) for offset in range(restate_days)]
+    days = [day for day in days if day >= first_day]
+
+    backfill_budget = _setting('ANALYTICS_ROLLUP_MAX_DAYS_PER_RUN', DEFAULT_MAX_DAYS_PER_RUN)
+    stale = list(DailyRollupDay.objects.filter(
+        stale=True, date__lt=yesterday - timedelta(days=restate_days - 1),
+    ).order_by('-date').values_list('date', flat=True)[:max(backfill_budget, 0)])
+    days.extend(stale)
+    backfill_budget -= len(stale)
+
+    rolled = set(DailyRollupDay.objects.filter(date__gte=first_day).values_list('date', flat=True))
+    day = yesterday - timedelta(days=restate_days)
+    while day >= first_day and backfill_budget > 0:
+        if day not in rolled:
+            days.append(day)
+            backfill_budget -= 1
+        day -= timedelta(days=1)
+    return days
+
+
+def refresh_daily_rollups(today=None):
+    """Roll the days chosen by days_to_roll; returns how many were written."""
+    days = days_to_roll(today)
+    for day in days:
+        rollup_day(day)
+    return len(days)
+
+
+# ---------------------------------------------------------------------------
+# Reading any window
+# ---------------------------------------------------------------------------
+
+def _plan(start, end):
+    """Split [start, end) into rolled whole days and live segments; stale days are live."""
+    from admin_manager.models import DailyRollupDay
+
+    covered = DailyRollupDay.objects.filter(stale=False, date__lt=timezone.localdate(end))
+    if start is not None:
+        first_whole = timezone.localdate(start)
+        if day_bounds(first_whole)[0] < start:
+            first_whole += timedelta(days=1)
+        covered = covered.filter(date__gte=first_whole)
+    covered = sorted(covered.values_list('date', flat=True))
+
+    live = []
+    cursor = start
+    for day in covered:
+        day_start, day_end = day_bounds(day)
+        if cursor is None or cursor < day_start:
+            live.append((cursor, day_start))
+        cursor = day_end
+    if cursor is None or cursor < end:
+        live.append((cursor, end))
+    return covered, live
+
+
+def _add(target, values, fields):
+    for field in fields:
+        value = values.get(field)
+        if value:
+            target[field] = target.get(field, 0) + value
+
+
+def range_by_key(table, start, end=None):
+    """{key: {field: total}} for one fact table over [start, end) (end defaults to now)."""
+    end = end or timezone.now()
+    if start is not None and start >= end:
+        return {}
+
+    model, key_field, fields = _tables()[table]
+    covered, live = _plan(start, end)
+    totals = defaultdict(dict)
+    if covered:
+        key_fields = _key_fields(key_field)
+        rows = model.objects.filter(date__in=covered).values(*key_fields).annotate(
+            **{field: Sum(field) for field in fields}
+        ).order_by()
+        for row in rows:
+            key = tuple(row[name] for name in key_fields) if isinstance(key_field, tuple) else row[key_field]
+            _add(totals[key], row, fields)
+    for segment_start, segment_end in live:
+        for key, values in compute_facts(segment_start, segment_end, tables=(table,))[table].items():
+            _add(totals[key], values, fields)
+    return {key: {field: values.get(field, 0) for field in fields} for key, values in totals.items()}
+
+
+def sum_keys(table, rows):
+    """{field: total} of some range_by_key values, summed across their keys."""
+    fields = _tables()[table][2]
+    totals = {field: 0 for field in fields}
+    for values in rows:
+        _add(totals, values, fields)
+    return totals
+
+
+def range_totals(table, start, end=None):
+    """{field: total} for one fact table over [start, end), summed across keys."""
+    return sum_keys(table, range_by_key(table, start, end).values())
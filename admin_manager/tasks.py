@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='admin_manager.refresh_daily_rollups')
+def refresh_daily_rollups():
+    """Roll closed days into the dashboard fact tables (admin_manager/rollups.py)."""
+    from admin_manager.rollups import refresh_daily_rollups as refresh
+
+    rolled = refresh()
+    logger.info("Rolled %s days of dashboard analytics", rolled)
+    return rolled
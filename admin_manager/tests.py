@@ -1,19 +1,27 @@
+import csv
 from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
 
 from django.urls import reverse
 from django.utils import timezone
+from openpyxl import load_workbook
 from rest_framework.test import APITestCase
 
 from account.models import (
+    Address,
     Rider,
     StaffMarketplaceAssignment,
     StaffPagePermission,
     User,
     Vendor,
 )
+from admin_manager import rollups
+from admin_manager.models import DailyRollupDay
 from product.models import (
     BukaItemServiceCharge,
     BukaVariantServiceCharge,
+    DeliveryZone,
     Order,
     OrderItem,
     OrderItemVariant,
@@ -23,6 +31,7 @@ from product.models import (
     ProductVariantCategory,
     SystemCategory,
 )
+from helpers.zone_index import zone_index_snapshot
 from vendor.models import MarketPlace
 from wallet.models import PaystackFeeRecord, Wallet, WalletTransaction
 
@@ -357,6 +366,207 @@ class AdminDashboardOverviewTests(APITestCase):
         self.assertEqual(float(order.vendor_amount), 1200.0)
         self.assertEqual(float(order.platform_amount), 150.0)
 
+    def test_rolled_days_are_read_from_the_rollup_tables(self):
+        day = timezone.localdate() - timedelta(days=3)
+        day_start, _ = rollups.day_bounds(day)
+        order = self.create_order()
+        Order.objects.filter(pk=order.pk).update(created_at=day_start + timedelta(hours=10))
+
+        rollups.rollup_day(day)
+        # Rolled history is not re-read: a later raw edit only shows up once
+        # the day is rolled again.
+        Order.objects.filter(pk=order.pk).update(total_amount=5000)
+
+        response = self.client.get(reverse('dashboard-overview'), {
+            'start_date': day.isoformat(),
+            'end_date': day.isoformat(),
+        })
+
+        data = response.data['data']
+        self.assertEqual(data['period'], 'custom')
+        self.assertEqual(data['order_overview']['total_orders']['value'], 1)
+        self.assertEqual(data['revenue_summary']['total_earnings']['value'], 1000.0)
+
+        rollups.rollup_day(day)
+        totals = rollups.range_totals('vendor', day_start, rollups.day_bounds(day)[1])
+        self.assertEqual(totals['revenue'], 5000)
+
+    def test_delivery_margins_are_read_from_rolled_days(self):
+        day = timezone.localdate() - timedelta(days=3)
+        day_start, _ = rollups.day_bounds(day)
+        orders = [
+            self.create_order(service_fee=150),
+            self.create_order(rider_commission_amount=None, rider_commission_percentage_applied=None),
+            self.create_order(
+                vendor=self.marketplace_vendor,
+                rider=self.in_house_rider,
+                delivery_fee=400,
+                service_fee=50,
+                platform_marketplace_delivery_amount=None,
+            ),
+        ]
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            created_at=day_start + timedelta(hours=10),
+        )
+        window = {'start_date': day.isoformat(), 'end_date': day.isoformat()}
+        live = self.client.get(reverse('dashboard-overview'), window).data['data']['revenue_summary']
+
+        rollups.rollup_day(day)
+        rolled = self.client.get(reverse('dashboard-overview'), window).data['data']['revenue_summary']
+
+        breakdown = rolled['platform_earnings']['breakdown']
+        # 150 service fee + 100 (10%) derived from the unsnapshotted order.
+        self.assertEqual(breakdown['delivery_service_fees']['value'], 250.0)
+        self.assertEqual(breakdown['marketplace_delivery_fees']['value'], 400.0)
+        self.assertEqual(rolled['platform_earnings'], live['platform_earnings'])
+
+    def test_active_orders_are_counted_live_on_rolled_days(self):
+        day = timezone.localdate() - timedelta(days=2)
+        day_start, _ = rollups.day_bounds(day)
+        order = self.create_order(payment_status='pending', status='preparing', delivery_status='pending')
+        Order.objects.filter(pk=order.pk).update(created_at=day_start + timedelta(hours=10))
+        rollups.rollup_day(day)
+        window = {'start_date': day.isoformat(), 'end_date': day.isoformat()}
+
+        response = self.client.get(reverse('dashboard-overview'), window)
+        self.assertEqual(response.data['data']['order_overview']['active_orders']['value'], 1)
+
+        # Delivered after the day was rolled: no longer active, even before a restatement.
+        Order.objects.filter(pk=order.pk).update(status='delivered')
+        response = self.client.get(reverse('dashboard-overview'), window)
+        self.assertEqual(response.data['data']['order_overview']['active_orders']['value'], 0)
+
+    def test_range_totals_combine_rolled_days_with_the_live_day(self):
+        day = timezone.localdate() - timedelta(days=2)
+        day_start, _ = rollups.day_bounds(day)
+        old_order = self.create_order()
+        Order.objects.filter(pk=old_order.pk).update(created_at=day_start + timedelta(hours=1))
+        rollups.rollup_day(day)
+        self.create_order(total_amount=400, payment_status='pending', status='preparing')
+
+        totals = rollups.range_totals('vendor', day_start)
+
+        self.assertEqual(totals['order_count'], 2)
+        self.assertEqual(totals['paid_order_count'], 1)
+        self.assertEqual(totals['revenue'], 1000)
+        self.assertTrue(DailyRollupDay.objects.filter(date=day).exists())
+
+    def test_status_changes_after_the_restatement_window_re_roll_the_day(self):
+        day = timezone.localdate() - timedelta(days=10)
+        day_start, day_end = rollups.day_bounds(day)
+        order = self.create_order(payment_status='pending', status='preparing', delivery_status='pending')
+        Order.objects.filter(pk=order.pk).update(created_at=day_start + timedelta(hours=10))
+        rollups.rollup_day(day)
+        self.assertNotIn(day, rollups.days_to_roll())
+
+        order = Order.objects.get(pk=order.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()  # Nothing the rollups read changed.
+        self.assertFalse(DailyRollupDay.objects.get(date=day).stale)
+
+        order.payment_status = 'paid'
+        order.status = 'delivered'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+        self.assertTrue(DailyRollupDay.objects.get(date=day).stale)
+        # Read live while stale...
+        totals = rollups.range_totals('vendor', day_start, day_end)
+        self.assertEqual(totals['paid_order_count'], 1)
+        self.assertEqual(totals['completed_order_count'], 1)
+        # ...and re-rolled by the next job run.
+        self.assertIn(day, rollups.days_to_roll())
+        rollups.refresh_daily_rollups()
+        self.assertFalse(DailyRollupDay.objects.get(date=day).stale)
+        self.assertEqual(rollups.range_totals('vendor', day_start, day_end)['revenue'], 1000)
+
+    def test_a_change_marked_during_a_rollup_keeps_the_day_stale(self):
+        day = timezone.localdate() - timedelta(days=10)
+        rollups.mark_day_stale(day)
+        DailyRollupDay.objects.filter(date=day).update(dirtied_at=timezone.now() + timedelta(minutes=1))
+
+        rollups.rollup_day(day)
+
+        self.assertTrue(DailyRollupDay.objects.get(date=day).stale)
+
+    def test_completed_withdrawals_stay_on_the_day_they_completed(self):
+        day = timezone.localdate() - timedelta(days=2)
+        day_start, day_end = rollups.day_bounds(day)
+        withdrawal = WalletTransaction.objects.create(
+            wallet=Wallet.objects.get(user=self.vendor.user),
+            user=self.vendor.user,
+            amount=700,
+            transaction_type='withdrawal',
+            status='completed',
+        )
+        WalletTransaction.objects.filter(pk=withdrawal.pk).update(
+            created_at=day_start + timedelta(hours=9),
+            completed_at=day_start + timedelta(hours=10),
+        )
+        rollups.rollup_day(day)
+
+        # A later save (a fee sync, a webhook replay) moves updated_at only.
+        withdrawal.refresh_from_db()
+        withdrawal.description = 'Fee synced'
+        withdrawal.save()
+        self.assertEqual(withdrawal.completed_at, day_start + timedelta(hours=10))
+
+        rolled = rollups.range_totals('vendor', day_start, day_end)
+        since = rollups.range_totals('vendor', day_start)
+        self.assertEqual(rolled['payouts_completed'], 700)
+        self.assertEqual(since['payouts_completed'], 700)
+        self.assertEqual(since['payout_count'], 1)
+
+    def test_order_export_streams_csv_rows_with_the_list_filters(self):
+        self.create_order(track_id='EXPORT-1', address='=HYPERLINK("x")', promo_discount_amount=100)
+        self.create_order(track_id='EXPORT-2', status='canceled')
+
+        response = self.client.get(
+            reverse('admin-orders-export'),
+            {'file_type': 'csv', 'status': 'delivered'},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        rows = list(csv.DictReader(lines))
+        self.assertEqual([row['Track ID'] for row in rows], ['EXPORT-1'])
+        self.assertEqual(rows[0]['Vendor'], 'Independent Vendor')
+        self.assertEqual(Decimal(rows[0]['Customer total']), Decimal('1900'))
+        self.assertEqual(rows[0]['Delivery address'], '\'=HYPERLINK("x")')
+
+    def test_order_export_writes_an_xlsx_workbook(self):
+        self.create_order(track_id='EXPORT-XLSX')
+
+        response = self.client.get(reverse('admin-orders-export'))
+
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook.worksheets[0].iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Track ID')
+        self.assertEqual(rows[1][0], 'EXPORT-XLSX')
+
+        response = self.client.get(reverse('admin-orders-export'), {'file_type': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_transaction_export_falls_back_to_the_wallet_owner(self):
+        rider_wallet = Wallet.objects.get(user=self.rider.user)
+        WalletTransaction.objects.create(
+            wallet=rider_wallet,
+            amount=250,
+            transaction_type='withdrawal',
+            status='pending',
+        )
+
+        response = self.client.get(reverse('transactions_export'), {'file_type': 'csv'})
+
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        rows = list(csv.DictReader(lines))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['User email'], 'overview-rider@example.com')
+        self.assertEqual(rows[0]['Type'], 'withdrawal')
+
 
 class MarketplaceStaffOrderVisibilityTests(APITestCase):
     """
@@ -455,6 +665,27 @@ class MarketplaceStaffOrderVisibilityTests(APITestCase):
 
         self.assertIsNotNone(listed[str(self.old_order.id)]['created_at'])
 
+    def test_zone_filter_uses_the_stored_delivery_zone(self):
+        self.addCleanup(zone_index_snapshot.invalidate)
+        zone = DeliveryZone.objects.create(
+            name='Yaba',
+            boundary=[[6.50, 3.36], [6.50, 3.40], [6.53, 3.40], [6.53, 3.36]],
+            fixed_fee='1500.00',
+        )
+        self.old_order.delivery_latitude = '6.510000'
+        self.old_order.delivery_longitude = '3.380000'
+        self.old_order.save()
+        self.client.force_authenticate(self.superadmin)
+
+        response = self.client.get(
+            reverse('admin-marketplace-vendors-all-orders'), {'zone_id': str(zone.id)},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        listed = {str(order['id']): order for order in response.data['results']}
+        self.assertEqual(set(listed), {str(self.old_order.id)})
+        self.assertEqual(listed[str(self.old_order.id)]['delivery_zone']['id'], str(zone.id))
+
     def test_staff_cannot_open_an_order_inside_the_window_directly(self):
         self.client.force_authenticate(self.staff)
 
@@ -472,3 +703,93 @@ class MarketplaceStaffOrderVisibilityTests(APITestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+
+
+class LocationAnalyticsRollupTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='analytics-admin@example.com',
+            password='password',
+        )
+        self.day = timezone.localdate() - timedelta(days=5)
+        day_start, _ = rollups.day_bounds(self.day)
+        placed = day_start + timedelta(hours=10)
+
+        self.buyers = []
+        for index, (city, state) in enumerate([('Ikeja', 'Lagos'), ('Ikeja', 'Lagos'), ('Wuse', 'Abuja')]):
+            buyer = User.objects.create_user(
+                email=f'analytics-buyer-{index}@example.com',
+                password='password',
+                role='buyer',
+            )
+            Address.objects.create(
+                user=buyer, country='Nigeria', city=city, state=state,
+                location_latitude='6.6000', location_longitude='3.3500',
+            )
+            self.buyers.append(buyer)
+        User.objects.filter(pk__in=[buyer.pk for buyer in self.buyers]).update(created_at=placed)
+
+        for buyer, amount in zip(self.buyers, [1000, 500, 700]):
+            address = Address.objects.get(user=buyer)
+            order = Order.objects.create(
+                user=buyer, payment_status='paid', status='delivered', total_amount=amount,
+                city=address.city, state=address.state,
+                delivery_latitude='6.600000', delivery_longitude='3.350000',
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=placed)
+        self.window = {'start_date': self.day.isoformat(), 'end_date': timezone.localdate().isoformat()}
+        self.client.force_authenticate(self.admin)
+
+    def get(self, name, **params):
+        response = self.client.get(reverse(name), {**self.window, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def test_rolled_areas_match_the_raw_rows(self):
+        live_heatmap = self.get('analytics-order-heatmap')
+        live_users = self.get('analytics-user-locations')
+        rollups.rollup_day(self.day)
+
+        heatmap = self.get('analytics-order-heatmap')
+        users = self.get('analytics-user-locations')
+
+        self.assertEqual(heatmap['summary'], live_heatmap['summary'])
+        self.assertEqual(heatmap['areas'], live_heatmap['areas'])
+        self.assertEqual(heatmap['summary']['total_orders'], 3)
+        self.assertEqual(heatmap['areas'][0]['area_label'], 'Ikeja, Lagos')
+        self.assertEqual(heatmap['areas'][0]['total_revenue'], 1500.0)
+        self.assertEqual(users['areas'], live_users['areas'])
+        self.assertEqual(users['summary']['total_registered_users'], 3)
+        self.assertEqual(users['summary']['users_with_saved_address'], 3)
+        self.assertEqual(users['areas'][0]['user_count'], 2)
+
+        # Text filters still match raw address text.
+        filtered = self.get('analytics-user-locations', city='wuse')
+        self.assertEqual([area['area_label'] for area in filtered['areas']], ['Wuse, Abuja'])
+
+    def test_coverage_gaps_and_summary_read_the_rollups(self):
+        rollups.rollup_day(self.day)
+
+        gaps = self.get('analytics-vendor-coverage-gaps', min_users=2, min_orders=2)
+        summary = self.client.get(reverse('analytics-summary')).data['data']
+
+        self.assertEqual(
+            [(area['area_label'], area['user_count'], area['order_count']) for area in gaps['high_demand_no_vendor']],
+            [('Ikeja, Lagos', 2, 2)],
+        )
+        self.assertEqual(summary['top_cities_by_users'][0], {'area_label': 'Ikeja, Lagos', 'user_count': 2})
+        self.assertEqual(summary['top_cities_by_orders'][0], {'area_label': 'Ikeja, Lagos', 'order_count': 2})
+        self.assertEqual(summary['gap_areas_count'], 2)
+
+    def test_an_address_change_restates_the_signup_day(self):
+        rollups.rollup_day(self.day)
+        address = Address.objects.get(user=self.buyers[2])
+
+        address.city = 'Ikeja'
+        address.state = 'Lagos'
+        with self.captureOnCommitCallbacks(execute=True):
+            address.save()
+
+        self.assertTrue(DailyRollupDay.objects.get(date=self.day).stale)
+        users = self.get('analytics-user-locations')
+        self.assertEqual(users['areas'][0]['user_count'], 3)
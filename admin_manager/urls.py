@@ -24,6 +24,7 @@ from admin_manager.views.announcements import (
 from admin_manager.views.notifications import AdminBulkPushNotificationView
 from admin_manager.views.paystack_fees import (
     AdminPaystackFeeAnalyticsView,
+    AdminPaystackFeeTransactionExportView,
     AdminPaystackFeeTransactionListView,
     AdminPaystackFeeSyncView,
     AdminPaystackSettlementView,
@@ -93,6 +94,7 @@ urlpatterns = [
 
     # orders
     path('orders/', admin_product_view.AdminGetAllOrdersAPIView.as_view(), name='admin-orders-list'),
+    path('orders/export/', admin_product_view.AdminExportOrdersAPIView.as_view(), name='admin-orders-export'),
     path('promo-orders/', admin_product_view.AdminPromoOrdersAPIView.as_view(), name='admin-promo-orders-list'),
     path('orders/<uuid:id>/', admin_product_view.AdminOrderDetailAPIView.as_view(), name='admin-order-detail'),
     path('orders/<uuid:id>/parties/', admin_product_view.AdminOrderDetailVendorRiderAPIView.as_view(), name='admin-users-detail'),
@@ -130,6 +132,7 @@ urlpatterns = [
 
 
     path('transactions/', transactions_view.AdminGetTransactionsListView.as_view(), name='transactions_list'),
+    path('transactions/export/', transactions_view.AdminExportTransactionsView.as_view(), name='transactions_export'),
     path('transactions/<uuid:transaction_id>/', transactions_view.AdminGetTransactionDetailView.as_view(), name='transactions_detail'),
 
 
@@ -159,6 +162,7 @@ urlpatterns = [
     # POST /admin-manager/analytics/paystack-fees/sync/         → reconcile with Paystack's ledger
     path('analytics/paystack-fees/', AdminPaystackFeeAnalyticsView.as_view(), name='analytics-paystack-fees'),
     path('analytics/paystack-fees/transactions/', AdminPaystackFeeTransactionListView.as_view(), name='analytics-paystack-fee-transactions'),
+    path('analytics/paystack-fees/transactions/export/', AdminPaystackFeeTransactionExportView.as_view(), name='analytics-paystack-fee-transactions-export'),
     path('analytics/paystack-fees/sync/', AdminPaystackFeeSyncView.as_view(), name='analytics-paystack-fees-sync'),
     # GET /admin-manager/analytics/paystack-settlements/ → what actually hit the bank
     path('analytics/paystack-settlements/', AdminPaystackSettlementView.as_view(), name='analytics-paystack-settlements'),
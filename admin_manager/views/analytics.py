@@ -19,26 +19,39 @@ Endpoints:
       Single-call summary card: totals used for top-level dashboard widgets.
 
 All views require IsAuthenticated (admin JWT).
-No new models are introduced — data is aggregated from:
+Data comes from:
   - account.Address  (user registration locations)
   - product.Order    (demand locations)
   - account.Vendor   (supply locations)
+Address and order areas (admin_manager/areas.py) are read from the daily
+area rollups (admin_manager/rollups.py); only requests with free-text or
+status filters, and the bounded heatmap point clouds, read raw rows. Vendors
+are current state and are read live.
 """
 
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Count, Avg, Sum, Q, FloatField
+from django.db.models import Avg, Q, FloatField
 from django.db.models.functions import Cast
 from django.utils import timezone
 from datetime import timedelta
-import re
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from account.models import Address, User, Vendor
-from product.models import DeliveryZone, Order
+from admin_manager import rollups
+from admin_manager.areas import (
+    ORDER_ZONE_FIELDS,
+    address_area_rollup,
+    area_from_row,
+    order_area_from_row,
+    order_area_rollup,
+    round_coord,
+)
+from helpers.zone_index import get_zone_index
+from product.models import Order
 from helpers.response.response_format import success_response, bad_request_response, internal_server_error_response
 
 
@@ -68,78 +81,27 @@ def _parse_date_range(request):
     return start_dt, end_dt, None
 
 
-def _round_coord(value, precision=2):
-    """Round a coordinate to 'precision' decimals for geo-bucketing."""
-    try:
-        return round(float(value), precision)
-    except (TypeError, ValueError):
-        return None
-
-
 def _is_blank(value):
     return value is None or str(value).strip() == ''
 
 
-def _zone_for_location(zones, latitude, longitude):
-    if latitude is None or longitude is None:
-        return None
-    try:
-        lat = float(latitude)
-        lng = float(longitude)
-    except (TypeError, ValueError):
-        return None
-    return next((zone for zone in zones if zone.contains_location(lat, lng)), None)
-
-
-def _normalize_area_text(value):
-    return re.sub(r'[^a-z0-9]+', ' ', str(value or '').lower()).strip()
-
-
-def _zone_for_text(zones, *values):
-    haystack = _normalize_area_text(' '.join(str(value or '') for value in values))
-    if not haystack:
-        return None
-
-    for zone in zones:
-        zone_name = _normalize_area_text(zone.name)
-        primary_name = _normalize_area_text(zone.name.split('(')[0])
-        bracket_matches = re.findall(r'\((.*?)\)', zone.name)
-        aliases = [zone_name, primary_name] + [
-            _normalize_area_text(alias)
-            for alias in bracket_matches
-        ]
-        if any(alias and re.search(rf'\b{re.escape(alias)}\b', haystack) for alias in aliases):
-            return zone
-    return None
-
-
-def _area_from_row(row, zones):
-    zone = _zone_for_location(
-        zones,
-        row.get('delivery_latitude') or row.get('location_latitude'),
-        row.get('delivery_longitude') or row.get('location_longitude'),
-    )
-    if not zone:
-        zone = _zone_for_text(
-            zones,
-            row.get('address'),
-            row.get('city'),
-            row.get('state'),
-            row.get('area_label'),
-            row.get('name'),
-        )
-    if zone:
-        return zone.name, 'Delivery Zone', zone.name
-
-    city = (row.get('city') or '').strip()
-    state = (row.get('state') or '').strip()
-    if city and state:
-        return city, state, f"{city}, {state}"
-    if city:
-        return city, '', city
-    if state:
-        return '', state, state
-    return 'Unknown', 'Unknown', 'Unknown'
+def _centroid(lat_total, lon_total, coord_count):
+    return {
+        'lat': round_coord(lat_total / coord_count, 5),
+        'lon': round_coord(lon_total / coord_count, 5),
+    } if coord_count else None
+
+
+def _rolled_areas(start_dt, end_dt=None):
+    """
+    Area facts (admin_manager/rollups.py AREA_FIELDS) for a window, one dict
+    per area with its city, state and area_label. Rolled days are read from
+    DailyAreaStats; only the rest is grouped from raw rows.
+    """
+    return [
+        {'area_label': area_label, 'city': city, 'state': state, **values}
+        for (area_label, city, state), values in rollups.range_by_key('area', start_dt, end_dt).items()
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -211,55 +173,40 @@ class AdminUserLocationAnalyticsView(generics.GenericAPIView):
             if city_filter:
                 addr_qs = addr_qs.filter(city__icontains=city_filter)
 
-            zones = list(DeliveryZone.objects.filter(is_active=True).order_by('name'))
-            area_coord_map = {}
-
-            def add_coord(key, row):
-                lat = _round_coord(row.get('delivery_latitude') or row.get('location_latitude'), 5)
-                lon = _round_coord(row.get('delivery_longitude') or row.get('location_longitude'), 5)
-                if lat is None or lon is None:
-                    return
-                entry = area_coord_map.setdefault(key, {'lat_total': 0, 'lon_total': 0, 'coord_count': 0})
-                entry['lat_total'] += lat
-                entry['lon_total'] += lon
-                entry['coord_count'] += 1
-
-            def centroid_for(key):
-                entry = area_coord_map.get(key)
-                if not entry or not entry['coord_count']:
-                    return None
-                return {
-                    'lat': _round_coord(entry['lat_total'] / entry['coord_count'], 5),
-                    'lon': _round_coord(entry['lon_total'] / entry['coord_count'], 5),
-                }
-            area_map = {}
-            for row in addr_qs.values(
-                'user_id',
-                'city',
-                'state',
-                'address',
-                'location_latitude',
-                'location_longitude',
-            ):
-                city, state, area_label = _area_from_row(row, zones)
-                entry = area_map.setdefault(area_label, {
-                    'city': city,
-                    'state': state,
-                    'area_label': area_label,
-                    'user_ids': set(),
-                    'address_count': 0,
-                    'lat_total': 0,
-                    'lon_total': 0,
-                    'coord_count': 0,
-                })
-                entry['user_ids'].add(row['user_id'])
-                entry['address_count'] += 1
-                lat = _round_coord(row.get('location_latitude'), 5)
-                lon = _round_coord(row.get('location_longitude'), 5)
-                if lat is not None and lon is not None:
-                    entry['lat_total'] += lat
-                    entry['lon_total'] += lon
-                    entry['coord_count'] += 1
+            zone_index = get_zone_index()
+            if state_filter or city_filter:
+                # Free-text filters match raw address text: group the rows.
+                areas = [
+                    {
+                        'city': area['city'],
+                        'state': area['state'],
+                        'area_label': area['area_label'],
+                        'address_count': area['address_count'],
+                        'user_count': len(area['user_ids']),
+                        'centroid': _centroid(area['lat_total'], area['lon_total'], area['coord_count']),
+                    }
+                    for area in address_area_rollup(addr_qs, zone_index).values()
+                ]
+                total_users_in_range = user_qs.count()
+                users_with_address = addr_qs.values('user').distinct().count()
+            else:
+                areas = [
+                    {
+                        'city': area['city'],
+                        'state': area['state'],
+                        'area_label': area['area_label'],
+                        'address_count': area['address_count'],
+                        'user_count': area['user_count'],
+                        'centroid': _centroid(
+                            area['address_lat_total'], area['address_lon_total'], area['address_coord_count'],
+                        ),
+                    }
+                    for area in _rolled_areas(start_dt, end_dt)
+                    if area['address_count']
+                ]
+                signups = rollups.range_totals('zone', start_dt, end_dt)
+                total_users_in_range = signups['buyer_signup_count']
+                users_with_address = signups['buyers_with_address']
 
             # ── Build heatmap point cloud (individual coords) ──────────────
             # Returns up to 500 individual geo-points for a dot-density map
@@ -271,37 +218,21 @@ class AdminUserLocationAnalyticsView(generics.GenericAPIView):
                 'location_latitude', 'location_longitude', 'city', 'state', 'address'
             )[:500]
 
-            points = [
-                {
-                    'lat': _round_coord(p['location_latitude'], 5),
-                    'lon': _round_coord(p['location_longitude'], 5),
-                    'city': _area_from_row(p, zones)[0],
-                    'state': _area_from_row(p, zones)[1],
-                    'area_label': _area_from_row(p, zones)[2],
-                }
-                for p in points_qs
-                if _round_coord(p['location_latitude'], 5) is not None
-            ]
+            points = []
+            for p in points_qs:
+                lat = round_coord(p['location_latitude'], 5)
+                if lat is None:
+                    continue
+                city, state, area_label = area_from_row(p, zone_index)
+                points.append({
+                    'lat': lat,
+                    'lon': round_coord(p['location_longitude'], 5),
+                    'city': city,
+                    'state': state,
+                    'area_label': area_label,
+                })
 
-            # ── Totals ─────────────────────────────────────────────────────
-            total_users_in_range = user_qs.count()
-            users_with_address = addr_qs.values('user').distinct().count()
-
-            areas = sorted(
-                area_map.values(),
-                key=lambda item: len(item['user_ids']),
-                reverse=True,
-            )[:limit]
-            for area in areas:
-                coord_count = area.pop('coord_count')
-                lat_total = area.pop('lat_total')
-                lon_total = area.pop('lon_total')
-                user_ids = area.pop('user_ids')
-                area['user_count'] = len(user_ids)
-                area['centroid'] = {
-                    'lat': _round_coord(lat_total / coord_count, 5),
-                    'lon': _round_coord(lon_total / coord_count, 5),
-                } if coord_count else None
+            areas = sorted(areas, key=lambda item: item['user_count'], reverse=True)[:limit]
 
             return success_response(data={
                 'period': {
@@ -388,38 +319,25 @@ class AdminOrderHeatmapView(generics.GenericAPIView):
             if order_status:
                 order_qs = order_qs.filter(status=order_status)
 
-            zones = list(DeliveryZone.objects.filter(is_active=True).order_by('name'))
-            area_map = {}
-            area_rows = order_qs.values(
-                'city',
-                'state',
-                'address',
-                'location_latitude',
-                'location_longitude',
-                'delivery_latitude',
-                'delivery_longitude',
-                'total_amount',
-            )
-            for row in area_rows:
-                city, state, area_label = _area_from_row(row, zones)
-                entry = area_map.setdefault(area_label, {
-                    'city': city,
-                    'state': state,
-                    'area_label': area_label,
-                    'order_count': 0,
-                    'total_revenue': 0,
-                    'lat_total': 0,
-                    'lon_total': 0,
-                    'coord_count': 0,
-                })
-                entry['order_count'] += 1
-                entry['total_revenue'] += float(row['total_amount'] or 0)
-                lat = _round_coord(row.get('delivery_latitude') or row.get('location_latitude'), 5)
-                lon = _round_coord(row.get('delivery_longitude') or row.get('location_longitude'), 5)
-                if lat is not None and lon is not None:
-                    entry['lat_total'] += lat
-                    entry['lon_total'] += lon
-                    entry['coord_count'] += 1
+            zone_index = get_zone_index()
+            if state_filter or city_filter or order_status:
+                # Text and status filters match raw order rows: group the rows.
+                areas = list(order_area_rollup(order_qs, zone_index).values())
+            else:
+                areas = [
+                    {
+                        'city': area['city'],
+                        'state': area['state'],
+                        'area_label': area['area_label'],
+                        'order_count': area['paid_order_count'],
+                        'total_revenue': float(area['revenue']),
+                        'lat_total': area['order_lat_total'],
+                        'lon_total': area['order_lon_total'],
+                        'coord_count': area['order_coord_count'],
+                    }
+                    for area in _rolled_areas(start_dt, end_dt)
+                    if area['paid_order_count']
+                ]
 
             # ── Point cloud for map (up to 500 individual delivery coords) ─
             points_qs = order_qs.exclude(
@@ -434,41 +352,38 @@ class AdminOrderHeatmapView(generics.GenericAPIView):
                 'city',
                 'state',
                 'address',
-                'total_amount'
+                'total_amount',
+                *ORDER_ZONE_FIELDS,
             )[:500]
 
-            points = [
-                {
-                    'lat': _round_coord(p.get('delivery_latitude') or p.get('location_latitude'), 5),
-                    'lon': _round_coord(p.get('delivery_longitude') or p.get('location_longitude'), 5),
-                    'city': _area_from_row(p, zones)[0],
-                    'state': _area_from_row(p, zones)[1],
-                    'area_label': _area_from_row(p, zones)[2],
+            points = []
+            for p in points_qs:
+                lat = round_coord(p.get('delivery_latitude') or p.get('location_latitude'), 5)
+                if lat is None:
+                    continue
+                city, state, area_label = order_area_from_row(p, zone_index)
+                points.append({
+                    'lat': lat,
+                    'lon': round_coord(p.get('delivery_longitude') or p.get('location_longitude'), 5),
+                    'city': city,
+                    'state': state,
+                    'area_label': area_label,
                     'order_value': float(p['total_amount'] or 0),
-                }
-                for p in points_qs
-                if _round_coord(p.get('delivery_latitude') or p.get('location_latitude'), 5) is not None
-            ]
+                })
 
             # ── Totals ─────────────────────────────────────────────────────
-            totals = order_qs.aggregate(
-                total_orders=Count('id'),
-                total_revenue=Sum('total_amount'),
-            )
+            totals = {
+                'total_orders': sum(area['order_count'] for area in areas),
+                'total_revenue': sum(area['total_revenue'] for area in areas),
+            }
 
             areas = sorted(
-                area_map.values(),
+                areas,
                 key=lambda item: item['order_count'],
                 reverse=True,
             )[:limit]
             for area in areas:
-                coord_count = area.pop('coord_count')
-                lat_total = area.pop('lat_total')
-                lon_total = area.pop('lon_total')
-                area['centroid'] = {
-                    'lat': _round_coord(lat_total / coord_count, 5),
-                    'lon': _round_coord(lon_total / coord_count, 5),
-                } if coord_count else None
+                area['centroid'] = _centroid(area.pop('lat_total'), area.pop('lon_total'), area.pop('coord_count'))
 
             return success_response(data={
                 'period': {
@@ -538,50 +453,47 @@ class AdminVendorCoverageGapView(generics.GenericAPIView):
             min_users = int(request.GET.get('min_users', 5))
             min_orders = int(request.GET.get('min_orders', 3))
 
-            zones = list(DeliveryZone.objects.filter(is_active=True).order_by('name'))
+            zone_index = get_zone_index()
+            area_coord_map = {}
 
-            # ── Users per zone/area ────────────────────────────────────────
-            user_area_sets = {}
-            for row in Address.objects.filter(
-                user__role='buyer',
-                user__created_at__gte=start_dt,
-                user__created_at__lte=end_dt,
-                is_active=True,
-            ).values('user_id', 'city', 'state', 'address', 'location_latitude', 'location_longitude'):
-                city, state, _area_label = _area_from_row(row, zones)
-                key = (city, state)
-                user_area_sets.setdefault(key, set()).add(row['user_id'])
-                add_coord(key, row)
-            user_area_map = {
-                key: len(user_ids)
-                for key, user_ids in user_area_sets.items()
-            }
+            def add_coord(key, row):
+                lat = round_coord(row.get('delivery_latitude') or row.get('location_latitude'), 5)
+                lon = round_coord(row.get('delivery_longitude') or row.get('location_longitude'), 5)
+                if lat is None or lon is None:
+                    return
+                entry = area_coord_map.setdefault(key, {'lat_total': 0, 'lon_total': 0, 'coord_count': 0})
+                entry['lat_total'] += lat
+                entry['lon_total'] += lon
+                entry['coord_count'] += 1
 
-            # ── Orders per area. Prefer delivery zone, fall back to city/state. ──
+            def centroid_for(key):
+                entry = area_coord_map.get(key)
+                if not entry or not entry['coord_count']:
+                    return None
+                return {
+                    'lat': round_coord(entry['lat_total'] / entry['coord_count'], 5),
+                    'lon': round_coord(entry['lon_total'] / entry['coord_count'], 5),
+                }
+
+            # ── Users and orders per zone/area, from the area rollups ─────
+            user_area_map = {}
             order_area_map = {}
-            for row in Order.objects.filter(
-                created_at__gte=start_dt,
-                created_at__lte=end_dt,
-                payment_status='paid',
-            ).values(
-                'city',
-                'state',
-                'address',
-                'location_latitude',
-                'location_longitude',
-                'delivery_latitude',
-                'delivery_longitude',
-                'total_amount',
-            ):
-                city, state, _area_label = _area_from_row(row, zones)
-                key = (city, state)
-                entry = order_area_map.setdefault(key, {
-                    'order_count': 0,
-                    'total_revenue': 0,
-                })
-                entry['order_count'] += 1
-                entry['total_revenue'] += float(row['total_amount'] or 0)
-                add_coord(key, row)
+            for area in _rolled_areas(start_dt, end_dt):
+                key = (area['city'], area['state'])
+                coords = area_coord_map.setdefault(key, {'lat_total': 0, 'lon_total': 0, 'coord_count': 0})
+                coords['lat_total'] += area['address_lat_total'] + area['order_lat_total']
+                coords['lon_total'] += area['address_lon_total'] + area['order_lon_total']
+                coords['coord_count'] += area['address_coord_count'] + area['order_coord_count']
+                if area['address_count']:
+                    user_area_map[key] = user_area_map.get(key, 0) + area['user_count']
+                if area['paid_order_count']:
+                    # Prefer delivery zone, fall back to city/state.
+                    entry = order_area_map.setdefault(key, {
+                        'order_count': 0,
+                        'total_revenue': 0,
+                    })
+                    entry['order_count'] += area['paid_order_count']
+                    entry['total_revenue'] += float(area['revenue'])
 
             # ── Active vendors per zone/area ───────────────────────────────
             vendor_area_map = {}
@@ -589,7 +501,7 @@ class AdminVendorCoverageGapView(generics.GenericAPIView):
                 is_active=True,
                 approval_status='approved',
             ).values('id', 'name', 'city', 'state', 'address', 'location_latitude', 'location_longitude'):
-                city, state, _area_label = _area_from_row(row, zones)
+                city, state, _area_label = area_from_row(row, zone_index)
                 key = (city, state)
                 vendor_area_map[key] = vendor_area_map.get(key, 0) + 1
                 add_coord(key, row)
@@ -701,58 +613,35 @@ class AdminLocationSummaryView(generics.GenericAPIView):
             now = timezone.now()
             start_dt = now - timedelta(days=30)
 
-            zones = list(DeliveryZone.objects.filter(is_active=True).order_by('name'))
+            zone_index = get_zone_index()
 
             # Top 5 signup zones. Prefer delivery zone, fall back to city/state.
-            user_area_counts = {}
-            for row in Address.objects.filter(
-                user__role='buyer',
-                is_active=True,
-            ).values('user_id', 'city', 'state', 'address', 'location_latitude', 'location_longitude'):
-                city, state, area_label = _area_from_row(row, zones)
-                entry = user_area_counts.setdefault(area_label, {
-                    'city': city,
-                    'state': state,
-                    'area_label': area_label,
-                    'user_ids': set(),
-                })
-                entry['user_ids'].add(row['user_id'])
             top_user_cities = sorted(
                 (
                     {
                         'area_label': item['area_label'],
-                        'user_count': len(item['user_ids']),
+                        'user_count': item['user_count'],
                     }
-                    for item in user_area_counts.values()
+                    for item in _rolled_areas(None)
+                    if item['address_count']
                 ),
                 key=lambda item: item['user_count'],
                 reverse=True,
             )[:5]
 
-            # Top 5 order areas by order count. Prefer city/state, fall back to delivery zone.
-            order_area_counts = {}
-            for row in Order.objects.filter(
-                created_at__gte=start_dt,
-                payment_status='paid',
-            ).values(
-                'city',
-                'state',
-                'address',
-                'location_latitude',
-                'location_longitude',
-                'delivery_latitude',
-                'delivery_longitude',
-            ):
-                city, state, area_label = _area_from_row(row, zones)
-                entry = order_area_counts.setdefault(area_label, {
-                    'city': city,
-                    'state': state,
-                    'area_label': area_label,
-                    'order_count': 0,
-                })
-                entry['order_count'] += 1
+            # Top 5 order areas by order count. Prefer delivery zone, fall back to city/state.
+            order_areas = [
+                {
+                    'city': item['city'],
+                    'state': item['state'],
+                    'area_label': item['area_label'],
+                    'order_count': item['paid_order_count'],
+                }
+                for item in _rolled_areas(start_dt)
+                if item['paid_order_count']
+            ]
             top_order_cities = sorted(
-                order_area_counts.values(),
+                order_areas,
                 key=lambda item: item['order_count'],
                 reverse=True,
             )[:5]
@@ -760,10 +649,10 @@ class AdminLocationSummaryView(generics.GenericAPIView):
             # Count of cities with demand but no vendor
             cities_with_demand = {
                 (item['city'], item['state'])
-                for item in order_area_counts.values()
+                for item in order_areas
             }
             cities_with_vendors = set(
-                _area_from_row(r, zones)[:2]
+                area_from_row(r, zone_index)[:2]
                 for r in Vendor.objects.filter(
                     is_active=True, approval_status='approved'
                 ).values('name', 'city', 'state', 'address', 'location_latitude', 'location_longitude')
@@ -771,9 +660,7 @@ class AdminLocationSummaryView(generics.GenericAPIView):
             gap_count = len(cities_with_demand - cities_with_vendors)
 
             # New signups in last 30 days
-            new_users_30d = User.objects.filter(
-                role='buyer', created_at__gte=start_dt
-            ).count()
+            new_users_30d = rollups.range_totals('zone', start_dt)['buyer_signup_count']
 
             return success_response(data={
                 'period_days': 30,
@@ -61,8 +61,9 @@ class AdminBulkPushNotificationView(generics.GenericAPIView):
         ]
         Notification.objects.bulk_create(notifications)
 
-        # Send push notifications using the helper's executor for efficiency
-        # The helper already handles PushNotificationLog creation via FirebaseNotificationService
+        # Queue the pushes in the notification outbox; Celery delivers them
+        # (and writes the PushNotificationLog rows) after this request returns.
+        # success_count is the number of pushes queued.
         results = notification_helper.send_to_users_with_executor(
             users=users,
             title=title,
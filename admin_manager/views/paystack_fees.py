@@ -10,6 +10,9 @@ Endpoints:
   GET  /admin-manager/analytics/paystack-fees/transactions/
        Paginated line-by-line list of Paystack movements and their fees.
 
+  GET  /admin-manager/analytics/paystack-fees/transactions/export/
+       The same list as one streamed Excel or CSV file.
+
   POST /admin-manager/analytics/paystack-fees/sync/
        Reconcile against Paystack's balance ledger, replacing estimated fees
        (mostly payouts, whose webhooks don't report a fee) with actuals.
@@ -33,6 +36,7 @@ from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 
 from helpers.date_range import parse_date_range
+from helpers.exports import column, export_format, stream_export
 from helpers.response.response_format import (
     bad_request_response,
     internal_server_error_response,
@@ -330,7 +334,8 @@ class AdminPaystackFeeTransactionListView(generics.GenericAPIView):
         ],
         responses={200: PaystackFeeRecordSerializer(many=True), 401: 'Unauthorized'},
     )
-    def get(self, request):
+    def get_queryset(self):
+        request = self.request
         start, end, _period = resolve_window(request)
         queryset = (
             PaystackFeeRecord.objects
@@ -349,14 +354,66 @@ class AdminPaystackFeeTransactionListView(generics.GenericAPIView):
         if str(request.GET.get('estimated_only', '')).lower() in ('1', 'true', 'yes'):
             queryset = queryset.filter(is_estimated=True)
 
+        return queryset.order_by('-paid_at')
+
+    def get(self, request):
         return paginate_success_response_with_serializer(
             request,
             self.serializer_class,
-            queryset.order_by('-paid_at'),
+            self.get_queryset(),
             page_size=int(request.GET.get('page_size', 20)),
         )
 
 
+FEE_RECORD_EXPORT_COLUMNS = [
+    column('Paid at', 'paid_at'),
+    column('Direction', 'direction'),
+    column('Reference', 'reference'),
+    column('Paystack ID', 'paystack_id'),
+    column('Channel', 'channel'),
+    column('Currency', 'currency'),
+    column('Gross amount', 'gross_amount'),
+    column('Fee', 'fee_amount'),
+    column('Net amount', 'net_amount'),
+    column('Fee estimated', 'is_estimated'),
+    column('Source', 'source'),
+    column('User', 'user__full_name'),
+    column('User email', 'user__email'),
+    column('Order track ID', 'order__track_id'),
+    column('Wallet transaction', 'wallet_transaction__reference_code'),
+]
+
+
+class AdminPaystackFeeTransactionExportView(AdminPaystackFeeTransactionListView):
+    """
+    GET /admin-manager/analytics/paystack-fees/transactions/export/?file_type=xlsx|csv
+
+    The whole fee ledger for the window and filters, streamed as one file.
+    """
+
+    @swagger_auto_schema(
+        operation_summary="Export the Paystack fee ledger",
+        manual_parameters=[
+            openapi.Parameter('file_type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['xlsx', 'csv'], description='Defaults to xlsx'),
+            openapi.Parameter('period', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['day', 'week', 'month', 'year']),
+            openapi.Parameter('start_date', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('direction', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['collection', 'payout', 'reversal']),
+            openapi.Parameter('channel', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('estimated_only', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        ],
+        responses={200: 'Spreadsheet download', 401: 'Unauthorized'},
+    )
+    def get(self, request):
+        file_type = export_format(request)
+        if file_type is None:
+            return bad_request_response(message='file_type must be one of: xlsx, csv')
+        return stream_export(self.get_queryset(), FEE_RECORD_EXPORT_COLUMNS, 'paystack-fees', file_type)
+
+
 class AdminPaystackFeeSyncView(generics.GenericAPIView):
     """
     POST /admin-manager/analytics/paystack-fees/sync/
@@ -8,9 +8,11 @@ from decimal import Decimal, ROUND_HALF_UP
 from uuid import UUID
 
 from helpers.date_range import filter_by_date_range, parse_date_range
+from helpers.exports import ExportColumn, column, export_format, stream_export
 
 from account.models import Rider, StaffPagePermission, User, Vendor
 from account.serializers import RiderSerializer
+from admin_manager import rollups
 from admin_manager.serializers.products import AdminProductCategoriesSerializer
 from admin_manager.staff_visibility import (
     STAFF_ORDER_VISIBILITY_HOURS,
@@ -120,33 +122,18 @@ class AdminDeliveryZoneListView(generics.GenericAPIView):
 
         marketplace_ids = _staff_marketplace_ids(request.user)
         if marketplace_ids is not None:
-            # Limited marketplace staff — only show zones that contain at
-            # least one of their orders' delivery (or pickup) coordinates.
+            # Limited marketplace staff — only show zones that at least one
+            # of their orders is delivered to.
             if not marketplace_ids:
                 zones = []
             else:
-                order_locations = Order.objects.filter(
-                    Q(vendor__is_marketplace=True) | Q(vendor__marketplace__isnull=False),
-                    vendor__marketplace__id__in=marketplace_ids,
-                ).values(
-                    'delivery_latitude',
-                    'delivery_longitude',
-                    'location_latitude',
-                    'location_longitude',
+                relevant_zone_ids = set(
+                    Order.objects.filter(
+                        Q(vendor__is_marketplace=True) | Q(vendor__marketplace__isnull=False),
+                        vendor__marketplace__id__in=marketplace_ids,
+                        delivery_zone__isnull=False,
+                    ).values_list('delivery_zone_id', flat=True).order_by().distinct()
                 )
-                relevant_zone_ids = set()
-                remaining = {z.id for z in zones}
-                for loc in order_locations:
-                    if not remaining:
-                        break
-                    lat = loc['delivery_latitude'] or loc['location_latitude']
-                    lon = loc['delivery_longitude'] or loc['location_longitude']
-                    if lat is None or lon is None:
-                        continue
-                    for zone in zones:
-                        if zone.id in remaining and zone.contains_location(lat, lon):
-                            relevant_zone_ids.add(zone.id)
-                            remaining.discard(zone.id)
                 zones = [z for z in zones if z.id in relevant_zone_ids]
 
         return success_response([
@@ -338,63 +325,47 @@ class AdminDashboardOverviewAPIView(generics.GenericAPIView):
             return bounds
 
         # ── Orders ──────────────────────────────────────────────────────────
+        # Order, revenue, balance-credit and completed-payout figures come
+        # from the daily rollups; only days not rolled yet (today, partial
+        # edge days) are aggregated from raw rows (admin_manager/rollups.py).
+        vendor_stats = rollups.range_by_key('vendor', start_date, end_date)
+        vendor_totals = rollups.sum_keys('vendor', vendor_stats.values())
+        rider_totals = rollups.range_totals('rider', start_date, end_date)
         base_orders = Order.objects.filter(**window_filter('created_at'))
 
-        completed_statuses = ['delivered']
-        canceled_statuses = ['canceled', 'cancelled', 'rejected', 'failed', 'payment_failed']
-
-        order_agg = base_orders.aggregate(
-            total=Count('id'),
-            active=Count('id', filter=Q(status__in=self.ACTIVE_ORDER_STATUSES)),
-            completed=Count('id', filter=Q(status__in=completed_statuses) | Q(delivery_status__in=completed_statuses)),
-            canceled=Count('id', filter=Q(status__in=canceled_statuses) | Q(delivery_status__in=canceled_statuses)),
-        )
+        order_agg = {
+            'total': vendor_totals['order_count'],
+            # Whether an order is still active is current state: count it live.
+            'active': base_orders.filter(status__in=self.ACTIVE_ORDER_STATUSES).count(),
+            'completed': vendor_totals['completed_order_count'],
+            'canceled': vendor_totals['canceled_order_count'],
+        }
 
         # ── Revenue ─────────────────────────────────────────────────────────
         # Customer-facing product/variant prices already include the platform's
         # flat service charge. `platform_amount` is the persisted difference
         # between those prices and the vendor settlement amount.
-        paid_orders = base_orders.filter(payment_status='paid')
-        revenue_agg = paid_orders.aggregate(
-            total_earnings=Sum('total_amount'),
-            vendor_service_charges=Sum('platform_amount'),
-        )
-        total_earnings = revenue_agg['total_earnings'] or 0
-        vendor_service_charges = revenue_agg['vendor_service_charges'] or 0
-
-        # Only independent riders receive per-delivery earnings. Marketplace
-        # riders are salaried, so their delivery fees belong to the platform's
-        # marketplace-delivery revenue instead.
-        independent_rider_orders = paid_orders.filter(
-            status='delivered',
-            rider__isnull=False,
-            rider__is_in_house_rider=False,
-        )
+        total_earnings = vendor_totals['revenue']
+        vendor_service_charges = vendor_totals['platform_amount']
+
         # The payout cards represent the internal earning ledger: money added
         # to vendor/rider wallet balances. This is deliberately independent of
         # whether those users later withdraw through Paystack.
+        vendor_balance_credits = vendor_totals['balance_credits']
+        rider_balance_credits = rider_totals['balance_credits']
+        completed_vendor_payouts = vendor_totals['payouts_completed']
+        completed_rider_payouts = rider_totals['payouts_completed']
+        completed_vendor_withdrawal_count = vendor_totals['payout_count']
+        completed_rider_withdrawal_count = rider_totals['payout_count']
+
+        # Pending withdrawals are current state, not history: read them live.
         vendor_user_ids = Vendor.objects.values_list('user_id', flat=True)
         rider_user_ids = Rider.objects.values_list('user_id', flat=True)
-        withdrawal_recipient = (
-            Q(user_id__in=vendor_user_ids)
-            | Q(user__isnull=True, wallet__user_id__in=vendor_user_ids)
-            | Q(user_id__in=rider_user_ids)
-            | Q(user__isnull=True, wallet__user_id__in=rider_user_ids)
-        )
-        withdrawals = WalletTransaction.objects.filter(
-            withdrawal_recipient,
+        pending_withdrawals = WalletTransaction.objects.filter(
             transaction_type='withdrawal',
-        )
-        balance_credits = WalletTransaction.objects.filter(
-            withdrawal_recipient,
-            transaction_type='earning',
-            status='completed',
+            status='pending',
             **window_filter('created_at'),
         )
-        completed_withdrawals = withdrawals.filter(
-            status='completed', **window_filter('updated_at'))
-        pending_withdrawals = withdrawals.filter(
-            status='pending', **window_filter('created_at'))
 
         def payout_total(queryset, user_ids):
             return queryset.filter(
@@ -402,18 +373,6 @@ class AdminDashboardOverviewAPIView(generics.GenericAPIView):
                 | Q(user__isnull=True, wallet__user_id__in=user_ids)
             ).aggregate(total=Sum('amount'))['total'] or 0
 
-        vendor_balance_credits = payout_total(balance_credits, vendor_user_ids)
-        rider_balance_credits = payout_total(balance_credits, rider_user_ids)
-        completed_vendor_payouts = payout_total(completed_withdrawals, vendor_user_ids)
-        completed_rider_payouts = payout_total(completed_withdrawals, rider_user_ids)
-        completed_vendor_withdrawal_count = completed_withdrawals.filter(
-            Q(user_id__in=vendor_user_ids)
-            | Q(user__isnull=True, wallet__user_id__in=vendor_user_ids)
-        ).count()
-        completed_rider_withdrawal_count = completed_withdrawals.filter(
-            Q(user_id__in=rider_user_ids)
-            | Q(user__isnull=True, wallet__user_id__in=rider_user_ids)
-        ).count()
         pending_vendor_payouts = payout_total(pending_withdrawals, vendor_user_ids)
         pending_rider_payouts = payout_total(pending_withdrawals, rider_user_ids)
 
@@ -422,64 +381,44 @@ class AdminDashboardOverviewAPIView(generics.GenericAPIView):
         # Marketplace orders are excluded here because the platform keeps their
         # entire delivery fee, counted separately below — including the service
         # fee inside it, which would otherwise be double counted.
-        marketplace_filter = (
-            Q(vendor__is_marketplace=True) | Q(vendor__marketplace__isnull=False)
-        )
-        non_marketplace_paid = paid_orders.exclude(marketplace_filter).distinct()
-
-        delivery_service_fees = non_marketplace_paid.aggregate(
-            total=Sum('service_fee'),
-        )['total'] or 0
+        # The rollups keep these per vendor; vendors are split by their
+        # current marketplace membership.
+        marketplace_vendor_ids = set(Vendor.objects.filter(
+            Q(is_marketplace=True) | Q(marketplace__isnull=False)
+        ).values_list('id', flat=True).distinct())
+        independent_totals = rollups.sum_keys('vendor', (
+            values for vendor_id, values in vendor_stats.items() if vendor_id not in marketplace_vendor_ids
+        ))
+        marketplace_totals = rollups.sum_keys('vendor', (
+            values for vendor_id, values in vendor_stats.items() if vendor_id in marketplace_vendor_ids
+        ))
 
         # Orders placed before the service fee was stored have service_fee = 0.
         # Fall back to the rider commission recorded at the time so historical
         # revenue doesn't collapse to zero after the model change.
-        legacy_delivery_margin = non_marketplace_paid.filter(
-            Q(service_fee__isnull=True) | Q(service_fee=0),
-            rider_commission_amount__isnull=False,
-        ).aggregate(total=Sum('rider_commission_amount'))['total'] or 0
-
         # The oldest orders predate both snapshots. Reconstruct their historic
         # delivery margin from the configured legacy commission percentage.
-        unsnapshotted_legacy_delivery = non_marketplace_paid.filter(
-            Q(service_fee__isnull=True) | Q(service_fee=0),
-            Q(status='delivered') | Q(delivery_status='delivered'),
-            rider_commission_amount__isnull=True,
-            rider_commission_percentage_applied__isnull=True,
-        ).aggregate(total=Sum('delivery_fee'))['total'] or 0
         legacy_percentage = Decimal(str(
             PlatformSettings.get_settings().rider_commission_percentage or 0
         ))
         derived_legacy_delivery_margin = (
-            Decimal(str(unsnapshotted_legacy_delivery))
+            Decimal(str(independent_totals['unsnapshotted_delivery_fees']))
             * legacy_percentage
             / Decimal('100')
         )
 
         delivery_service_fees = (
-            Decimal(str(delivery_service_fees))
-            + Decimal(str(legacy_delivery_margin))
+            Decimal(str(independent_totals['service_fees']))
+            + Decimal(str(independent_totals['legacy_delivery_margin']))
             + derived_legacy_delivery_margin
         )
 
         # New orders snapshot marketplace delivery revenue on the order. For
         # older rows where that snapshot is null, derive it from the vendor's
-        # marketplace membership without double-counting M2M joins.
-        recorded_marketplace_delivery = paid_orders.filter(
-            platform_marketplace_delivery_amount__isnull=False,
-        ).aggregate(total=Sum('platform_marketplace_delivery_amount'))['total'] or 0
-        legacy_marketplace_delivery = (
-            paid_orders
-            .filter(platform_marketplace_delivery_amount__isnull=True)
-            .filter(
-                Q(vendor__is_marketplace=True) |
-                Q(vendor__marketplace__isnull=False)
-            )
-            .distinct()
-            .aggregate(total=Sum('delivery_fee'))['total'] or 0
-        )
+        # marketplace membership.
         marketplace_delivery_fees = (
-            recorded_marketplace_delivery + legacy_marketplace_delivery
+            vendor_totals['marketplace_delivery_recorded']
+            + marketplace_totals['unsnapshotted_marketplace_delivery']
         )
         platform_earnings = (
             vendor_service_charges + delivery_service_fees + marketplace_delivery_fees
@@ -522,16 +461,11 @@ class AdminDashboardOverviewAPIView(generics.GenericAPIView):
 
         # ── Previous period for growth indicators ───────────────────────────
         if prev_start and start_date:
-            prev_orders = Order.objects.filter(
-                created_at__gte=prev_start,
-                created_at__lt=start_date,
-            )
+            prev_totals = rollups.range_totals('vendor', prev_start, start_date)
         else:
-            prev_orders = Order.objects.none()
-        prev_total = prev_orders.count()
-        prev_earnings = prev_orders.filter(payment_status='paid').aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
+            prev_totals = {'order_count': 0, 'revenue': 0}
+        prev_total = prev_totals['order_count']
+        prev_earnings = prev_totals['revenue']
 
         order_growth = order_agg['total'] > 0 if prev_total == 0 else (order_agg['total'] > prev_total)
         earnings_growth = total_earnings > 0 if float(prev_earnings) == 0 else (float(total_earnings) > float(prev_earnings))
@@ -541,7 +475,7 @@ class AdminDashboardOverviewAPIView(generics.GenericAPIView):
         total_customers = User.objects.filter(role='buyer').count()
 
         active_users = User.objects.filter(is_active=True, **window_filter('last_login')).count()
-        new_users = User.objects.filter(**window_filter('created_at')).count()
+        new_users = rollups.range_totals('zone', start_date, end_date)['signup_count']
         vendors_count = Vendor.objects.count()
         riders_count = Rider.objects.count()
 
@@ -698,14 +632,13 @@ class AdminGetMarketPlaceRiderListView(generics.GenericAPIView):
                     'delivery_longitude',
                     'location_latitude',
                     'location_longitude',
+                    'delivery_zone',
                 ).get(id=order_id)
             except Order.DoesNotExist:
                 return bad_request_response(message="Order not found.", status_code=404)
 
             if not order_zone:
-                latitude = order.delivery_latitude or order.location_latitude
-                longitude = order.delivery_longitude or order.location_longitude
-                order_zone = self._zone_for_location(zones, latitude, longitude)
+                order_zone = next((zone for zone in zones if zone.pk == order.delivery_zone_id), None)
 
         if order_zone:
             matching_ids = [
@@ -950,7 +883,92 @@ class AdminGetAllOrdersAPIView(generics.GenericAPIView):
                 'marketplace_staff_limited': limited_staff,
             }
         )
-    
+
+
+def _customer_total(row):
+    # Same figure AdminOrderListSerializer reports as total_amount.
+    return (
+        (row['total_amount'] or 0)
+        + (row['delivery_fee'] or 0)
+        - (row['promo_discount_amount'] or 0)
+    )
+
+
+ORDER_EXPORT_COLUMNS = [
+    column('Track ID', 'track_id'),
+    column('Order ID', 'id'),
+    column('Placed at', 'created_at'),
+    column('Status', 'status'),
+    column('Delivery status', 'delivery_status'),
+    column('Payment status', 'payment_status'),
+    column('Payment method', 'payment_method'),
+    column('Customer', 'user__full_name'),
+    column('Customer email', 'user__email'),
+    column('Vendor', 'vendor__name'),
+    column('Vendor category', 'vendor__category__name'),
+    column('Rider', 'rider__user__full_name'),
+    column('Delivery zone', 'delivery_zone__name'),
+    column('Delivery address', 'address'),
+    column('City', 'city'),
+    column('State', 'state'),
+    column('Items total', 'total_amount'),
+    column('Delivery fee', 'delivery_fee'),
+    column('Promo code', 'promo_code__code'),
+    column('Promo discount', 'promo_discount_amount'),
+    ExportColumn('Customer total', ('total_amount', 'delivery_fee', 'promo_discount_amount'), _customer_total),
+    column('Vendor amount', 'vendor_amount'),
+    column('Platform amount', 'platform_amount'),
+    column('Rider earning', 'rider_earning'),
+    column('Rider commission', 'rider_commission_amount'),
+    column('Marketplace delivery amount', 'platform_marketplace_delivery_amount'),
+    column('Delivered at', 'delivered_at'),
+]
+
+# Marketplace staff see the vendor side of an order only, as in the list.
+LIMITED_STAFF_ORDER_EXPORT_COLUMNS = [
+    column('Track ID', 'track_id'),
+    column('Order ID', 'id'),
+    column('Placed at', 'created_at'),
+    column('Status', 'status'),
+    column('Delivery status', 'delivery_status'),
+    column('Vendor', 'vendor__name'),
+    column('Vendor item total', 'vendor_amount'),
+    column('Pickup confirmed at', 'pickup_confirmed_at'),
+]
+
+
+class AdminExportOrdersAPIView(AdminGetAllOrdersAPIView):
+    """
+    GET /admin-manager/orders/export/?file_type=xlsx|csv
+
+    Every order matching the order list's filters as one spreadsheet,
+    streamed in chunks (helpers/exports.py) rather than paginated.
+    """
+
+    @swagger_auto_schema(
+        operation_summary="Export Orders (Admin)",
+        operation_description="Download all orders matching the order list filters as Excel or CSV.",
+        manual_parameters=[
+            openapi.Parameter('file_type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['xlsx', 'csv'], description="Defaults to xlsx"),
+            openapi.Parameter('search', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('start_date', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('end_date', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'Spreadsheet download', 401: 'Unauthorized'},
+    )
+    def get(self, request):
+        file_type = export_format(request)
+        if file_type is None:
+            return bad_request_response(message="file_type must be one of: xlsx, csv")
+
+        columns = (
+            LIMITED_STAFF_ORDER_EXPORT_COLUMNS
+            if _is_limited_marketplace_staff(request.user)
+            else ORDER_EXPORT_COLUMNS
+        )
+        return stream_export(self.get_queryset(), columns, 'orders', file_type)
 
 
 class AdminPromoOrdersAPIView(generics.GenericAPIView):
@@ -1093,27 +1111,9 @@ class AdminGetAllMarketPlaceVendorOrdersAPIView(generics.GenericAPIView):
             queryset = queryset.filter(marketplace_filter).distinct()
 
         if zone_id:
-            try:
-                zones = self.get_active_delivery_zones()
-                zone = next((candidate for candidate in zones if str(candidate.id) == str(zone_id)), None)
-                if not zone:
-                    raise DeliveryZone.DoesNotExist
-                matching_ids = [
-                    order['id']
-                    for order in queryset.values(
-                        'id',
-                        'location_latitude',
-                        'location_longitude',
-                        'delivery_latitude',
-                        'delivery_longitude',
-                    )
-                    if zone.contains_location(
-                        order['delivery_latitude'] or order['location_latitude'],
-                        order['delivery_longitude'] or order['location_longitude'],
-                    )
-                ]
-                queryset = queryset.filter(id__in=matching_ids)
-            except DeliveryZone.DoesNotExist:
+            if _is_uuid(zone_id):
+                queryset = queryset.filter(delivery_zone_id=zone_id, delivery_zone__is_active=True)
+            else:
                 queryset = queryset.none()
 
         # Optional custom date range (start_date / end_date on created_at).
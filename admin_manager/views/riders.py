@@ -588,18 +588,8 @@ class AdminAssignOrderToRiderView(generics.GenericAPIView):
             if rider.status != 'active' or not rider.is_verified:
                 return bad_request_response(message="Rider must be active and verified before assignment.")
 
-            from product.models import DeliveryZone
-            latitude = order.delivery_latitude or order.location_latitude
-            longitude = order.delivery_longitude or order.location_longitude
-            order_zone = None
-            if latitude is not None and longitude is not None:
-                try:
-                    order_zone = DeliveryZone.get_zone_for_location(
-                        float(latitude),
-                        float(longitude),
-                    )
-                except (TypeError, ValueError):
-                    order_zone = None
+            from helpers.zone_index import active_zone
+            order_zone = active_zone(order.delivery_zone_id)
 
             rider_zone = rider.get_current_zone() or rider.get_home_zone()
 
@@ -840,18 +830,15 @@ class RiderAdvancePaymentView(generics.GenericAPIView):
         except Rider.DoesNotExist:
             return bad_request_response(message="Rider not found.", status_code=404)
 
-        from wallet.models import Wallet, WalletTransaction
+        from wallet import ledger
+        from wallet.models import Wallet
         wallet, _ = Wallet.objects.get_or_create(user=rider.user)
 
         # Process advance payment
-        wallet.deposit(amount)
-
-        WalletTransaction.objects.create(
-            wallet=wallet,
+        ledger.credit(
+            wallet,
+            amount,
             user=rider.user,
-            amount=amount,
-            transaction_type='deposit',
-            status='completed',
             description=f"Advance Payment: {reason}"
         )
 
@@ -933,6 +920,7 @@ class AdminRiderFundRequestActionView(generics.GenericAPIView):
         if not rider:
             return bad_request_response(message="Rider not found for this request.", status_code=404)
 
+        from wallet import ledger
         from wallet.models import Wallet
         wallet = txn.wallet or Wallet.objects.filter(user=txn.user).first()
         if not wallet:
@@ -940,7 +928,6 @@ class AdminRiderFundRequestActionView(generics.GenericAPIView):
 
         if action == 'reject':
             reason = request.data.get('reason', 'Fund request rejected')
-            txn.status = 'failed'
             txn.description = f"{txn.description or 'Rider fund request'} — rejected: {reason}"
             # A rejection and a genuine payment failure are both stored as
             # 'failed', which left the apps unable to tell a rider which one
@@ -949,8 +936,11 @@ class AdminRiderFundRequestActionView(generics.GenericAPIView):
             response_data = txn.response_data if isinstance(txn.response_data, dict) else {}
             response_data.update({'rejected': True, 'rejection_reason': reason})
             txn.response_data = response_data
-            txn.save()
-            wallet.deposit(txn.amount)
+            # release flips the status conditionally, so a double-submitted
+            # rejection refunds once.
+            if not ledger.release(wallet, txn):
+                return bad_request_response(message="This fund request has already been rejected.")
+            txn.save(update_fields=['description', 'response_data', 'updated_at'])
             return success_response(message="Fund request rejected and funds returned to the rider's wallet.")
 
         success, message = PaystackManager().initiate_transfer(
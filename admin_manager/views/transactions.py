@@ -5,6 +5,7 @@ from django.db.models import Q
 from admin_manager.serializers.transactions import AdminWalletTransactionSerializer
 from helpers.response.response_format import paginate_success_response_with_serializer,bad_request_response,success_response
 from helpers.date_range import filter_by_date_range
+from helpers.exports import ExportColumn, column, export_format, stream_export
 from product.models import Product
 
 from wallet.models import WalletTransaction
@@ -50,6 +51,37 @@ class AdminGetTransactionsListView(generics.GenericAPIView):
             self.get_queryset(),
             page_size=int(request.GET.get('page_size',20))
         )
+
+
+def _owner(field):
+    # Rows saved before WalletTransaction.user existed only carry the wallet.
+    return lambda row: row[f'user__{field}'] or row[f'wallet__user__{field}']
+
+
+TRANSACTION_EXPORT_COLUMNS = [
+    column('Date', 'created_at'),
+    column('Updated at', 'updated_at'),
+    column('Reference', 'reference_code'),
+    column('External reference', 'external_reference'),
+    column('Type', 'transaction_type'),
+    column('Status', 'status'),
+    column('Amount', 'amount'),
+    ExportColumn('User', ('user__full_name', 'wallet__user__full_name'), _owner('full_name')),
+    ExportColumn('User email', ('user__email', 'wallet__user__email'), _owner('email')),
+    ExportColumn('Role', ('user__role', 'wallet__user__role'), _owner('role')),
+    column('Order track ID', 'order__track_id'),
+    column('Description', 'description'),
+]
+
+
+class AdminExportTransactionsView(AdminGetTransactionsListView):
+    """Every transaction matching the list filters, streamed as Excel or CSV (?file_type=)."""
+
+    def get(self, request):
+        file_type = export_format(request)
+        if file_type is None:
+            return bad_request_response(message="file_type must be one of: xlsx, csv")
+        return stream_export(self.get_queryset(), TRANSACTION_EXPORT_COLUMNS, 'transactions', file_type)
     
 
 class AdminGetTransactionDetailView(generics.GenericAPIView):
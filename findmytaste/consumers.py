@@ -3,9 +3,27 @@ from urllib.parse import parse_qs
 
 from channels.generic.websocket import AsyncWebsocketConsumer, AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 
 from product.models import Order
 import logging
+import time
+from decimal import Decimal
+
+from django.conf import settings
+
+from helpers.redis_tracking_rooms import tracking_room_joined, tracking_room_left
+from helpers.rider_location import current_rider_location
+
+# RiderConsumer "location" action defaults; each can be overridden in settings.
+DEFAULT_WS_LOCATION_MIN_INTERVAL_SECONDS = 2
+DEFAULT_WS_LOCATION_ACK_BATCH = 10
+DEFAULT_WS_LOCATION_ACK_INTERVAL_SECONDS = 15
+RIDER_PROFILE_REFRESH_SECONDS = 30
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
 
 
 class OrderTrackingConsumer(AsyncWebsocketConsumer):
@@ -128,6 +146,9 @@ class DeliveryTrackingConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # Rider location fixes are only broadcast to rooms someone is watching.
+        await sync_to_async(tracking_room_joined)(self.order_id)
+        self.counted_in_room = True
         
         await self.accept()
         
@@ -146,6 +167,9 @@ class DeliveryTrackingConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        if getattr(self, 'counted_in_room', False):
+            self.counted_in_room = False
+            await sync_to_async(tracking_room_left)(self.order_id)
         logging.warning(f"[DeliveryTrackingConsumer] Disconnect finished for {self.room_group_name} ({self.channel_name})")
 
     async def receive(self, text_data):
@@ -164,14 +188,17 @@ class DeliveryTrackingConsumer(AsyncWebsocketConsumer):
         logging.info(f"[DeliveryTrackingConsumer] Sent {event['type']} update: {event['data']}")
 
     async def rider_location_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'rider_location',
-            'data': event['data']
-        }))
-
+        # broadcast_location_update sends the frame pre-serialized.
+        text = event.get('text')
+        if text is None:
+            text = json.dumps({
+                'type': 'rider_location',
+                'data': event['data']
+            })
+        await self.send(text_data=text)
 
         # add log
-        logging.info(f"[DeliveryTrackingConsumer] Sent rider_location update: {event['data']}")
+        logging.info(f"[DeliveryTrackingConsumer] Sent rider_location update for {self.room_group_name}")
 
 
 
@@ -191,7 +218,10 @@ class DeliveryTrackingConsumer(AsyncWebsocketConsumer):
             
             # Get latest tracking data
             tracking = DeliveryTracking.objects.filter(order=order).last()
-            
+            rider_latitude, rider_longitude, rider_located_at = (
+                current_rider_location(order.rider) if order.rider else (None, None, None)
+            )
+
             return {
                 'order_id': str(order.id),
                 'status': order.status,
@@ -216,9 +246,9 @@ class DeliveryTrackingConsumer(AsyncWebsocketConsumer):
                     'name': order.rider.user.full_name if order.rider else None,
                     'phone': order.rider.user.phone_number if order.rider else None,
                     'current_location': {
-                        'latitude': float(order.rider.current_latitude) if order.rider and order.rider.current_latitude else None,
-                        'longitude': float(order.rider.current_longitude) if order.rider and order.rider.current_longitude else None,
-                        'updated_at': order.rider.location_updated_at.isoformat() if order.rider and order.rider.location_updated_at else None
+                        'latitude': rider_latitude,
+                        'longitude': rider_longitude,
+                        'updated_at': rider_located_at.isoformat() if rider_located_at else None
                     }
                 } if order.rider else None,
                 'tracking': {
@@ -429,10 +459,13 @@ class RiderConsumer(AsyncJsonWebsocketConsumer):
         `user_id`, while the backend broadcasts to riders_group_<User.id>.
         Resolve both directions so the connection always joins the group the
         server actually sends to.
+
+        Returns ``(group ids, rider)``; rider is None when no profile matched.
         """
         from account.models import Rider
 
         ids = {str(raw_id)}
+        rider = None
         try:
             rider = Rider.objects.only('id', 'user_id').filter(id=raw_id).first()
             if rider:
@@ -443,19 +476,52 @@ class RiderConsumer(AsyncJsonWebsocketConsumer):
                     ids.add(str(rider.id))
         except Exception as e:
             logging.warning(f"[RiderConsumer] Could not resolve rider groups for {raw_id}: {e}")
-        return ids
+        return ids, rider
+
+    @staticmethod
+    @database_sync_to_async
+    def _user_from_token(token):
+        """The user a SimpleJWT access token belongs to, or None if it is invalid."""
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        jwt_auth = JWTAuthentication()
+        try:
+            return jwt_auth.get_user(jwt_auth.get_validated_token(token))
+        except Exception as e:
+            logging.info(f"[RiderConsumer] Rejected socket token: {e}")
+            return None
+
+    def _access_token(self, params):
+        """JWT from the ``token`` query parameter or an ``Authorization: Bearer`` header."""
+        if params.get('token'):
+            return params['token']
+        auth_header = dict(self.scope.get('headers') or []).get(b'authorization', b'').decode()
+        if auth_header.startswith('Bearer '):
+            return auth_header[len('Bearer '):].strip()
+        return None
 
     async def connect(self):
         # Get query string parameters
         query_string = self.scope['query_string'].decode()
-        params = dict(qc.split('=') for qc in query_string.split('&') if '=' in qc)
+        params = dict(qc.split('=', 1) for qc in query_string.split('&') if '=' in qc)
         user_id = params.get('user_id')
 
+        # The session AuthMiddlewareStack leaves mobile clients anonymous, so
+        # authenticate the JWT here. Receiving broadcasts still works without
+        # one; reporting a location does not (see _may_report_location).
+        token = self._access_token(params)
+        if token:
+            user = await self._user_from_token(token)
+            if user is not None:
+                self.scope['user'] = user
+
         if not user_id:
             await self.close()
             return
 
-        group_ids = await self._resolve_rider_group_ids(user_id)
+        group_ids, rider = await self._resolve_rider_group_ids(user_id)
+        self.rider_id = rider.id if rider else None
+        self.rider_user_id = rider.user_id if rider else None
         self.group_names = [f"riders_group_{gid}" for gid in group_ids]
         # Kept for backwards compatibility with any code reading group_name.
         self.group_name = f"riders_group_{user_id}"
@@ -487,6 +553,9 @@ class RiderConsumer(AsyncJsonWebsocketConsumer):
         explicit subscribe message. Group membership is established from the
         authenticated rider id in the connection URL, so subscribe is an
         acknowledgement-only operation here.
+
+        ``location`` carries a GPS fix, replacing one HTTP update_location
+        request per ping; see _handle_location.
         """
         action = str(content.get('action') or content.get('type') or '').lower()
         if action == 'ping':
@@ -496,9 +565,110 @@ class RiderConsumer(AsyncJsonWebsocketConsumer):
                 'type': 'subscribed',
                 'groups': getattr(self, 'group_names', []),
             })
+        elif action == 'location':
+            await self._handle_location(content)
         else:
             logging.debug(f"[RiderConsumer] Ignored client message: {action}")
 
+    async def _handle_location(self, content):
+        """
+        Feed a GPS fix into the same pipeline as the HTTP endpoint
+        (Rider.update_location, then the tracking-room broadcast).
+
+        Fixes closer together than RIDER_WS_LOCATION_MIN_INTERVAL_SECONDS are
+        dropped; the next accepted fix supersedes them anyway. Instead of one
+        reply per fix, a single ``location_ack`` reports the last ``seq`` seen
+        and the accepted/throttled counts every RIDER_WS_LOCATION_ACK_BATCH
+        fixes or RIDER_WS_LOCATION_ACK_INTERVAL_SECONDS, whichever is first.
+        """
+        if not getattr(self, 'rider_id', None) or not self._may_report_location():
+            await self.send_json({'type': 'location_error', 'error': 'Not a rider connection'})
+            return
+
+        try:
+            latitude = float(content['latitude'])
+            longitude = float(content['longitude'])
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                raise ValueError('out of range')
+        except (KeyError, TypeError, ValueError):
+            await self.send_json({'type': 'location_error', 'error': 'Invalid latitude/longitude', 'seq': content.get('seq')})
+            return
+
+        now = time.monotonic()
+        if 'seq' in content:
+            self._location_last_seq = content.get('seq')
+        last_accepted_at = getattr(self, '_location_accepted_at', None)
+        if last_accepted_at is not None and now - last_accepted_at < _setting(
+            'RIDER_WS_LOCATION_MIN_INTERVAL_SECONDS', DEFAULT_WS_LOCATION_MIN_INTERVAL_SECONDS
+        ):
+            self._location_throttled = getattr(self, '_location_throttled', 0) + 1
+        else:
+            self._location_accepted_at = now
+            try:
+                await self._ingest_location(
+                    Decimal(str(round(latitude, 7))),
+                    Decimal(str(round(longitude, 7))),
+                    content.get('speed'),
+                    content.get('heading'),
+                )
+                self._location_accepted = getattr(self, '_location_accepted', 0) + 1
+            except Exception as e:
+                logging.warning(f"[RiderConsumer] Location ingest failed for rider {self.rider_id}: {e}")
+                await self.send_json({'type': 'location_error', 'error': 'Location not saved', 'seq': content.get('seq')})
+                return
+
+        await self._maybe_ack_locations(now)
+
+    def _may_report_location(self):
+        """Only the rider's own authenticated user may move them; user_id alone proves nothing."""
+        user = self.scope.get('user')
+        if user is None or not getattr(user, 'is_authenticated', False):
+            return False
+        return str(user.pk) == str(self.rider_user_id)
+
+    async def _maybe_ack_locations(self, now):
+        accepted = getattr(self, '_location_accepted', 0)
+        throttled = getattr(self, '_location_throttled', 0)
+        if not accepted and not throttled:
+            return
+        batch_full = accepted + throttled >= _setting('RIDER_WS_LOCATION_ACK_BATCH', DEFAULT_WS_LOCATION_ACK_BATCH)
+        interval_elapsed = now - getattr(self, '_location_acked_at', 0.0) >= _setting(
+            'RIDER_WS_LOCATION_ACK_INTERVAL_SECONDS', DEFAULT_WS_LOCATION_ACK_INTERVAL_SECONDS
+        )
+        if not (batch_full or interval_elapsed):
+            return
+
+        await self.send_json({
+            'type': 'location_ack',
+            'seq': getattr(self, '_location_last_seq', None),
+            'accepted': accepted,
+            'throttled': throttled,
+        })
+        self._location_accepted = 0
+        self._location_throttled = 0
+        self._location_acked_at = now
+
+    @database_sync_to_async
+    def _ingest_location(self, latitude, longitude, speed, heading):
+        from rider.location_broadcast import broadcast_location_update
+
+        rider = self._location_rider()
+        position = rider.update_location(latitude, longitude, speed=speed, heading=heading)
+        broadcast_location_update(rider, latitude, longitude)
+        return position
+
+    def _location_rider(self):
+        """The rider row, reloaded now and then so is_online changes are seen."""
+        from account.models import Rider
+
+        now = time.monotonic()
+        rider = getattr(self, '_cached_rider', None)
+        if rider is None or now - self._cached_rider_at >= RIDER_PROFILE_REFRESH_SECONDS:
+            rider = Rider.objects.select_related('user').get(id=self.rider_id)
+            self._cached_rider = rider
+            self._cached_rider_at = now
+        return rider
+
     async def new_order_event(self, event):
         await self.send_json(event)
         logging.info(f"[RiderConsumer] Sent new_order_event: {event['data']}")
@@ -220,6 +220,8 @@ STATICFILES_DIRS = [
 
 FLUTTERWAVE_AUTH_TOKEN=os.getenv('FLUTTERWAVE_AUTH_TOKEN')
 PAYSTACK_SECRET_KEY=os.getenv('PAYSTACK_SECRET_KEY')
+# Overridable so tests (and a sandbox proxy) can point payouts at another host.
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
 
 # tawk.to live-chat secure mode. All three apps (customer, vendor, rider) share
 # one tawk.to property, so one API key (Admin > Property Settings) signs every
@@ -331,10 +333,92 @@ CACHES = {
         "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # The geo helpers share this pool (helpers/redis_client.py), so a
+            # dead Redis must fail fast rather than hang a request.
+            "SOCKET_CONNECT_TIMEOUT": 2,
+            "SOCKET_TIMEOUT": 2,
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": 50,
+                "health_check_interval": 30,
+            },
         }
     }
 }
 
+# Process-local Haversine memo (helpers/distance_cache.py): bounded LRU keyed
+# by ~11 m grid cells so rider GPS pings cannot grow worker memory.
+DISTANCE_CACHE_MAX_ENTRIES = config('DISTANCE_CACHE_MAX_ENTRIES', default=10000, cast=int)
+DISTANCE_CACHE_TTL_SECONDS = 30 * 60
+DISTANCE_CACHE_PRECISION = 4
+
+# Per-worker DeliveryConfig snapshot (helpers/config_snapshot.py). Saves are
+# pushed to workers over Redis pub/sub; the TTL only bounds staleness when
+# Redis is down.
+DELIVERY_CONFIG_SNAPSHOT_TTL_SECONDS = config('DELIVERY_CONFIG_SNAPSHOT_TTL_SECONDS', default=60, cast=int)
+
+# Per-worker DeliveryZone/EstateGatePass index (helpers/zone_index.py), also
+# invalidated over pub/sub on zone saves.
+DELIVERY_ZONE_INDEX_TTL_SECONDS = config('DELIVERY_ZONE_INDEX_TTL_SECONDS', default=300, cast=int)
+
+# Per-worker ServiceChargeTier index (helpers/service_charge_index.py),
+# invalidated over pub/sub on tier saves and deletes.
+SERVICE_CHARGE_INDEX_TTL_SECONDS = config('SERVICE_CHARGE_INDEX_TTL_SECONDS', default=300, cast=int)
+
+# Rider GPS pings go to Redis on every fix (helpers/rider_location.py); the
+# rider row is written at most once per interval. Keep this well below
+# RIDER_GEO_FRESHNESS_SECONDS (120 s), which dispatch checks against the row.
+RIDER_LOCATION_PERSIST_INTERVAL_SECONDS = config('RIDER_LOCATION_PERSIST_INTERVAL_SECONDS', default=30, cast=int)
+
+# RiderConsumer "location" action: fixes closer together than the minimum
+# interval are dropped, and acks are batched per N fixes or per interval.
+RIDER_WS_LOCATION_MIN_INTERVAL_SECONDS = 2
+RIDER_WS_LOCATION_ACK_BATCH = 10
+RIDER_WS_LOCATION_ACK_INTERVAL_SECONDS = 15
+
+# Each delivery tracking room gets at most one rider location update per
+# interval, across all workers (rider/location_broadcast.py).
+RIDER_TRACKING_BROADCAST_INTERVAL_SECONDS = config('RIDER_TRACKING_BROADCAST_INTERVAL_SECONDS', default=1, cast=float)
+
+# Dashboard rollups: each run re-rolls this many recent days (orders keep
+# changing status after the day they were placed) and backfills at most
+# this many older days.
+ANALYTICS_ROLLUP_RESTATE_DAYS = 3
+ANALYTICS_ROLLUP_MAX_DAYS_PER_RUN = 31
+
+# Rows fetched per server-side cursor round-trip by the admin spreadsheet
+# exports (helpers/exports.py).
+EXPORT_CHUNK_SIZE = 2000
+
+# Threads sending push fan-outs in-process when the Celery task cannot be
+# queued (helpers/push_fanout.py).
+PUSH_FANOUT_FALLBACK_WORKERS = 2
+
+# Notification outbox: rows claimed per drain batch, delivery attempts
+# before a push is marked failed, and how long settled rows (and so their
+# dedup keys) are kept.
+NOTIFICATION_OUTBOX_BATCH_SIZE = 200
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5
+NOTIFICATION_OUTBOX_RETENTION_DAYS = 7
+
+# Weekly rider payouts whose bulk transfer got no clear answer are looked up
+# at Paystack this long after the run, retrying unanswered lookups up to
+# this many times (rider/payouts.py).
+PAYOUT_RECONCILE_DELAY_SECONDS = 10 * 60
+PAYOUT_RECONCILE_MAX_ATTEMPTS = 6
+
+# calculate_delivery_fee fetches its external inputs concurrently
+# (helpers/quote_factors.py). Each source falls back to a neutral value after
+# its own timeout; the deadline caps the whole stage.
+QUOTE_FACTOR_DEADLINE_SECONDS = 8
+# Pool workers one quote may hold at once; batch quotes queue the rest.
+QUOTE_FACTOR_MAX_PER_QUOTE = 8
+QUOTE_FACTOR_TIMEOUTS = {
+    'distance': 8,   # Routes API: 6s per attempt, falls back to straight line
+    'traffic': 3,
+    'weather': 3,
+    'rider': 1,
+}
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
@@ -360,6 +444,52 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'rider.process_weekly_rider_payouts',
         'schedule': crontab(day_of_week='friday', hour=10, minute=0),
     },
+    # Full vendors:geo ZRANGE-vs-DB diff; the request path only does a cheap
+    # count/watermark check (helpers/redis_geo.py).
+    'reconcile-vendor-geo-index': {
+        'task': 'vendor.reconcile_vendor_geo_index',
+        'schedule': crontab(minute='*/15'),
+    },
+    # Pre-measure road distances from vendors to the busiest destination
+    # cells so checkout quotes hit the route cache (helpers/route_cache.py).
+    'prefetch-popular-route-distances': {
+        'task': 'helpers.prefetch_popular_route_distances',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    # Trim riders that stopped pinging from riders:geo; dispatch queries
+    # filter stale members themselves (helpers/redis_rider_geo.py).
+    'cleanup-stale-rider-geo': {
+        'task': 'rider.cleanup_stale_rider_geo',
+        'schedule': crontab(minute='*'),
+    },
+    # Order saves keep orders:open:geo current; this catches .update() calls.
+    'rebuild-open-order-index': {
+        'task': 'rider.rebuild_open_order_index',
+        'schedule': crontab(minute='*/5'),
+    },
+    # Roll closed days into the dashboard fact tables and backfill history a
+    # month per run (admin_manager/rollups.py).
+    'refresh-daily-analytics-rollups': {
+        'task': 'admin_manager.refresh_daily_rollups',
+        'schedule': crontab(minute=15),
+    },
+    # Each queued push already triggers a drain on commit; this catches
+    # retries coming due and drains whose enqueue failed
+    # (helpers/notification_outbox.py).
+    'drain-notification-outbox': {
+        'task': 'helpers.drain_notification_outbox',
+        'schedule': crontab(minute='*'),
+    },
+    'purge-notification-outbox': {
+        'task': 'helpers.purge_notification_outbox',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    # Vendor settlement holds are kept in hourly buckets
+    # (wallet/settlement.py); drop the ones that have cleared.
+    'expire-settlement-holds': {
+        'task': 'wallet.expire_settlement_holds',
+        'schedule': crontab(minute=5),
+    },
 }
 
 
@@ -0,0 +1,221 @@
+"""
+Process-local snapshot of the delivery configuration.
+
+DeliveryConfig.get_config used to go through ConfigurationManager.get_config
+for every key, i.e. one ``cache.get`` (a Redis round-trip in production) per
+property access. A single calculate_delivery_fee touches 15-20 keys, so every
+quote paid for 15-20 network hops before doing any maths. Instead:
+
+- The first lookup loads every active row at once (ConfigurationManager
+  .get_all_configs, one cache read) into an immutable mapping that is shared
+  by all threads of the worker.
+- The snapshot expires after ``DELIVERY_CONFIG_SNAPSHOT_TTL_SECONDS`` as a
+  safety net; within that window quotes make no configuration round-trips.
+- Saving a DeliveryConfiguration publishes on the
+  ``delivery_config:invalidate`` Redis channel once the transaction commits.
+  Each worker runs a small daemon thread subscribed to that channel and drops
+  its snapshot, so admin edits take effect everywhere within milliseconds.
+
+If Redis is unavailable the listener simply is not running and edits are
+picked up when the TTL expires.
+
+Other per-process snapshots (e.g. the delivery zone index) reuse the same
+listener by calling register_invalidation_channel.
+"""
+
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Mapping
+
+from helpers.redis_client import get_redis_client, record_redis_failure
+
+logger = logging.getLogger(__name__)
+
+CONFIG_INVALIDATION_CHANNEL = "delivery_config:invalidate"
+DEFAULT_SNAPSHOT_TTL_SECONDS = 60
+LISTENER_POLL_SECONDS = 1.0
+LISTENER_MAX_BACKOFF_SECONDS = 30
+
+
+class ConfigSnapshot:
+    """An immutable mapping loaded in one call and refreshed on expiry or invalidation."""
+
+    def __init__(
+        self,
+        loader: Callable[[], Mapping],
+        ttl_seconds: float = DEFAULT_SNAPSHOT_TTL_SECONDS,
+        clock=time.monotonic,
+        freeze: bool = True,
+    ):
+        self._loader = loader
+        self._freeze = freeze
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._values = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._generation = 0
+        self.version = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._values is not None
+            and not self._stale
+            and self._clock() - self._loaded_at < self.ttl_seconds
+        )
+
+    def get(self) -> Mapping:
+        values = self._values
+        if self._is_fresh():
+            return values
+
+        with self._lock:
+            if self._is_fresh():
+                return self._values
+
+            generation = self._generation
+            try:
+                loaded = self._loader()
+                if self._freeze:
+                    loaded = MappingProxyType(dict(loaded))
+            except Exception as exc:
+                if self._values is None:
+                    raise
+                # Serve the previous snapshot for another TTL rather than
+                # hammering a failing backend on every quote.
+                logger.warning("Delivery config reload failed, keeping previous snapshot: %s", exc)
+                self._loaded_at = self._clock()
+                self._stale = False
+                return self._values
+
+            self._values = loaded
+            self.version += 1
+            # An invalidation that arrived mid-load may describe data newer
+            # than what we read: keep the values but reload on the next call.
+            self._loaded_at = self._clock()
+            self._stale = generation != self._generation
+            return loaded
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+
+
+def _load_delivery_configs() -> Mapping:
+    from helpers.models import ConfigurationManager
+
+    ensure_invalidation_listener()
+    return ConfigurationManager.get_all_configs()
+
+
+def _snapshot_ttl() -> float:
+    from django.conf import settings
+
+    return getattr(settings, "DELIVERY_CONFIG_SNAPSHOT_TTL_SECONDS", DEFAULT_SNAPSHOT_TTL_SECONDS)
+
+
+delivery_config_snapshot = ConfigSnapshot(_load_delivery_configs, ttl_seconds=_snapshot_ttl())
+
+_channels = {CONFIG_INVALIDATION_CHANNEL: delivery_config_snapshot}
+
+
+def register_invalidation_channel(channel: str, snapshot: ConfigSnapshot) -> None:
+    """Have this process's listener invalidate ``snapshot`` on messages to ``channel``."""
+    _channels[channel] = snapshot
+
+
+def publish_invalidation(channel: str, payload: str = "") -> None:
+    """Drop this worker's snapshot for ``channel`` and tell every other worker to do the same."""
+    _channels[channel].invalidate()
+
+    r = get_redis_client()
+    if r is None:
+        return
+    try:
+        r.publish(channel, payload)
+    except Exception as exc:
+        logger.warning("Could not publish invalidation on %s: %s", channel, exc)
+        record_redis_failure(exc)
+
+
+def publish_config_invalidation(key: str = "") -> None:
+    publish_invalidation(CONFIG_INVALIDATION_CHANNEL, key)
+
+
+_listener_thread = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _listen_for_invalidations() -> None:
+    backoff = 1
+    while True:
+        r = get_redis_client()
+        if r is None:
+            time.sleep(backoff)
+            backoff = min(backoff * 2, LISTENER_MAX_BACKOFF_SECONDS)
+            continue
+
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        try:
+            subscribed = set(_channels)
+            pubsub.subscribe(*subscribed)
+            # Anything published while we were disconnected was missed.
+            for snapshot in list(_channels.values()):
+                snapshot.invalidate()
+            backoff = 1
+            while True:
+                if len(_channels) != len(subscribed):
+                    added = set(_channels) - subscribed
+                    pubsub.subscribe(*added)
+                    subscribed |= added
+                message = pubsub.get_message(timeout=LISTENER_POLL_SECONDS)
+                if message and message.get("type") == "message":
+                    channel = message.get("channel")
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    snapshot = _channels.get(channel)
+                    if snapshot is not None:
+                        snapshot.invalidate()
+        except Exception as exc:
+            logger.warning("Delivery config listener disconnected: %s", exc)
+            record_redis_failure(exc)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, LISTENER_MAX_BACKOFF_SECONDS)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+
+def ensure_invalidation_listener() -> bool:
+    """
+    Start this process's invalidation listener if Redis is configured.
+
+    Checked on every snapshot load, so a worker forked after the parent
+    started a listener gets its own thread.
+    """
+    global _listener_thread, _listener_pid
+
+    pid = os.getpid()
+    if _listener_thread is not None and _listener_pid == pid and _listener_thread.is_alive():
+        return True
+    if get_redis_client() is None:
+        return False
+
+    with _listener_lock:
+        if _listener_thread is None or _listener_pid != pid or not _listener_thread.is_alive():
+            _listener_thread = threading.Thread(
+                target=_listen_for_invalidations,
+                name="delivery-config-invalidation",
+                daemon=True,
+            )
+            _listener_thread.start()
+            _listener_pid = pid
+    return True
@@ -0,0 +1,125 @@
+"""
+Bounded, thread-safe in-process cache for pure-math distance results.
+
+get_distance_between_two_location used to keep every pair in an unbounded
+module-level dict keyed by the raw float string of four coordinates. Rider GPS
+pings make almost every key unique, so long-lived gunicorn/daphne workers grew
+without limit. This cache:
+
+- evicts least-recently-used entries beyond ``max_entries``;
+- expires entries after ``ttl_seconds``;
+- quantizes coordinates to a grid (4 decimals ~= 11 m) so nearby pings share
+  one entry;
+- counts hits, misses and evictions for monitoring.
+
+Haversine costs well under a microsecond, so results are never written to the
+shared Django/Redis cache: a network round-trip is slower than recomputing.
+
+Size, TTL and grid are configurable with the DISTANCE_CACHE_MAX_ENTRIES,
+DISTANCE_CACHE_TTL_SECONDS and DISTANCE_CACHE_PRECISION settings.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 30 * 60
+DEFAULT_PRECISION = 4
+
+
+def quantize_coordinates(*coords: float, precision: int = DEFAULT_PRECISION) -> tuple:
+    """Snap coordinates to a grid so nearby points share a cache key."""
+    return tuple(round(float(coord), precision) for coord in coords)
+
+
+class BoundedTTLCache:
+    """An LRU mapping with per-entry expiry and hit/miss counters."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, self._clock() + self.ttl_seconds)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class DistanceCache(BoundedTTLCache):
+    """BoundedTTLCache keyed by quantized (lat1, lon1, lat2, lon2)."""
+
+    def __init__(self, *args, precision: int = DEFAULT_PRECISION, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.precision = precision
+
+    def key_for(self, lat1: float, lon1: float, lat2: float, lon2: float) -> tuple:
+        return quantize_coordinates(lat1, lon1, lat2, lon2, precision=self.precision)
+
+    def get_distance(self, lat1, lon1, lat2, lon2) -> Optional[float]:
+        return self.get(self.key_for(lat1, lon1, lat2, lon2))
+
+    def set_distance(self, lat1, lon1, lat2, lon2, distance: float) -> None:
+        self.set(self.key_for(lat1, lon1, lat2, lon2), distance)
+
+
+def build_distance_cache() -> DistanceCache:
+    from django.conf import settings
+
+    return DistanceCache(
+        max_entries=getattr(settings, "DISTANCE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+        ttl_seconds=getattr(settings, "DISTANCE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS),
+        precision=getattr(settings, "DISTANCE_CACHE_PRECISION", DEFAULT_PRECISION),
+    )
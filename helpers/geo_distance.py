@@ -0,0 +1,178 @@
+"""
+Batched great-circle distances for the Redis-down proximity fallbacks.
+
+The vendor and rider fallbacks used to call get_distance_between_two_location
+once per pair: a string-keyed dict lookup, a cache.get round-trip to a Redis
+that is probably down, input validation and one scalar trig calculation each.
+Here one origin is measured against a whole array of destinations in a single
+pass:
+
+- CoordinateArray keeps ids plus precomputed radians and cos(latitude), so
+  the per-request work is only the origin-dependent part of Haversine.
+- With NumPy installed the pass is vectorised; without it the same maths runs
+  as one tight list comprehension.
+- vendor_coordinate_array() caches the array of every geo-eligible vendor per
+  process, so the fallback does not re-parse coordinate strings per request.
+
+Distances are rounded to 2 decimals to match get_distance_between_two_location.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Iterable, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - numpy is in requirements.txt
+    np = None
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371
+VENDOR_COORDINATE_CACHE_TTL_SECONDS = 60
+
+
+def _parse_coordinates(latitude, longitude) -> Optional[tuple[float, float]]:
+    try:
+        lat = float(latitude)
+        lon = float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class CoordinateArray:
+    """A fixed set of points, prepared for repeated one-to-many distance passes."""
+
+    def __init__(self, ids: Iterable, latitudes: Iterable, longitudes: Iterable):
+        self.ids: list[str] = []
+        lat_rad: list[float] = []
+        lon_rad: list[float] = []
+        for point_id, latitude, longitude in zip(ids, latitudes, longitudes):
+            coords = _parse_coordinates(latitude, longitude)
+            if coords is None:
+                continue
+            self.ids.append(str(point_id))
+            lat_rad.append(math.radians(coords[0]))
+            lon_rad.append(math.radians(coords[1]))
+
+        self.positions = {point_id: index for index, point_id in enumerate(self.ids)}
+        if NUMPY_AVAILABLE:
+            self._lat = np.array(lat_rad, dtype=float)
+            self._lon = np.array(lon_rad, dtype=float)
+            self._cos_lat = np.cos(self._lat)
+        else:
+            self._lat = lat_rad
+            self._lon = lon_rad
+            self._cos_lat = [math.cos(value) for value in lat_rad]
+
+    @classmethod
+    def from_rows(cls, rows) -> "CoordinateArray":
+        """Build from (id, latitude, longitude) rows, e.g. a values_list()."""
+        rows = list(rows)
+        return cls(
+            (row[0] for row in rows),
+            (row[1] for row in rows),
+            (row[2] for row in rows),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, point_id) -> bool:
+        return str(point_id) in self.positions
+
+    def distances_from(self, origin_lat: float, origin_lon: float) -> list[float]:
+        """Distances (km) from the origin to every point, in ``ids`` order."""
+        if not self.ids:
+            return []
+
+        lat1 = math.radians(float(origin_lat))
+        lon1 = math.radians(float(origin_lon))
+        cos_lat1 = math.cos(lat1)
+
+        if NUMPY_AVAILABLE:
+            a = (
+                np.sin((self._lat - lat1) / 2) ** 2
+                + cos_lat1 * self._cos_lat * np.sin((self._lon - lon1) / 2) ** 2
+            )
+            c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+            return np.round(EARTH_RADIUS_KM * c, 2).tolist()
+
+        sin, sqrt, atan2 = math.sin, math.sqrt, math.atan2
+        distances = []
+        for lat2, lon2, cos_lat2 in zip(self._lat, self._lon, self._cos_lat):
+            a = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos_lat2 * sin((lon2 - lon1) / 2) ** 2
+            distances.append(round(EARTH_RADIUS_KM * 2 * atan2(sqrt(a), sqrt(1 - a)), 2))
+        return distances
+
+    def within(self, origin_lat: float, origin_lon: float, radius_km: Optional[float] = None) -> dict[str, float]:
+        """Return {id: distance_km} for points within radius_km (all if None)."""
+        distances = self.distances_from(origin_lat, origin_lon)
+        if radius_km is None:
+            return dict(zip(self.ids, distances))
+        return {
+            point_id: distance
+            for point_id, distance in zip(self.ids, distances)
+            if distance <= radius_km
+        }
+
+
+def haversine_many(origin_lat: float, origin_lon: float, destinations) -> list[Optional[float]]:
+    """
+    Distances (km) from one origin to many (lat, lon) destinations.
+
+    Invalid destinations yield None in their slot, mirroring the scalar helper.
+    """
+    destinations = list(destinations)
+    array = CoordinateArray(
+        range(len(destinations)),
+        (dest[0] for dest in destinations),
+        (dest[1] for dest in destinations),
+    )
+    by_index = dict(zip(array.ids, array.distances_from(origin_lat, origin_lon)))
+    return [by_index.get(str(index)) for index in range(len(destinations))]
+
+
+_vendor_array: Optional[CoordinateArray] = None
+_vendor_array_loaded_at = 0.0
+_vendor_array_lock = threading.Lock()
+
+
+def vendor_coordinate_array(max_age_seconds: float = VENDOR_COORDINATE_CACHE_TTL_SECONDS) -> CoordinateArray:
+    """
+    Process-wide CoordinateArray of every vendor eligible for the geo index.
+
+    Refreshed at most once per ``max_age_seconds`` so a Redis outage costs one
+    values_list() per worker per minute instead of per-request parsing.
+    """
+    global _vendor_array, _vendor_array_loaded_at
+
+    now = time.monotonic()
+    if _vendor_array is not None and now - _vendor_array_loaded_at < max_age_seconds:
+        return _vendor_array
+
+    with _vendor_array_lock:
+        if _vendor_array is None or now - _vendor_array_loaded_at >= max_age_seconds:
+            from helpers.redis_geo import _eligible_geo_vendor_queryset
+
+            rows = _eligible_geo_vendor_queryset().values_list(
+                'id', 'location_latitude', 'location_longitude',
+            )
+            _vendor_array = CoordinateArray.from_rows(rows)
+            _vendor_array_loaded_at = time.monotonic()
+            logger.debug("Loaded %s vendor coordinates for the Haversine fallback", len(_vendor_array))
+    return _vendor_array
+
+
+def reset_vendor_coordinate_array() -> None:
+    global _vendor_array, _vendor_array_loaded_at
+    with _vendor_array_lock:
+        _vendor_array = None
+        _vendor_array_loaded_at = 0.0
@@ -302,6 +302,26 @@ class Command(BaseCommand):
                 'min_value': 60,
                 'max_value': 7200,
             },
+            {
+                'key': 'route_cache_stale_timeout',
+                'category': 'cache',
+                'data_type': 'int',
+                'value': '604800',
+                'default_value': '604800',
+                'description': 'Seconds a stale route distance is still served while it is re-measured',
+                'min_value': 60,
+                'max_value': 2592000,
+            },
+            {
+                'key': 'route_cache_geohash_precision',
+                'category': 'cache',
+                'data_type': 'int',
+                'value': '7',
+                'default_value': '7',
+                'description': 'Geohash length for snapping route endpoints into shared cache cells (7 ~= 150 m)',
+                'min_value': 4,
+                'max_value': 9,
+            },
             {
                 'key': 'weather_cache_timeout',
                 'category': 'cache',
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
@@ -146,8 +146,31 @@ class DeliveryConfiguration(models.Model):
         # Clear the configuration cache
         cache.delete('delivery_config_cache')
         cache.delete(f'delivery_config_{self.key}')
+        self._broadcast_change()
         
         logger.info(f"Configuration '{self.key}' updated with value: {self.value}")
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        cache.delete('delivery_config_cache')
+        cache.delete(f'delivery_config_{self.key}')
+        self._broadcast_change()
+        return result
+    
+    def _broadcast_change(self):
+        """Drop this worker's config snapshot now and every worker's once committed."""
+        from helpers.config_snapshot import delivery_config_snapshot, publish_config_invalidation
+        
+        key = self.key
+        delivery_config_snapshot.invalidate()
+        
+        def _after_commit():
+            # Clear again: another worker may have re-cached the pre-commit rows.
+            cache.delete('delivery_config_cache')
+            cache.delete(f'delivery_config_{key}')
+            publish_config_invalidation(key)
+        
+        transaction.on_commit(_after_commit)
 
 
 class ConfigurationManager:
@@ -217,8 +240,11 @@ class ConfigurationManager:
         for config in DeliveryConfiguration.objects.filter(is_active=True):
             cache.delete(f'delivery_config_{config.key}')
         
-        # Rebuild cache
-        return cls.get_all_configs()
+        # Rebuild cache and tell workers to drop their snapshots
+        configs = cls.get_all_configs()
+        from helpers.config_snapshot import publish_config_invalidation
+        publish_config_invalidation()
+        return configs
     
     @classmethod
     def set_config(cls, key: str, value, user: str = None):
@@ -0,0 +1,350 @@
+"""
+Transactional outbox for push notifications.
+
+NotificationHelper used to start a daemon thread per push from inside the
+request handler, and send_to_users_with_executor blocked the caller for up
+to 30 seconds while FCM answered; the rider location endpoint paid that on
+the near-delivery ping. A push in flight when gunicorn recycled the worker
+was lost, and nothing was retried. Instead:
+
+- queue_push writes a PushNotificationOutbox row, in the caller's
+  transaction, so the push exists exactly when the order change it announces
+  does. Once the transaction commits it queues the
+  ``helpers.drain_notification_outbox`` task; the beat schedule also runs it
+  every minute in case that enqueue failed.
+- ``dedup_key`` makes a push idempotent per user (a retried webhook does not
+  send "Payment successful" twice). ``coalesce_key`` replaces a still-pending
+  push for the same user, so e.g. several status changes of one order that
+  land before the drain runs reach the customer as one, the latest. The
+  merged push's dedup_key is kept on a 'skipped' marker row, so its retries
+  are still dropped.
+- drain_outbox claims due rows with SELECT ... FOR UPDATE SKIP LOCKED (so
+  several workers can drain at once), groups identical messages and sends
+  each group through helpers/push_fanout.deliver_push (one token query,
+  500-token multicasts, bulk logs). Transient failures are retried with
+  exponential backoff up to NOTIFICATION_OUTBOX_MAX_ATTEMPTS; a claim that
+  is never settled (worker killed mid-send) is picked up again after
+  CLAIM_LEASE_SECONDS.
+- outbox_stats reports per-process drain throughput and latency plus the
+  current queue depth.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_RETENTION_DAYS = 7
+MAX_BATCHES_PER_DRAIN = 50
+CLAIM_LEASE_SECONDS = 120
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 30 * 60
+
+
+class OutboxStats:
+    """Per-process counters for queue_push and drain_outbox."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts = defaultdict(int)
+            self._drain_ms = 0.0
+            self._lag_total = 0.0
+            self._lag_max = 0.0
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def record_drain(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self._counts['drains'] += 1
+            self._drain_ms += elapsed_ms
+
+    def record_lags(self, lags: Iterable[float]) -> None:
+        """Seconds from queueing to delivery, one per sent push."""
+        with self._lock:
+            for lag in lags:
+                self._lag_total += lag
+                self._lag_max = max(self._lag_max, lag)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            drain_seconds = self._drain_ms / 1000
+            sent = counts.get('sent', 0)
+            return {
+                **counts,
+                'drain_seconds': round(drain_seconds, 3),
+                'sent_per_second': round(sent / drain_seconds, 2) if drain_seconds else 0.0,
+                'avg_lag_seconds': round(self._lag_total / sent, 3) if sent else 0.0,
+                'max_lag_seconds': round(self._lag_max, 3),
+            }
+
+
+_stats = OutboxStats()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _kick_drain() -> None:
+    try:
+        from helpers.tasks import drain_notification_outbox
+
+        drain_notification_outbox.delay()
+    except Exception as exc:
+        # The beat schedule drains every minute, so the push is only delayed.
+        logger.warning("Could not queue the notification outbox drain: %s", exc)
+
+
+def _record_dedup_key(user_id, dedup_key, coalesce_key, fields) -> None:
+    """
+    Keep the dedup_key of a push that was merged into another row.
+
+    The merged row keeps its own dedup_key, so without this a retry of the
+    newer event would find nothing and be pushed again once that row is
+    sent. The marker is written as 'skipped', so the drain never sends it,
+    and purge_outbox ages it out with the rest of the dedup window.
+    """
+    from account.models import PushNotificationOutbox
+
+    try:
+        with transaction.atomic():
+            PushNotificationOutbox.objects.create(
+                user_id=user_id, dedup_key=dedup_key, coalesce_key=coalesce_key,
+                status='skipped', last_error='Coalesced into a pending push', **fields
+            )
+    except IntegrityError:
+        # A concurrent request recorded the same key first.
+        pass
+
+
+def queue_push(
+    user,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, Any]] = None,
+    image_url: Optional[str] = None,
+    dedup_key: Optional[str] = None,
+    coalesce_key: Optional[str] = None,
+):
+    """
+    Queue a push for ``user`` (a User or its id) in the current transaction.
+
+    Returns the outbox row, or None when the push was dropped as a duplicate
+    of ``dedup_key`` or merged into a pending push with ``coalesce_key``.
+    """
+    from account.models import PushNotificationOutbox
+
+    user_id = getattr(user, 'pk', user)
+    payload = {str(key): str(value) for key, value in (data or {}).items()}
+    fields = {'title': title, 'body': body, 'data': payload, 'image_url': image_url}
+
+    if dedup_key and PushNotificationOutbox.objects.filter(user_id=user_id, dedup_key=dedup_key).exists():
+        _stats.incr('deduplicated')
+        return None
+
+    if coalesce_key:
+        merged = PushNotificationOutbox.objects.filter(
+            user_id=user_id, coalesce_key=coalesce_key, status='pending',
+        ).update(**fields)
+        if merged:
+            if dedup_key:
+                _record_dedup_key(user_id, dedup_key, coalesce_key, fields)
+            _stats.incr('coalesced')
+            return None
+
+    try:
+        with transaction.atomic():
+            row = PushNotificationOutbox.objects.create(
+                user_id=user_id, dedup_key=dedup_key, coalesce_key=coalesce_key, **fields
+            )
+    except IntegrityError:
+        # A concurrent request queued the same dedup_key first.
+        _stats.incr('deduplicated')
+        return None
+
+    _stats.incr('queued')
+    transaction.on_commit(_kick_drain)
+    return row
+
+
+def queue_push_to_users(users: Iterable, title: str, body: str, data=None, image_url=None,
+                        dedup_key=None, coalesce_key=None) -> int:
+    """
+    queue_push for each user; returns how many rows were written.
+
+    Without a dedup or coalesce key there is nothing to check per user, so
+    the rows are written with one bulk_create (a broadcast to every user is
+    then a handful of INSERTs, and the drain sends it as one message group).
+    """
+    from account.models import PushNotificationOutbox
+
+    if dedup_key or coalesce_key:
+        return sum(
+            1 for user in users
+            if queue_push(user, title, body, data, image_url, dedup_key, coalesce_key) is not None
+        )
+
+    user_ids = list(dict.fromkeys(getattr(user, 'pk', user) for user in users if user))
+    if not user_ids:
+        return 0
+    payload = {str(key): str(value) for key, value in (data or {}).items()}
+    PushNotificationOutbox.objects.bulk_create(
+        [
+            PushNotificationOutbox(user_id=user_id, title=title, body=body, data=payload, image_url=image_url)
+            for user_id in user_ids
+        ],
+        batch_size=_setting('NOTIFICATION_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+    )
+    _stats.incr('queued', len(user_ids))
+    transaction.on_commit(_kick_drain)
+    return len(user_ids)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), RETRY_MAX_SECONDS))
+
+
+def _claim(batch_size: int):
+    from account.models import PushNotificationOutbox
+
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            PushNotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status__in=('pending', 'sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if rows:
+            PushNotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status='sending',
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS),
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def _message_key(row):
+    return row.title, row.body, json.dumps(row.data, sort_keys=True), row.image_url or ''
+
+
+def _settle(rows) -> Dict[str, int]:
+    """Send one claimed batch and record each row's outcome."""
+    from account.models import PushNotificationOutbox
+    from helpers.push_fanout import deliver_push
+
+    max_attempts = _setting('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    groups = defaultdict(list)
+    for row in rows:
+        groups[_message_key(row)].append(row)
+
+    sent, skipped, failed = [], [], []
+    retries = defaultdict(list)
+    for (title, body, _data, image_url), group in groups.items():
+        outcomes, _counts = deliver_push(
+            [row.user_id for row in group], title, body, group[0].data, image_url or None,
+        )
+        for row in group:
+            outcome = outcomes.get(str(row.user_id))
+            if outcome is None:
+                skipped.append(row.pk)
+            elif outcome['sent']:
+                sent.append(row)
+            elif outcome['retryable'] and row.attempts < max_attempts:
+                retries[(row.attempts, outcome['error'])].append(row.pk)
+            else:
+                failed.append((row.pk, outcome['error']))
+
+    now = timezone.now()
+    if sent:
+        PushNotificationOutbox.objects.filter(pk__in=[row.pk for row in sent]).update(
+            status='sent', sent_at=now, last_error=None)
+    if skipped:
+        PushNotificationOutbox.objects.filter(pk__in=skipped).update(
+            status='skipped', last_error='No active FCM tokens')
+    for (attempts, error), pks in retries.items():
+        PushNotificationOutbox.objects.filter(pk__in=pks).update(
+            status='pending', next_attempt_at=now + _retry_delay(attempts), last_error=error)
+    for pk, error in failed:
+        PushNotificationOutbox.objects.filter(pk=pk).update(status='failed', last_error=error)
+
+    _stats.record_lags((now - row.created_at).total_seconds() for row in sent)
+    result = {
+        'sent': len(sent),
+        'skipped': len(skipped),
+        'retried': sum(len(pks) for pks in retries.values()),
+        'failed': len(failed),
+    }
+    for name, count in result.items():
+        _stats.incr(name, count)
+    return result
+
+
+def drain_outbox(batch_size: Optional[int] = None, max_batches: int = MAX_BATCHES_PER_DRAIN) -> Dict[str, int]:
+    """Deliver every due outbox row, one claimed batch at a time."""
+    batch_size = batch_size or _setting('NOTIFICATION_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    totals = {'claimed': 0, 'sent': 0, 'skipped': 0, 'retried': 0, 'failed': 0}
+    started = time.monotonic()
+
+    for _batch in range(max_batches):
+        rows = _claim(batch_size)
+        if not rows:
+            break
+        totals['claimed'] += len(rows)
+        for name, count in _settle(rows).items():
+            totals[name] += count
+
+    elapsed_ms = (time.monotonic() - started) * 1000
+    _stats.record_drain(elapsed_ms)
+    if totals['claimed']:
+        logger.info(
+            "Notification outbox drained in %.0f ms: claimed=%s sent=%s skipped=%s retried=%s failed=%s",
+            elapsed_ms, totals['claimed'], totals['sent'], totals['skipped'], totals['retried'], totals['failed'],
+        )
+    return totals
+
+
+def purge_outbox(older_than_days: Optional[int] = None) -> int:
+    """Delete settled rows older than the retention window (also the dedup window)."""
+    from account.models import PushNotificationOutbox
+
+    days = older_than_days or _setting('NOTIFICATION_OUTBOX_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    deleted, _ = PushNotificationOutbox.objects.filter(
+        status__in=('sent', 'skipped', 'failed'),
+        created_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+def outbox_stats() -> Dict[str, Any]:
+    """This process's drain counters plus the current queue depth."""
+    from account.models import PushNotificationOutbox
+
+    pending = PushNotificationOutbox.objects.filter(status__in=('pending', 'sending'))
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        **_stats.snapshot(),
+        'queue_depth': pending.count(),
+        'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0.0,
+    }
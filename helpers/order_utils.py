@@ -21,6 +21,9 @@ from typing import Dict, Optional, Tuple, Any
 from django.core.cache import cache
 from django.conf import settings
 
+from helpers.config_snapshot import delivery_config_snapshot
+from helpers.distance_cache import build_distance_cache
+
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -226,6 +229,11 @@ class DeliveryConfig:
         'free_weight_threshold_kg': 2.0,
         'weight_surcharge_per_kg': 100.0,
         'route_cache_timeout': 1800,
+        # Route distances hardly change: serve them for a week, re-measuring
+        # in the background once they are older than route_cache_timeout.
+        'route_cache_stale_timeout': 7 * 24 * 3600,
+        # 7 characters ~= 150 m x 150 m cells.
+        'route_cache_geohash_precision': 7,
         'weather_cache_timeout': 600,
         'traffic_cache_timeout': 180,
         'rider_cache_timeout': 120,
@@ -235,10 +243,18 @@ class DeliveryConfig:
 
     @classmethod
     def get_config(cls, key: str, default=None):
-        """Get configuration value with database fallback."""
+        """
+        Get configuration value with database fallback.
+
+        Reads from the per-process snapshot (helpers/config_snapshot.py), so a
+        quote makes no cache or database round-trips for configuration.
+        """
         if CONFIG_MANAGER_AVAILABLE:
             try:
-                return ConfigurationManager.get_config(key, cls._FALLBACK_CONFIG.get(key, default))
+                configs = delivery_config_snapshot.get()
+                if key in configs:
+                    return configs[key]
+                return cls._FALLBACK_CONFIG.get(key, default)
             except Exception as e:
                 logger.warning(
                     f"Failed to get config from database for {key}: {e}")
@@ -316,6 +332,16 @@ class DeliveryConfig:
     def ROUTE_CACHE_TIMEOUT(self):
         return self.get_config('route_cache_timeout')
 
+    @property
+    def ROUTE_CACHE_STALE_TIMEOUT(self):
+        """How long a route distance may still be served (and refreshed) after going stale."""
+        return self.get_config('route_cache_stale_timeout')
+
+    @property
+    def ROUTE_CACHE_GEOHASH_PRECISION(self):
+        """Geohash length used to snap route endpoints into shared cache cells."""
+        return self.get_config('route_cache_geohash_precision')
+
     @property
     def WEATHER_CACHE_TIMEOUT(self):
         return self.get_config('weather_cache_timeout')
@@ -434,13 +460,17 @@ DeliveryConfig = DeliveryConfig()
 # -------------------------
 
 
-_local_distance_cache: dict = {}
+# Bounded LRU/TTL cache keyed by ~10 m grid cells (see helpers/distance_cache.py).
+_local_distance_cache = build_distance_cache()
 
 
 def get_distance_between_two_location(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
     """
     Calculate distance between two GPS coordinates using Haversine formula.
 
+    Results are memoised in the bounded process-local cache only; they are
+    cheaper to recompute than to fetch from Redis.
+
     Args:
         lat1, lon1: Origin coordinates
         lat2, lon2: Destination coordinates
@@ -448,18 +478,6 @@ def get_distance_between_two_location(lat1: float, lon1: float, lat2: float, lon
     Returns:
         Distance in kilometers or None if calculation fails
     """
-    cache_key = f"distance_{lat1}_{lon1}_{lat2}_{lon2}"
-
-    # 1. Check process-local cache first (zero network overhead, survives Redis outages)
-    if cache_key in _local_distance_cache:
-        return _local_distance_cache[cache_key]
-
-    # 2. Check Redis/Django cache
-    cached_distance = cache.get(cache_key)
-    if cached_distance is not None:
-        _local_distance_cache[cache_key] = cached_distance
-        return cached_distance
-
     try:
         # Validate input types and ranges
         coordinates = [lat1, lon1, lat2, lon2]
@@ -473,6 +491,10 @@ def get_distance_between_two_location(lat1: float, lon1: float, lat2: float, lon
         if not (-180 <= lon1 <= 180 and -180 <= lon2 <= 180):
             raise ValueError(f"Invalid longitude values: {lon1}, {lon2}")
 
+        cached_distance = _local_distance_cache.get_distance(lat1, lon1, lat2, lon2)
+        if cached_distance is not None:
+            return cached_distance
+
         # Convert to radians
         lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(radians, coordinates)
 
@@ -485,9 +507,7 @@ def get_distance_between_two_location(lat1: float, lon1: float, lat2: float, lon
 
         distance = round(6371 * c, 2)  # Earth's radius in km
 
-        # Store in both local and distributed cache
-        _local_distance_cache[cache_key] = distance
-        cache.set(cache_key, distance, DeliveryConfig.ROUTE_CACHE_TIMEOUT)
+        _local_distance_cache.set_distance(lat1, lon1, lat2, lon2, distance)
 
         return distance
 
@@ -496,39 +516,20 @@ def get_distance_between_two_location(lat1: float, lon1: float, lat2: float, lon
         return None
 
 
+def get_distance_cache_stats() -> Dict[str, Any]:
+    """Size and hit/miss counters of the process-local distance cache."""
+    return _local_distance_cache.stats()
+
+
 class DeliveryDistanceExceeded(ValueError):
     """Raised when a route is longer than the configured maximum delivery
     distance. Distinct from a calculation failure so callers can tell the
     customer "too far" instead of quoting a fallback price."""
 
 
-def get_road_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
-    """
-    Actual driving distance (km) from the Google Directions API.
-
-    Haversine measures a straight line, which under-states real Lagos trips by
-    roughly 30-40% (one-ways, bridges, no through-roads) — so riders cover
-    ground the customer was never charged for. This uses the real route.
-
-    Returns None when no API key is set or the lookup fails, so callers can
-    fall back to the straight-line distance.
-    """
-    api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
-    if not api_key:
-        return None
-
-    # Deliveries go by motorbike, which routes differently from a car — okadas
-    # take links and one-ways a car must detour around. The Routes API (v2)
-    # supports a real TWO_WHEELER mode in Nigeria; the legacy Directions API
-    # does NOT (its 'two_wheeler' silently returns car routes, and 'bicycling'
-    # returns ZERO_RESULTS). Never use 'walking' as a bike stand-in: it cannot
-    # cross bridges, so Yaba -> Lagos Island measures 161km instead of 7.7km.
-    mode = DeliveryConfig.ROUTE_TRAVEL_MODE          # TWO_WHEELER | DRIVE
-    cache_key = f"road_distance_{mode}_{lat1}_{lon1}_{lat2}_{lon2}"
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return cached
-
+def _fetch_road_distance_km(lat1: float, lon1: float, lat2: float, lon2: float,
+                            mode: str, api_key: str) -> Optional[float]:
+    """One computeRoutes lookup in ``mode``, retried in DRIVE; no caching."""
     for attempt in [mode] + (['DRIVE'] if mode != 'DRIVE' else []):
         try:
             response = requests.post(
@@ -550,7 +551,6 @@ def get_road_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) ->
             routes = (response.json() or {}).get('routes') or []
             if routes and routes[0].get('distanceMeters') is not None:
                 distance = round(routes[0]['distanceMeters'] / 1000.0, 2)
-                cache.set(cache_key, distance, DeliveryConfig.ROUTE_CACHE_TIMEOUT)
                 logger.debug(f"Route distance {distance}km via Routes API ({attempt})")
                 return distance
 
@@ -561,10 +561,137 @@ def get_road_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) ->
         except Exception as e:
             logger.warning(f"Route distance lookup ({attempt}) failed: {e}")
 
-    logger.warning("All route lookups failed; using straight-line distance")
     return None
 
 
+def get_road_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
+    """
+    Actual driving distance (km) from the Google Directions API.
+
+    Haversine measures a straight line, which under-states real Lagos trips by
+    roughly 30-40% (one-ways, bridges, no through-roads) — so riders cover
+    ground the customer was never charged for. This uses the real route.
+
+    Results are cached per geohash cell pair (helpers/route_cache.py); stale
+    entries are served while a background task re-measures them.
+
+    Returns None when no API key is set or the lookup fails, so callers can
+    fall back to the straight-line distance.
+    """
+    from helpers import route_cache
+
+    api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
+    if not api_key:
+        return None
+
+    # Deliveries go by motorbike, which routes differently from a car — okadas
+    # take links and one-ways a car must detour around. The Routes API (v2)
+    # supports a real TWO_WHEELER mode in Nigeria; the legacy Directions API
+    # does NOT (its 'two_wheeler' silently returns car routes, and 'bicycling'
+    # returns ZERO_RESULTS). Never use 'walking' as a bike stand-in: it cannot
+    # cross bridges, so Yaba -> Lagos Island measures 161km instead of 7.7km.
+    mode = DeliveryConfig.ROUTE_TRAVEL_MODE          # TWO_WHEELER | DRIVE
+    cached = route_cache.get_route_km(mode, lat1, lon1, lat2, lon2)
+    if cached is not None:
+        return cached
+
+    distance = _fetch_road_distance_km(lat1, lon1, lat2, lon2, mode, api_key)
+    if distance is None:
+        logger.warning("All route lookups failed; using straight-line distance")
+        return None
+
+    route_cache.set_route_km(mode, lat1, lon1, lat2, lon2, distance)
+    return distance
+
+
+ROUTE_MATRIX_MAX_ORIGINS = 50
+
+
+def _fetch_road_distance_matrix_km(origins, dest_lat: float, dest_lon: float,
+                                   mode: str, api_key: str) -> list:
+    """computeRouteMatrix from many origins to one destination; no caching."""
+    origins = list(origins)
+    distances = [None] * len(origins)
+    for attempt in [mode] + (['DRIVE'] if mode != 'DRIVE' else []):
+        missing = [index for index, distance in enumerate(distances) if distance is None]
+        if not missing:
+            break
+        for start in range(0, len(missing), ROUTE_MATRIX_MAX_ORIGINS):
+            chunk = missing[start:start + ROUTE_MATRIX_MAX_ORIGINS]
+            try:
+                response = requests.post(
+                    "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix",
+                    json={
+                        "origins": [
+                            {"waypoint": {"location": {"latLng": {
+                                "latitude": origins[index][0], "longitude": origins[index][1]}}}}
+                            for index in chunk
+                        ],
+                        "destinations": [
+                            {"waypoint": {"location": {"latLng": {
+                                "latitude": dest_lat, "longitude": dest_lon}}}}
+                        ],
+                        "travelMode": attempt,
+                    },
+                    headers={
+                        "Content-Type": "application/json",
+                        "X-Goog-Api-Key": api_key,
+                        "X-Goog-FieldMask": "originIndex,destinationIndex,distanceMeters,condition",
+                    },
+                    timeout=6,
+                )
+                elements = response.json() or []
+                if not isinstance(elements, list):
+                    logger.warning(
+                        "Route matrix '%s' returned no elements (HTTP %s)",
+                        attempt, response.status_code,
+                    )
+                    continue
+            except Exception as e:
+                logger.warning(f"Route matrix lookup ({attempt}) failed: {e}")
+                continue
+
+            for element in elements:
+                origin_index = element.get('originIndex', 0)
+                if (element.get('condition') != 'ROUTE_EXISTS'
+                        or element.get('distanceMeters') is None
+                        or not 0 <= origin_index < len(chunk)):
+                    continue
+                distances[chunk[origin_index]] = round(element['distanceMeters'] / 1000.0, 2)
+    return distances
+
+
+def get_road_distance_matrix_km(origins, dest_lat: float, dest_lon: float) -> list:
+    """
+    Road distances (km) from many origins to one destination.
+
+    Batch counterpart of get_road_distance_km: pairs already in the route
+    cache are served from one cache.get_many, and the rest are measured with
+    the Routes API computeRouteMatrix call (one request per
+    ROUTE_MATRIX_MAX_ORIGINS origins) instead of one computeRoutes per vendor.
+    Returns a list aligned with ``origins``; None marks a pair the caller
+    should measure in a straight line.
+    """
+    from helpers import route_cache
+
+    origins = list(origins)
+    api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
+    if not api_key or not origins:
+        return [None] * len(origins)
+
+    mode = DeliveryConfig.ROUTE_TRAVEL_MODE
+    distances = route_cache.get_many_route_km(mode, origins, dest_lat, dest_lon)
+    missing = [index for index, distance in enumerate(distances) if distance is None]
+    if missing:
+        measured = _fetch_road_distance_matrix_km(
+            [origins[index] for index in missing], dest_lat, dest_lon, mode, api_key)
+        for index, distance in zip(missing, measured):
+            distances[index] = distance
+        route_cache.set_many_route_km(
+            mode, [origins[index] for index in missing], dest_lat, dest_lon, measured)
+    return distances
+
+
 def get_delivery_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> Optional[float]:
     """Distance used for pricing: real road distance, straight line as fallback."""
     return (
@@ -977,13 +1104,14 @@ def _simulate_rider_availability() -> Dict[str, Any]:
 # -------------------------
 # 4. Advanced Features
 # -------------------------
-def calculate_vendor_specific_fee(vendor_id: str, base_fee: float) -> Dict[str, Any]:
+def calculate_vendor_specific_fee(vendor_id: str, base_fee: float, vendor=None) -> Dict[str, Any]:
     """
     Calculate vendor-specific delivery fee adjustments.
 
     Args:
         vendor_id: Unique identifier for the vendor
         base_fee: Base delivery fee before vendor adjustments
+        vendor: Already-loaded Vendor (with category) to skip the lookup
 
     Returns:
         Dictionary with vendor fee information
@@ -991,7 +1119,8 @@ def calculate_vendor_specific_fee(vendor_id: str, base_fee: float) -> Dict[str,
     try:
         from account.models import Vendor
 
-        vendor = Vendor.objects.filter(id=vendor_id).select_related('category').first()
+        if vendor is None:
+            vendor = Vendor.objects.filter(id=vendor_id).select_related('category').first()
         vendor_type = "restaurant"
         if vendor and vendor.category and vendor.category.name:
             category_name = vendor.category.name.lower()
@@ -1296,10 +1425,67 @@ def apply_promo_code(
     return promo_info
 
 
+def _gather_quote_factors(origin_lat: float, origin_lon: float,
+                          dest_lat: float, dest_lon: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Fetch distance, traffic, weather and rider availability concurrently."""
+    from helpers.quote_factors import gather_factors
+
+    origin, destination = (origin_lat, origin_lon), (dest_lat, dest_lon)
+    sources = {
+        'distance': (
+            get_road_distance_km, (origin_lat, origin_lon, dest_lat, dest_lon),
+            lambda: get_distance_between_two_location(origin_lat, origin_lon, dest_lat, dest_lon),
+        ),
+        'traffic': (
+            fetch_traffic_level, (origin, destination),
+            lambda: dict(_simulate_traffic_conditions(origin, destination), source="fallback"),
+        ),
+        'weather': (
+            fetch_weather_factor, (dest_lat, dest_lon),
+            lambda: dict(_simulate_weather_conditions(), source="fallback"),
+        ),
+        'rider': (
+            fetch_rider_availability, (),
+            lambda: dict(_simulate_rider_availability(), source="fallback"),
+        ),
+    }
+    return gather_factors(
+        sources,
+        deadline_seconds=getattr(settings, 'QUOTE_FACTOR_DEADLINE_SECONDS', 8),
+        timeouts=getattr(settings, 'QUOTE_FACTOR_TIMEOUTS', None),
+    )
+
+
+def _batch_quote_factors(quote_context: Dict[str, Any], vendor_id, origin_lat: float, origin_lon: float,
+                         dest_lat: float, dest_lon: float) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Pick one vendor's inputs out of a calculate_delivery_fees_batch context."""
+    key = str(vendor_id)
+    distance_km = quote_context['distances'].get(key)
+    if distance_km is None:
+        distance_km = get_distance_between_two_location(origin_lat, origin_lon, dest_lat, dest_lon)
+    traffic_data = quote_context['traffic'].get(key) or dict(
+        _simulate_traffic_conditions((origin_lat, origin_lon), (dest_lat, dest_lon)), source="fallback")
+    factors = {
+        'distance': distance_km,
+        'traffic': traffic_data,
+        'weather': quote_context['weather'],
+        'rider': quote_context['rider'],
+    }
+    return factors, quote_context['factor_meta']
+
+
+def get_quote_factor_stats() -> Dict[str, Any]:
+    """Per-source latency/timeout counters for the concurrent quote inputs."""
+    from helpers.quote_factors import factor_latency_stats
+
+    return factor_latency_stats()
+
+
 def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float, dest_lon: float,
                            order_value: float = 0, item_count: int = 1, weight_kg: float = 1.0,
                            vendor_id: str = None, customer_id: str = None,
-                           include_time_estimate: bool = True, promo_code: str = None, **kwargs) -> Dict[str, Any]:
+                           include_time_estimate: bool = True, promo_code: str = None,
+                           quote_context: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
     """
     Enhanced delivery fee calculation with comprehensive features.
 
@@ -1312,6 +1498,9 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
         vendor_id: Vendor identifier for vendor-specific pricing
         customer_id: Customer identifier for loyalty discounts
         include_time_estimate: Whether to include delivery time estimation
+        quote_context: Shared inputs prepared by calculate_delivery_fees_batch
+            (customer, vendors, platform discount, distances, live factors);
+            when given, those lookups are not repeated for this quote
 
     Returns:
         Comprehensive dictionary with fee breakdown and additional information
@@ -1331,8 +1520,10 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
         # This will be applied after all surcharges, before min/max constraints
         delivery_discount_percentage = None
         # 1. User-specific
-        user_obj = None
-        if customer_id:
+        user_obj = quote_context['customer'] if quote_context else None
+        if user_obj is not None:
+            delivery_discount_percentage = getattr(user_obj, 'delivery_percentage_off', None)
+        elif customer_id and not quote_context:
             try:
                 user_obj = User.objects.filter(id=customer_id).first()
                 if user_obj and user_obj.delivery_percentage_off is not None:
@@ -1344,13 +1535,18 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
             try:
                 # Try to get vendor's system category via vendor_id
                 from account.models import Vendor
-                vendor = Vendor.objects.filter(id=vendor_id).first()
+                if quote_context:
+                    vendor = quote_context['vendors'].get(str(vendor_id))
+                else:
+                    vendor = Vendor.objects.filter(id=vendor_id).first()
                 if vendor and vendor.category and vendor.category.delivery_percentage_off is not None:
                     delivery_discount_percentage = vendor.category.delivery_percentage_off
             except Exception:
                 pass
         # 3. Platform/global
-        if delivery_discount_percentage is None:
+        if delivery_discount_percentage is None and quote_context:
+            delivery_discount_percentage = quote_context['platform_discount']
+        elif delivery_discount_percentage is None:
             try:
                 platform_settings = PlatformSettings.get_settings()
                 if platform_settings.delivery_percentage_off is not None:
@@ -1392,24 +1588,37 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
 
     try:
 
-        # 1. Calculate distance — real driving distance, straight line if the
-        # Directions lookup is unavailable.
+        # 1. Gather the external inputs concurrently: road distance, traffic,
+        # weather and rider availability. Each source has its own timeout and
+        # a neutral fallback, and all share one deadline, so the quote waits
+        # for the slowest single source rather than the sum of all of them.
         logger.debug(
-            f"Step 1: Calculating distance for calculation {calculation_id}")
-        distance_km = get_delivery_distance_km(
-            origin_lat, origin_lon, dest_lat, dest_lon)
+            f"Step 1: Gathering distance and real-time factors for calculation {calculation_id}")
+        max_distance_km = DeliveryConfig.MAX_DISTANCE_KM
+        if quote_context:
+            factors, factor_meta = _batch_quote_factors(
+                quote_context, vendor_id, origin_lat, origin_lon, dest_lat, dest_lon)
+        else:
+            factors, factor_meta = _gather_quote_factors(
+                origin_lat, origin_lon, dest_lat, dest_lon)
+        distance_km = factors['distance']
+        traffic_data = factors['traffic']
+        weather_data = factors['weather']
+        rider_data = factors['rider']
         if distance_km is None:
             raise ValueError(
                 "Could not calculate distance between coordinates")
 
-        if distance_km > DeliveryConfig.MAX_DISTANCE_KM:
+        if distance_km > max_distance_km:
             # Business rule, not a failure: must surface to the customer as
             # "we can't deliver that far", never as a fallback price.
             raise DeliveryDistanceExceeded(
-                f"Distance {distance_km:.2f}km exceeds maximum allowed distance of {DeliveryConfig.MAX_DISTANCE_KM}km")
+                f"Distance {distance_km:.2f}km exceeds maximum allowed distance of {max_distance_km}km")
 
         logger.debug(
-            f"Calculated distance: {distance_km:.2f} km for calculation {calculation_id}")
+            f"Calculated distance: {distance_km:.2f} km, traffic {traffic_data.get('level', 'unknown')}, "
+            f"weather {weather_data.get('condition', 'unknown')}, riders {rider_data.get('level', 'unknown')} "
+            f"(timings {factor_meta['timings_ms']}) for calculation {calculation_id}")
 
         # 2. Get base fee with time-based pricing
         logger.debug(
@@ -1426,40 +1635,6 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
             base_fee = max(DeliveryConfig.MIN_DELIVERY_FEE, distance_km * 150)
             base_fee_data = {"time_adjusted_fee": base_fee, "fallback": True}
 
-        # 3. Get real-time dynamic factors
-        logger.debug(
-            f"Step 3: Fetching real-time factors for calculation {calculation_id}")
-        try:
-            traffic_data = fetch_traffic_level(
-                (origin_lat, origin_lon), (dest_lat, dest_lon))
-            logger.debug(
-                f"Traffic data: {traffic_data.get('level', 'unknown')} (multiplier: {traffic_data.get('multiplier', 1.0)}) for calculation {calculation_id}")
-        except Exception as e:
-            logger.warning(
-                f"Traffic data fetch failed for calculation {calculation_id}: {e}")
-            traffic_data = {"level": "moderate",
-                            "multiplier": 1.3, "source": "fallback"}
-
-        try:
-            weather_data = fetch_weather_factor(dest_lat, dest_lon)
-            logger.debug(
-                f"Weather data: {weather_data.get('condition', 'unknown')} (multiplier: {weather_data.get('multiplier', 1.0)}) for calculation {calculation_id}")
-        except Exception as e:
-            logger.warning(
-                f"Weather data fetch failed for calculation {calculation_id}: {e}")
-            weather_data = {"condition": "clear",
-                            "multiplier": 1.0, "source": "fallback"}
-
-        try:
-            rider_data = fetch_rider_availability()
-            logger.debug(
-                f"Rider availability: {rider_data.get('level', 'unknown')} (multiplier: {rider_data.get('multiplier', 1.0)}) for calculation {calculation_id}")
-        except Exception as e:
-            logger.warning(
-                f"Rider availability fetch failed for calculation {calculation_id}: {e}")
-            rider_data = {"level": "normal",
-                          "multiplier": 1.0, "source": "fallback"}
-
         # 4. Apply surge pricing
         logger.debug(
             f"Step 4: Applying surge pricing for calculation {calculation_id}")
@@ -1481,7 +1656,8 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
         if vendor_id:
             try:
                 vendor_fee_data = calculate_vendor_specific_fee(
-                    vendor_id, surge_data['surged_fee'])
+                    vendor_id, surge_data['surged_fee'],
+                    vendor=quote_context['vendors'].get(str(vendor_id)) if quote_context else None)
                 current_fee = vendor_fee_data['adjusted_fee']
                 logger.debug(
                     f"Vendor adjustment applied: {vendor_fee_data.get('multiplier', 1.0)}x (₦{vendor_fee_data.get('adjustment', 0):.2f}) for calculation {calculation_id}")
@@ -1573,7 +1749,10 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
 
         # --- NEW PROMO CODE SYSTEM INTEGRATION ---
         from account.models import Vendor
-        vendor_obj = Vendor.objects.filter(id=vendor_id).first() if vendor_id else None
+        if quote_context and vendor_id:
+            vendor_obj = quote_context['vendors'].get(str(vendor_id))
+        else:
+            vendor_obj = Vendor.objects.filter(id=vendor_id).first() if vendor_id else None
         
         original_final_fee = final_fee # Save before promo
         
@@ -1632,6 +1811,7 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
             "calculation_id": calculation_id,
             "calculation_timestamp": calculation_end.isoformat(),
             "calculation_time_ms": round(calculation_time * 1000, 2),
+            "factor_timings_ms": factor_meta['timings_ms'],
             "success": True,
             # Detailed breakdown
             "breakdown": {
@@ -1771,6 +1951,121 @@ def calculate_delivery_fee(origin_lat: float, origin_lon: float, dest_lat: float
             }
 
 
+def calculate_delivery_fees_batch(vendors, dest_lat: float, dest_lon: float, customer=None,
+                                  order_value: float = 0, item_count: int = 1, promo_code: str = None,
+                                  **kwargs) -> Dict[str, Dict[str, Any]]:
+    """
+    Quote one destination against many vendors in a single pass.
+
+    The per-request work that calculate_delivery_fee would otherwise repeat
+    for every vendor is done once: the customer and platform discount
+    lookups, the configuration snapshot, weather at the destination and rider
+    availability. Road distances come from one Routes API matrix call
+    (get_road_distance_matrix_km), and the matrix, weather, rider and
+    per-vendor traffic lookups all run concurrently under the same deadline
+    as a single quote.
+
+    Args:
+        vendors: Vendor instances (ideally with ``category`` selected)
+        dest_lat, dest_lon: Customer coordinates
+        customer: The requesting User, or None for anonymous quotes
+
+    Returns:
+        {vendor_id: calculate_delivery_fee result}
+    """
+    from helpers.quote_factors import gather_factors
+    from product.models import PlatformSettings
+
+    vendors = list(vendors)
+    if not vendors:
+        return {}
+
+    platform_discount = None
+    try:
+        platform_discount = PlatformSettings.get_settings().delivery_percentage_off
+    except Exception:
+        pass
+
+    origins = []
+    for vendor in vendors:
+        try:
+            origins.append((float(vendor.location_latitude), float(vendor.location_longitude)))
+        except (TypeError, ValueError):
+            origins.append(None)
+    routable = [index for index, origin in enumerate(origins) if origin is not None]
+    destination = (dest_lat, dest_lon)
+
+    # Load the config snapshot on this thread before fanning out.
+    DeliveryConfig.ROUTE_TRAVEL_MODE
+    sources = {
+        'distances': (
+            get_road_distance_matrix_km, ([origins[i] for i in routable], dest_lat, dest_lon),
+            lambda: [None] * len(routable),
+        ),
+        'weather': (
+            fetch_weather_factor, (dest_lat, dest_lon),
+            lambda: dict(_simulate_weather_conditions(), source="fallback"),
+        ),
+        'rider': (
+            fetch_rider_availability, (),
+            lambda: dict(_simulate_rider_availability(), source="fallback"),
+        ),
+    }
+    for index in routable:
+        origin = origins[index]
+        sources[f'traffic:{vendors[index].id}'] = (
+            fetch_traffic_level, (origin, destination),
+            lambda origin=origin: dict(_simulate_traffic_conditions(origin, destination), source="fallback"),
+        )
+    timeouts = dict(getattr(settings, 'QUOTE_FACTOR_TIMEOUTS', None) or {})
+    timeouts.setdefault('distances', timeouts.get('distance', 8))
+    for name in sources:
+        if name.startswith('traffic:'):
+            timeouts.setdefault(name, timeouts.get('traffic', 3))
+    results, factor_meta = gather_factors(
+        sources,
+        deadline_seconds=getattr(settings, 'QUOTE_FACTOR_DEADLINE_SECONDS', 8),
+        timeouts=timeouts,
+    )
+
+    quote_context = {
+        'customer': customer,
+        'vendors': {str(vendor.id): vendor for vendor in vendors},
+        'platform_discount': platform_discount,
+        'distances': {
+            str(vendors[index].id): distance
+            for index, distance in zip(routable, results['distances'])
+        },
+        'traffic': {
+            name.split(':', 1)[1]: value
+            for name, value in results.items() if name.startswith('traffic:')
+        },
+        'weather': results['weather'],
+        'rider': results['rider'],
+        'factor_meta': factor_meta,
+    }
+
+    quotes = {}
+    for index, vendor in enumerate(vendors):
+        if origins[index] is None:
+            quotes[str(vendor.id)] = {"error": "Vendor has no valid location", "success": False}
+            continue
+        quotes[str(vendor.id)] = calculate_delivery_fee(
+            origin_lat=origins[index][0],
+            origin_lon=origins[index][1],
+            dest_lat=dest_lat,
+            dest_lon=dest_lon,
+            order_value=order_value,
+            item_count=item_count,
+            vendor_id=str(vendor.id),
+            customer_id=str(customer.id) if customer else None,
+            promo_code=promo_code,
+            quote_context=quote_context,
+            **kwargs,
+        )
+    return quotes
+
+
 def get_delivery_fee_estimate(distance_km: float, vendor_type: str = 'restaurant',
                               customer_loyalty: str = 'bronze', current_conditions: bool = True) -> Dict[str, Any]:
     """
@@ -1890,36 +2185,16 @@ def calculate_rider_fare(distance_km: float) -> float:
 def check_address_in_zone(lat: float, lon: float) -> Optional[Any]:
     """
     Check if a coordinate falls within a predefined delivery zone using Point-in-Polygon.
+
+    Uses the in-process zone index (helpers/zone_index.py): bounding boxes and
+    a grid narrow the candidates, so no zone query is made per call.
     """
-    from product.models import DeliveryZone
-
-    def is_point_in_polygon(x, y, poly):
-        n = len(poly)
-        inside = False
-        if n < 3:
-            return False
-
-        p1x, p1y = poly[0]
-        for i in range(n + 1):
-            p2x, p2y = poly[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xints = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xints:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        return inside
+    from helpers.zone_index import find_zone
 
     try:
-        zones = DeliveryZone.objects.filter(is_active=True)
-        for zone in zones:
-            boundary = zone.boundary
-            if boundary and is_point_in_polygon(float(lat), float(lon), boundary):
-                return zone
+        return find_zone(lat, lon)
     except Exception as e:
-        print(f"Error checking address in zone: {e}")
+        logger.warning(f"Error checking address in zone: {e}")
     return None
 
 
@@ -1956,8 +2231,8 @@ def calculate_delivery_price_v2(origin_lat: float, origin_lon: float, dest_lat:
         is_zone_based = True
 
         # Add Estate Gate Pass Fee if applicable
-        from product.models import EstateGatePass
-        gate_pass = EstateGatePass.objects.filter(location_zone=zone).first()
+        from helpers.zone_index import gate_pass_for_zone
+        gate_pass = gate_pass_for_zone(zone)
         if gate_pass:
             estate_fee = float(gate_pass.gate_fee_bike)
     else:
@@ -1,17 +1,45 @@
 from decimal import Decimal
+import hashlib
 import json
 import logging
 import requests
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from uuid import UUID
-from findmytaste import settings
 from account.models import User, Vendor, VirtualAccount
 from helpers.paystack_fees import record_collection_fee, record_payout_fee
 from helpers.response.response_format import bad_request_response, success_response, internal_server_error_response
+from wallet import ledger
 from wallet.models import Wallet, WalletTransaction
 
 logger = logging.getLogger(__name__)
 
+PAYSTACK_BASE_URL = "https://api.paystack.co"
+# Paystack accepts at most this many transfers per /transfer/bulk request.
+BULK_TRANSFER_LIMIT = 100
+# Transfer statuses Paystack returns for a transfer it has taken on; it
+# settles later via webhook unless it is already 'success'.
+ACCEPTED_TRANSFER_STATUSES = ('success', 'pending', 'queued', 'received', 'processing')
+BANKS_CACHE_KEY = 'paystack:banks'
+BANKS_CACHE_SECONDS = 24 * 60 * 60
+RECIPIENT_CACHE_SECONDS = 30 * 24 * 60 * 60
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as exc:
+        logger.warning("Paystack cache read failed for %s: %s", key, exc)
+        return None
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception as exc:
+        logger.warning("Paystack cache write failed for %s: %s", key, exc)
+
 
 def _paystack_error(response, fallback):
     """Extract Paystack's real error message from a failed response for logging/UX."""
@@ -32,7 +60,7 @@ class PaystackManager:
             'Content-Type': 'application/json',
         }
         self.header = header
-        self.base_url = "https://api.paystack.co"
+        self.base_url = getattr(settings, 'PAYSTACK_BASE_URL', PAYSTACK_BASE_URL)
 
 
     def get_header(self):
@@ -56,31 +84,46 @@ class PaystackManager:
                 return bank.get('code')
         return None
 
-    def initiate_transfer(self, user: User, vendor: Vendor, amount, transaction_obj,
-                          reason="Withdrawal from balance", bank_override=None):
+    @staticmethod
+    def _payout_account(user, vendor, bank_override=None):
+        """(bank, account_number, account_name) to pay out to, or None."""
+        if vendor and vendor.bank_name and vendor.bank_account and vendor.bank_account_name:
+            return vendor.bank_name, vendor.bank_account, vendor.bank_account_name
+        if user and user.bank_name and user.bank_account and user.bank_account_name:
+            return user.bank_name, user.bank_account, user.bank_account_name
+        if bank_override and bank_override.get('bank_code') and bank_override.get('account_number'):
+            return (
+                bank_override['bank_code'],
+                bank_override['account_number'],
+                bank_override.get('account_name') or (user.full_name if user else None) or "Withdrawal Recipient",
+            )
+        return None
+
+    @staticmethod
+    def recipient_cache_key(user, account_bank, account_number):
+        # Hashed so bank names (spaces) and account numbers stay out of the key.
+        owner = user.pk if user else 'anonymous'
+        account = f"{str(account_bank).strip().lower()}:{str(account_number).strip()}"
+        return f"paystack:recipient:{owner}:{hashlib.sha1(account.encode()).hexdigest()}"
+
+    def get_recipient_code(self, user: User, vendor: Vendor = None, bank_override=None):
         """
-        Initiate a Paystack transfer to the vendor's/user's saved bank account.
-        Works outside a request cycle (celery tasks, admin approvals).
-        `bank_override` is an optional dict: {bank_code, account_number, account_name}.
-        Returns (success: bool, message: str).
+        The Paystack transfer recipient for this user's payout account.
+
+        Recipient codes are cached per user and bank account (a changed
+        account gets a new key), so repeat payouts skip the bank lookup,
+        the account resolve and the recipient POST.
+        Returns (success: bool, recipient_code or error message).
         """
-        account_bank = None
-        account_number = None
-        account_name = None
-        if vendor and vendor.bank_name and vendor.bank_account and vendor.bank_account_name:
-            account_bank = vendor.bank_name
-            account_number = vendor.bank_account
-            account_name = vendor.bank_account_name
-        elif user and user.bank_name and user.bank_account and user.bank_account_name:
-            account_bank = user.bank_name
-            account_number = user.bank_account
-            account_name = user.bank_account_name
-        elif bank_override and bank_override.get('bank_code') and bank_override.get('account_number'):
-            account_bank = bank_override['bank_code']
-            account_number = bank_override['account_number']
-            account_name = bank_override.get('account_name') or (user.full_name if user else None) or "Withdrawal Recipient"
-        else:
+        account = self._payout_account(user, vendor, bank_override)
+        if not account:
             return False, 'You do not have a bank account attached to your profile, kindly add one.'
+        account_bank, account_number, account_name = account
+
+        cache_key = self.recipient_cache_key(user, account_bank, account_number)
+        recipient_code = _cache_get(cache_key)
+        if recipient_code:
+            return True, recipient_code
 
         bank_code = self.resolve_bank_identifier(account_bank)
         if not bank_code:
@@ -102,51 +145,37 @@ class PaystackManager:
         recipient_response = requests.post(
             f'{self.base_url}/transferrecipient',
             headers=self.get_header(),
-            json=recipient_data
+            json=recipient_data,
+            timeout=30,
         )
         if not recipient_response.ok:
             error = _paystack_error(recipient_response, 'Failed to create transfer recipient')
             logger.error(
-                "Paystack recipient creation failed (%s) for txn %s: %s",
-                recipient_response.status_code, transaction_obj.id, error,
+                "Paystack recipient creation failed (%s) for user %s: %s",
+                recipient_response.status_code, user.pk if user else None, error,
             )
             return False, error
 
         recipient_code = recipient_response.json()['data']['recipient_code']
+        _cache_set(cache_key, recipient_code, RECIPIENT_CACHE_SECONDS)
+        return True, recipient_code
 
-        # Initiate transfer
-        data = {
-            "source": "balance",
-            "amount": int(Decimal(str(amount)) * 100),  # Convert to kobo
-            "recipient": recipient_code,
-            "reason": reason,
-            "reference": str(transaction_obj.id)
-        }
-        response = requests.post(
-            f'{self.base_url}/transfer',
-            headers=self.get_header(),
-            json=data
-        )
-
-        if not response.ok:
-            # Surface Paystack's real reason (e.g. "You cannot initiate third
-            # party payouts as a starter business", insufficient balance, etc.)
-            error = _paystack_error(response, 'Withdrawal creation failed')
-            logger.error(
-                "Paystack transfer failed (%s) for txn %s: %s",
-                response.status_code, transaction_obj.id, error,
-            )
-            return False, error
-
-        initiate_result = response.json()
-        transfer_status = (initiate_result.get('data') or {}).get('status')
+    def apply_transfer_result(self, transaction_obj, transfer_data, payload, user=None):
+        """
+        Record what Paystack said about one initiated transfer on its
+        withdrawal transaction. ``payload`` is the response stored on the
+        transaction, shaped ``{'data': transfer_data, ...}``. Returns
+        (success: bool, message: str); on failure the caller releases the
+        held funds.
+        """
+        transfer_status = (transfer_data or {}).get('status')
         # A freshly-initiated Paystack transfer is normally 'pending' or
         # 'queued' (it settles later via webhook); 'success' is the instant
         # case. Only 'otp' / 'failed' are genuine problems here.
-        if transfer_status in ('success', 'pending', 'queued', 'received', 'processing'):
-            transaction_obj.response_data = initiate_result
+        if transfer_status in ACCEPTED_TRANSFER_STATUSES:
+            transaction_obj.response_data = payload
             transaction_obj.external_reference = (
-                (initiate_result.get('data') or {}).get('reference')
+                (transfer_data or {}).get('reference')
                 or str(transaction_obj.id)
             )
             # An instant success is already final. Other accepted statuses are
@@ -160,7 +189,7 @@ class PaystackManager:
                 # to follow, so bank the fee now. Recording is idempotent, so a
                 # webhook arriving later just refreshes this row.
                 record_payout_fee(
-                    initiate_result,
+                    payload,
                     wallet_transaction=transaction_obj,
                     user=user,
                     source='verify',
@@ -171,7 +200,7 @@ class PaystackManager:
                 "Paystack transfer requires OTP for txn %s — disable Transfers OTP "
                 "in the Paystack dashboard (Settings > Preferences) so payouts can "
                 "complete via the API. Response: %s",
-                transaction_obj.id, initiate_result,
+                transaction_obj.id, payload,
             )
             return False, (
                 'Payouts require OTP, which blocks automatic transfers. Please '
@@ -179,10 +208,113 @@ class PaystackManager:
             )
         logger.error(
             "Paystack transfer returned unexpected status '%s' for txn %s: %s",
-            transfer_status, transaction_obj.id, initiate_result,
+            transfer_status, transaction_obj.id, payload,
         )
         return False, f"Withdrawal could not be completed (status: {transfer_status or 'unknown'})."
 
+    def initiate_transfer(self, user: User, vendor: Vendor, amount, transaction_obj,
+                          reason="Withdrawal from balance", bank_override=None):
+        """
+        Initiate a Paystack transfer to the vendor's/user's saved bank account.
+        Works outside a request cycle (celery tasks, admin approvals).
+        `bank_override` is an optional dict: {bank_code, account_number, account_name}.
+        Returns (success: bool, message: str).
+        """
+        has_recipient, recipient = self.get_recipient_code(user, vendor, bank_override)
+        if not has_recipient:
+            return False, recipient
+
+        # Initiate transfer
+        data = {
+            "source": "balance",
+            "amount": int(Decimal(str(amount)) * 100),  # Convert to kobo
+            "recipient": recipient,
+            "reason": reason,
+            "reference": str(transaction_obj.id)
+        }
+        response = requests.post(
+            f'{self.base_url}/transfer',
+            headers=self.get_header(),
+            json=data,
+            timeout=30,
+        )
+
+        if not response.ok:
+            # Surface Paystack's real reason (e.g. "You cannot initiate third
+            # party payouts as a starter business", insufficient balance, etc.)
+            error = _paystack_error(response, 'Withdrawal creation failed')
+            logger.error(
+                "Paystack transfer failed (%s) for txn %s: %s",
+                response.status_code, transaction_obj.id, error,
+            )
+            return False, error
+
+        initiate_result = response.json()
+        return self.apply_transfer_result(
+            transaction_obj, initiate_result.get('data'), initiate_result, user=user,
+        )
+
+    def bulk_transfer(self, transfers):
+        """
+        Submit up to BULK_TRANSFER_LIMIT transfers in one /transfer/bulk call.
+
+        Each transfer is a dict with amount (naira), recipient, reference and
+        reason. Returns (success: bool, list of per-transfer results or error
+        message); each result carries its reference and status. Final outcomes
+        arrive per transfer through the transfer.success / transfer.failed
+        webhooks. Only a 4xx is a definite rejection. Network errors and 5xx
+        responses (a 502/504 from the gateway) raise instead: Paystack may
+        still have queued the transfers, so the caller must not treat them
+        as failed.
+        """
+        data = {
+            "currency": "NGN",
+            "source": "balance",
+            "transfers": [
+                {
+                    "amount": int(Decimal(str(transfer['amount'])) * 100),  # Convert to kobo
+                    "recipient": transfer['recipient'],
+                    "reference": str(transfer['reference']),
+                    "reason": transfer.get('reason') or "Withdrawal from balance",
+                }
+                for transfer in transfers
+            ],
+        }
+        response = requests.post(
+            f'{self.base_url}/transfer/bulk',
+            headers=self.get_header(),
+            json=data,
+            timeout=60,
+        )
+        if response.status_code >= 500:
+            response.raise_for_status()
+        if not response.ok:
+            error = _paystack_error(response, 'Bulk transfer failed')
+            logger.error("Paystack bulk transfer failed (%s): %s", response.status_code, error)
+            return False, error
+        return True, response.json().get('data') or []
+
+    def verify_transfer(self, reference):
+        """
+        Look up a transfer by the reference we sent (GET /transfer/verify/:reference).
+
+        Returns the transfer data, or None when Paystack has no transfer with
+        that reference. Any other failure raises (requests.RequestException,
+        or ValueError for an unreadable body): the outcome is still unknown.
+        """
+        response = requests.get(
+            f'{self.base_url}/transfer/verify/{reference}',
+            headers=self.get_header(),
+            timeout=30,
+        )
+        if response.status_code == 404 or (
+            response.status_code == 400
+            and 'not found' in _paystack_error(response, '').lower()
+        ):
+            return None
+        response.raise_for_status()
+        return response.json().get('data') or {}
+
     def make_withdrawal(self, request, vendor: Vendor, amount, transaction_obj):
         bank_override = None
         if request.data.get('bank_code') and request.data.get('account_number'):
@@ -256,7 +388,7 @@ class PaystackManager:
         if not is_valid:
             return False , bank_object
         url = f'{self.base_url}/bank/resolve?account_number={account_number}&bank_code={bank_code}'
-        response = requests.get(url, headers=self.get_header())
+        response = requests.get(url, headers=self.get_header(), timeout=30)
         if response.ok:
             res = response.json()['data']
             res['bank_name'] = bank_object['name']
@@ -266,10 +398,17 @@ class PaystackManager:
     
 
     def banks(self):
+        # The bank list rarely changes and every transfer used to fetch it
+        # twice (resolve_bank_identifier and validate_bank).
+        cached = _cache_get(BANKS_CACHE_KEY)
+        if cached:
+            return True, cached
         url = f'{self.base_url}/bank'
-        response = requests.get(url, headers=self.get_header())
+        response = requests.get(url, headers=self.get_header(), timeout=30)
         if response.ok:
-            return True , response.json()['data']
+            banks = response.json()['data']
+            _cache_set(BANKS_CACHE_KEY, banks, BANKS_CACHE_SECONDS)
+            return True , banks
         return False , "Account could not be resolve"
 
 
@@ -523,12 +662,13 @@ class PaystackManager:
                 self._drop_payout_fee_record(reference)
                 transaction = self._find_withdrawal(reference)
                 if transaction:
-                    transaction.status = 'failed'
                     transaction.response_data = payload
-                    transaction.save()
-                    # Optionally refund the wallet
-                    wallet = transaction.wallet
-                    wallet.deposit(transaction.amount)
+                    transaction.save(update_fields=['response_data', 'updated_at'])
+                    if transaction.wallet:
+                        # Conditional: a re-delivered webhook does not refund twice.
+                        ledger.release(transaction.wallet, transaction)
+                    else:
+                        WalletTransaction.objects.filter(pk=transaction.pk).update(status='failed')
                     return bad_request_response(message="Withdrawal failed and amount refunded")
                 return bad_request_response(message="Transaction not found")
             except Exception:
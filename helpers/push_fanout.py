@@ -0,0 +1,220 @@
+"""
+Send one push notification to many users.
+
+send_new_order_push_notification_riders used to submit every candidate rider
+to a fresh ThreadPoolExecutor, and each task called
+notification_helper.send_to_user_async, which started yet another thread that
+queried that rider's FCMToken rows, made its own send_each_for_multicast call
+and wrote its own PushNotificationLog row. A 200-rider fan-out meant hundreds
+of threads, token queries and FCM requests, all started from the request
+thread. deliver_push instead:
+
+- loads every recipient's active tokens in one query;
+- packs them into multicast batches of FCM_MULTICAST_LIMIT (500, FCM's
+  per-request maximum) tokens, whoever they belong to;
+- writes one PushNotificationLog per recipient with a single bulk_create
+  ('sent' if any of their devices accepted the message, as before);
+- deactivates the tokens FCM reported as permanently invalid with a single
+  UPDATE. Transient failures (quota, unavailable) leave the token active.
+
+It also reports the outcome per user, which the notification outbox
+(helpers/notification_outbox.py) uses to decide what to retry.
+
+enqueue_push_fanout runs send_push_to_users off the request thread as the
+``helpers.send_push_fanout`` Celery task once the current transaction
+commits, or on a small bounded thread pool if the task cannot be queued.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+FCM_MULTICAST_LIMIT = 500
+DEFAULT_FANOUT_WORKERS = 2
+
+_fallback_executor = None
+_fallback_lock = threading.Lock()
+
+
+def _invalid_token_errors():
+    from firebase_admin import exceptions, messaging
+
+    return (messaging.UnregisteredError, messaging.SenderIdMismatchError, exceptions.InvalidArgumentError)
+
+
+def _multicast(tokens: List[str], title: str, body: str, data: Dict[str, str], image_url: Optional[str]):
+    from firebase_admin import messaging
+
+    from helpers.services.firebase_service import FirebaseNotificationService
+
+    message = messaging.MulticastMessage(
+        notification=messaging.Notification(title=title, body=body, image=image_url),
+        data=data,
+        tokens=tokens,
+        android=FirebaseNotificationService._android_config(),
+        apns=FirebaseNotificationService._apns_config(),
+    )
+    return messaging.send_each_for_multicast(message)
+
+
+def deliver_push(
+    user_ids: Iterable,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, Any]] = None,
+    image_url: Optional[str] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+    """
+    Deliver one notification to every active device of ``user_ids``.
+
+    Returns ``(outcomes, stats)``. ``outcomes`` maps each recipient's user
+    id (as a string) to ``{'sent', 'message_id', 'error', 'retryable'}``;
+    users without an active token are absent. ``retryable`` is True when
+    nothing reached the user and at least one failure was transient.
+    ``stats`` counts recipients, batches, tokens, delivered and failed
+    tokens, and deactivated tokens.
+    """
+    from account.models import FCMToken, PushNotificationLog
+
+    user_ids = {str(user_id) for user_id in user_ids if user_id}
+    stats = {'recipients': 0, 'batches': 0, 'tokens': 0, 'delivered': 0, 'failed': 0, 'deactivated': 0}
+    if not user_ids:
+        return {}, stats
+
+    token_owner = {
+        token: str(owner)
+        for token, owner in FCMToken.objects.filter(
+            user_id__in=user_ids, is_active=True,
+        ).values_list('token', 'user_id')
+    }
+    if not token_owner:
+        logger.info("Push fan-out '%s': none of %s users has an active FCM token", title, len(user_ids))
+        return {}, stats
+
+    payload = {str(key): str(value) for key, value in (data or {}).items()}
+    invalid_errors = _invalid_token_errors()
+    tokens = list(token_owner)
+    outcomes: Dict[str, Dict[str, Any]] = {
+        owner: {'sent': False, 'message_id': None, 'error': None, 'retryable': False}
+        for owner in token_owner.values()
+    }
+    invalid_tokens = []
+
+    for start in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+        batch = tokens[start:start + FCM_MULTICAST_LIMIT]
+        stats['batches'] += 1
+        try:
+            response = _multicast(batch, title, body, payload, image_url)
+        except Exception as exc:
+            logger.error("Push fan-out batch of %s tokens failed: %s", len(batch), exc)
+            stats['failed'] += len(batch)
+            for token in batch:
+                outcomes[token_owner[token]].update(error=str(exc), retryable=True)
+            continue
+
+        for token, result in zip(batch, response.responses):
+            outcome = outcomes[token_owner[token]]
+            if result.success:
+                stats['delivered'] += 1
+                outcome['sent'] = True
+                outcome['message_id'] = outcome['message_id'] or result.message_id
+                continue
+            stats['failed'] += 1
+            outcome['error'] = str(result.exception)
+            if isinstance(result.exception, invalid_errors):
+                invalid_tokens.append(token)
+            else:
+                outcome['retryable'] = True
+
+    for outcome in outcomes.values():
+        if outcome['sent']:
+            outcome['error'] = None
+            outcome['retryable'] = False
+
+    PushNotificationLog.objects.bulk_create([
+        PushNotificationLog(
+            user_id=owner,
+            title=title,
+            body=body,
+            data=data or {},
+            status='sent' if outcome['sent'] else 'failed',
+            firebase_message_id=outcome['message_id'],
+            error_message=outcome['error'],
+        )
+        for owner, outcome in outcomes.items()
+    ])
+    if invalid_tokens:
+        stats['deactivated'] = FCMToken.objects.filter(token__in=invalid_tokens).update(is_active=False)
+
+    stats['recipients'] = len(outcomes)
+    stats['tokens'] = len(tokens)
+    logger.info(
+        "Push fan-out '%s': recipients=%s batches=%s tokens=%s delivered=%s failed=%s deactivated=%s",
+        title, stats['recipients'], stats['batches'], stats['tokens'],
+        stats['delivered'], stats['failed'], stats['deactivated'],
+    )
+    return outcomes, stats
+
+
+def send_push_to_users(
+    user_ids: Iterable,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, Any]] = None,
+    image_url: Optional[str] = None,
+) -> Dict[str, int]:
+    """deliver_push, returning only the counts."""
+    return deliver_push(user_ids, title, body, data, image_url)[1]
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _fallback_executor
+    if _fallback_executor is None:
+        with _fallback_lock:
+            if _fallback_executor is None:
+                _fallback_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PUSH_FANOUT_FALLBACK_WORKERS', DEFAULT_FANOUT_WORKERS),
+                    thread_name_prefix='push-fanout',
+                )
+    return _fallback_executor
+
+
+def _run_in_pool(user_ids, title, body, data, image_url):
+    def run():
+        try:
+            send_push_to_users(user_ids, title, body, data, image_url)
+        except Exception as exc:
+            logger.error("Push fan-out '%s' failed: %s", title, exc)
+
+    _executor().submit(run)
+
+
+def enqueue_push_fanout(
+    user_ids: Iterable,
+    title: str,
+    body: str,
+    data: Optional[Dict[str, Any]] = None,
+    image_url: Optional[str] = None,
+) -> None:
+    """Schedule send_push_to_users for after the current transaction commits."""
+    user_ids = sorted({str(user_id) for user_id in user_ids if user_id})
+    if not user_ids:
+        return
+    data = {str(key): str(value) for key, value in (data or {}).items()}
+
+    def dispatch():
+        try:
+            from helpers.tasks import send_push_fanout
+
+            send_push_fanout.delay(user_ids, title, body, data, image_url)
+        except Exception as exc:
+            logger.warning("Could not queue push fan-out '%s', sending in-process: %s", title, exc)
+            _run_in_pool(user_ids, title, body, data, image_url)
+
+    transaction.on_commit(dispatch)
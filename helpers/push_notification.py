@@ -73,11 +73,18 @@ class NotificationHelper:
         body: str,
         data: Optional[Dict[str, Any]] = None,
         image_url: Optional[str] = None,
-        callback: Optional[Callable] = None
-    ) -> threading.Thread:
+        callback: Optional[Callable] = None,
+        dedup_key: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+    ):
         """
         Send notification to a user asynchronously
         
+        Without a callback the push is queued in the notification outbox
+        (helpers/notification_outbox.py) as part of the current transaction
+        and delivered by Celery; only callers that need the FCM result in a
+        callback still get a sending thread.
+        
         Args:
             user: User object, user ID, or username
             title: Notification title
@@ -85,10 +92,25 @@ class NotificationHelper:
             data: Additional data payload
             image_url: Optional image URL
             callback: Optional callback function to execute after sending
+            dedup_key: Drop the push if one with this key was already queued for the user
+            coalesce_key: Replace a still-pending push with this key for the user
         
         Returns:
-            threading.Thread: The thread handling the notification
+            The PushNotificationOutbox row (None if deduplicated, coalesced or
+            the user was not found), or the sending thread when a callback is given
         """
+        if callback is None:
+            from helpers.notification_outbox import queue_push
+
+            user_obj = user if isinstance(user, User) else self._resolve_user(user)
+            if not user_obj:
+                logger.error(f"User not found: {user}")
+                return None
+            return queue_push(
+                user_obj, title, body, data, image_url,
+                dedup_key=dedup_key, coalesce_key=coalesce_key,
+            )
+
         def _send_notification():
             try:
                 # Resolve user if needed
@@ -185,8 +207,10 @@ class NotificationHelper:
         body: str,
         data: Optional[Dict[str, Any]] = None,
         image_url: Optional[str] = None,
-        callback: Optional[Callable] = None
-    ) -> List[threading.Thread]:
+        callback: Optional[Callable] = None,
+        dedup_key: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+    ) -> List:
         """
         Send notifications to multiple users asynchronously
         
@@ -197,9 +221,12 @@ class NotificationHelper:
             data: Additional data payload
             image_url: Optional image URL
             callback: Optional callback function to execute after each send
+            dedup_key: See send_to_user_async
+            coalesce_key: See send_to_user_async
         
         Returns:
-            List[threading.Thread]: List of threads handling the notifications
+            List of send_to_user_async results (outbox rows, or threads when a
+            callback is given)
         """
         threads = []
         
@@ -210,7 +237,9 @@ class NotificationHelper:
                 body=body,
                 data=data,
                 image_url=image_url,
-                callback=callback
+                callback=callback,
+                dedup_key=dedup_key,
+                coalesce_key=coalesce_key,
             )
             threads.append(thread)
         
@@ -273,11 +302,19 @@ class NotificationHelper:
         body: str,
         data: Optional[Dict[str, Any]] = None,
         image_url: Optional[str] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        dedup_key: Optional[str] = None,
+        coalesce_key: Optional[str] = None,
+        wait: bool = False,
     ) -> Dict[str, Any]:
         """
-        Send notifications to multiple users using ThreadPoolExecutor
-        This method waits for all notifications to complete and returns results
+        Send notifications to multiple users
+        
+        By default the pushes are queued in the notification outbox and this
+        returns immediately; ``success_count`` is then the number queued and
+        ``failure_count`` the users dropped (not found, deduplicated or
+        coalesced). ``wait=True`` keeps the old behaviour of sending on the
+        executor and waiting for every result (used by test commands).
         
         Args:
             users: List of User objects, user IDs, or usernames
@@ -285,11 +322,31 @@ class NotificationHelper:
             body: Notification body
             data: Additional data payload
             image_url: Optional image URL
-            timeout: Timeout in seconds for all operations
+            timeout: Timeout in seconds for all operations (wait=True only)
+            dedup_key: See send_to_user_async
+            coalesce_key: See send_to_user_async
+            wait: Send now and wait for the FCM results
         
         Returns:
             Dict with success/failure counts and results
         """
+        if not wait:
+            from helpers.notification_outbox import queue_push_to_users
+
+            users = list(users)
+            resolved = [user if isinstance(user, User) else self._resolve_user(user) for user in users]
+            queued = queue_push_to_users(
+                [user for user in resolved if user], title, body, data, image_url,
+                dedup_key=dedup_key, coalesce_key=coalesce_key,
+            )
+            return {
+                "total": len(users),
+                "queued": queued,
+                "success_count": queued,
+                "failure_count": len(users) - queued,
+                "results": [],
+            }
+
         def send_to_single_user(user):
             try:
                 user_obj = self._resolve_user(user)
@@ -522,7 +579,8 @@ def send_order_payment_success_notification(
             "type": "payment_success",
             "delivery_code": delivery_code or "",
         },
-        callback=callback
+        callback=callback,
+        dedup_key=f"payment_success:{order_id}",
     )
 
 def send_login_notification(user: Union[User, int, str], callback: Optional[Callable] = None) -> threading.Thread:
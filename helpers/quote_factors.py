@@ -0,0 +1,200 @@
+"""
+Concurrent gathering of the external inputs to a delivery quote.
+
+calculate_delivery_fee used to call the Routes API (6 s timeout, up to two
+attempts), the traffic lookup, the weather lookup and the rider-availability
+lookup strictly one after another, so a slow upstream made checkout wait for
+the *sum* of several timeouts. gather_factors instead:
+
+- submits the sources to one shared, bounded thread pool, at most
+  QUOTE_FACTOR_MAX_PER_QUOTE at a time, so a batch quote (one traffic lookup
+  per vendor) cannot take every worker from the single quotes behind it;
+- waits for each source up to its own timeout, all capped by one overall
+  deadline, so a quote is bounded by the slowest single source;
+- substitutes the source's neutral fallback when it times out, raises or
+  returns None (a late result is simply discarded);
+- records per-source latency, timeout, error and fallback counts, exposed via
+  factor_latency_stats().
+
+Sources must not rely on the caller's database transaction: they run on pool
+threads, each with its own connection. Each call recycles that connection as
+Django does between requests (close_old_connections: only once it is broken
+or older than CONN_MAX_AGE) instead of closing it after every source.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE_SECONDS = 8.0
+DEFAULT_SOURCE_TIMEOUT_SECONDS = 5.0
+QUOTE_FACTOR_MAX_WORKERS = 16
+DEFAULT_MAX_PER_QUOTE = 8
+
+
+class FactorLatencyStats:
+    """Thread-safe per-source counters: calls, latency, timeouts, errors, fallbacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict[str, float]] = {}
+
+    def _entry(self, name: str) -> Dict[str, float]:
+        return self._sources.setdefault(name, {
+            "calls": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "timeouts": 0, "errors": 0, "fallbacks": 0,
+        })
+
+    def record_latency(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            entry = self._entry(name)
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def record_outcome(self, name: str, outcome: str) -> None:
+        with self._lock:
+            self._entry(name)[outcome] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sources.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            result = {}
+            for name, entry in self._sources.items():
+                calls = entry["calls"]
+                result[name] = dict(
+                    entry,
+                    total_ms=round(entry["total_ms"], 2),
+                    max_ms=round(entry["max_ms"], 2),
+                    avg_ms=round(entry["total_ms"] / calls, 2) if calls else 0.0,
+                )
+            return result
+
+
+_stats = FactorLatencyStats()
+_executor = ThreadPoolExecutor(max_workers=QUOTE_FACTOR_MAX_WORKERS, thread_name_prefix="quote-factor")
+
+
+def factor_latency_stats() -> Dict[str, Dict[str, float]]:
+    return _stats.snapshot()
+
+
+def _run_source(name: str, func: Callable, args: Tuple) -> Any:
+    close_old_connections()
+    started = time.monotonic()
+    try:
+        return func(*args)
+    finally:
+        # Recorded even when the caller has already given up on this source,
+        # so slow upstreams show up in max_ms rather than only as timeouts.
+        _stats.record_latency(name, (time.monotonic() - started) * 1000)
+        close_old_connections()
+
+
+class _FanOut:
+    """
+    Runs one quote's sources on the shared pool, at most ``limit`` at a time.
+
+    Each source gets a Future up front; the next queued source is submitted
+    when a running one finishes. A queued source that is past its deadline
+    (``expires``, in time.monotonic() terms) is cancelled without running.
+    """
+
+    def __init__(self, sources, limit: int, expires: Dict[str, float]):
+        self._sources = sources
+        self._expires = expires
+        self._queue = deque(sources)
+        self._lock = threading.Lock()
+        self.futures: Dict[str, Future] = {name: Future() for name in sources}
+        for _ in range(max(1, limit)):
+            self._submit_next()
+
+    def _submit_next(self) -> None:
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return
+                name = self._queue.popleft()
+            future = self.futures[name]
+            if time.monotonic() >= self._expires[name]:
+                future.cancel()
+            if future.set_running_or_notify_cancel():
+                break
+        func, args, _fallback = self._sources[name]
+        _executor.submit(_run_source, name, func, args).add_done_callback(
+            lambda done: self._finish(future, done)
+        )
+
+    def _finish(self, future: Future, done: Future) -> None:
+        exc = done.exception()
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(done.result())
+        self._submit_next()
+
+
+def gather_factors(
+    sources: Dict[str, Tuple[Callable, Tuple, Callable[[], Any]]],
+    deadline_seconds: float = DEFAULT_DEADLINE_SECONDS,
+    timeouts: Optional[Dict[str, float]] = None,
+    max_parallel: Optional[int] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Run ``{name: (func, args, fallback)}`` concurrently, ``max_parallel`` at a
+    time (default QUOTE_FACTOR_MAX_PER_QUOTE). Timeouts count from the call,
+    so a source still queued when its time is up falls back without running.
+
+    Returns ``(results, meta)``: results maps each name to the source's value
+    or ``fallback()``; meta holds ``timings_ms`` per source (time until the
+    value was available to the caller) and the list of ``fallbacks`` used.
+    """
+    timeouts = timeouts or {}
+    started = time.monotonic()
+    deadline = started + deadline_seconds
+
+    if max_parallel is None:
+        max_parallel = getattr(settings, 'QUOTE_FACTOR_MAX_PER_QUOTE', DEFAULT_MAX_PER_QUOTE)
+    source_deadlines = {
+        name: min(deadline, started + timeouts.get(name, DEFAULT_SOURCE_TIMEOUT_SECONDS))
+        for name in sources
+    }
+    futures = _FanOut(sources, max_parallel, source_deadlines).futures
+
+    results: Dict[str, Any] = {}
+    timings_ms: Dict[str, float] = {}
+    fallbacks = []
+    for name, future in futures.items():
+        outcome = None
+        try:
+            value = future.result(timeout=max(0.0, source_deadlines[name] - time.monotonic()))
+            if value is None:
+                outcome = "fallbacks"
+        except (FutureTimeoutError, CancelledError):
+            future.cancel()
+            outcome = "timeouts"
+            logger.warning("Quote factor '%s' timed out; using fallback", name)
+        except Exception as exc:
+            outcome = "errors"
+            logger.warning("Quote factor '%s' failed: %s; using fallback", name, exc)
+
+        if outcome is not None:
+            _stats.record_outcome(name, outcome)
+            fallbacks.append(name)
+            value = sources[name][2]()
+
+        results[name] = value
+        timings_ms[name] = round((time.monotonic() - started) * 1000, 2)
+
+    return results, {"timings_ms": timings_ms, "fallbacks": fallbacks}
@@ -0,0 +1,207 @@
+"""
+Shared Redis client for the geo helpers and other raw Redis users.
+
+Every geo call used to build a fresh ``redis.Redis.from_url(...)`` and PING it,
+which meant a new TCP connection plus an extra round-trip per request. This
+module hands out one process-wide client instead:
+
+- Connection pool: when the default cache is django-redis we reuse its pool via
+  ``get_redis_connection("default")``, so the cache and the geo helpers share
+  the same sockets. Otherwise a pooled client is built once from the cache URL.
+- Health checking: redis-py re-validates idle pooled connections every
+  ``REDIS_HEALTH_CHECK_INTERVAL`` seconds, so we never PING on the hot path.
+- Circuit breaker: callers report failures with ``record_redis_failure``. After
+  ``REDIS_CIRCUIT_FAILURE_THRESHOLD`` failures inside the failure window the
+  circuit opens and ``get_redis_client`` returns None immediately, so callers
+  go straight to their Haversine/DB fallback instead of waiting on the connect
+  timeout. After ``REDIS_CIRCUIT_RESET_SECONDS`` a single PING probe decides
+  whether to close the circuit again.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_SOCKET_CONNECT_TIMEOUT = 2
+REDIS_SOCKET_TIMEOUT = 2
+REDIS_HEALTH_CHECK_INTERVAL = 30
+REDIS_MAX_CONNECTIONS = 50
+
+REDIS_CIRCUIT_FAILURE_THRESHOLD = 3
+REDIS_CIRCUIT_FAILURE_WINDOW_SECONDS = 10
+REDIS_CIRCUIT_RESET_SECONDS = 30
+
+
+class RedisCircuitBreaker:
+    """
+    Thread-safe closed/open/half-open breaker around the shared Redis client.
+
+    closed    -> Redis is used normally; failures are counted in a window.
+    open      -> Redis is skipped until the reset timeout elapses.
+    half-open -> one caller gets to probe Redis; success closes the circuit,
+                 failure re-opens it for another reset period.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: int = REDIS_CIRCUIT_FAILURE_THRESHOLD,
+        failure_window_seconds: float = REDIS_CIRCUIT_FAILURE_WINDOW_SECONDS,
+        reset_seconds: float = REDIS_CIRCUIT_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.failure_window_seconds = failure_window_seconds
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures: list[float] = []
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if the caller may use Redis right now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                # Let exactly one caller through to probe.
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Redis circuit closed after a successful probe")
+            self._state = self.CLOSED
+            self._failures = []
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._state == self.HALF_OPEN:
+                self._trip(now)
+                return
+
+            window_start = now - self.failure_window_seconds
+            self._failures = [ts for ts in self._failures if ts >= window_start]
+            self._failures.append(now)
+            if self._state == self.CLOSED and len(self._failures) >= self.failure_threshold:
+                self._trip(now)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = []
+            self._opened_at = 0.0
+
+    def _trip(self, now: float) -> None:
+        self._state = self.OPEN
+        self._opened_at = now
+        self._failures = []
+        logger.warning(
+            "Redis circuit opened; skipping Redis for %ss", self.reset_seconds
+        )
+
+
+circuit_breaker = RedisCircuitBreaker()
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _cache_uses_django_redis() -> bool:
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    return backend.startswith("django_redis.")
+
+
+def _build_client():
+    """Create the process-wide client, preferring django-redis's own pool."""
+    if _cache_uses_django_redis():
+        from django_redis import get_redis_connection
+
+        return get_redis_connection("default")
+
+    location = settings.CACHES.get("default", {}).get("LOCATION")
+    if not isinstance(location, str) or not location.startswith(("redis://", "rediss://", "unix://")):
+        return None
+
+    import redis as redis_lib
+
+    pool = redis_lib.ConnectionPool.from_url(
+        location,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+    )
+    return redis_lib.Redis(connection_pool=pool)
+
+
+def _shared_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def get_redis_client():
+    """
+    Return the shared pooled redis.Redis client, or None.
+
+    None means Redis is not configured or the circuit is open; callers should
+    use their fallback path. Callers that hit a Redis error should call
+    ``record_redis_failure`` so a dead server trips the breaker quickly.
+    """
+    if not circuit_breaker.allow_request():
+        return None
+
+    try:
+        client = _shared_client()
+    except Exception as exc:
+        logger.warning("Could not create shared Redis client: %s", exc)
+        circuit_breaker.record_failure()
+        return None
+
+    if client is None:
+        return None
+
+    if circuit_breaker.state == RedisCircuitBreaker.HALF_OPEN:
+        try:
+            client.ping()
+        except Exception as exc:
+            logger.warning("Redis health probe failed: %s", exc)
+            circuit_breaker.record_failure()
+            return None
+        circuit_breaker.record_success()
+
+    return client
+
+
+def record_redis_failure(exc=None) -> None:
+    """Report a Redis command failure to the circuit breaker."""
+    if exc is not None:
+        logger.debug("Redis failure reported: %s", exc)
+    circuit_breaker.record_failure()
+
+
+def reset_redis_client() -> None:
+    """Drop the cached client and close the circuit (tests, fork hooks)."""
+    global _client
+    with _client_lock:
+        _client = None
+    circuit_breaker.reset()
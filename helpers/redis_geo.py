@@ -10,11 +10,14 @@ Key design decisions:
                            addition to the endpoint's browse/search radius
 - Fallback: if Redis is unreachable, falls back to the shared Haversine helper
             so the app never goes dark
+- Client: the pooled, circuit-broken client from helpers.redis_client, so a
+          Redis outage fails fast instead of paying a connect timeout per call
 """
 
 import logging
 from typing import Optional
-from django.conf import settings
+
+from helpers.redis_client import get_redis_client, record_redis_failure
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,15 @@ GEO_KEY = "vendors:geo"
 GEO_INDEX_VALIDATION_KEY = "vendors:geo:validated"
 GEO_INDEX_VALIDATION_TTL_SECONDS = 5 * 60
 
+# Incremental sync bookkeeping. Every vendor geo mutation bumps the version and
+# appends "<version>:<op>:<vendor_id>" to the change log (scored by version).
+# The watermark is the newest Vendor.updated_at that has reached the index, so
+# a database row saved without reaching Redis shows up as updated_at > watermark.
+GEO_INDEX_VERSION_KEY = "vendors:geo:version"
+GEO_INDEX_CHANGELOG_KEY = "vendors:geo:changelog"
+GEO_INDEX_WATERMARK_KEY = "vendors:geo:watermark"
+GEO_INDEX_CHANGELOG_MAX_ENTRIES = 1000
+
 # Browsing radius: vendors shown on home feed, hot-picks, featured, all-vendors.
 # 10km matches what Chowdeck/Bolt Food use for Nigerian city density —
 # tight enough to be relevant, wide enough to cover a full city.
@@ -31,42 +43,74 @@ BROWSE_RADIUS_KM = 10
 # We let the search query itself be the relevance filter.
 SEARCH_RADIUS_KM = 500
 
-
-def _get_redis_client():
-    """Return a raw redis.Redis client from the Django cache URL, or None."""
-    try:
-        import redis as redis_lib
-        location = settings.CACHES["default"].get("LOCATION")
-        if not location:
-            return None
-        client = redis_lib.Redis.from_url(location, socket_connect_timeout=2)
-        client.ping()
-        return client
-    except Exception:
-        return None
+# Apply one mutation, bump the version, log it and advance the watermark in a
+# single atomic round-trip.
+#   KEYS: geo, version, changelog, watermark
+#   ARGV: op ('add'|'remove'|'reconcile'), member, lon, lat, updated_ts, max_log
+_RECORD_MUTATION_LUA = """
+if ARGV[1] == 'add' then
+  redis.call('GEOADD', KEYS[1], ARGV[3], ARGV[4], ARGV[2])
+elseif ARGV[1] == 'remove' then
+  redis.call('ZREM', KEYS[1], ARGV[2])
+end
+local version = redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[3], version, version .. ':' .. ARGV[1] .. ':' .. ARGV[2])
+redis.call('ZREMRANGEBYRANK', KEYS[3], 0, -(tonumber(ARGV[6]) + 1))
+if ARGV[5] ~= '' then
+  local current = tonumber(redis.call('GET', KEYS[4]) or '0')
+  if tonumber(ARGV[5]) > current then
+    redis.call('SET', KEYS[4], ARGV[5])
+  end
+end
+return version
+"""
 
 
-def _eligible_geo_vendors():
-    """Return every vendor that should have coordinates in the geo index."""
+def _eligible_geo_vendor_queryset():
+    """Vendors that should have coordinates in the geo index."""
     from account.models import Vendor
 
-    return list(
-        Vendor.objects.filter(
-            approval_status='approved',
-            is_active=True,
-            location_latitude__isnull=False,
-            location_longitude__isnull=False,
-        ).exclude(
-            location_latitude='',
-            location_longitude='',
-        )
+    return Vendor.objects.filter(
+        approval_status='approved',
+        is_active=True,
+        location_latitude__isnull=False,
+        location_longitude__isnull=False,
+    ).exclude(
+        location_latitude='',
+        location_longitude='',
     )
 
 
+def _eligible_geo_vendors():
+    """Return every vendor that should have coordinates in the geo index."""
+    return list(_eligible_geo_vendor_queryset())
+
+
 def _decode_member(member) -> str:
     return member.decode() if isinstance(member, bytes) else str(member)
 
 
+def _timestamp(value) -> float:
+    return value.timestamp() if value is not None else 0.0
+
+
+def _record_mutation(r, op: str, member: str = "", lon="", lat="", updated_at=None) -> int:
+    return int(r.eval(
+        _RECORD_MUTATION_LUA,
+        4,
+        GEO_KEY,
+        GEO_INDEX_VERSION_KEY,
+        GEO_INDEX_CHANGELOG_KEY,
+        GEO_INDEX_WATERMARK_KEY,
+        op,
+        member,
+        lon,
+        lat,
+        _timestamp(updated_at) if updated_at is not None else "",
+        GEO_INDEX_CHANGELOG_MAX_ENTRIES,
+    ))
+
+
 def _rebuild_geo_index(r, vendors=None) -> int:
     """
     Repopulate the geo index from the database.
@@ -84,6 +128,7 @@ def _rebuild_geo_index(r, vendors=None) -> int:
     # Delete and repopulate in one pipeline so stale members are removed too.
     pipe.delete(GEO_KEY)
     added = 0
+    watermark = 0.0
     for vendor in vendors:
         try:
             lon = float(vendor.location_longitude)
@@ -91,7 +136,9 @@ def _rebuild_geo_index(r, vendors=None) -> int:
         except (TypeError, ValueError):
             continue
         pipe.execute_command("GEOADD", GEO_KEY, lon, lat, str(vendor.id))
+        watermark = max(watermark, _timestamp(getattr(vendor, 'updated_at', None)))
         added += 1
+    pipe.set(GEO_INDEX_WATERMARK_KEY, watermark)
 
     # Execute even when there are no eligible vendors so a stale index is cleared.
     pipe.execute()
@@ -99,27 +146,56 @@ def _rebuild_geo_index(r, vendors=None) -> int:
     return added
 
 
+def _enqueue_geo_reconciliation() -> None:
+    try:
+        from vendor.tasks import reconcile_vendor_geo_index
+        reconcile_vendor_geo_index.delay()
+    except Exception as exc:
+        logger.warning("Could not enqueue vendors:geo reconciliation: %s", exc)
+
+
+def _index_matches_database(r) -> bool:
+    """
+    Cheap drift check: compare member count and the updated_at watermark.
+
+    One aggregate query plus one Redis pipeline, independent of how many
+    vendors exist. A count mismatch means an add/remove was lost; a vendor
+    updated after the watermark means a save never reached the index.
+    """
+    from django.db.models import Count, Max
+
+    db_state = _eligible_geo_vendor_queryset().aggregate(
+        count=Count('id'),
+        latest=Max('updated_at'),
+    )
+    pipe = r.pipeline(transaction=False)
+    pipe.zcard(GEO_KEY)
+    pipe.get(GEO_INDEX_WATERMARK_KEY)
+    indexed_count, watermark = pipe.execute()
+
+    if int(indexed_count or 0) != db_state['count']:
+        return False
+    return _timestamp(db_state['latest']) <= float(watermark or 0)
+
+
 def _ensure_geo_index(r) -> bool:
     """
-    Validate Redis membership against the database and repair it when needed.
+    Make sure the index exists and schedule repair when it has drifted.
 
-    Validation is cached briefly to keep the normal request path fast. Vendor
-    save/remove operations invalidate the marker, so ordinary data changes are
-    checked on the very next discovery request.
+    Vendor saves/removals update the index in place (see geo_add_vendor), so
+    the hot path only needs the cheap count/watermark comparison once per
+    validation window. Full ZRANGE-vs-DB reconciliation runs in the
+    reconcile_vendor_geo_index Celery task. The only inline rebuild left is
+    when the key has vanished altogether (Redis restart/eviction).
     """
     try:
-        if r.exists(GEO_KEY) and r.get(GEO_INDEX_VALIDATION_KEY):
+        if not r.exists(GEO_KEY):
+            _rebuild_geo_index(r)
+        elif r.get(GEO_INDEX_VALIDATION_KEY):
             return True
-
-        vendors = _eligible_geo_vendors()
-        expected_ids = {str(vendor.id) for vendor in vendors}
-        indexed_ids = {
-            _decode_member(member)
-            for member in r.zrange(GEO_KEY, 0, -1)
-        }
-
-        if indexed_ids != expected_ids:
-            _rebuild_geo_index(r, vendors=vendors)
+        elif not _index_matches_database(r):
+            logger.warning("vendors:geo drifted from the database; scheduling reconciliation")
+            _enqueue_geo_reconciliation()
 
         r.set(
             GEO_INDEX_VALIDATION_KEY,
@@ -128,10 +204,101 @@ def _ensure_geo_index(r) -> bool:
         )
         return True
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("Redis geo index validation/rebuild failed: %s", exc)
         return False
 
 
+def reconcile_geo_index(r=None) -> Optional[dict]:
+    """
+    Full ZRANGE-vs-DB reconciliation. Runs in the background job only.
+
+    Stale members are removed and every eligible vendor is re-added (GEOADD
+    overwrites moved coordinates) in one transaction, so readers never see a
+    half-built index. Returns a summary, or None if Redis is unavailable.
+    """
+    r = r or get_redis_client()
+    if r is None:
+        return None
+
+    vendors = _eligible_geo_vendors()
+    try:
+        indexed_ids = {_decode_member(member) for member in r.zrange(GEO_KEY, 0, -1)}
+        expected_ids = set()
+        watermark = 0.0
+
+        pipe = r.pipeline()
+        for vendor in vendors:
+            try:
+                lon = float(vendor.location_longitude)
+                lat = float(vendor.location_latitude)
+            except (TypeError, ValueError):
+                continue
+            expected_ids.add(str(vendor.id))
+            pipe.execute_command("GEOADD", GEO_KEY, lon, lat, str(vendor.id))
+            watermark = max(watermark, _timestamp(vendor.updated_at))
+
+        stale_ids = indexed_ids - expected_ids
+        if stale_ids:
+            pipe.zrem(GEO_KEY, *stale_ids)
+        pipe.set(GEO_INDEX_WATERMARK_KEY, watermark)
+        pipe.set(GEO_INDEX_VALIDATION_KEY, "1", ex=GEO_INDEX_VALIDATION_TTL_SECONDS)
+        pipe.execute()
+
+        version = _record_mutation(r, "reconcile")
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("vendors:geo reconciliation failed: %s", exc)
+        return None
+
+    summary = {
+        "indexed": len(expected_ids),
+        "added": len(expected_ids - indexed_ids),
+        "removed": len(stale_ids),
+        "version": version,
+    }
+    logger.info("Reconciled vendors:geo: %s", summary)
+    return summary
+
+
+def geo_index_version(r=None) -> Optional[int]:
+    """Current change-log version of the vendor geo index, or None."""
+    r = r or get_redis_client()
+    if r is None:
+        return None
+    try:
+        return int(r.get(GEO_INDEX_VERSION_KEY) or 0)
+    except Exception as exc:
+        record_redis_failure(exc)
+        return None
+
+
+def geo_changes_since(version: int, r=None) -> Optional[list[tuple[int, str, str]]]:
+    """
+    Return [(version, op, vendor_id), ...] logged after ``version``.
+
+    Returns None if Redis is unavailable or the log has been trimmed past
+    ``version`` (the caller must then resync from scratch).
+    """
+    r = r or get_redis_client()
+    if r is None:
+        return None
+    try:
+        oldest = r.zrange(GEO_INDEX_CHANGELOG_KEY, 0, 0, withscores=True)
+        if oldest and int(oldest[0][1]) > version + 1:
+            return None
+        entries = r.zrangebyscore(GEO_INDEX_CHANGELOG_KEY, f"({version}", "+inf")
+    except Exception as exc:
+        record_redis_failure(exc)
+        return None
+
+    changes = []
+    for entry in entries:
+        entry_version, op, vendor_id = _decode_member(entry).split(":", 2)
+        changes.append((int(entry_version), op, vendor_id))
+    return changes
+
+
 def geo_nearby_vendor_ids(
     user_lat: float,
     user_lon: float,
@@ -143,7 +310,7 @@ def geo_nearby_vendor_ids(
     Returns a list of (vendor_id_str, distance_km) tuples sorted nearest-first,
     or None if Redis is unavailable (caller should fall back to Haversine).
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return None
 
@@ -168,6 +335,7 @@ def geo_nearby_vendor_ids(
         # raw: [(b'uuid', distance_float), ...]
         return [(member.decode(), float(dist)) for member, dist in raw]
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("Redis geo query failed, will fall back to Haversine: %s", exc)
         return None
 
@@ -176,22 +344,28 @@ def geo_add_vendor(vendor) -> bool:
     """
     Add or update a single vendor in the Redis geo index.
     Safe to call on vendor save — no-ops if Redis is down.
+
+    The mutation is versioned and logged atomically, so the index stays valid
+    without forcing the next discovery request to re-check it.
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return False
 
     try:
         lat = float(vendor.location_latitude)
         lon = float(vendor.location_longitude)
-        r.execute_command("GEOADD", GEO_KEY, lon, lat, str(vendor.id))
-        r.delete(GEO_INDEX_VALIDATION_KEY)
+        _record_mutation(
+            r,
+            "add",
+            str(vendor.id),
+            lon,
+            lat,
+            updated_at=getattr(vendor, 'updated_at', None),
+        )
         return True
     except Exception as exc:
-        try:
-            r.delete(GEO_INDEX_VALIDATION_KEY)
-        except Exception:
-            pass
+        record_redis_failure(exc)
         logger.warning("geo_add_vendor failed for %s: %s", vendor.id, exc)
         return False
 
@@ -200,19 +374,15 @@ def geo_remove_vendor(vendor_id: str) -> bool:
     """
     Remove a vendor from the Redis geo index (called on deactivation / rejection).
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return False
 
     try:
-        r.zrem(GEO_KEY, str(vendor_id))
-        r.delete(GEO_INDEX_VALIDATION_KEY)
+        _record_mutation(r, "remove", str(vendor_id))
         return True
     except Exception as exc:
-        try:
-            r.delete(GEO_INDEX_VALIDATION_KEY)
-        except Exception:
-            pass
+        record_redis_failure(exc)
         logger.warning("geo_remove_vendor failed for %s: %s", vendor_id, exc)
         return False
 
@@ -0,0 +1,162 @@
+"""
+Redis Geo index of orders waiting for a rider.
+
+RiderViewSet.available_order used to load every unassigned order in the
+system with its items, products and images, then check each one against the
+rider (declined lookup plus a distance computation). Instead:
+
+- ``orders:open:geo`` holds every open order (OPEN_ORDER_STATUSES, no rider)
+  at its pickup vendor's coordinates, and ``orders:open:created`` its
+  creation time, which decides the order's dispatch radius.
+- product/signals.py keeps both in step on every Order save once the
+  transaction commits; rider.rebuild_open_order_index rebuilds them from
+  the database periodically to catch queryset .update() calls.
+- nearby_open_orders runs one GEOSEARCH around the rider (out to the widest
+  dispatch radius) and returns the creation time alongside each hit, so the
+  caller can apply the age-based radius without touching the database.
+
+Redis is only a candidate filter: the endpoint re-checks status and rider
+in SQL when it hydrates the page, so an entry that lags behind the database
+is never shown.
+"""
+
+import logging
+import time
+from typing import Iterable, Optional
+
+from helpers.redis_client import get_redis_client, record_redis_failure
+
+logger = logging.getLogger(__name__)
+
+OPEN_ORDER_GEO_KEY = "orders:open:geo"
+OPEN_ORDER_CREATED_KEY = "orders:open:created"
+OPEN_ORDER_STATUSES = ('looking_for_rider', 'awaiting_rider')
+
+# Returns a flat [member, distance, created_ts, ...] list, nearest first.
+_OPEN_ORDER_SEARCH_LUA = """
+local hits = redis.call('GEOSEARCH', KEYS[1], 'FROMLONLAT', ARGV[1], ARGV[2],
+                        'BYRADIUS', ARGV[3], 'km', 'ASC', 'WITHDIST')
+local result = {}
+for _, hit in ipairs(hits) do
+    result[#result + 1] = hit[1]
+    result[#result + 1] = hit[2]
+    result[#result + 1] = redis.call('ZSCORE', KEYS[2], hit[1]) or '0'
+end
+return result
+"""
+
+
+def is_open_order(order) -> bool:
+    return order.rider_id is None and order.status in OPEN_ORDER_STATUSES
+
+
+def _pickup_coordinates(order):
+    vendor = order.vendor
+    if vendor is None or vendor.location_latitude is None or vendor.location_longitude is None:
+        return None
+    try:
+        return float(vendor.location_latitude), float(vendor.location_longitude)
+    except (TypeError, ValueError):
+        return None
+
+
+def _created_ts(order) -> int:
+    return int(order.created_at.timestamp()) if order.created_at else int(time.time())
+
+
+def sync_open_order(order) -> bool:
+    """Add the order to the index if it is waiting for a rider, otherwise remove it."""
+    coordinates = _pickup_coordinates(order) if is_open_order(order) else None
+    if coordinates is None:
+        return remove_open_order(order.id)
+
+    r = get_redis_client()
+    if r is None:
+        return False
+
+    try:
+        pipe = r.pipeline()
+        pipe.execute_command("GEOADD", OPEN_ORDER_GEO_KEY, coordinates[1], coordinates[0], str(order.id))
+        pipe.zadd(OPEN_ORDER_CREATED_KEY, {str(order.id): _created_ts(order)})
+        pipe.execute()
+        return True
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("sync_open_order failed for %s: %s", order.id, exc)
+        return False
+
+
+def remove_open_order(order_id) -> bool:
+    r = get_redis_client()
+    if r is None:
+        return False
+
+    try:
+        pipe = r.pipeline()
+        pipe.zrem(OPEN_ORDER_GEO_KEY, str(order_id))
+        pipe.zrem(OPEN_ORDER_CREATED_KEY, str(order_id))
+        pipe.execute()
+        return True
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("remove_open_order failed for %s: %s", order_id, exc)
+        return False
+
+
+def nearby_open_orders(latitude: float, longitude: float,
+                       radius_km: float) -> Optional[list[tuple[str, float, int]]]:
+    """
+    ``(order_id, distance_km, created_ts)`` for indexed orders within
+    ``radius_km``, nearest first, or None if Redis is unavailable.
+    """
+    r = get_redis_client()
+    if r is None:
+        return None
+
+    try:
+        search = r.register_script(_OPEN_ORDER_SEARCH_LUA)
+        raw = search(
+            keys=[OPEN_ORDER_GEO_KEY, OPEN_ORDER_CREATED_KEY],
+            args=[longitude, latitude, radius_km],
+        )
+        hits = []
+        for member, dist, created in zip(raw[::3], raw[1::3], raw[2::3]):
+            order_id = member.decode() if isinstance(member, bytes) else str(member)
+            hits.append((order_id, float(dist), int(float(created))))
+        return hits
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("Open order geo query failed, will fall back to DB scan: %s", exc)
+        return None
+
+
+def rebuild_open_order_index(orders: Iterable) -> tuple[int, int]:
+    """
+    Replace the index with ``orders`` (open orders with vendor selected).
+
+    Returns (indexed_count, skipped_count).
+    """
+    r = get_redis_client()
+    if r is None:
+        return 0, 0
+
+    indexed = 0
+    skipped = 0
+    try:
+        pipe = r.pipeline()
+        pipe.delete(OPEN_ORDER_GEO_KEY)
+        pipe.delete(OPEN_ORDER_CREATED_KEY)
+        for order in orders:
+            coordinates = _pickup_coordinates(order) if is_open_order(order) else None
+            if coordinates is None:
+                skipped += 1
+                continue
+            pipe.execute_command("GEOADD", OPEN_ORDER_GEO_KEY, coordinates[1], coordinates[0], str(order.id))
+            pipe.zadd(OPEN_ORDER_CREATED_KEY, {str(order.id): _created_ts(order)})
+            indexed += 1
+        pipe.execute()
+        return indexed, skipped
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("rebuild_open_order_index failed: %s", exc)
+        return 0, 0
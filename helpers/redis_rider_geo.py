@@ -10,7 +10,7 @@ import logging
 import time
 from typing import Iterable, Optional
 
-from helpers.redis_geo import _get_redis_client
+from helpers.redis_client import get_redis_client, record_redis_failure
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +32,7 @@ def geo_add_rider(rider) -> bool:
     if latitude is None or longitude is None:
         return False
 
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return False
 
@@ -44,6 +44,7 @@ def geo_add_rider(rider) -> bool:
         pipe.execute()
         return True
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("geo_add_rider failed for %s: %s", rider.id, exc)
         return False
 
@@ -52,7 +53,7 @@ def geo_remove_rider(rider_id) -> bool:
     """
     Remove a rider from the Redis geo index.
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return False
 
@@ -63,6 +64,7 @@ def geo_remove_rider(rider_id) -> bool:
         pipe.execute()
         return True
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("geo_remove_rider failed for %s: %s", rider_id, exc)
         return False
 
@@ -71,7 +73,7 @@ def cleanup_stale_riders(max_age_seconds: int = RIDER_GEO_FRESHNESS_SECONDS) ->
     """
     Remove stale riders from the geo index using the Redis freshness sorted set.
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return 0
 
@@ -90,49 +92,68 @@ def cleanup_stale_riders(max_age_seconds: int = RIDER_GEO_FRESHNESS_SECONDS) ->
         pipe.execute()
         return len(stale_rider_ids)
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("cleanup_stale_riders failed: %s", exc)
         return 0
 
 
+# One round-trip: GEOSEARCH out to the widest band, keeping only members whose
+# freshness score is recent enough. Returns a flat [member, distance, ...] list.
+_FRESH_GEOSEARCH_LUA = """
+local hits = redis.call('GEOSEARCH', KEYS[1], 'FROMLONLAT', ARGV[1], ARGV[2],
+                        'BYRADIUS', ARGV[3], 'km', 'ASC', 'WITHDIST')
+local fresh_after = tonumber(ARGV[4])
+local result = {}
+for _, hit in ipairs(hits) do
+    local seen_at = redis.call('ZSCORE', KEYS[2], hit[1])
+    if seen_at and tonumber(seen_at) >= fresh_after then
+        result[#result + 1] = hit[1]
+        result[#result + 1] = hit[2]
+    end
+end
+return result
+"""
+
+
 def geo_nearby_rider_ids(
     vendor_lat: float,
     vendor_lon: float,
     radii_km: Iterable[float],
+    max_age_seconds: int = RIDER_GEO_FRESHNESS_SECONDS,
 ) -> Optional[list[tuple[str, float]]]:
     """
     Query riders in expanding neighborhood radii around a vendor.
 
     Returns ordered unique (rider_id, distance_km) pairs, nearest bands first,
     or None if Redis is unavailable so callers can fall back.
+
+    A single GEOSEARCH to the widest radius replaces one GEORADIUS per band:
+    the bands are nested, so the ascending-distance result already lists
+    every inner band before the next. Riders whose freshness score is older
+    than ``max_age_seconds`` are dropped inside the same script; removing
+    them from the index is left to rider.cleanup_stale_rider_geo.
     """
-    r = _get_redis_client()
+    radii = list(radii_km)
+    if not radii:
+        return []
+
+    r = get_redis_client()
     if r is None:
         return None
 
     try:
-        cleanup_stale_riders()
-        seen: dict[str, float] = {}
+        search = r.register_script(_FRESH_GEOSEARCH_LUA)
+        raw = search(
+            keys=[RIDER_GEO_KEY, RIDER_GEO_FRESHNESS_KEY],
+            args=[vendor_lon, vendor_lat, max(radii), int(time.time()) - max_age_seconds],
+        )
         ordered: list[tuple[str, float]] = []
-        for radius_km in radii_km:
-            raw = r.georadius(
-                RIDER_GEO_KEY,
-                vendor_lon,
-                vendor_lat,
-                radius_km,
-                "km",
-                withdist=True,
-                withcoord=False,
-                sort="ASC",
-            )
-            for member, dist in raw:
-                rider_id = member.decode()
-                distance_km = float(dist)
-                if rider_id in seen:
-                    continue
-                seen[rider_id] = distance_km
-                ordered.append((rider_id, distance_km))
+        for member, dist in zip(raw[::2], raw[1::2]):
+            rider_id = member.decode() if isinstance(member, bytes) else str(member)
+            ordered.append((rider_id, float(dist)))
         return ordered
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("Redis rider geo query failed, will fall back to DB scan: %s", exc)
         return None
 
@@ -143,7 +164,7 @@ def rebuild_rider_geo_index(riders) -> tuple[int, int]:
 
     Returns (indexed_count, skipped_count).
     """
-    r = _get_redis_client()
+    r = get_redis_client()
     if r is None:
         return 0, 0
 
@@ -174,5 +195,6 @@ def rebuild_rider_geo_index(riders) -> tuple[int, int]:
         pipe.execute()
         return indexed, skipped
     except Exception as exc:
+        record_redis_failure(exc)
         logger.warning("rebuild_rider_geo_index failed: %s", exc)
         return 0, 0
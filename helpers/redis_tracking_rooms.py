@@ -0,0 +1,144 @@
+"""
+Presence counters and broadcast throttling for ``delivery_<order_id>`` rooms.
+
+broadcast_location_update used to group_send to the tracking room of every
+active order on every rider ping, whether or not a customer had the tracking
+screen open, and as often as the rider app reported. On channels_redis each
+group_send is a Redis round-trip per member plus one for the group lookup, so
+a rider on a multi-drop route multiplied the ping rate by their order count.
+Instead:
+
+- DeliveryTrackingConsumer counts its connections per order in
+  ``tracking:subs:<order_id>`` (INCR on connect, DECR on disconnect). The key
+  expires after TRACKING_PRESENCE_TTL_SECONDS so a worker that died without
+  disconnecting cannot keep a room "occupied" forever.
+- claim_tracking_broadcasts asks, in one script call for all of a rider's
+  orders, which rooms have a subscriber and have not had an update within the
+  broadcast interval, and claims the interval for those (SET NX PX). Rooms
+  nobody watches are skipped; the others get at most one location update per
+  interval, across every web and websocket worker.
+
+Without Redis the channel layer is down as well, so presence cannot be
+tracked; rooms are then assumed occupied and the interval is enforced per
+process with TrackingThrottle.
+"""
+
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+
+from helpers.redis_client import get_redis_client, record_redis_failure
+
+logger = logging.getLogger(__name__)
+
+TRACKING_SUBSCRIBERS_KEY = "tracking:subs:{order_id}"
+TRACKING_THROTTLE_KEY = "tracking:sent:{order_id}"
+TRACKING_PRESENCE_TTL_SECONDS = 12 * 60 * 60
+
+# KEYS are (subscribers, throttle) pairs; ARGV[1] is the interval in ms and
+# ARGV[i + 1] the order id of pair i. Returns the order ids claimed.
+_CLAIM_BROADCASTS_LUA = """
+local claimed = {}
+for i = 1, #KEYS, 2 do
+    local subscribers = tonumber(redis.call('GET', KEYS[i]) or '0')
+    if subscribers > 0 and redis.call('SET', KEYS[i + 1], '1', 'NX', 'PX', ARGV[1]) then
+        claimed[#claimed + 1] = ARGV[(i + 1) / 2 + 1]
+    end
+end
+return claimed
+"""
+
+_LEAVE_ROOM_LUA = """
+local remaining = redis.call('DECR', KEYS[1])
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+return remaining
+"""
+
+
+def tracking_room_joined(order_id) -> Optional[int]:
+    """Count a new subscriber to the order's tracking room; None if Redis is unavailable."""
+    r = get_redis_client()
+    if r is None:
+        return None
+
+    key = TRACKING_SUBSCRIBERS_KEY.format(order_id=order_id)
+    try:
+        pipe = r.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, TRACKING_PRESENCE_TTL_SECONDS)
+        return int(pipe.execute()[0])
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("tracking_room_joined failed for %s: %s", order_id, exc)
+        return None
+
+
+def tracking_room_left(order_id) -> Optional[int]:
+    """Drop a subscriber from the order's tracking room; None if Redis is unavailable."""
+    r = get_redis_client()
+    if r is None:
+        return None
+
+    try:
+        leave = r.register_script(_LEAVE_ROOM_LUA)
+        return int(leave(keys=[TRACKING_SUBSCRIBERS_KEY.format(order_id=order_id)]))
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("tracking_room_left failed for %s: %s", order_id, exc)
+        return None
+
+
+def claim_tracking_broadcasts(order_ids: Iterable, interval_seconds: float) -> Optional[set[str]]:
+    """
+    The subset of ``order_ids`` whose room has a subscriber and is due an
+    update, claiming the next interval for each; None if Redis is unavailable.
+    """
+    order_ids = [str(order_id) for order_id in order_ids]
+    if not order_ids:
+        return set()
+
+    r = get_redis_client()
+    if r is None:
+        return None
+
+    keys = []
+    for order_id in order_ids:
+        keys.append(TRACKING_SUBSCRIBERS_KEY.format(order_id=order_id))
+        keys.append(TRACKING_THROTTLE_KEY.format(order_id=order_id))
+    try:
+        claim = r.register_script(_CLAIM_BROADCASTS_LUA)
+        claimed = claim(keys=keys, args=[max(int(interval_seconds * 1000), 1), *order_ids])
+        return {member.decode() if isinstance(member, bytes) else str(member) for member in claimed}
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("claim_tracking_broadcasts failed, throttling in-process: %s", exc)
+        return None
+
+
+class TrackingThrottle:
+    """Per-process fallback: at most one claim per key per interval."""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sent_at: dict[str, float] = {}
+
+    def claim(self, key, interval_seconds: float) -> bool:
+        now = self._clock()
+        key = str(key)
+        with self._lock:
+            last = self._sent_at.get(key)
+            if last is not None and now - last < interval_seconds:
+                return False
+            if len(self._sent_at) >= self.MAX_ENTRIES:
+                self._sent_at = {
+                    k: sent for k, sent in self._sent_at.items() if now - sent < interval_seconds
+                }
+            self._sent_at[key] = now
+            return True
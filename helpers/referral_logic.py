@@ -2,7 +2,8 @@ import logging
 from decimal import Decimal
 from django.db import transaction
 from account.models import User
-from wallet.models import Wallet, WalletTransaction
+from wallet import ledger
+from wallet.models import Wallet
 from product.promo_models import PromoCode, PromoUsage
 
 logger = logging.getLogger(__name__)
@@ -60,14 +61,10 @@ def grant_reward(referrer, promo, referee, order):
         with transaction.atomic():
             if reward_type == 'wallet_credit':
                 wallet, _ = Wallet.objects.get_or_create(user=referrer)
-                wallet.deposit(reward_value)
-
-                WalletTransaction.objects.create(
-                    wallet=wallet,
+                ledger.credit(
+                    wallet,
+                    reward_value,
                     user=referrer,
-                    amount=reward_value,
-                    transaction_type='deposit',
-                    status='completed',
                     description=f"Referral reward for inviting {referee.email} (Order #{order.id})"
                 )
                 logger.info(f"Granted {reward_value} wallet credit to {referrer.email} for referral.")
@@ -0,0 +1,172 @@
+"""
+Rider GPS ingestion.
+
+Rider.update_location used to save every column of the rider row, reload it
+with refresh_from_db() and then write the geo index, on every ping. Riders
+ping every few seconds, which made it the highest-write path in the system.
+ingest_rider_location instead:
+
+- writes the latest position to Redis first, in one pipeline: the dispatch
+  geo index (riders:geo and its freshness set) plus a per-rider hash
+  ``rider:pos:<id>`` holding latitude, longitude, timestamp, speed and
+  heading;
+- persists to Postgres at most once per RIDER_LOCATION_PERSIST_INTERVAL_SECONDS
+  per rider, with ``save(update_fields=...)`` on the three location columns.
+  The first ping of each window wins a short Redis lock and writes; the
+  rest only update Redis. Without Redis every ping is persisted, as before;
+- updates the in-memory rider and returns a RiderPosition, so callers
+  broadcast what they just ingested instead of re-reading the row.
+
+The interval has to stay well under RIDER_GEO_FRESHNESS_SECONDS, since the
+dispatch queries still filter on the persisted location_updated_at.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Tuple
+
+from django.utils import timezone
+
+from helpers.redis_client import get_redis_client, record_redis_failure
+from helpers.redis_rider_geo import RIDER_GEO_FRESHNESS_KEY, RIDER_GEO_KEY
+
+logger = logging.getLogger(__name__)
+
+RIDER_POSITION_KEY = "rider:pos:{rider_id}"
+RIDER_POSITION_TTL_SECONDS = 60 * 60
+RIDER_PERSIST_LOCK_KEY = "rider:pos:{rider_id}:persisted"
+DEFAULT_PERSIST_INTERVAL_SECONDS = 30
+
+LOCATION_UPDATE_FIELDS = ['current_latitude', 'current_longitude', 'location_updated_at']
+
+
+@dataclass(frozen=True)
+class RiderPosition:
+    rider_id: str
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+    speed: Optional[float] = None
+    heading: Optional[float] = None
+
+    def as_payload(self) -> dict:
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'updated_at': self.recorded_at.isoformat(),
+            'speed': self.speed,
+            'heading': self.heading,
+        }
+
+
+def _persist_interval() -> int:
+    from django.conf import settings
+
+    return getattr(settings, "RIDER_LOCATION_PERSIST_INTERVAL_SECONDS", DEFAULT_PERSIST_INTERVAL_SECONDS)
+
+
+def _optional_float(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _write_position(r, position: RiderPosition, index_for_dispatch: bool) -> bool:
+    """One Redis round-trip; returns True if this ping should be persisted."""
+    rider_id = position.rider_id
+    timestamp = position.recorded_at.timestamp()
+    fields = {'lat': position.latitude, 'lon': position.longitude, 'ts': timestamp}
+    if position.speed is not None:
+        fields['speed'] = position.speed
+    if position.heading is not None:
+        fields['heading'] = position.heading
+
+    pipe = r.pipeline()
+    key = RIDER_POSITION_KEY.format(rider_id=rider_id)
+    pipe.hset(key, mapping=fields)
+    pipe.expire(key, RIDER_POSITION_TTL_SECONDS)
+    if index_for_dispatch:
+        pipe.execute_command("GEOADD", RIDER_GEO_KEY, position.longitude, position.latitude, rider_id)
+        pipe.zadd(RIDER_GEO_FRESHNESS_KEY, {rider_id: int(timestamp)})
+    pipe.set(RIDER_PERSIST_LOCK_KEY.format(rider_id=rider_id), 1, nx=True, ex=_persist_interval())
+    return bool(pipe.execute()[-1])
+
+
+def ingest_rider_location(rider, latitude, longitude, speed=None, heading=None) -> RiderPosition:
+    """Record a GPS fix: Redis always, the database at most once per persist interval."""
+    position = RiderPosition(
+        rider_id=str(rider.pk),
+        latitude=float(latitude),
+        longitude=float(longitude),
+        recorded_at=timezone.now(),
+        speed=_optional_float(speed),
+        heading=_optional_float(heading),
+    )
+
+    rider.current_latitude = latitude
+    rider.current_longitude = longitude
+    rider.location_updated_at = position.recorded_at
+
+    persist = True
+    r = get_redis_client()
+    if r is not None:
+        try:
+            persist = _write_position(r, position, index_for_dispatch=rider.is_online)
+        except Exception as exc:
+            record_redis_failure(exc)
+            logger.warning("Rider position write to Redis failed for %s: %s", rider.pk, exc)
+
+    if persist:
+        rider.save(update_fields=LOCATION_UPDATE_FIELDS)
+    return position
+
+
+def get_rider_position(rider_id) -> Optional[RiderPosition]:
+    """The latest ingested position from Redis, or None if unknown or Redis is down."""
+    r = get_redis_client()
+    if r is None:
+        return None
+    try:
+        raw = r.hgetall(RIDER_POSITION_KEY.format(rider_id=rider_id))
+    except Exception as exc:
+        record_redis_failure(exc)
+        logger.warning("Rider position read from Redis failed for %s: %s", rider_id, exc)
+        return None
+    if not raw:
+        return None
+
+    fields = {
+        (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+        for key, value in raw.items()
+    }
+    try:
+        return RiderPosition(
+            rider_id=str(rider_id),
+            latitude=float(fields['lat']),
+            longitude=float(fields['lon']),
+            recorded_at=datetime.fromtimestamp(float(fields['ts']), tz=dt_timezone.utc),
+            speed=_optional_float(fields.get('speed')),
+            heading=_optional_float(fields.get('heading')),
+        )
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def current_rider_location(rider) -> Tuple[Optional[float], Optional[float], Optional[datetime]]:
+    """
+    (latitude, longitude, updated_at) of a rider: the latest ingested position
+    from Redis, else the persisted columns, which trail it by up to
+    RIDER_LOCATION_PERSIST_INTERVAL_SECONDS. Any part may be None.
+    """
+    position = get_rider_position(rider.pk)
+    if position is not None:
+        return position.latitude, position.longitude, position.recorded_at
+    return (
+        _optional_float(rider.current_latitude),
+        _optional_float(rider.current_longitude),
+        rider.location_updated_at,
+    )
@@ -0,0 +1,189 @@
+"""
+Road-distance cache keyed by geohash cells, with stale-while-revalidate.
+
+get_road_distance_km used to cache by the exact ``lat1_lon1_lat2_lon2``
+floats, so two customers in the same building (or one customer whose GPS
+jittered) each paid a Google Routes call with a 6 s timeout. Here:
+
+- Origin and destination are snapped to geohash cells. The precision comes
+  from DeliveryConfig.ROUTE_CACHE_GEOHASH_PRECISION (7 ~= 150 m cells by
+  default), so admins can trade accuracy for hit rate.
+- Each entry records when it stops being fresh (ROUTE_CACHE_TIMEOUT) but is
+  kept in the cache until ROUTE_CACHE_STALE_TIMEOUT. A stale hit is served
+  immediately and a background refresh is queued (at most one per key per
+  REFRESH_LOCK_SECONDS), so quotes never wait on a re-measure.
+- helpers.tasks.prefetch_popular_route_distances warms the cache from each
+  active vendor to the destination cells seen most in recent orders.
+"""
+
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {char: index for index, char in enumerate(_BASE32)}
+
+DEFAULT_GEOHASH_PRECISION = 7
+REFRESH_LOCK_SECONDS = 300
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = DEFAULT_GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> Tuple[float, float]:
+    """(latitude, longitude) of the centre of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+def _precision() -> int:
+    from helpers.order_utils import DeliveryConfig
+
+    return int(DeliveryConfig.ROUTE_CACHE_GEOHASH_PRECISION or DEFAULT_GEOHASH_PRECISION)
+
+
+def route_cells(lat1: float, lon1: float, lat2: float, lon2: float,
+                precision: Optional[int] = None) -> Tuple[str, str]:
+    precision = precision or _precision()
+    return geohash_encode(lat1, lon1, precision), geohash_encode(lat2, lon2, precision)
+
+
+def route_cache_key(mode: str, origin_cell: str, dest_cell: str) -> str:
+    return f"route_km:{mode}:{origin_cell}:{dest_cell}"
+
+
+def _enqueue_refresh(mode: str, origin_cell: str, dest_cell: str) -> None:
+    lock_key = f"{route_cache_key(mode, origin_cell, dest_cell)}:refreshing"
+    try:
+        if not cache.add(lock_key, 1, REFRESH_LOCK_SECONDS):
+            return
+        from helpers.tasks import refresh_route_distance
+
+        refresh_route_distance.delay(mode, origin_cell, dest_cell)
+    except Exception as exc:
+        logger.warning("Could not queue route refresh for %s->%s: %s", origin_cell, dest_cell, exc)
+
+
+def _read(entry, mode: str, origin_cell: str, dest_cell: str, revalidate: bool) -> Optional[float]:
+    if not isinstance(entry, dict) or entry.get("km") is None:
+        return None
+    if revalidate and entry.get("fresh_until", 0) <= time.time():
+        _enqueue_refresh(mode, origin_cell, dest_cell)
+    return entry["km"]
+
+
+def get_route_km(mode: str, lat1: float, lon1: float, lat2: float, lon2: float,
+                 revalidate: bool = True) -> Optional[float]:
+    """Cached road distance for the cells of two points; stale entries are served and refreshed."""
+    origin_cell, dest_cell = route_cells(lat1, lon1, lat2, lon2)
+    entry = cache.get(route_cache_key(mode, origin_cell, dest_cell))
+    return _read(entry, mode, origin_cell, dest_cell, revalidate)
+
+
+def _get_many_entries(mode: str, origins: Iterable[Tuple[float, float]], dest_lat: float, dest_lon: float):
+    precision = _precision()
+    dest_cell = geohash_encode(dest_lat, dest_lon, precision)
+    origin_cells = [geohash_encode(lat, lon, precision) for lat, lon in origins]
+    keys = [route_cache_key(mode, cell, dest_cell) for cell in origin_cells]
+    entries = cache.get_many(keys) if keys else {}
+    return [(entries.get(key), cell) for key, cell in zip(keys, origin_cells)], dest_cell
+
+
+def get_many_route_km(mode: str, origins: Iterable[Tuple[float, float]], dest_lat: float, dest_lon: float,
+                      revalidate: bool = True) -> List[Optional[float]]:
+    """get_route_km for many origins and one destination, in one cache round-trip."""
+    entries, dest_cell = _get_many_entries(mode, origins, dest_lat, dest_lon)
+    return [_read(entry, mode, cell, dest_cell, revalidate) for entry, cell in entries]
+
+
+def needs_refresh_many(mode: str, origins: Iterable[Tuple[float, float]],
+                       dest_lat: float, dest_lon: float) -> List[bool]:
+    """True for each origin whose entry is missing or past its freshness window."""
+    entries, _dest_cell = _get_many_entries(mode, origins, dest_lat, dest_lon)
+    now = time.time()
+    return [
+        not isinstance(entry, dict) or entry.get("km") is None or entry.get("fresh_until", 0) <= now
+        for entry, _cell in entries
+    ]
+
+
+def _entry(distance_km: float) -> Dict[str, float]:
+    from helpers.order_utils import DeliveryConfig
+
+    return {"km": distance_km, "fresh_until": time.time() + DeliveryConfig.ROUTE_CACHE_TIMEOUT}
+
+
+def _stale_timeout() -> int:
+    from helpers.order_utils import DeliveryConfig
+
+    return max(DeliveryConfig.ROUTE_CACHE_STALE_TIMEOUT, DeliveryConfig.ROUTE_CACHE_TIMEOUT)
+
+
+def set_route_km(mode: str, lat1: float, lon1: float, lat2: float, lon2: float, distance_km: float) -> None:
+    origin_cell, dest_cell = route_cells(lat1, lon1, lat2, lon2)
+    set_route_km_for_cells(mode, origin_cell, dest_cell, distance_km)
+
+
+def set_route_km_for_cells(mode: str, origin_cell: str, dest_cell: str, distance_km: float) -> None:
+    cache.set(route_cache_key(mode, origin_cell, dest_cell), _entry(distance_km), _stale_timeout())
+
+
+def set_many_route_km(mode: str, origins: Iterable[Tuple[float, float]], dest_lat: float, dest_lon: float,
+                      distances: Iterable[Optional[float]]) -> None:
+    precision = _precision()
+    dest_cell = geohash_encode(dest_lat, dest_lon, precision)
+    entries = {
+        route_cache_key(mode, geohash_encode(lat, lon, precision), dest_cell): _entry(distance)
+        for (lat, lon), distance in zip(origins, distances)
+        if distance is not None
+    }
+    if entries:
+        cache.set_many(entries, _stale_timeout())
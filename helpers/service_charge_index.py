@@ -0,0 +1,122 @@
+"""
+In-process index of active service-charge tiers.
+
+ServiceChargeTier.get_charge_for used to run up to two ordered queries (the
+vendor's tiers, then the category defaults) every time a price was shown.
+Product.get_display_price, get_platform_earnings and
+Order.calculate_total_commission all go through it, so a 20-product catalog
+page paid 40-120 queries for service charges alone.
+
+ServiceChargeIndex loads every active tier once per process and groups them
+by (system_category_id, vendor_id), vendor None being the category default.
+Each group is a list of tiers sorted by min_price; a lookup bisects to the
+tier with the highest min_price at or below the price and walks down until
+one whose max_price covers it, which is the row the old ``order_by
+('-min_price').first()`` query returned.
+
+The index lives in a ConfigSnapshot: it expires after
+SERVICE_CHARGE_INDEX_TTL_SECONDS and is dropped on every worker when a tier
+is saved or deleted (product/signals.py publishes on
+SERVICE_CHARGE_INVALIDATION_CHANNEL).
+
+Per-item Buka overrides are not part of the index: callers serializing many
+products prefetch them with SERVICE_CHARGE_PREFETCHES.
+"""
+
+import logging
+from bisect import bisect_right
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from helpers.config_snapshot import ConfigSnapshot, ensure_invalidation_listener, register_invalidation_channel
+
+logger = logging.getLogger(__name__)
+
+SERVICE_CHARGE_INVALIDATION_CHANNEL = "service_charge_tiers:invalidate"
+DEFAULT_SERVICE_CHARGE_INDEX_TTL_SECONDS = 300
+
+# Lookups that make Product/ProductVariant.get_service_charge query-free for
+# a page of top-level products and their variants.
+SERVICE_CHARGE_PREFETCHES = (
+    'buka_service_charge',
+    'variants__buka_service_charge',
+    'productvariantcategory_set__variants__buka_service_charge',
+)
+
+
+class ServiceChargeIndex:
+    """Sorted tier intervals per (system_category_id, vendor_id)."""
+
+    def __init__(self, tiers):
+        groups: Dict[Tuple, List[Tuple[Decimal, Optional[Decimal], Decimal]]] = {}
+        for tier in tiers:
+            groups.setdefault((tier['system_category_id'], tier['vendor_id']), []).append(
+                (Decimal(tier['min_price']), tier['max_price'], Decimal(tier['flat_charge']))
+            )
+
+        self._groups: Dict[Tuple, Tuple[List[Decimal], List[Tuple]]] = {}
+        for key, intervals in groups.items():
+            intervals.sort(key=lambda interval: interval[0])
+            self._groups[key] = ([interval[0] for interval in intervals], intervals)
+
+    def __len__(self) -> int:
+        return sum(len(intervals) for _, intervals in self._groups.values())
+
+    def _match(self, system_category_id, vendor_id, price: Decimal) -> Optional[Decimal]:
+        group = self._groups.get((system_category_id, vendor_id))
+        if group is None:
+            return None
+        min_prices, intervals = group
+        position = bisect_right(min_prices, price)
+        # Overlaps are rejected by ServiceChargeTier.clean, but rows written
+        # without it may still overlap; fall back to lower tiers like the query did.
+        for index in range(position - 1, -1, -1):
+            max_price = intervals[index][1]
+            if max_price is None or max_price >= price:
+                return intervals[index][2]
+        return None
+
+    def charge_for(self, system_category_id, price, vendor_id=None) -> Decimal:
+        """Vendor tier if one covers the price, else the category default, else 0."""
+        price = price if isinstance(price, Decimal) else Decimal(str(price))
+        if vendor_id is not None:
+            charge = self._match(system_category_id, vendor_id, price)
+            if charge is not None:
+                return charge
+        charge = self._match(system_category_id, None, price)
+        return charge if charge is not None else Decimal('0.00')
+
+
+def _load_service_charge_index() -> ServiceChargeIndex:
+    from product.models import ServiceChargeTier
+
+    ensure_invalidation_listener()
+    tiers = ServiceChargeTier.objects.filter(is_active=True).values(
+        'system_category_id', 'vendor_id', 'min_price', 'max_price', 'flat_charge',
+    )
+    index = ServiceChargeIndex(tiers)
+    logger.debug("Loaded %s service charge tiers into the tier index", len(index))
+    return index
+
+
+def _index_ttl() -> float:
+    from django.conf import settings
+
+    return getattr(settings, "SERVICE_CHARGE_INDEX_TTL_SECONDS", DEFAULT_SERVICE_CHARGE_INDEX_TTL_SECONDS)
+
+
+service_charge_index_snapshot = ConfigSnapshot(_load_service_charge_index, ttl_seconds=_index_ttl(), freeze=False)
+register_invalidation_channel(SERVICE_CHARGE_INVALIDATION_CHANNEL, service_charge_index_snapshot)
+
+
+def get_service_charge_index() -> ServiceChargeIndex:
+    return service_charge_index_snapshot.get()
+
+
+def service_charge_for(system_category, price, vendor=None) -> Decimal:
+    """The tier charge for a price, without a database query; model instances or ids."""
+    return get_service_charge_index().charge_for(
+        getattr(system_category, 'pk', system_category),
+        price,
+        getattr(vendor, 'pk', vendor),
+    )
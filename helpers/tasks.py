@@ -0,0 +1,136 @@
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ROUTE_PREFETCH_LOOKBACK_DAYS = 30
+ROUTE_PREFETCH_TOP_CELLS = 100
+ROUTE_PREFETCH_MAX_ELEMENTS = 2000
+
+
+@shared_task(name='helpers.refresh_route_distance')
+def refresh_route_distance(mode, origin_cell, dest_cell):
+    """
+    Re-measure one stale route-cache entry (see helpers/route_cache.py).
+
+    Measured between the cell centres, which is what every quote inside
+    those cells shares anyway.
+    """
+    from helpers import route_cache
+    from helpers.order_utils import _fetch_road_distance_km
+
+    api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
+    if not api_key:
+        return None
+
+    lat1, lon1 = route_cache.geohash_center(origin_cell)
+    lat2, lon2 = route_cache.geohash_center(dest_cell)
+    distance = _fetch_road_distance_km(lat1, lon1, lat2, lon2, mode, api_key)
+    if distance is not None:
+        route_cache.set_route_km_for_cells(mode, origin_cell, dest_cell, distance)
+    return distance
+
+
+@shared_task(name='helpers.prefetch_popular_route_distances')
+def prefetch_popular_route_distances(
+    lookback_days=ROUTE_PREFETCH_LOOKBACK_DAYS,
+    top_cells=ROUTE_PREFETCH_TOP_CELLS,
+    max_elements=ROUTE_PREFETCH_MAX_ELEMENTS,
+):
+    """
+    Warm the route cache from every active vendor to the busiest destination cells.
+
+    Destination cells are the geohash cells of recent Order delivery
+    coordinates. For each of the ``top_cells`` busiest cells, vendors within
+    the maximum delivery distance (straight line) whose entry is missing or
+    stale are measured with one Routes API matrix call per 50 vendors.
+    ``max_elements`` caps the route elements requested per run.
+    """
+    from helpers import route_cache
+    from helpers.geo_distance import CoordinateArray
+    from helpers.order_utils import DeliveryConfig, _fetch_road_distance_matrix_km
+    from helpers.redis_geo import _eligible_geo_vendor_queryset
+    from product.models import Order
+
+    api_key = getattr(settings, 'GOOGLE_MAPS_API_KEY', '')
+    if not api_key:
+        logger.info('Route prefetch skipped: GOOGLE_MAPS_API_KEY is not set')
+        return {'cells': 0, 'measured': 0}
+
+    precision = int(DeliveryConfig.ROUTE_CACHE_GEOHASH_PRECISION)
+    mode = DeliveryConfig.ROUTE_TRAVEL_MODE
+    max_distance_km = DeliveryConfig.MAX_DISTANCE_KM
+
+    since = timezone.now() - timedelta(days=lookback_days)
+    destinations = (
+        Order.objects
+        .filter(created_at__gte=since, delivery_latitude__isnull=False, delivery_longitude__isnull=False)
+        .values_list('delivery_latitude', 'delivery_longitude')
+        .iterator(chunk_size=2000)
+    )
+    cell_counts = Counter(
+        route_cache.geohash_encode(float(lat), float(lon), precision)
+        for lat, lon in destinations
+    )
+
+    vendor_rows = list(
+        _eligible_geo_vendor_queryset().values_list('id', 'location_latitude', 'location_longitude')
+    )
+    vendors = CoordinateArray.from_rows(vendor_rows)
+    coordinates = {
+        str(vendor_id): (float(lat), float(lon))
+        for vendor_id, lat, lon in vendor_rows
+        if str(vendor_id) in vendors
+    }
+
+    measured = 0
+    cells = 0
+    for cell, _count in cell_counts.most_common(top_cells):
+        if measured >= max_elements:
+            break
+        dest_lat, dest_lon = route_cache.geohash_center(cell)
+        nearby = vendors.within(dest_lat, dest_lon, max_distance_km)
+        origins = [coordinates[vendor_id] for vendor_id in nearby]
+        needs_measure = route_cache.needs_refresh_many(mode, origins, dest_lat, dest_lon)
+        pending = [
+            origin for origin, needed in zip(origins, needs_measure) if needed
+        ][:max_elements - measured]
+        if not pending:
+            continue
+
+        distances = _fetch_road_distance_matrix_km(pending, dest_lat, dest_lon, mode, api_key)
+        route_cache.set_many_route_km(mode, pending, dest_lat, dest_lon, distances)
+        measured += len(pending)
+        cells += 1
+
+    logger.info('Route prefetch measured %s vendor/cell pairs across %s cells', measured, cells)
+    return {'cells': cells, 'measured': measured}
+
+
+@shared_task(name='helpers.send_push_fanout')
+def send_push_fanout(user_ids, title, body, data=None, image_url=None):
+    """Deliver one push notification to many users (see helpers/push_fanout.py)."""
+    from helpers.push_fanout import send_push_to_users
+
+    return send_push_to_users(user_ids, title, body, data, image_url)
+
+
+@shared_task(name='helpers.drain_notification_outbox')
+def drain_notification_outbox():
+    """Deliver due push notifications (see helpers/notification_outbox.py)."""
+    from helpers.notification_outbox import drain_outbox
+
+    return drain_outbox()
+
+
+@shared_task(name='helpers.purge_notification_outbox')
+def purge_notification_outbox():
+    """Delete settled outbox rows past the retention window."""
+    from helpers.notification_outbox import purge_outbox
+
+    return purge_outbox()
@@ -1,13 +1,41 @@
+import threading
+import time
+from decimal import Decimal
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
 
+from helpers.config_snapshot import CONFIG_INVALIDATION_CHANNEL, ConfigSnapshot, publish_config_invalidation
+from helpers.distance_cache import DistanceCache
+from helpers.geo_distance import CoordinateArray, haversine_many
+from helpers.order_utils import DeliveryConfig, get_distance_between_two_location, get_road_distance_matrix_km
+from helpers.quote_factors import factor_latency_stats, gather_factors
+from helpers import notification_outbox, push_fanout, route_cache
+from helpers.redis_open_orders import OPEN_ORDER_CREATED_KEY, OPEN_ORDER_GEO_KEY, nearby_open_orders, sync_open_order
+from helpers.redis_tracking_rooms import TrackingThrottle, claim_tracking_broadcasts
+from helpers.redis_rider_geo import RIDER_GEO_FRESHNESS_KEY, RIDER_GEO_KEY, geo_nearby_rider_ids
+from helpers.rider_location import (
+    LOCATION_UPDATE_FIELDS,
+    current_rider_location,
+    get_rider_position,
+    ingest_rider_location,
+)
+from helpers.service_charge_index import ServiceChargeIndex
+from helpers.zone_aliases import ZoneAliasMatcher
+from helpers.zone_index import ZoneIndex
+from helpers.redis_client import RedisCircuitBreaker
 from helpers.redis_geo import (
+    GEO_INDEX_CHANGELOG_KEY,
     GEO_INDEX_VALIDATION_KEY,
+    GEO_INDEX_VERSION_KEY,
+    GEO_INDEX_WATERMARK_KEY,
     GEO_KEY,
     _ensure_geo_index,
     _rebuild_geo_index,
+    geo_add_vendor,
+    reconcile_geo_index,
 )
 from helpers.vendor_discovery import filter_and_sort_vendors_by_distance
 
@@ -20,15 +48,38 @@ class RedisGeoIndexRepairTests(SimpleTestCase):
             location_longitude="3.4023064",
         )
 
+    @patch("helpers.redis_geo._enqueue_geo_reconciliation")
+    @patch("helpers.redis_geo._index_matches_database", return_value=False)
+    @patch("helpers.redis_geo._rebuild_geo_index")
+    def test_drifted_index_is_reconciled_in_the_background(
+        self,
+        rebuild,
+        _matches,
+        enqueue,
+    ):
+        redis_client = Mock()
+        redis_client.exists.return_value = True
+        redis_client.get.return_value = None
+
+        self.assertTrue(_ensure_geo_index(redis_client))
+
+        rebuild.assert_not_called()
+        redis_client.zrange.assert_not_called()
+        enqueue.assert_called_once_with()
+        redis_client.set.assert_called_once_with(
+            GEO_INDEX_VALIDATION_KEY,
+            "1",
+            ex=5 * 60,
+        )
+
     @patch("helpers.redis_geo._eligible_geo_vendors")
-    def test_repairs_an_existing_but_incomplete_index(self, eligible_vendors):
+    def test_missing_index_is_rebuilt_inline(self, eligible_vendors):
         vendor = self._vendor()
+        vendor.updated_at = None
         eligible_vendors.return_value = [vendor]
 
         redis_client = Mock()
-        redis_client.exists.return_value = True
-        redis_client.get.return_value = None
-        redis_client.zrange.return_value = [b"stale-vendor"]
+        redis_client.exists.return_value = False
         pipe = redis_client.pipeline.return_value
 
         self.assertTrue(_ensure_geo_index(redis_client))
@@ -42,12 +93,46 @@ class RedisGeoIndexRepairTests(SimpleTestCase):
             str(vendor.id),
         )
         pipe.execute.assert_called_once_with()
-        redis_client.set.assert_called_once_with(
-            GEO_INDEX_VALIDATION_KEY,
-            "1",
-            ex=5 * 60,
+
+    @patch("helpers.redis_geo._eligible_geo_vendors")
+    def test_reconcile_removes_stale_members_and_logs_a_version(self, eligible_vendors):
+        vendor = self._vendor()
+        vendor.updated_at = None
+        eligible_vendors.return_value = [vendor]
+
+        redis_client = Mock()
+        redis_client.zrange.return_value = [b"stale-vendor", b"current-vendor"]
+        redis_client.eval.return_value = 7
+        pipe = redis_client.pipeline.return_value
+
+        summary = reconcile_geo_index(redis_client)
+
+        pipe.zrem.assert_called_once_with(GEO_KEY, "stale-vendor")
+        self.assertEqual(
+            summary,
+            {"indexed": 1, "added": 0, "removed": 1, "version": 7},
         )
 
+    def test_vendor_mutation_is_one_versioned_script_call(self):
+        redis_client = Mock()
+        redis_client.eval.return_value = 3
+        vendor = self._vendor()
+        vendor.updated_at = None
+
+        with patch("helpers.redis_geo.get_redis_client", return_value=redis_client):
+            self.assertTrue(geo_add_vendor(vendor))
+
+        redis_client.eval.assert_called_once()
+        args = redis_client.eval.call_args.args
+        self.assertEqual(args[2:6], (
+            GEO_KEY,
+            GEO_INDEX_VERSION_KEY,
+            GEO_INDEX_CHANGELOG_KEY,
+            GEO_INDEX_WATERMARK_KEY,
+        ))
+        self.assertEqual(args[6:8], ("add", "current-vendor"))
+        redis_client.delete.assert_not_called()
+
     def test_rebuild_clears_stale_members_when_database_has_no_vendors(self):
         redis_client = Mock()
         pipe = redis_client.pipeline.return_value
@@ -60,20 +145,29 @@ class RedisGeoIndexRepairTests(SimpleTestCase):
 
 
 class VendorDiscoveryFallbackTests(SimpleTestCase):
-    def _vendor(self, delivery_radius_km="10.00"):
+    def _vendor(
+        self,
+        delivery_radius_km="10.00",
+        latitude="6.5442935",
+        longitude="3.4023064",
+    ):
         return SimpleNamespace(
             id="current-vendor",
-            location_latitude="6.5442935",
-            location_longitude="3.4023064",
+            location_latitude=latitude,
+            location_longitude=longitude,
             delivery_radius_km=delivery_radius_km,
             rating="3.00",
             name="Nearby vendor",
         )
 
-    @patch(
-        "helpers.vendor_discovery.get_distance_between_two_location",
-        return_value=0.2,
-    )
+    def setUp(self):
+        patcher = patch(
+            "helpers.vendor_discovery.vendor_coordinate_array",
+            return_value=CoordinateArray([], [], []),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch(
         "helpers.vendor_discovery.geo_nearby_vendor_ids",
         return_value=[("stale-vendor", 0.1)],
@@ -81,9 +175,8 @@ class VendorDiscoveryFallbackTests(SimpleTestCase):
     def test_stale_redis_ids_fall_back_to_database_distance(
         self,
         _geo_nearby_vendor_ids,
-        _distance,
     ):
-        vendor = self._vendor()
+        vendor = self._vendor(latitude="6.5460935", longitude="3.4023064")
 
         results = filter_and_sort_vendors_by_distance(
             [vendor],
@@ -94,17 +187,13 @@ class VendorDiscoveryFallbackTests(SimpleTestCase):
 
         self.assertEqual(results, [(vendor, 0.2)])
 
-    @patch(
-        "helpers.vendor_discovery.get_distance_between_two_location",
-        return_value=12.0,
-    )
     @patch("helpers.vendor_discovery.geo_nearby_vendor_ids", return_value=[])
     def test_fallback_keeps_the_same_browse_radius_as_redis(
         self,
         _geo_nearby_vendor_ids,
-        _distance,
     ):
-        vendor = self._vendor(delivery_radius_km="20.00")
+        # ~12 km north: inside the vendor's 20 km radius, outside the browse radius.
+        vendor = self._vendor(delivery_radius_km="20.00", latitude="6.6522")
 
         results = filter_and_sort_vendors_by_distance(
             [vendor],
@@ -115,17 +204,12 @@ class VendorDiscoveryFallbackTests(SimpleTestCase):
 
         self.assertEqual(results, [])
 
-    @patch(
-        "helpers.vendor_discovery.get_distance_between_two_location",
-        return_value=0.2,
-    )
     @patch("helpers.vendor_discovery.geo_nearby_vendor_ids", return_value=[])
     def test_empty_redis_result_falls_back_to_database_distance(
         self,
         _geo_nearby_vendor_ids,
-        _distance,
     ):
-        vendor = self._vendor()
+        vendor = self._vendor(latitude="6.5460935", longitude="3.4023064")
 
         results = filter_and_sort_vendors_by_distance(
             [vendor],
@@ -135,3 +219,756 @@ class VendorDiscoveryFallbackTests(SimpleTestCase):
         )
 
         self.assertEqual(results, [(vendor, 0.2)])
+
+
+class BatchedHaversineTests(SimpleTestCase):
+    def test_matches_the_scalar_helper(self):
+        origin = (6.5442935, 3.4023064)
+        destinations = [(6.6018, 3.3515), (6.4281, 3.4219), (9.0579, 7.4951)]
+
+        batched = haversine_many(origin[0], origin[1], destinations)
+
+        expected = [
+            get_distance_between_two_location(origin[0], origin[1], lat, lon)
+            for lat, lon in destinations
+        ]
+        self.assertEqual(batched, expected)
+
+    def test_invalid_destinations_are_none(self):
+        self.assertEqual(
+            haversine_many(6.5, 3.4, [(None, 3.4), ("abc", "1"), (6.5, 3.4)]),
+            [None, None, 0.0],
+        )
+
+    def test_within_filters_by_radius(self):
+        array = CoordinateArray(
+            ["near", "far"],
+            ["6.5460935", "6.6522"],
+            ["3.4023064", "3.4023064"],
+        )
+
+        self.assertEqual(array.within(6.5442935, 3.4023064, 10), {"near": 0.2})
+
+
+class RedisCircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.breaker = RedisCircuitBreaker(
+            failure_threshold=2,
+            failure_window_seconds=10,
+            reset_seconds=30,
+            clock=lambda: self.now,
+        )
+
+    def test_opens_after_threshold_failures_inside_window(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_failures_outside_window_do_not_trip(self):
+        self.breaker.record_failure()
+        self.now += 11
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.CLOSED)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now += 30
+
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.HALF_OPEN)
+        # Only the single probe gets through while half-open.
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.OPEN)
+
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.CLOSED)
+
+
+class DistanceCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = DistanceCache(max_entries=2, ttl_seconds=60, clock=lambda: self.now)
+
+    def test_nearby_points_share_a_quantized_entry(self):
+        self.cache.set_distance(6.54429, 3.40230, 6.60180, 3.35150, 8.51)
+
+        self.assertEqual(self.cache.get_distance(6.544291, 3.402304, 6.601803, 3.351498), 8.51)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_evicts_least_recently_used_entry(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.set("a", 1)
+        self.now = 61
+
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    @patch("helpers.order_utils.cache")
+    def test_distance_helper_skips_the_remote_cache(self, remote_cache):
+        get_distance_between_two_location(6.5442935, 3.4023064, 6.6018, 3.3515)
+
+        remote_cache.get.assert_not_called()
+        remote_cache.set.assert_not_called()
+
+
+class DeliveryConfigSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.loader = Mock(return_value={"max_distance_km": 30})
+        self.snapshot = ConfigSnapshot(self.loader, ttl_seconds=60, clock=lambda: self.now)
+
+    def test_loads_once_per_ttl(self):
+        for _ in range(20):
+            self.assertEqual(self.snapshot.get()["max_distance_km"], 30)
+        self.assertEqual(self.loader.call_count, 1)
+
+        self.now = 61
+        self.snapshot.get()
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_snapshot_is_read_only(self):
+        with self.assertRaises(TypeError):
+            self.snapshot.get()["max_distance_km"] = 1
+
+    def test_invalidate_forces_reload(self):
+        self.snapshot.get()
+        self.loader.return_value = {"max_distance_km": 40}
+        self.snapshot.invalidate()
+
+        self.assertEqual(self.snapshot.get()["max_distance_km"], 40)
+        self.assertEqual(self.snapshot.version, 2)
+
+    def test_failed_reload_keeps_previous_snapshot(self):
+        self.snapshot.get()
+        self.loader.side_effect = RuntimeError("cache down")
+        self.now = 61
+
+        self.assertEqual(self.snapshot.get()["max_distance_km"], 30)
+
+    def test_delivery_config_reads_snapshot_with_fallback(self):
+        snapshot = ConfigSnapshot(lambda: {"max_distance_km": 30})
+        with patch("helpers.order_utils.delivery_config_snapshot", snapshot), \
+                patch("helpers.models.ConfigurationManager.get_config") as per_key:
+            self.assertEqual(DeliveryConfig.MAX_DISTANCE_KM, 30)
+            self.assertEqual(DeliveryConfig.get_config("min_delivery_fee"), 500)
+        per_key.assert_not_called()
+
+    @patch("helpers.config_snapshot.get_redis_client")
+    def test_publish_invalidates_locally_and_notifies_workers(self, get_client):
+        r = Mock()
+        get_client.return_value = r
+        snapshot = Mock()
+        with patch.dict("helpers.config_snapshot._channels", {CONFIG_INVALIDATION_CHANNEL: snapshot}):
+            publish_config_invalidation("max_distance_km")
+
+        snapshot.invalidate.assert_called_once_with()
+        r.publish.assert_called_once_with(CONFIG_INVALIDATION_CHANNEL, "max_distance_km")
+
+
+class QuoteFactorGatheringTests(SimpleTestCase):
+    def test_sources_run_concurrently_within_slowest_timeout(self):
+        def slow(value):
+            time.sleep(0.2)
+            return value
+
+        started = time.monotonic()
+        results, meta = gather_factors({
+            "traffic": (slow, ("heavy",), lambda: "neutral"),
+            "weather": (slow, ("rain",), lambda: "neutral"),
+            "rider": (slow, ("low",), lambda: "neutral"),
+        }, deadline_seconds=2)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(results, {"traffic": "heavy", "weather": "rain", "rider": "low"})
+        self.assertEqual(meta["fallbacks"], [])
+
+    def test_timeouts_errors_and_none_use_fallbacks(self):
+        def hang():
+            time.sleep(0.5)
+            return "late"
+
+        def boom():
+            raise RuntimeError("upstream down")
+
+        started = time.monotonic()
+        results, meta = gather_factors({
+            "distance": (lambda: None, (), lambda: 4.2),
+            "traffic": (hang, (), lambda: "neutral"),
+            "weather": (boom, (), lambda: "clear"),
+        }, deadline_seconds=2, timeouts={"traffic": 0.05})
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(results, {"distance": 4.2, "traffic": "neutral", "weather": "clear"})
+        self.assertEqual(sorted(meta["fallbacks"]), ["distance", "traffic", "weather"])
+        self.assertGreaterEqual(factor_latency_stats()["traffic"]["timeouts"], 1)
+
+    def test_one_quote_holds_at_most_max_parallel_workers(self):
+        lock = threading.Lock()
+        running = {"now": 0, "peak": 0}
+
+        def tracked(value):
+            with lock:
+                running["now"] += 1
+                running["peak"] = max(running["peak"], running["now"])
+            time.sleep(0.05)
+            with lock:
+                running["now"] -= 1
+            return value
+
+        results, meta = gather_factors({
+            f"traffic:{index}": (tracked, (index,), lambda: None) for index in range(6)
+        }, deadline_seconds=2, max_parallel=2)
+
+        self.assertEqual(results, {f"traffic:{index}": index for index in range(6)})
+        self.assertEqual(meta["fallbacks"], [])
+        self.assertEqual(running["peak"], 2)
+
+    def test_sources_still_queued_at_their_timeout_never_run(self):
+        ran = []
+
+        def slow(name):
+            ran.append(name)
+            time.sleep(0.2)
+            return name
+
+        results, meta = gather_factors({
+            "first": (slow, ("first",), lambda: "neutral"),
+            "queued": (slow, ("queued",), lambda: "neutral"),
+        }, deadline_seconds=2, timeouts={"queued": 0.05}, max_parallel=1)
+
+        time.sleep(0.3)
+        self.assertEqual(results, {"first": "first", "queued": "neutral"})
+        self.assertEqual(meta["fallbacks"], ["queued"])
+        self.assertEqual(ran, ["first"])
+
+
+class RouteMatrixTests(SimpleTestCase):
+    @override_settings(GOOGLE_MAPS_API_KEY="test-key")
+    @patch("helpers.route_cache.cache")
+    @patch("helpers.order_utils.requests.post")
+    def test_one_matrix_request_for_uncached_origins(self, post, cache):
+        cache.get_many.return_value = {}
+        post.return_value = Mock(status_code=200, json=Mock(return_value=[
+            {"originIndex": 0, "destinationIndex": 0, "distanceMeters": 2500, "condition": "ROUTE_EXISTS"},
+            {"originIndex": 1, "destinationIndex": 0, "condition": "ROUTE_NOT_FOUND"},
+        ]))
+
+        with patch.object(type(DeliveryConfig), "ROUTE_TRAVEL_MODE", "DRIVE"):
+            distances = get_road_distance_matrix_km([(6.52, 3.37), (6.53, 3.38)], 6.54, 3.39)
+
+        self.assertEqual(distances, [2.5, None])
+        post.assert_called_once()
+        self.assertEqual(len(post.call_args.kwargs["json"]["origins"]), 2)
+        cache.set_many.assert_called_once()
+
+
+class RouteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = {}
+        patcher = patch("helpers.route_cache.cache")
+        self.remote = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.remote.get.side_effect = self.cache.get
+        self.remote.set.side_effect = lambda key, value, timeout=None: self.cache.__setitem__(key, value)
+        self.remote.add.return_value = True
+
+    def test_geohash_matches_reference_encoding(self):
+        self.assertEqual(route_cache.geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        lat, lon = route_cache.geohash_center("u4pruydqqvj")
+        self.assertAlmostEqual(lat, 57.64911, places=4)
+        self.assertAlmostEqual(lon, 10.40744, places=4)
+
+    def test_nearby_points_share_a_cell_entry(self):
+        route_cache.set_route_km("DRIVE", 6.524410, 3.379210, 6.601800, 3.351500, 9.8)
+
+        self.assertEqual(route_cache.get_route_km("DRIVE", 6.524430, 3.379190, 6.601810, 3.351520), 9.8)
+
+    @patch("helpers.tasks.refresh_route_distance")
+    def test_stale_entry_is_served_and_refreshed_in_background(self, refresh):
+        route_cache.set_route_km("DRIVE", 6.5244, 3.3792, 6.6018, 3.3515, 9.8)
+        for entry in self.cache.values():
+            entry["fresh_until"] = time.time() - 1
+
+        self.assertEqual(route_cache.get_route_km("DRIVE", 6.5244, 3.3792, 6.6018, 3.3515), 9.8)
+        refresh.delay.assert_called_once()
+
+
+class ZoneIndexTests(SimpleTestCase):
+    def setUp(self):
+        square = [[6.50, 3.30], [6.50, 3.40], [6.60, 3.40], [6.60, 3.30]]
+        inner = [[6.52, 3.32], [6.52, 3.34], [6.54, 3.34], [6.54, 3.32]]
+        self.outer = SimpleNamespace(pk="outer", name="A Outer", boundary=square)
+        self.inner = SimpleNamespace(pk="inner", name="B Inner", boundary=inner)
+        self.broken = SimpleNamespace(pk="broken", name="C Broken", boundary=[[1, 2]])
+        self.index = ZoneIndex(
+            [self.outer, self.inner, self.broken],
+            gate_passes={"inner": SimpleNamespace(gate_fee_bike=500)},
+        )
+
+    def test_first_matching_zone_in_order_wins(self):
+        self.assertIs(self.index.zone_for(6.53, 3.33), self.outer)
+        self.assertIs(self.index.zone_for("6.58", "3.38"), self.outer)
+
+    def test_points_outside_every_zone_or_invalid(self):
+        self.assertIsNone(self.index.zone_for(6.70, 3.33))
+        self.assertIsNone(self.index.zone_for("not-a-number", 3.33))
+        self.assertEqual(len(self.index), 2)
+
+    def test_wide_zones_are_still_found(self):
+        huge = SimpleNamespace(pk="huge", name="Nigeria", boundary=[[4, 2], [4, 15], [14, 15], [14, 2]])
+        index = ZoneIndex([huge])
+
+        self.assertIs(index.zone_for(9.06, 7.49), huge)
+
+    def test_gate_pass_lookup(self):
+        self.assertEqual(self.index.gate_pass_for("inner").gate_fee_bike, 500)
+        self.assertIsNone(self.index.gate_pass_for("outer"))
+
+
+class ZoneAliasMatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.ajah = SimpleNamespace(pk="ajah", name="Ajah (Sangotedo)")
+        self.lekki = SimpleNamespace(pk="lekki", name="Lekki")
+        self.lekki_one = SimpleNamespace(pk="lekki-one", name="Lekki Phase 1 (Admiralty)")
+        self.matcher = ZoneAliasMatcher([self.ajah, self.lekki, self.lekki_one])
+
+    def test_aliases_match_whole_words_only(self):
+        self.assertIs(self.matcher.zone_for("12 Admiralty Way", "Lagos"), self.lekki_one)
+        self.assertIs(self.matcher.zone_for("Sangotedo, Ajah"), self.ajah)
+        self.assertIsNone(self.matcher.zone_for("Lekkiville Estate"))
+        self.assertIsNone(self.matcher.zone_for("", None))
+
+    def test_earliest_zone_wins_even_for_nested_aliases(self):
+        # "lekki" and "lekki phase 1" both start at the same word; the
+        # zone that comes first in order is returned, as the per-zone scan did.
+        self.assertIs(self.matcher.zone_for("Lekki Phase 1, Lagos"), self.lekki)
+        self.assertIs(self.matcher.zone_for("Admiralty Way off Ajah road"), self.ajah)
+
+    def test_results_are_memoized_per_normalized_text(self):
+        self.assertIs(self.matcher.zone_for("LEKKI!!"), self.lekki)
+        with patch.object(self.matcher, "_position_for") as position_for:
+            self.assertIs(self.matcher.zone_for("lekki"), self.lekki)
+        position_for.assert_not_called()
+
+    def test_zone_index_matches_text_over_all_active_zones(self):
+        square = [[6.40, 3.40], [6.40, 3.50], [6.50, 3.50], [6.50, 3.40]]
+        lekki = SimpleNamespace(pk="lekki", name="Lekki", boundary=square)
+        index = ZoneIndex([lekki, SimpleNamespace(pk="yaba", name="Yaba", boundary=None)])
+
+        self.assertEqual(index.zone_for_text("Herbert Macaulay Way, Yaba").pk, "yaba")
+
+
+class ServiceChargeIndexTests(SimpleTestCase):
+    def _tier(self, vendor_id, min_price, max_price, flat_charge, category_id=1):
+        return {
+            "system_category_id": category_id,
+            "vendor_id": vendor_id,
+            "min_price": Decimal(min_price),
+            "max_price": Decimal(max_price) if max_price is not None else None,
+            "flat_charge": Decimal(flat_charge),
+        }
+
+    def setUp(self):
+        self.index = ServiceChargeIndex([
+            self._tier(None, "0", "999.99", "50"),
+            self._tier(None, "1000", "4999.99", "100"),
+            self._tier(None, "5000", None, "250"),
+            self._tier("vendor-a", "1000", "1999.99", "0"),
+        ])
+
+    def test_category_default_intervals(self):
+        self.assertEqual(self.index.charge_for(1, Decimal("999.99")), Decimal("50"))
+        self.assertEqual(self.index.charge_for(1, Decimal("1000")), Decimal("100"))
+        self.assertEqual(self.index.charge_for(1, 250000), Decimal("250"))
+        self.assertEqual(self.index.charge_for(2, Decimal("1000")), Decimal("0.00"))
+
+    def test_vendor_tier_overrides_default_even_when_zero(self):
+        self.assertEqual(self.index.charge_for(1, Decimal("1500"), vendor_id="vendor-a"), Decimal("0"))
+        self.assertEqual(self.index.charge_for(1, Decimal("2500"), vendor_id="vendor-a"), Decimal("100"))
+
+    def test_gaps_fall_back_to_a_wider_lower_tier(self):
+        index = ServiceChargeIndex([
+            self._tier(None, "0", None, "20"),
+            self._tier(None, "500", "600", "70"),
+        ])
+
+        self.assertEqual(index.charge_for(1, Decimal("550")), Decimal("70"))
+        self.assertEqual(index.charge_for(1, Decimal("700")), Decimal("20"))
+
+
+class RiderLocationIngestTests(SimpleTestCase):
+    def _rider(self, is_online=True):
+        return Mock(pk="rider-1", is_online=is_online)
+
+    @patch("helpers.rider_location.get_redis_client")
+    def test_first_ping_in_window_is_persisted_with_update_fields(self, get_client):
+        pipe = get_client.return_value.pipeline.return_value
+        pipe.execute.return_value = [1, True, 1, 1, True]
+        rider = self._rider()
+
+        position = ingest_rider_location(rider, "6.5244", "3.3792", speed=12.5, heading=90)
+
+        rider.save.assert_called_once_with(update_fields=LOCATION_UPDATE_FIELDS)
+        pipe.hset.assert_called_once()
+        self.assertEqual(pipe.hset.call_args.kwargs["mapping"]["speed"], 12.5)
+        pipe.execute_command.assert_called_once_with("GEOADD", "riders:geo", 3.3792, 6.5244, "rider-1")
+        self.assertEqual(position.heading, 90.0)
+        self.assertEqual(rider.location_updated_at, position.recorded_at)
+
+    @patch("helpers.rider_location.get_redis_client")
+    def test_later_pings_in_window_only_touch_redis(self, get_client):
+        pipe = get_client.return_value.pipeline.return_value
+        pipe.execute.return_value = [1, True, None]
+        rider = self._rider(is_online=False)
+
+        ingest_rider_location(rider, 6.5, 3.3)
+
+        rider.save.assert_not_called()
+        pipe.execute_command.assert_not_called()
+        self.assertEqual(rider.current_latitude, 6.5)
+
+    @patch("helpers.rider_location.get_redis_client", return_value=None)
+    def test_without_redis_every_ping_is_persisted(self, _get_client):
+        rider = self._rider()
+
+        ingest_rider_location(rider, 6.5, 3.3)
+
+        rider.save.assert_called_once_with(update_fields=LOCATION_UPDATE_FIELDS)
+
+    @patch("helpers.rider_location.get_redis_client")
+    def test_position_is_read_back_from_the_hash(self, get_client):
+        get_client.return_value.hgetall.return_value = {
+            b"lat": b"6.5", b"lon": b"3.3", b"ts": b"1700000000.0", b"heading": b"180",
+        }
+
+        position = get_rider_position("rider-1")
+
+        self.assertEqual((position.latitude, position.longitude, position.heading), (6.5, 3.3, 180.0))
+        self.assertIsNone(position.speed)
+        self.assertEqual(position.recorded_at.timestamp(), 1700000000.0)
+
+    @patch("helpers.rider_location.get_redis_client")
+    def test_current_location_prefers_redis_over_the_persisted_columns(self, get_client):
+        get_client.return_value.hgetall.return_value = {b"lat": b"6.6", b"lon": b"3.4", b"ts": b"1700000000.0"}
+        rider = Mock(pk="rider-1", current_latitude="6.5", current_longitude="3.3", location_updated_at=None)
+
+        latitude, longitude, updated_at = current_rider_location(rider)
+
+        self.assertEqual((latitude, longitude), (6.6, 3.4))
+        self.assertEqual(updated_at.timestamp(), 1700000000.0)
+
+    @patch("helpers.rider_location.get_redis_client")
+    def test_current_location_falls_back_to_the_persisted_columns(self, get_client):
+        get_client.return_value.hgetall.return_value = {}
+        rider = Mock(pk="rider-1", current_latitude="6.5", current_longitude="3.3", location_updated_at=None)
+
+        self.assertEqual(current_rider_location(rider), (6.5, 3.3, None))
+
+
+class RiderGeoSearchTests(SimpleTestCase):
+    @patch("helpers.redis_rider_geo.time.time", return_value=1000)
+    @patch("helpers.redis_rider_geo.get_redis_client")
+    def test_one_script_call_covers_every_band(self, get_client, _time):
+        redis_client = get_client.return_value
+        script = redis_client.register_script.return_value
+        script.return_value = [b"near", b"0.8000", b"far", b"21.5000"]
+
+        nearby = geo_nearby_rider_ids(6.5, 3.3, [3, 8, 15, 25])
+
+        self.assertEqual(nearby, [("near", 0.8), ("far", 21.5)])
+        script.assert_called_once_with(
+            keys=[RIDER_GEO_KEY, RIDER_GEO_FRESHNESS_KEY],
+            args=[3.3, 6.5, 25, 1000 - 120],
+        )
+        redis_client.georadius.assert_not_called()
+        redis_client.zrangebyscore.assert_not_called()
+
+    @patch("helpers.redis_rider_geo.get_redis_client")
+    def test_script_failure_falls_back_to_database(self, get_client):
+        get_client.return_value.register_script.return_value.side_effect = RuntimeError("unknown command")
+
+        self.assertIsNone(geo_nearby_rider_ids(6.5, 3.3, [3, 8]))
+
+
+class OpenOrderIndexTests(SimpleTestCase):
+    def _order(self, status="looking_for_rider", rider_id=None):
+        return SimpleNamespace(
+            id="order-1",
+            status=status,
+            rider_id=rider_id,
+            created_at=None,
+            vendor=SimpleNamespace(location_latitude="6.5", location_longitude="3.3"),
+        )
+
+    @patch("helpers.redis_open_orders.get_redis_client")
+    def test_open_orders_are_indexed_at_the_vendor(self, get_client):
+        pipe = get_client.return_value.pipeline.return_value
+
+        self.assertTrue(sync_open_order(self._order()))
+
+        pipe.execute_command.assert_called_once_with("GEOADD", OPEN_ORDER_GEO_KEY, 3.3, 6.5, "order-1")
+        pipe.zrem.assert_not_called()
+
+    @patch("helpers.redis_open_orders.get_redis_client")
+    def test_claimed_orders_are_removed(self, get_client):
+        pipe = get_client.return_value.pipeline.return_value
+
+        sync_open_order(self._order(status="rider_assigned", rider_id="rider-1"))
+
+        pipe.execute_command.assert_not_called()
+        pipe.zrem.assert_any_call(OPEN_ORDER_GEO_KEY, "order-1")
+        pipe.zrem.assert_any_call(OPEN_ORDER_CREATED_KEY, "order-1")
+
+    @patch("helpers.redis_open_orders.get_redis_client")
+    def test_search_returns_distance_and_creation_time(self, get_client):
+        get_client.return_value.register_script.return_value.return_value = [b"order-1", b"2.5000", b"1700000000"]
+
+        self.assertEqual(nearby_open_orders(6.5, 3.3, 35), [("order-1", 2.5, 1700000000)])
+
+
+class TrackingRoomTests(SimpleTestCase):
+    @patch("helpers.redis_tracking_rooms.get_redis_client")
+    def test_claim_checks_all_rooms_in_one_script_call(self, get_client):
+        script = get_client.return_value.register_script.return_value
+        script.return_value = [b"order-2"]
+
+        due = claim_tracking_broadcasts(["order-1", "order-2"], 1)
+
+        self.assertEqual(due, {"order-2"})
+        script.assert_called_once_with(
+            keys=["tracking:subs:order-1", "tracking:sent:order-1", "tracking:subs:order-2", "tracking:sent:order-2"],
+            args=[1000, "order-1", "order-2"],
+        )
+
+    @patch("helpers.redis_tracking_rooms.get_redis_client", return_value=None)
+    def test_claim_without_redis_returns_none(self, get_client):
+        self.assertIsNone(claim_tracking_broadcasts(["order-1"], 1))
+
+    def test_local_throttle_allows_one_claim_per_interval(self):
+        now = [100.0]
+        throttle = TrackingThrottle(clock=lambda: now[0])
+
+        self.assertTrue(throttle.claim("order-1", 1))
+        self.assertFalse(throttle.claim("order-1", 1))
+        self.assertTrue(throttle.claim("order-2", 1))
+        now[0] += 1
+        self.assertTrue(throttle.claim("order-1", 1))
+
+
+class PushFanoutTests(TestCase):
+    def setUp(self):
+        from account.models import FCMToken, User
+
+        self.riders = [
+            User.objects.create_user(email=f"fanout-rider-{index}@example.com", password="password", role="rider")
+            for index in range(3)
+        ]
+        FCMToken.objects.create(user=self.riders[0], token="token-a", device_id="a")
+        FCMToken.objects.create(user=self.riders[0], token="token-b", device_id="b")
+        FCMToken.objects.create(user=self.riders[1], token="token-c", device_id="c")
+        FCMToken.objects.create(user=self.riders[1], token="token-old", device_id="old", is_active=False)
+
+    def fake_multicast(self, failures):
+        batches = []
+
+        def multicast(tokens, title, body, data, image_url):
+            batches.append(list(tokens))
+            responses = [
+                SimpleNamespace(success=False, message_id=None, exception=failures[token])
+                if token in failures else
+                SimpleNamespace(success=True, message_id=f"msg-{token}", exception=None)
+                for token in tokens
+            ]
+            return SimpleNamespace(responses=responses)
+
+        return batches, multicast
+
+    def test_tokens_are_loaded_once_and_sent_in_batches(self):
+        from account.models import FCMToken, PushNotificationLog
+        from firebase_admin import exceptions, messaging
+
+        batches, multicast = self.fake_multicast({
+            "token-a": messaging.UnregisteredError("gone"),
+            "token-c": exceptions.UnavailableError("try later"),
+        })
+        user_ids = [rider.pk for rider in self.riders]
+
+        with patch.object(push_fanout, "FCM_MULTICAST_LIMIT", 2), \
+                patch.object(push_fanout, "_multicast", side_effect=multicast):
+            with self.assertNumQueries(3):  # tokens, bulk log insert, deactivation
+                stats = push_fanout.send_push_to_users(user_ids, "New order!", "Pick it up", {"order_id": 7})
+
+        self.assertEqual(sorted(token for batch in batches for token in batch), ["token-a", "token-b", "token-c"])
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(stats["recipients"], 2)
+        self.assertEqual(stats["delivered"], 1)
+        self.assertEqual(stats["deactivated"], 1)
+
+        logs = {log.user_id: log for log in PushNotificationLog.objects.all()}
+        self.assertEqual(set(logs), {self.riders[0].pk, self.riders[1].pk})
+        self.assertEqual(logs[self.riders[0].pk].status, "sent")
+        self.assertEqual(logs[self.riders[0].pk].firebase_message_id, "msg-token-b")
+        self.assertEqual(logs[self.riders[1].pk].status, "failed")
+        self.assertEqual(
+            set(FCMToken.objects.filter(is_active=True).values_list("token", flat=True)),
+            {"token-b", "token-c"},
+        )
+
+    def test_enqueue_runs_the_task_after_commit(self):
+        with patch.object(push_fanout, "send_push_to_users") as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                push_fanout.enqueue_push_fanout([self.riders[0].pk, None], "Title", "Body", {"n": 1})
+
+        send.assert_called_once_with([str(self.riders[0].pk)], "Title", "Body", {"n": "1"}, None)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        from account.models import FCMToken, User
+
+        self.users = [
+            User.objects.create_user(email=f"outbox-user-{index}@example.com", password="password")
+            for index in range(3)
+        ]
+        FCMToken.objects.create(user=self.users[0], token="token-a", device_id="a")
+        FCMToken.objects.create(user=self.users[1], token="token-b", device_id="b")
+
+    def multicast(self, failures=None):
+        failures = failures or {}
+        batches = []
+
+        def send(tokens, title, body, data, image_url):
+            batches.append((list(tokens), title, body))
+            return SimpleNamespace(responses=[
+                SimpleNamespace(success=False, message_id=None, exception=failures[token])
+                if token in failures else
+                SimpleNamespace(success=True, message_id=f"msg-{token}", exception=None)
+                for token in tokens
+            ])
+
+        return batches, send
+
+    def test_helper_queues_instead_of_sending_and_drops_duplicates(self):
+        from account.models import PushNotificationOutbox
+        from helpers.push_notification import notification_helper
+
+        with patch.object(push_fanout, "_multicast") as send:
+            first = notification_helper.send_to_user_async(
+                self.users[0], "Paid", "Payment received", {"order_id": 1}, dedup_key="payment_success:1")
+            second = notification_helper.send_to_user_async(
+                self.users[0], "Paid", "Payment received", {"order_id": 1}, dedup_key="payment_success:1")
+
+        send.assert_not_called()
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        row = PushNotificationOutbox.objects.get()
+        self.assertEqual((row.status, row.data), ("pending", {"order_id": "1"}))
+
+    def test_coalesce_key_replaces_the_pending_push(self):
+        from account.models import PushNotificationOutbox
+
+        notification_outbox.queue_push(self.users[0], "Order Confirmed!", "Accepted", coalesce_key="order_status:9")
+        notification_outbox.queue_push(self.users[0], "Order Shipped!", "On the way", coalesce_key="order_status:9")
+        notification_outbox.queue_push(self.users[1], "Order Shipped!", "On the way", coalesce_key="order_status:9")
+
+        rows = PushNotificationOutbox.objects.order_by("created_at")
+        self.assertEqual(
+            [(row.user_id, row.title) for row in rows],
+            [(self.users[0].pk, "Order Shipped!"), (self.users[1].pk, "Order Shipped!")],
+        )
+
+    def test_coalesced_push_still_deduplicates_its_retries(self):
+        from account.models import PushNotificationOutbox
+
+        notification_outbox.queue_push(
+            self.users[0], "Almost there", "Rider is near", coalesce_key="order_status:9",
+            dedup_key="near_delivery:9")
+        notification_outbox.queue_push(
+            self.users[0], "Delivered", "Enjoy", coalesce_key="order_status:9", dedup_key="order_delivered:9")
+        PushNotificationOutbox.objects.filter(status="pending").update(status="sent")
+
+        retried = notification_outbox.queue_push(
+            self.users[0], "Delivered", "Enjoy", coalesce_key="order_status:9", dedup_key="order_delivered:9")
+
+        self.assertIsNone(retried)
+        self.assertEqual(PushNotificationOutbox.objects.filter(status="sent").get().title, "Delivered")
+        self.assertFalse(PushNotificationOutbox.objects.filter(status="pending").exists())
+
+    def test_bulk_queue_without_keys_is_one_insert(self):
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            queued = notification_outbox.queue_push_to_users(
+                self.users + [self.users[0]], "Hello", "Everyone")
+
+        self.assertEqual(queued, 3)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_drain_sends_groups_and_settles_each_row(self):
+        from account.models import PushNotificationOutbox
+        from firebase_admin import exceptions
+
+        notification_outbox.queue_push_to_users(self.users, "Hello", "Everyone")
+        batches, send = self.multicast({"token-b": exceptions.UnavailableError("try later")})
+
+        with patch.object(push_fanout, "_multicast", side_effect=send):
+            totals = notification_outbox.drain_outbox()
+
+        self.assertEqual(len(batches), 1)
+        self.assertEqual(sorted(batches[0][0]), ["token-a", "token-b"])
+        self.assertEqual(totals, {"claimed": 3, "sent": 1, "skipped": 1, "retried": 1, "failed": 0})
+
+        rows = {row.user_id: row for row in PushNotificationOutbox.objects.all()}
+        self.assertEqual(rows[self.users[0].pk].status, "sent")
+        self.assertIsNotNone(rows[self.users[0].pk].sent_at)
+        self.assertEqual(rows[self.users[2].pk].status, "skipped")
+        retry = rows[self.users[1].pk]
+        self.assertEqual((retry.status, retry.attempts), ("pending", 1))
+        self.assertGreater(retry.next_attempt_at, timezone.now())
+
+        # Not due yet, so a second drain leaves it alone.
+        with patch.object(push_fanout, "_multicast", side_effect=send):
+            self.assertEqual(notification_outbox.drain_outbox()["claimed"], 0)
+
+    @override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=1)
+    def test_gives_up_after_max_attempts(self):
+        from account.models import PushNotificationOutbox
+        from firebase_admin import exceptions
+
+        notification_outbox.queue_push(self.users[1], "Hello", "You")
+        _batches, send = self.multicast({"token-b": exceptions.UnavailableError("try later")})
+
+        with patch.object(push_fanout, "_multicast", side_effect=send):
+            totals = notification_outbox.drain_outbox()
+
+        self.assertEqual(totals["failed"], 1)
+        row = PushNotificationOutbox.objects.get()
+        self.assertEqual(row.status, "failed")
+        self.assertIn("try later", row.last_error)
+
+    def test_stats_report_queue_depth(self):
+        notification_outbox.queue_push(self.users[0], "Hello", "You")
+
+        stats = notification_outbox.outbox_stats()
+
+        self.assertEqual(stats["queue_depth"], 1)
+        self.assertGreaterEqual(stats["oldest_pending_seconds"], 0)
@@ -117,6 +117,12 @@ def validate_cache_timeout(value: Any) -> None:
         raise ValidationError("Cache timeout should not exceed 24 hours (86400 seconds)")
 
 
+def validate_geohash_precision(value: Any) -> None:
+    """Validate a geohash length used for spatial cache bucketing."""
+    if not isinstance(value, int) or not (4 <= value <= 9):
+        raise ValidationError("Geohash precision must be an integer between 4 and 9")
+
+
 def validate_weight_tiers(value: Any) -> None:
     """Validate weight tiers configuration."""
     if not isinstance(value, list):
@@ -162,6 +168,8 @@ VALIDATION_FUNCTIONS = {
     'free_weight_threshold_kg': validate_non_negative_number,
     'weight_surcharge_per_kg': validate_non_negative_number,
     'route_cache_timeout': validate_cache_timeout,
+    'route_cache_stale_timeout': validate_positive_number,
+    'route_cache_geohash_precision': validate_geohash_precision,
     'weather_cache_timeout': validate_cache_timeout,
     'traffic_cache_timeout': validate_cache_timeout,
     'rider_cache_timeout': validate_cache_timeout,
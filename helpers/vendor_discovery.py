@@ -3,13 +3,14 @@ Vendor discovery helpers shared across all vendor views.
 
 Ordering guarantee (nearest-first):
   1. Redis GEORADIUS  — O(log N + M), zero Python loops, scales to millions of vendors
-  2. Haversine fallback — used only when Redis is unreachable
+  2. Haversine fallback — used only when Redis is unreachable; one batched pass
+     over the cached vendor coordinate array (helpers/geo_distance.py)
 """
 
 from django.db.models import Count, Q
 
 from account.models import Address, Vendor
-from helpers.order_utils import get_distance_between_two_location
+from helpers.geo_distance import CoordinateArray, vendor_coordinate_array
 from helpers.redis_geo import geo_nearby_vendor_ids, BROWSE_RADIUS_KM, SEARCH_RADIUS_KM
 
 
@@ -152,25 +153,28 @@ def filter_and_sort_vendors_by_distance(
         # cache/index problem can never make every vendor disappear.
 
     # --- Path 2: Haversine fallback (Redis down) ---
+    # One vectorised pass over the cached coordinates of every geo-eligible
+    # vendor, plus a second small pass for any listed vendor not in that cache
+    # (e.g. approved since the last refresh). Applies the same endpoint radius
+    # cap as Redis would.
+    cached_coordinates = vendor_coordinate_array()
+    distances = cached_coordinates.within(user_latitude, user_longitude, radius_km)
+    uncached = [vendor for vendor in vendor_list if str(vendor.id) not in cached_coordinates]
+    if uncached:
+        distances.update(
+            CoordinateArray(
+                (vendor.id for vendor in uncached),
+                (vendor.location_latitude for vendor in uncached),
+                (vendor.location_longitude for vendor in uncached),
+            ).within(user_latitude, user_longitude, radius_km)
+        )
+
     vendors_with_distance = []
     for vendor in vendor_list:
-        try:
-            distance = get_distance_between_two_location(
-                lat1=user_latitude,
-                lon1=user_longitude,
-                lat2=float(vendor.location_latitude),
-                lon2=float(vendor.location_longitude),
-            )
-        except (TypeError, ValueError):
-            continue
-
+        distance = distances.get(str(vendor.id))
         if distance is None:
             continue
 
-        # Apply the same endpoint radius cap as Redis would.
-        if distance > radius_km:
-            continue
-
         if enforce_delivery_radius and distance > float(vendor.delivery_radius_km):
             continue
 
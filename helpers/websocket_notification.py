@@ -1,19 +1,25 @@
+from contextlib import contextmanager
 from typing import Optional
 from channels.layers import get_channel_layer
 from account.models import Rider
 from asgiref.sync import async_to_sync
+from django.db import connection
 from django.db.models import Count, Q
 from django.utils import timezone
 import logging
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta
 
+from helpers.geo_distance import CoordinateArray
 from helpers.order_utils import get_distance_between_two_location
+from helpers.redis_open_orders import OPEN_ORDER_STATUSES, nearby_open_orders
 from helpers.redis_rider_geo import (
     RIDER_GEO_FRESHNESS_SECONDS,
     geo_nearby_rider_ids,
 )
-from product.models import Order
+from product.models import DeclinedOrder, Order
 from helpers.push_notification import notification_helper
 from rider.serializers import OrderSerializer
 
@@ -27,15 +33,84 @@ ORDER_DISPATCH_RADIUS_STEPS_KM = (
 ORDER_DISPATCH_NEIGHBOURHOOD_RADII_KM = (3, 8, 15, 25, 35)
 
 
-def get_order_dispatch_radius_km(order: Order) -> int:
-    anchor_time = order.created_at or order.updated_at or timezone.now()
-    age_seconds = max(0, (timezone.now() - anchor_time).total_seconds())
+class DispatchCostStats:
+    """
+    Per-path cost of get_candidate_riders_for_order: calls, SQL queries,
+    wall time and riders considered vs. returned.
+
+    Candidate selection used to run one or two queries per nearby rider, so
+    its cost grew with rider density; these counters show it staying flat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def record(self, path: str, queries: int, elapsed_ms: float, considered: int, candidates: int) -> None:
+        with self._lock:
+            entry = self._paths.setdefault(path, {
+                "calls": 0, "queries": 0, "max_queries": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "considered": 0, "candidates": 0,
+            })
+            entry["calls"] += 1
+            entry["queries"] += queries
+            entry["max_queries"] = max(entry["max_queries"], queries)
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["considered"] += considered
+            entry["candidates"] += candidates
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for path, entry in self._paths.items():
+                calls = entry["calls"]
+                result[path] = dict(
+                    entry,
+                    total_ms=round(entry["total_ms"], 2),
+                    max_ms=round(entry["max_ms"], 2),
+                    avg_queries=round(entry["queries"] / calls, 2) if calls else 0.0,
+                    avg_ms=round(entry["total_ms"] / calls, 2) if calls else 0.0,
+                )
+            return result
+
+
+_dispatch_cost_stats = DispatchCostStats()
+
+
+def get_dispatch_cost_stats() -> dict:
+    return _dispatch_cost_stats.snapshot()
+
+
+@contextmanager
+def _count_queries():
+    counter = {"queries": 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter["queries"] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def _dispatch_radius_for_age_km(age_seconds: float) -> int:
     for max_age_seconds, radius_km in ORDER_DISPATCH_RADIUS_STEPS_KM:
         if age_seconds <= max_age_seconds:
             return radius_km
     return 35
 
 
+def get_order_dispatch_radius_km(order: Order) -> int:
+    anchor_time = order.created_at or order.updated_at or timezone.now()
+    age_seconds = max(0, (timezone.now() - anchor_time).total_seconds())
+    return _dispatch_radius_for_age_km(age_seconds)
+
+
 def _get_rider_dispatch_coordinates(rider: Rider):
     latitude = rider.current_latitude or rider.location_latitude
     longitude = rider.current_longitude or rider.location_longitude
@@ -66,11 +141,18 @@ def is_order_visible_to_rider(
     *,
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
+    declined: Optional[bool] = None,
 ) -> bool:
+    """
+    ``declined`` lets a caller that already resolved the rider's declined
+    orders in bulk skip the per-rider lookup.
+    """
     if rider.status != 'active' or not rider.is_verified or not rider.is_online:
         return False
 
-    if rider.declined_orders.filter(order_id=order.id).exists():
+    if declined is None:
+        declined = rider.declined_orders.filter(order_id=order.id).exists()
+    if declined:
         return False
 
     coords = (
@@ -94,20 +176,97 @@ def is_order_visible_to_rider(
     return distance is not None and distance <= get_order_dispatch_radius_km(order)
 
 
+def _open_orders_near_from_db(latitude: float, longitude: float, radius_km: float):
+    """nearby_open_orders without Redis: one narrow query, one batched Haversine pass."""
+    rows = list(
+        Order.objects.filter(rider=None, status__in=OPEN_ORDER_STATUSES)
+        .values_list('id', 'created_at', 'vendor__location_latitude', 'vendor__location_longitude')
+    )
+    distances = CoordinateArray.from_rows(
+        (order_id, lat, lon) for order_id, _created_at, lat, lon in rows
+    ).within(latitude, longitude, radius_km)
+    now_ts = int(time.time())
+    hits = []
+    for order_id, created_at, _lat, _lon in rows:
+        distance = distances.get(str(order_id))
+        if distance is not None:
+            hits.append((str(order_id), distance, int(created_at.timestamp()) if created_at else now_ts))
+    hits.sort(key=lambda hit: hit[1])
+    return hits
+
+
+def get_available_order_ids_for_rider(rider: Rider, latitude: float, longitude: float) -> list[str]:
+    """
+    Ids of open orders whose pickup is within their (age-based) dispatch
+    radius of the given point, nearest first.
+
+    Served from the Redis open-order index when available, otherwise from a
+    single query backed by the partial open-order index. The rider's declined
+    orders, marketplace vendors and orders claimed since are filtered in SQL
+    by the caller when it hydrates the page.
+    """
+    if rider.status != 'active' or not rider.is_verified or not rider.is_online:
+        return []
+
+    max_radius_km = max(radius_km for _, radius_km in ORDER_DISPATCH_RADIUS_STEPS_KM)
+    hits = nearby_open_orders(latitude, longitude, max_radius_km)
+    if hits is None:
+        hits = _open_orders_near_from_db(latitude, longitude, max_radius_km)
+
+    now_ts = time.time()
+    return [
+        order_id
+        for order_id, distance, created_ts in hits
+        if distance <= _dispatch_radius_for_age_km(max(0, now_ts - created_ts))
+    ]
+
+
 def get_candidate_riders_for_order(order: Order, exclude_rider: Optional[Rider] = None):
     """
     Return riders eligible to see an available order based on proximity and status,
     ordered by expanding neighbourhood bands around the vendor.
     Marketplace vendor orders are excluded — they require admin assignment.
+
+    Runs a fixed number of queries however many riders are nearby: declined
+    riders are excluded in SQL, and the Redis path trusts the distances the
+    geo search already computed. The cost of each call is logged and
+    aggregated in get_dispatch_cost_stats().
     """
+    started = time.monotonic()
+    with _count_queries() as counter:
+        path, considered, candidates = _select_candidate_riders(order, exclude_rider)
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    _dispatch_cost_stats.record(path, counter["queries"], elapsed_ms, considered, len(candidates))
+    logger.info(
+        "Rider dispatch cost for order %s: path=%s queries=%s elapsed_ms=%.1f considered=%s eligible=%s",
+        order.id,
+        path,
+        counter["queries"],
+        elapsed_ms,
+        considered,
+        len(candidates),
+    )
+    return candidates
+
+
+def _select_candidate_riders(order: Order, exclude_rider: Optional[Rider]):
+    """``(path, riders considered, candidates)`` for get_candidate_riders_for_order."""
     vendor = order.vendor
     if getattr(vendor, 'is_marketplace', False) or vendor.marketplace_set.exists():
-        return []
+        return "marketplace", 0, []
+    if not vendor.location_latitude or not vendor.location_longitude:
+        logger.warning("Vendor %s has no location; no riders to dispatch order %s to", vendor.id, order.id)
+        return "no_vendor_location", 0, []
+    vendor_latitude = float(vendor.location_latitude)
+    vendor_longitude = float(vendor.location_longitude)
 
     riders = Rider.objects.filter(
         status='active',
         is_verified=True,
         is_online=True,
+    ).exclude(
+        id__in=DeclinedOrder.objects.filter(order_id=order.id).values('rider_id'),
     ).select_related('user').annotate(
         active_assignment_count=Count(
             'orders',
@@ -115,36 +274,30 @@ def get_candidate_riders_for_order(order: Order, exclude_rider: Optional[Rider]
             distinct=True,
         )
     )
+    if exclude_rider is not None:
+        riders = riders.exclude(id=exclude_rider.id)
 
     max_radius_km = get_order_dispatch_radius_km(order)
     search_radii = _get_dispatch_search_radii(max_radius_km)
     nearby_geo_ids = geo_nearby_rider_ids(
-        float(order.vendor.location_latitude),
-        float(order.vendor.location_longitude),
+        vendor_latitude,
+        vendor_longitude,
         search_radii,
     )
 
     if nearby_geo_ids is not None:
         stale_before = timezone.now() - timedelta(seconds=RIDER_GEO_FRESHNESS_SECONDS)
-        ordered_ids = [rider_id for rider_id, _ in nearby_geo_ids]
+        ordered_ids = [rider_id for rider_id, distance in nearby_geo_ids if distance <= max_radius_km]
         riders_by_id = {
             str(r.id): r
             for r in riders.filter(
                 id__in=ordered_ids,
                 location_updated_at__gte=stale_before,
             )
-        }
+        } if ordered_ids else {}
 
-        candidates = []
-        for rider_id, distance in nearby_geo_ids:
-            rider = riders_by_id.get(rider_id)
-            if rider is None:
-                continue
-            if exclude_rider is not None and rider.id == exclude_rider.id:
-                continue
-            if not is_order_visible_to_rider(order, rider):
-                continue
-            candidates.append(rider)
+        # nearby_geo_ids is already in band/distance order.
+        candidates = [riders_by_id[rider_id] for rider_id in ordered_ids if rider_id in riders_by_id]
         logger.debug(
             "Rider dispatch using Redis geo for order %s: radius=%skm nearby=%s eligible=%s",
             order.id,
@@ -153,35 +306,34 @@ def get_candidate_riders_for_order(order: Order, exclude_rider: Optional[Rider]
             len(candidates),
         )
         if candidates:
-            return candidates
+            return "redis", len(nearby_geo_ids), candidates
         logger.debug(
             "Redis returned no eligible riders for order %s; falling back to DB scan",
             order.id,
         )
 
-    candidates = []
+    fallback_riders = []
     for rider in riders:
-        if exclude_rider is not None and rider.id == exclude_rider.id:
-            continue
-
-        if rider.declined_orders.filter(order_id=order.id).exists():
-            continue
-
         coords = _get_rider_dispatch_coordinates(rider)
         if coords is None:
             continue
+        fallback_riders.append((rider, coords))
+
+    # One batched Haversine pass for every remaining rider.
+    distances = CoordinateArray(
+        (rider.id for rider, _ in fallback_riders),
+        (coords[0] for _, coords in fallback_riders),
+        (coords[1] for _, coords in fallback_riders),
+    ).within(
+        vendor_latitude,
+        vendor_longitude,
+        max_radius_km,
+    )
 
-        try:
-            distance = get_distance_between_two_location(
-                lat1=coords[0],
-                lon1=coords[1],
-                lat2=float(order.vendor.location_latitude),
-                lon2=float(order.vendor.location_longitude),
-            )
-        except (TypeError, ValueError):
-            continue
-
-        if distance is None or distance > max_radius_km:
+    candidates = []
+    for rider, _ in fallback_riders:
+        distance = distances.get(str(rider.id))
+        if distance is None:
             continue
 
         candidates.append(
@@ -199,7 +351,7 @@ def get_candidate_riders_for_order(order: Order, exclude_rider: Optional[Rider]
         max_radius_km,
         len(candidates),
     )
-    return [rider for _, _, rider in candidates]
+    return "database", len(fallback_riders), [rider for _, _, rider in candidates]
 
 
 def notify_order_unavailable_to_riders(order: Order, accepted_rider: Optional[Rider] = None):
@@ -255,7 +407,8 @@ def send_order_status_update_notification(order: Order, status: str, message: Op
                 "type": "order_status_update",
                 "order_id": str(order.id),
                 "status": status,
-            }
+            },
+            coalesce_key=f"order_status:{order.id}",
         )
     except Exception as e:
         print(f"Push notification error: {e}")
@@ -421,7 +574,8 @@ def send_order_accepted_notification_customer(order:Order):
                     "type": "order_status_update",
                     "order_id": str(order.id),
                     "status": "confirmed",
-                }
+                },
+                coalesce_key=f"order_status:{order.id}",
             )
         except Exception as e:
             print(f"Push notification error: {e}")
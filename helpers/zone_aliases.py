@@ -0,0 +1,87 @@
+"""
+Match free-text addresses to delivery zones by name.
+
+The admin analytics views label an address with a delivery zone when its
+coordinates do not fall inside one but its text mentions the zone, e.g.
+"12 Admiralty Way, Lekki" for a zone named "Lekki Phase 1 (Lekki)". They used
+to re-normalize every zone name, rebuild its alias list and compile a fresh
+``\\b<alias>\\b`` regex per alias per zone for every row. Instead:
+
+- ZoneAliasMatcher builds one alternation over every alias of every zone,
+  once per zone set (ZoneIndex builds it lazily, so it is rebuilt whenever
+  the zone index is). Alternatives are ordered by zone priority and the
+  pattern is a zero-width lookahead tried at every word start, so each
+  position reports the highest-priority alias starting there, including
+  aliases that overlap or nest. The lowest zone position across those hits
+  is the same zone the old per-zone loop returned.
+- Results are memoized per normalized address text; analytics rows repeat
+  the same city/area strings thousands of times.
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+MAX_CACHED_TEXTS = 20000
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+_BRACKETED = re.compile(r'\((.*?)\)')
+
+
+def normalize_area_text(value) -> str:
+    return _NON_ALNUM.sub(' ', str(value or '').lower()).strip()
+
+
+def zone_aliases(name) -> List[str]:
+    """The full name, the name before any bracket, and each bracketed alias, normalized."""
+    name = str(name or '')
+    aliases = [normalize_area_text(name), normalize_area_text(name.split('(')[0])]
+    aliases.extend(normalize_area_text(alias) for alias in _BRACKETED.findall(name))
+    return [alias for alias in aliases if alias]
+
+
+class ZoneAliasMatcher:
+    """First zone (in the given order) with an alias appearing as whole words in a text."""
+
+    def __init__(self, zones: Iterable):
+        self._zones = list(zones)
+        self._priority: Dict[str, int] = {}
+        for position, zone in enumerate(self._zones):
+            for alias in zone_aliases(zone.name):
+                self._priority.setdefault(alias, position)
+
+        self._pattern = None
+        if self._priority:
+            alternation = '|'.join(
+                re.escape(alias)
+                for alias, _position in sorted(self._priority.items(), key=lambda item: item[1])
+            )
+            self._pattern = re.compile(rf'\b(?=({alternation})\b)')
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Optional[int]] = {}
+
+    def _position_for(self, haystack: str) -> Optional[int]:
+        best = None
+        for match in self._pattern.finditer(haystack):
+            position = self._priority[match.group(1)]
+            if best is None or position < best:
+                best = position
+                if best == 0:
+                    break
+        return best
+
+    def zone_for(self, *values):
+        haystack = normalize_area_text(' '.join(str(value or '') for value in values))
+        if not haystack or self._pattern is None:
+            return None
+
+        try:
+            position = self._cache[haystack]
+        except KeyError:
+            position = self._position_for(haystack)
+            with self._lock:
+                if len(self._cache) >= MAX_CACHED_TEXTS:
+                    self._cache.clear()
+                self._cache[haystack] = position
+        return self._zones[position] if position is not None else None
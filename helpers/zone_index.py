@@ -0,0 +1,180 @@
+"""
+In-process spatial index of active delivery zones.
+
+check_address_in_zone and DeliveryZone.get_zone_for_location used to query
+every active DeliveryZone and ray-cast each boundary on every call, and
+calculate_delivery_price_v2 then queried EstateGatePass on top. Zone pricing
+runs for every marketplace quote and Rider.get_current_zone for every
+dispatch decision, so that was a table scan per request.
+
+ZoneIndex loads the zones and their gate passes once per process:
+
+- every polygon is parsed once into float tuples with a bounding box;
+- a uniform grid (GRID_CELL_DEGREES, ~1.1 km) maps each cell to the zones
+  whose bounding box overlaps it, so a lookup ray-casts only a handful of
+  candidates; zones covering more than MAX_CELLS_PER_ZONE cells are kept in a
+  short always-checked list instead of flooding the grid;
+- candidates are tried in the same order as DeliveryZone's default ordering,
+  so the first match is the same zone the linear scan returned.
+
+zone_for_text matches address text against zone names with a
+ZoneAliasMatcher (helpers/zone_aliases.py), compiled on first use and so
+rebuilt together with the index.
+
+The index lives in a ConfigSnapshot: it expires after
+DELIVERY_ZONE_INDEX_TTL_SECONDS and is dropped on every worker when a zone or
+gate pass is saved or deleted (product/signals.py publishes on
+ZONE_INVALIDATION_CHANNEL).
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from helpers.config_snapshot import ConfigSnapshot, ensure_invalidation_listener, register_invalidation_channel
+from helpers.zone_aliases import ZoneAliasMatcher
+
+logger = logging.getLogger(__name__)
+
+ZONE_INVALIDATION_CHANNEL = "delivery_zones:invalidate"
+DEFAULT_ZONE_INDEX_TTL_SECONDS = 300
+GRID_CELL_DEGREES = 0.01
+MAX_CELLS_PER_ZONE = 10000
+
+
+def _parse_polygon(boundary) -> Optional[List[Tuple[float, float]]]:
+    try:
+        polygon = [(float(point[0]), float(point[1])) for point in boundary or []]
+    except (TypeError, ValueError, IndexError, KeyError):
+        return None
+    return polygon if len(polygon) >= 3 else None
+
+
+def point_in_polygon(lat: float, lng: float, polygon: List[Tuple[float, float]]) -> bool:
+    """Ray casting, identical to DeliveryZone.contains_location."""
+    inside = False
+    n = len(polygon)
+    p1_lat, p1_lng = polygon[0]
+    for i in range(1, n + 1):
+        p2_lat, p2_lng = polygon[i % n]
+        if min(p1_lng, p2_lng) < lng <= max(p1_lng, p2_lng) and lat <= max(p1_lat, p2_lat):
+            if p1_lng != p2_lng:
+                x_intersect = (lng - p1_lng) * (p2_lat - p1_lat) / (p2_lng - p1_lng) + p1_lat
+            if p1_lat == p2_lat or lat <= x_intersect:
+                inside = not inside
+        p1_lat, p1_lng = p2_lat, p2_lng
+    return inside
+
+
+def _cell(value: float) -> int:
+    return int(value // GRID_CELL_DEGREES)
+
+
+class ZoneIndex:
+    """Bounding boxes plus a grid bucket index over a fixed list of zones."""
+
+    def __init__(self, zones, gate_passes: Optional[Dict[Any, Any]] = None):
+        self._zones: List[Tuple[Any, List[Tuple[float, float]], Tuple[float, float, float, float]]] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._wide: List[int] = []
+        self._gate_passes = dict(gate_passes or {})
+        self._by_id: Dict[Any, Any] = {}
+        self._text_matcher: Optional[ZoneAliasMatcher] = None
+
+        for zone in zones:
+            self._by_id[zone.pk] = zone
+            polygon = _parse_polygon(zone.boundary)
+            if polygon is None:
+                continue
+            lats = [point[0] for point in polygon]
+            lngs = [point[1] for point in polygon]
+            bbox = (min(lats), max(lats), min(lngs), max(lngs))
+            position = len(self._zones)
+            self._zones.append((zone, polygon, bbox))
+
+            lat_cells = range(_cell(bbox[0]), _cell(bbox[1]) + 1)
+            lng_cells = range(_cell(bbox[2]), _cell(bbox[3]) + 1)
+            if len(lat_cells) * len(lng_cells) > MAX_CELLS_PER_ZONE:
+                self._wide.append(position)
+                continue
+            for lat_cell in lat_cells:
+                for lng_cell in lng_cells:
+                    self._grid.setdefault((lat_cell, lng_cell), []).append(position)
+
+    def __len__(self) -> int:
+        return len(self._zones)
+
+    def zone_for(self, latitude, longitude):
+        """First zone (in DeliveryZone ordering) containing the point, or None."""
+        try:
+            lat, lng = float(latitude), float(longitude)
+        except (TypeError, ValueError):
+            return None
+
+        candidates = self._grid.get((_cell(lat), _cell(lng)), [])
+        if self._wide:
+            candidates = sorted(set(candidates).union(self._wide))
+        for position in candidates:
+            zone, polygon, (min_lat, max_lat, min_lng, max_lng) = self._zones[position]
+            if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+                continue
+            if point_in_polygon(lat, lng, polygon):
+                return zone
+        return None
+
+    def zone_for_text(self, *values):
+        """First zone (in DeliveryZone ordering) named in the given address text, or None."""
+        matcher = self._text_matcher
+        if matcher is None:
+            matcher = self._text_matcher = ZoneAliasMatcher(self._by_id.values())
+        return matcher.zone_for(*values)
+
+    def zone_by_id(self, zone_id):
+        """The active zone with this primary key, or None."""
+        return self._by_id.get(zone_id)
+
+    def gate_pass_for(self, zone_id):
+        """First EstateGatePass (by name) attached to the zone, or None."""
+        return self._gate_passes.get(zone_id)
+
+
+def _load_zone_index() -> ZoneIndex:
+    from product.models import DeliveryZone, EstateGatePass
+
+    ensure_invalidation_listener()
+    zones = list(DeliveryZone.objects.filter(is_active=True))
+    gate_passes = {}
+    for gate_pass in EstateGatePass.objects.filter(location_zone__isnull=False).order_by('name'):
+        gate_passes.setdefault(gate_pass.location_zone_id, gate_pass)
+    index = ZoneIndex(zones, gate_passes)
+    logger.debug("Loaded %s delivery zones into the zone index", len(index))
+    return index
+
+
+def _index_ttl() -> float:
+    from django.conf import settings
+
+    return getattr(settings, "DELIVERY_ZONE_INDEX_TTL_SECONDS", DEFAULT_ZONE_INDEX_TTL_SECONDS)
+
+
+zone_index_snapshot = ConfigSnapshot(_load_zone_index, ttl_seconds=_index_ttl(), freeze=False)
+register_invalidation_channel(ZONE_INVALIDATION_CHANNEL, zone_index_snapshot)
+
+
+def get_zone_index() -> ZoneIndex:
+    return zone_index_snapshot.get()
+
+
+def find_zone(latitude, longitude):
+    """The active DeliveryZone containing the point, without a database query."""
+    return get_zone_index().zone_for(latitude, longitude)
+
+
+def gate_pass_for_zone(zone):
+    return get_zone_index().gate_pass_for(getattr(zone, 'pk', zone))
+
+
+def active_zone(zone_id):
+    """The active DeliveryZone with this id (e.g. Order.delivery_zone_id), without a query."""
+    if zone_id is None:
+        return None
+    return get_zone_index().zone_by_id(zone_id)
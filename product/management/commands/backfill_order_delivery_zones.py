@@ -0,0 +1,84 @@
+"""
+Assign Order.delivery_zone to orders saved before the column existed.
+
+New orders resolve their zone on save; everything older still has NULL and
+would drop out of zone filters and rollups. This command runs the same
+point-in-polygon lookup over the stored delivery coordinates once and writes
+the result with one UPDATE per zone per batch.
+
+    python manage.py backfill_order_delivery_zones
+    python manage.py backfill_order_delivery_zones --all --batch-size 5000
+    python manage.py backfill_order_delivery_zones --dry-run
+
+`--all` re-resolves orders that already have a zone, e.g. after zone
+boundaries were redrawn.
+"""
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from helpers.zone_index import zone_index_snapshot
+from product.models import Order
+
+
+class Command(BaseCommand):
+    help = "Backfill Order.delivery_zone from the stored delivery coordinates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-resolve every order, not only those without a zone.')
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Orders read and written per batch.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be written without touching the database.')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        dry_run = options['dry_run']
+
+        zone_index_snapshot.invalidate()
+        index = zone_index_snapshot.get()
+
+        orders = Order.objects.all()
+        if not options['all']:
+            orders = orders.filter(delivery_zone__isnull=True)
+        rows = orders.values_list(
+            'id', 'delivery_zone_id',
+            'delivery_latitude', 'delivery_longitude',
+            'location_latitude', 'location_longitude',
+        ).order_by('id')
+
+        stats = {'scanned': 0, 'assigned': 0, 'cleared': 0, 'unchanged': 0}
+        pending = defaultdict(list)
+
+        def flush():
+            if not dry_run:
+                for zone_id, order_ids in pending.items():
+                    Order.objects.filter(id__in=order_ids).update(delivery_zone_id=zone_id)
+            pending.clear()
+
+        for order_id, current_zone_id, d_lat, d_lng, l_lat, l_lng in rows.iterator(chunk_size=batch_size):
+            stats['scanned'] += 1
+            latitude = d_lat or l_lat
+            longitude = d_lng or l_lng
+            zone = index.zone_for(latitude, longitude) if latitude is not None and longitude is not None else None
+            zone_id = zone.pk if zone else None
+
+            if zone_id == current_zone_id:
+                stats['unchanged'] += 1
+                continue
+            stats['assigned' if zone_id else 'cleared'] += 1
+            pending[zone_id].append(order_id)
+            if sum(len(ids) for ids in pending.values()) >= batch_size:
+                flush()
+        flush()
+
+        prefix = '[dry run] ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Scanned {stats['scanned']} orders: {stats['assigned']} assigned a zone, "
+            f"{stats['cleared']} cleared, {stats['unchanged']} unchanged."
+        ))
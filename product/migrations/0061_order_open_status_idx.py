@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0053_staffpagepermission_delivery_settings'),
+        ('product', '0060_deliveryfee_service_fee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('rider__isnull', True)), fields=['status'], name='order_open_status_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0061_order_open_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivery_zone',
+            field=models.ForeignKey(blank=True, help_text='The delivery zone the order is delivered to.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='product.deliveryzone'),
+        ),
+    ]
@@ -167,35 +167,13 @@ class ServiceChargeTier(models.Model):
         """
         Return the flat service charge for a given product price.
         Vendor-specific tiers override category default tiers.
+
+        Served from the per-process tier index (helpers/service_charge_index.py);
+        system_category and vendor may be instances or primary keys.
         """
-        base_filters = {
-            'system_category': system_category,
-            'is_active': True,
-            'min_price__lte': price,
-        }
+        from helpers.service_charge_index import service_charge_for
 
-        def matching_tier(vendor_value):
-            return (
-                cls.objects
-                .filter(**base_filters, vendor=vendor_value)
-                .filter(models.Q(max_price__isnull=True) | models.Q(max_price__gte=price))
-                .order_by('-min_price')
-                .first()
-            )
-
-        if vendor is not None:
-            tier = matching_tier(vendor)
-            if tier:
-                return tier.flat_charge
-
-        tier = (
-            cls.objects
-            .filter(**base_filters, vendor__isnull=True)
-            .filter(models.Q(max_price__isnull=True) | models.Q(max_price__gte=price))
-            .order_by('-min_price')
-            .first()
-        )
-        return tier.flat_charge if tier else Decimal('0.00')
+        return service_charge_for(system_category, price, vendor=vendor)
 
 
 class BukaItemServiceCharge(models.Model):
@@ -378,14 +356,13 @@ class DeliveryZone(models.Model):
         
         Returns:
             DeliveryZone or None: The zone containing the location, or None if not found
+
+        Served from the per-process zone index (helpers/zone_index.py), so
+        no query is made once the index is loaded.
         """
-        active_zones = cls.objects.filter(is_active=True)
-        
-        for zone in active_zones:
-            if zone.contains_location(latitude, longitude):
-                return zone
-        
-        return None
+        from helpers.zone_index import find_zone
+
+        return find_zone(latitude, longitude)
 
     @classmethod
     def get_rider_zone(cls, rider):
@@ -624,12 +601,12 @@ class Product(models.Model):
         if self.parent_id:
             return Decimal('0.00')
 
-        effective_category = self.system_category or getattr(self.vendor, 'category', None)
-        if effective_category:
+        effective_category_id = self.system_category_id or getattr(self.vendor, 'category_id', None)
+        if effective_category_id:
             tier_charge = ServiceChargeTier.get_charge_for(
-                effective_category,
+                effective_category_id,
                 base_price,
-                vendor=self.vendor,
+                vendor=self.vendor_id,
             )
             if tier_charge:
                 return tier_charge
@@ -952,6 +929,10 @@ class Order(models.Model):
         max_digits=9, decimal_places=6, null=True, blank=True)
     location_longitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True)
+    # Resolved from the delivery coordinates on save (see resolve_delivery_zone)
+    # so zone filters and rollups are a plain indexed join.
+    delivery_zone = models.ForeignKey(DeliveryZone, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='orders', help_text="The delivery zone the order is delivered to.")
     created_at = models.DateTimeField(
         auto_now_add=True, help_text="Timestamp when the order was created.")
     updated_at = models.DateTimeField(
@@ -1089,7 +1070,14 @@ class Order(models.Model):
         from decimal import Decimal
         total_commission = Decimal('0.00')
 
-        items = prefetched_items if prefetched_items is not None else self.items.all()
+        items = list(prefetched_items if prefetched_items is not None else self.items.all())
+        # Tier charges come from the in-process index; only the per-item Buka
+        # overrides need loading, once for the whole order.
+        models.prefetch_related_objects(
+            items,
+            'product__buka_service_charge',
+            'variant_selections__variant__product__buka_service_charge',
+        )
         for item in items:
             product_commission = item.product.calculate_commission(item.price)
             total_commission += product_commission * item.quantity
@@ -1109,7 +1097,60 @@ class Order(models.Model):
         self.total_amount = total
         self.save()
 
+    ZONE_COORDINATE_FIELDS = ('delivery_latitude', 'delivery_longitude', 'location_latitude', 'location_longitude')
+    # Fields the daily analytics rollups (admin_manager/rollups.py) read.
+    ROLLUP_FIELDS = (
+        'status', 'delivery_status', 'payment_status', 'vendor_id', 'rider_id', 'delivery_zone_id',
+        'total_amount', 'platform_amount', 'vendor_amount', 'delivery_fee', 'service_fee',
+        'rider_commission_amount', 'rider_commission_percentage_applied', 'platform_marketplace_delivery_amount',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._zone_point = instance._delivery_point()
+        instance._rollup_state = instance.rollup_values()
+        return instance
+
+    def rollup_values(self):
+        """The loaded ROLLUP_FIELDS as a tuple, or None if any is deferred."""
+        loaded = self.__dict__
+        if any(name not in loaded for name in self.ROLLUP_FIELDS):
+            return None
+        return tuple(loaded[name] for name in self.ROLLUP_FIELDS)
+
+    def _delivery_point(self):
+        """(lat, lng) the zone is resolved from, or None if unset or deferred."""
+        loaded = self.__dict__
+        if any(name not in loaded for name in self.ZONE_COORDINATE_FIELDS):
+            return None
+        latitude = loaded['delivery_latitude'] or loaded['location_latitude']
+        longitude = loaded['delivery_longitude'] or loaded['location_longitude']
+        if latitude is None or longitude is None:
+            return None
+        return latitude, longitude
+
+    def resolve_delivery_zone(self):
+        """Set delivery_zone from the active zone containing the delivery point."""
+        from helpers.zone_index import find_zone
+
+        point = self._delivery_point()
+        self.delivery_zone = find_zone(*point) if point else None
+        self._zone_point = point
+        return self.delivery_zone
+
     def save(self, *args, **kwargs):
+        # Resolve the zone when the delivery point is first set or changes;
+        # the index lookup makes no query once the process has loaded it.
+        update_fields = kwargs.get('update_fields')
+        point = self._delivery_point()
+        if point is not None and point != getattr(self, '_zone_point', None) and (
+            update_fields is None or set(update_fields) & set(self.ZONE_COORDINATE_FIELDS)
+        ):
+            self.resolve_delivery_zone()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'delivery_zone']
+
         # Auto-generate track_id if it's not provided
         if not self.track_id and self.user:
             while True:
@@ -1175,22 +1216,12 @@ class Order(models.Model):
             or self.pickup_confirmed_by.email
         )
 
-    def credit_vendor_earning_once(self, description=None):
-        """Credit vendor earning for this order once, regardless of caller."""
+    def apply_vendor_settlement(self):
+        """
+        Fix this order's vendor/platform split and return the vendor earning
+        (0 if there is nothing to credit). Sets the fields without saving.
+        """
         from decimal import Decimal
-        from wallet.models import Wallet, WalletTransaction
-
-        if not self.vendor or not self.vendor.user:
-            return None
-
-        existing = WalletTransaction.objects.filter(
-            order=self,
-            user=self.vendor.user,
-            transaction_type='earning',
-            status='completed',
-        ).first()
-        if existing:
-            return existing
 
         # Prefer the settlement captured when the order was priced/paid. Using
         # current product prices here would rewrite historical vendor and
@@ -1199,7 +1230,7 @@ class Order(models.Model):
         if vendor_earning <= 0:
             vendor_earning = self.calculate_vendor_settlement_amount()
         if vendor_earning <= 0:
-            return None
+            return Decimal('0.00')
 
         self.vendor_amount = vendor_earning
         if Decimal(str(self.platform_amount or 0)) <= 0:
@@ -1208,6 +1239,34 @@ class Order(models.Model):
                 (Decimal(str(self.get_total_price() or 0)) - vendor_earning).quantize(Decimal('0.01')),
             )
         self.platform_marketplace_delivery_amount = self.calculate_marketplace_delivery_earning()
+        return vendor_earning
+
+    def credit_vendor_earning_once(self, description=None):
+        """Credit vendor earning for this order once, regardless of caller."""
+        from django.db import transaction as db_transaction
+
+        from wallet import ledger
+
+        if not self.vendor or not self.vendor.user:
+            return None
+
+        with db_transaction.atomic():
+            # Held until the credit commits, so a concurrent caller (or
+            # settle_vendor_earnings) waits and then finds this earning.
+            ledger.lock_orders([self.pk])
+            return self._credit_vendor_earning(description)
+
+    def _credit_vendor_earning(self, description):
+        from wallet import ledger
+        from wallet.models import Wallet
+
+        existing = ledger.completed_earnings().filter(order=self, recipient=self.vendor.user_id).first()
+        if existing:
+            return existing
+
+        vendor_earning = self.apply_vendor_settlement()
+        if vendor_earning <= 0:
+            return None
         self.save(update_fields=[
             'vendor_amount',
             'platform_amount',
@@ -1216,13 +1275,11 @@ class Order(models.Model):
         ])
 
         vendor_wallet, _ = Wallet.objects.get_or_create(user=self.vendor.user)
-        vendor_wallet.deposit(vendor_earning)
-        return WalletTransaction.objects.create(
-            wallet=vendor_wallet,
-            user=self.vendor.user,
-            amount=vendor_earning,
+        return ledger.credit(
+            vendor_wallet,
+            vendor_earning,
             transaction_type='earning',
-            status='completed',
+            user=self.vendor.user,
             description=description or f"Earning from Order #{self.track_id}",
             order=self,
         )
@@ -1434,6 +1491,13 @@ class Order(models.Model):
             models.Index(fields=['status'], name='order_status_idx'),
             models.Index(fields=['payment_status'], name='order_payment_status_idx'),
             models.Index(fields=['vendor', 'status'], name='order_vendor_status_idx'),
+            # Orders waiting for a rider; backs the available-order fallback
+            # when the Redis open-order index is unavailable.
+            models.Index(
+                fields=['status'],
+                name='order_open_status_idx',
+                condition=models.Q(rider__isnull=True),
+            ),
         ]
 
 
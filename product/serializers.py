@@ -3,6 +3,7 @@ from decimal import Decimal
 from vendor.serializers import VendorSerializer
 from .models import DeliveryZone, ProductVariantCategory, UserFavoriteVendor, Order, OrderItem, Product, Rating, ProductImage, UserFavoriteVendor
 from .promo_models import PromoUsage
+from helpers.zone_index import active_zone
 
 
 
@@ -38,6 +39,22 @@ class BuyerProductSerializer(serializers.ModelSerializer):
         return ProductImageSerializerClass(images, many=True).data
         
 
+def order_delivery_zone(order, context=None):
+    """
+    The order's stored delivery zone while it is still active.
+
+    Uses the ``active_delivery_zones`` list from the serializer context when
+    the view supplied one, otherwise the per-process zone index; neither makes
+    a query per row.
+    """
+    if order.delivery_zone_id is None:
+        return None
+    zones = (context or {}).get('active_delivery_zones')
+    if zones is None:
+        return active_zone(order.delivery_zone_id)
+    return next((zone for zone in zones if zone.pk == order.delivery_zone_id), None)
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product = BuyerProductSerializer()
 
@@ -90,23 +107,7 @@ class OrderSerializer(serializers.ModelSerializer):
         return float(max(0.0, total_amount + delivery_fee - promo_discount_amount))
 
     def get_delivery_zone(self, obj):
-        latitude = obj.delivery_latitude or obj.location_latitude
-        longitude = obj.delivery_longitude or obj.location_longitude
-        if latitude is None or longitude is None:
-            return None
-
-        try:
-            lat = float(latitude)
-            lng = float(longitude)
-        except (TypeError, ValueError):
-            return None
-
-        zones = (self.context or {}).get('active_delivery_zones')
-        if zones is None:
-            zone = DeliveryZone.get_zone_for_location(lat, lng)
-        else:
-            zone = next((candidate for candidate in zones if candidate.contains_location(lat, lng)), None)
-
+        zone = order_delivery_zone(obj, self.context)
         if not zone:
             return None
 
@@ -512,23 +513,7 @@ class AdminOrderListSerializer(serializers.ModelSerializer):
         return self._money(obj.delivery_fee)
 
     def get_delivery_zone(self, obj):
-        latitude = obj.delivery_latitude or obj.location_latitude
-        longitude = obj.delivery_longitude or obj.location_longitude
-        if latitude is None or longitude is None:
-            return None
-
-        try:
-            lat = float(latitude)
-            lng = float(longitude)
-        except (TypeError, ValueError):
-            return None
-
-        zones = (self.context or {}).get('active_delivery_zones')
-        if zones is None:
-            zone = DeliveryZone.get_zone_for_location(lat, lng)
-        else:
-            zone = next((candidate for candidate in zones if candidate.contains_location(lat, lng)), None)
-        return self._serialize_zone(zone)
+        return self._serialize_zone(order_delivery_zone(obj, self.context))
 
     def get_customer(self, obj):
         return self._serialize_user(obj.user)
@@ -1,11 +1,13 @@
-"""Order signals."""
+"""Order, delivery-zone and service-charge signals."""
 
 import logging
 
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from product.models import Order
+from product.models import DeliveryZone, EstateGatePass, Order, ServiceChargeTier
 from product.vendor_notifications import notify_vendor_of_paid_order
 
 logger = logging.getLogger(__name__)
@@ -27,3 +29,71 @@ def alert_vendor_when_order_is_paid(sender, instance: Order, **kwargs):
     except Exception:
         # An alert must never roll back or break a payment.
         logger.exception("Vendor alert failed for order %s", instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def sync_open_order_index(sender, instance: Order, **kwargs):
+    """Keep the Redis open-order index (helpers/redis_open_orders.py) in step."""
+    from helpers.redis_open_orders import sync_open_order
+
+    transaction.on_commit(lambda: sync_open_order(instance))
+
+
+@receiver(post_save, sender=Order)
+def mark_rollup_day_stale(sender, instance: Order, created, **kwargs):
+    """Have the analytics rollups re-roll the day an order was placed on when its figures change.
+
+    Orders are rolled up by created_at but keep changing status, payment and
+    amounts long after that day; see admin_manager.rollups.mark_day_stale.
+    An order saved with ROLLUP_FIELDS deferred is treated as changed.
+    """
+    previous = getattr(instance, '_rollup_state', None)
+    instance._rollup_state = current = instance.rollup_values()
+    if created or (current is not None and current == previous):
+        return
+    _mark_rollup_day_stale(instance)
+
+
+@receiver(post_delete, sender=Order)
+def mark_rollup_day_stale_on_delete(sender, instance: Order, **kwargs):
+    _mark_rollup_day_stale(instance)
+
+
+def _mark_rollup_day_stale(order):
+    from admin_manager.rollups import mark_day_stale
+
+    day = timezone.localdate(order.created_at)
+    # After commit, so a rollup that reads the old row cannot clear the mark.
+    transaction.on_commit(lambda: mark_day_stale(day))
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_open_order_index(sender, instance: Order, **kwargs):
+    from helpers.redis_open_orders import remove_open_order
+
+    order_id = instance.pk
+    transaction.on_commit(lambda: remove_open_order(order_id))
+
+
+@receiver(post_save, sender=DeliveryZone)
+@receiver(post_delete, sender=DeliveryZone)
+@receiver(post_save, sender=EstateGatePass)
+@receiver(post_delete, sender=EstateGatePass)
+def invalidate_zone_index(sender, instance, **kwargs):
+    """Drop the zone index here now and on every worker once committed."""
+    from helpers.config_snapshot import publish_invalidation
+    from helpers.zone_index import ZONE_INVALIDATION_CHANNEL, zone_index_snapshot
+
+    zone_index_snapshot.invalidate()
+    transaction.on_commit(lambda: publish_invalidation(ZONE_INVALIDATION_CHANNEL, str(instance.pk)))
+
+
+@receiver(post_save, sender=ServiceChargeTier)
+@receiver(post_delete, sender=ServiceChargeTier)
+def invalidate_service_charge_index(sender, instance, **kwargs):
+    """Drop the tier index here now and on every worker once committed."""
+    from helpers.config_snapshot import publish_invalidation
+    from helpers.service_charge_index import SERVICE_CHARGE_INVALIDATION_CHANNEL, service_charge_index_snapshot
+
+    service_charge_index_snapshot.invalidate()
+    transaction.on_commit(lambda: publish_invalidation(SERVICE_CHARGE_INVALIDATION_CHANNEL, str(instance.pk)))
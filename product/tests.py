@@ -1,9 +1,22 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
-from account.models import User, Vendor
-from product.models import Product, ProductVariant, ProductVariantCategory, SystemCategory
+from account.models import Rider, User, Vendor
+from product.models import BukaItemServiceCharge, DeclinedOrder, DeliveryFee, DeliveryZone, Order, PlatformSettings, Product, ProductVariant, ProductVariantCategory, ServiceChargeTier, SystemCategory
 from product.views import reserve_order_stock
+from helpers.websocket_notification import get_candidate_riders_for_order, get_dispatch_cost_stats
+from helpers.service_charge_index import service_charge_index_snapshot
+from helpers.zone_index import zone_index_snapshot
 
 
 class ReserveOrderStockTests(TestCase):
@@ -197,3 +210,269 @@ class ReserveOrderStockTests(TestCase):
         child_variant.refresh_from_db()
         self.assertEqual(child_variant.stock, 1)
         self.assertEqual(child_variant.purchases, 2)
+
+
+class BatchDeliveryFeeViewTests(TestCase):
+    def setUp(self):
+        self.food_category = SystemCategory.objects.create(
+            name="Food",
+            name_key="food",
+            description="Not stock managed",
+            is_stock=False,
+        )
+        self.vendors = []
+        for index, (lat, lon) in enumerate([("6.5244", "3.3792"), ("6.5300", "3.3850")]):
+            owner = User.objects.create_user(
+                email=f"vendor{index}@example.com",
+                password="password",
+                role="vendor",
+            )
+            self.vendors.append(Vendor.objects.create(
+                user=owner,
+                name=f"Vendor {index}",
+                email=f"vendor{index}@example.com",
+                category=self.food_category,
+                approval_status="approved",
+                is_active=True,
+                location_latitude=lat,
+                location_longitude=lon,
+            ))
+        self.url = reverse("vendor-delivery-fees-batch")
+
+    def test_quotes_every_vendor_with_shared_lookups(self):
+        with patch(
+            "product.models.PlatformSettings.get_settings", wraps=PlatformSettings.get_settings,
+        ) as get_settings:
+            response = self.client.post(self.url, {
+                "latitude": 6.5400,
+                "longitude": 3.3900,
+                "vendor_ids": [str(vendor.id) for vendor in self.vendors],
+            }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        results = {row["vendor_id"]: row for row in response.json()["data"]}
+        self.assertEqual(set(results), {str(vendor.id) for vendor in self.vendors})
+        for row in results.values():
+            self.assertNotIn("error", row)
+            self.assertTrue(DeliveryFee.objects.filter(id=row["id"]).exists())
+        self.assertEqual(get_settings.call_count, 1)
+
+    def test_unknown_vendor_is_reported_without_failing_the_batch(self):
+        missing = "00000000-0000-0000-0000-000000000000"
+        response = self.client.post(self.url, {
+            "latitude": 6.5400,
+            "longitude": 3.3900,
+            "vendor_ids": [str(self.vendors[0].id), missing],
+        }, content_type="application/json")
+
+        results = {row["vendor_id"]: row for row in response.json()["data"]}
+        self.assertEqual(results[missing]["error"], "Vendor not found")
+        self.assertIn("delivery_fee", results[str(self.vendors[0].id)])
+
+
+class DeliveryZoneIndexTests(TestCase):
+    def setUp(self):
+        # The index outlives the test transaction; don't leak rolled-back zones.
+        self.addCleanup(zone_index_snapshot.invalidate)
+        self.zone = DeliveryZone.objects.create(
+            name="Yaba",
+            boundary=[[6.50, 3.36], [6.50, 3.40], [6.53, 3.40], [6.53, 3.36]],
+            fixed_fee="1500.00",
+        )
+
+    def test_lookup_is_served_from_the_index(self):
+        self.assertEqual(DeliveryZone.get_zone_for_location(6.51, 3.38), self.zone)
+        with self.assertNumQueries(0):
+            self.assertEqual(DeliveryZone.get_zone_for_location(6.52, 3.37), self.zone)
+
+    def test_saving_a_zone_refreshes_the_index(self):
+        self.assertEqual(DeliveryZone.get_zone_for_location(6.51, 3.38), self.zone)
+
+        self.zone.is_active = False
+        self.zone.save()
+
+        self.assertIsNone(DeliveryZone.get_zone_for_location(6.51, 3.38))
+
+
+class OrderDeliveryZoneTests(TestCase):
+    def setUp(self):
+        self.addCleanup(zone_index_snapshot.invalidate)
+        self.zone = DeliveryZone.objects.create(
+            name="Yaba",
+            boundary=[[6.50, 3.36], [6.50, 3.40], [6.53, 3.40], [6.53, 3.36]],
+            fixed_fee="1500.00",
+        )
+        self.user = User.objects.create_user(email="zone-buyer@example.com", password="password")
+
+    def test_zone_is_resolved_when_the_delivery_point_is_set(self):
+        order = Order.objects.create(user=self.user)
+        self.assertIsNone(order.delivery_zone_id)
+
+        order.delivery_latitude = Decimal("6.510000")
+        order.delivery_longitude = Decimal("3.380000")
+        order.save(update_fields=["delivery_latitude", "delivery_longitude"])
+
+        order.refresh_from_db()
+        self.assertEqual(order.delivery_zone_id, self.zone.id)
+
+    def test_unchanged_point_is_not_resolved_again(self):
+        order = Order.objects.create(user=self.user, location_latitude="6.51", location_longitude="3.38")
+        order = Order.objects.get(pk=order.pk)
+
+        with patch.object(Order, "resolve_delivery_zone") as resolve:
+            order.status = "confirmed"
+            order.save()
+
+        resolve.assert_not_called()
+
+    def test_backfill_assigns_zones_to_existing_orders(self):
+        inside = Order.objects.create(user=self.user)
+        outside = Order.objects.create(user=self.user)
+        Order.objects.filter(pk=inside.pk).update(location_latitude="6.51", location_longitude="3.38")
+        Order.objects.filter(pk=outside.pk).update(location_latitude="7.50", location_longitude="4.50")
+
+        out = StringIO()
+        call_command("backfill_order_delivery_zones", stdout=out)
+
+        self.assertEqual(Order.objects.get(pk=inside.pk).delivery_zone_id, self.zone.id)
+        self.assertIsNone(Order.objects.get(pk=outside.pk).delivery_zone_id)
+        self.assertIn("1 assigned a zone", out.getvalue())
+
+
+class RiderDispatchCandidateTests(TestCase):
+    def setUp(self):
+        category = SystemCategory.objects.create(
+            name="Food",
+            name_key="food",
+            description="Not stock managed",
+            is_stock=False,
+        )
+        owner = User.objects.create_user(email="dispatch-vendor@example.com", password="password", role="vendor")
+        self.vendor = Vendor.objects.create(
+            user=owner,
+            name="Dispatch Vendor",
+            email="dispatch-vendor@example.com",
+            category=category,
+            approval_status="approved",
+            is_active=True,
+            location_latitude="6.5244",
+            location_longitude="3.3792",
+        )
+        self.order = Order.objects.create(vendor=self.vendor, status="looking_for_rider")
+        self.riders = [self._rider(index) for index in range(6)]
+
+    def _rider(self, index):
+        user = User.objects.create_user(email=f"rider{index}@example.com", password="password", role="rider")
+        return Rider.objects.create(
+            user=user,
+            mode_of_transport="bike",
+            status="active",
+            is_verified=True,
+            is_online=True,
+            current_latitude="6.5250",
+            current_longitude=f"3.38{index}0",
+            location_updated_at=timezone.now(),
+        )
+
+    def test_database_path_runs_a_fixed_number_of_queries(self):
+        DeclinedOrder.objects.create(rider=self.riders[0], order=self.order)
+
+        with patch("helpers.websocket_notification.geo_nearby_rider_ids", return_value=None):
+            with self.assertNumQueries(2):
+                candidates = get_candidate_riders_for_order(self.order, exclude_rider=self.riders[1])
+
+        self.assertEqual({rider.id for rider in candidates}, {rider.id for rider in self.riders[2:]})
+
+    def test_redis_path_reuses_geo_distances(self):
+        DeclinedOrder.objects.create(rider=self.riders[0], order=self.order)
+        nearby = [(str(rider.id), 0.5 + index) for index, rider in enumerate(self.riders)]
+        nearby[-1] = (nearby[-1][0], 80.0)
+
+        with patch("helpers.websocket_notification.geo_nearby_rider_ids", return_value=nearby), \
+                patch("helpers.websocket_notification.get_distance_between_two_location") as distance:
+            with self.assertNumQueries(2):
+                candidates = get_candidate_riders_for_order(self.order)
+
+        distance.assert_not_called()
+        self.assertEqual([rider.id for rider in candidates], [rider.id for rider in self.riders[1:5]])
+        self.assertEqual(get_dispatch_cost_stats()["redis"]["max_queries"], 2)
+
+    def test_vendor_without_coordinates_has_no_candidates(self):
+        self.order.vendor.location_latitude = None
+        self.order.vendor.save(update_fields=['location_latitude'])
+
+        with patch("helpers.websocket_notification.geo_nearby_rider_ids") as nearby:
+            self.assertEqual(get_candidate_riders_for_order(self.order), [])
+
+        nearby.assert_not_called()
+
+
+class ServiceChargeTierIndexTests(TestCase):
+    def setUp(self):
+        self.addCleanup(service_charge_index_snapshot.invalidate)
+        self.category = SystemCategory.objects.create(
+            name="Buka",
+            name_key="buka",
+            description="Food",
+            is_stock=False,
+        )
+        owner = User.objects.create_user(email="tier-vendor@example.com", password="password", role="vendor")
+        self.vendor = Vendor.objects.create(
+            user=owner,
+            name="Tier Vendor",
+            email="tier-vendor@example.com",
+            category=self.category,
+            approval_status="approved",
+            is_active=True,
+        )
+        ServiceChargeTier.objects.create(system_category=self.category, min_price="0", flat_charge="50")
+        self.products = [
+            Product.objects.create(
+                name=f"Dish {index}",
+                description="Plate",
+                price=1000 + index,
+                vendor=self.vendor,
+                system_category=self.category,
+            )
+            for index in range(5)
+        ]
+        BukaItemServiceCharge.objects.create(vendor=self.vendor, product=self.products[0], flat_charge="80")
+
+    def _page_queries(self):
+        url = reverse("products_by_system_category", args=[self.category.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        service_charge_queries = [q for q in queries.captured_queries if "servicecharge" in q["sql"]]
+        return len(service_charge_queries), response.json()
+
+    def test_catalog_page_prices_without_per_item_queries(self):
+        service_charge_index_snapshot.get()
+        small_page_queries, _ = self._page_queries()
+        for index in range(5, 15):
+            Product.objects.create(
+                name=f"Dish {index}",
+                description="Plate",
+                price=1000 + index,
+                vendor=self.vendor,
+                system_category=self.category,
+            )
+
+        large_page_queries, body = self._page_queries()
+
+        self.assertEqual(large_page_queries, small_page_queries)
+        prices = {row["name"]: row["discounted_price"] for row in body["results"]}
+        self.assertEqual(prices["Dish 0"], 1080.0)
+        self.assertEqual(prices["Dish 3"], 1053.0)
+
+    def test_tier_changes_invalidate_the_index(self):
+        product = self.products[1]
+        self.assertEqual(product.get_service_charge(), Decimal("50"))
+
+        ServiceChargeTier.objects.create(
+            system_category=self.category, vendor=self.vendor, min_price="1000", max_price="2000", flat_charge="75",
+        )
+        self.assertEqual(product.get_service_charge(), Decimal("75"))
+
+        ServiceChargeTier.objects.filter(vendor=self.vendor).first().delete()
+        self.assertEqual(product.get_service_charge(), Decimal("50"))
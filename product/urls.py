@@ -3,6 +3,7 @@ from django.urls import path
 from product.views import ( 
     AddToFavoritesView,
     AllProductsView,
+    BatchDeliveryFeeView,
     CustomerCreateOrderMobileView,
     CustomerCreateOrderView,
     CustomerCreateOrderWithVariantsView,
@@ -47,6 +48,7 @@ urlpatterns = [
     path('vendor/<uuid:vendor_id>/ratings/', VendorRatingListView.as_view(), name='vendor-rating-list'),
     path('vendor/<uuid:vendor_id>/rating/', VendorRatingCreateView.as_view(), name='vendor-rating-create'),
     path('vendor/<uuid:vendor_id>/delivery-fee/', GetDeliveryFeeView.as_view(), name='vendor-delivery-fee'),
+    path('vendors/delivery-fees/', BatchDeliveryFeeView.as_view(), name='vendor-delivery-fees-batch'),
     path('product/vendor-category/<uuid:vendor_category_id>/', ProductByVendorCategoryView.as_view(), name='products_by_vendor_category'),
 
     # Order Endpoints
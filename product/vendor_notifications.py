@@ -108,6 +108,7 @@ def notify_vendor_of_paid_order(order):
                 "order_id": str(order.id),
                 "track_id": track_id,
             },
+            dedup_key=f"vendor_new_order:{order.id}",
         )
     except Exception:
         logger.exception("Vendor push alert failed for order %s", order.id)
@@ -40,10 +40,13 @@ from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.db.models import F, Q, Avg, Count, Prefetch
 from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError
 from account.models import Address, Vendor, VendorRating,VendorIssueReporting
 from account.serializers import VendorIssueReportSerializer, VendorRatingSerializer
-from helpers.order_utils import apply_promo_code, calculate_delivery_fee, get_distance_between_two_location, calculate_rider_fare
+from helpers.order_utils import apply_promo_code, calculate_delivery_fee, calculate_delivery_fees_batch, get_distance_between_two_location, calculate_rider_fare
+from helpers.geo_distance import haversine_many
+from helpers.service_charge_index import SERVICE_CHARGE_PREFETCHES
 from helpers.vendor_discovery import (
     approved_vendor_queryset,
     apply_vendor_search,
@@ -519,7 +522,8 @@ class CustomerCreateOrderWithVariantsView(generics.GenericAPIView):
                             user=order.user,
                             title="Order Placed!",
                             body="Your order has been sent to the vendor. We'll let you know as soon as they accept it 🧑‍🍳",
-                            data={"event": "order_created", "order_id": order.id}
+                            data={"event": "order_created", "order_id": order.id},
+                            dedup_key=f"order_created:{order.id}",
                         )
                     except Exception as e:
                         print(e)
@@ -670,6 +674,7 @@ class ProductBySystemCategoryView(generics.GenericAPIView):
                 ),
                 'productvariantcategory_set__variants',
                 'variants',
+                *SERVICE_CHARGE_PREFETCHES,
             )
             .order_by('-is_featured', 'vendor__name', 'name')
         )
@@ -1273,6 +1278,157 @@ class GetDeliveryFeeView(generics.GenericAPIView):
 
 
 
+class BatchDeliveryFeeView(generics.GenericAPIView):
+    """
+    POST /products/vendors/delivery-fees/
+        {"latitude", "longitude", "vendor_ids": [...], "item_count",
+         "order_value", "promo_code"}
+
+    Quotes one destination against up to MAX_VENDORS vendors in one request,
+    so listing and cart screens do not call GetDeliveryFeeView per vendor.
+    Each quote is stored as a DeliveryFee exactly like the single endpoint;
+    vendors that cannot deliver get an ``error`` entry instead of failing the
+    whole batch.
+    """
+    permission_classes = [AllowAny]
+    MAX_VENDORS = 50
+
+    def post(self, request):
+        user = request.user if request.user.is_authenticated else None
+        vendor_ids = request.data.get('vendor_ids') or []
+        if not isinstance(vendor_ids, list) or not vendor_ids:
+            return bad_request_response(message="vendor_ids must be a non-empty list.")
+        if len(vendor_ids) > self.MAX_VENDORS:
+            return bad_request_response(message=f"At most {self.MAX_VENDORS} vendors can be quoted at once.")
+
+        try:
+            item_count = int(request.data.get('item_count', 1))
+            order_value = float(request.data.get('order_value', 0.0))
+        except (TypeError, ValueError):
+            return bad_request_response(message="item_count and order_value must be numbers.")
+        promo_code = request.data.get('promo_code')
+
+        location_latitude = request.data.get('latitude')
+        location_longitude = request.data.get('longitude')
+        if any([not location_latitude, not location_longitude]):
+            user_address = Address.objects.filter(user=user, is_active=True).first() if user else None
+            if not user_address:
+                return bad_request_response(
+                    message="Please set your delivery address in settings before placing an order."
+                )
+            if any([not user_address.location_latitude, not user_address.location_longitude]):
+                return bad_request_response(
+                    message="Please set your delivery address in settings."
+                )
+            location_latitude = user_address.location_latitude
+            location_longitude = user_address.location_longitude
+        try:
+            dest_lat, dest_lon = float(location_latitude), float(location_longitude)
+        except (TypeError, ValueError):
+            return bad_request_response(message="Invalid delivery location.")
+
+        try:
+            vendors = {
+                str(vendor.id): vendor
+                for vendor in Vendor.objects.filter(id__in=vendor_ids).select_related('category')
+            }
+        except DjangoValidationError:
+            return bad_request_response(message="vendor_ids contains an invalid id.")
+        marketplace_vendor_ids = {
+            str(vendor_id) for vendor_id in
+            MarketPlace.objects.filter(vendors__in=list(vendors)).values_list('vendors', flat=True)
+        }
+
+        errors = {}
+        direct = []
+        for vendor_id in dict.fromkeys(str(v) for v in vendor_ids):
+            vendor = vendors.get(vendor_id)
+            if vendor is None:
+                errors[vendor_id] = "Vendor not found"
+                continue
+            try:
+                validate_vendor_accepting_orders(vendor)
+            except ValidationError as exc:
+                errors[vendor_id] = resolve_validation_error_message(exc)
+                continue
+            if vendor_id not in marketplace_vendor_ids:
+                direct.append(vendor)
+
+        # Same straight-line radius check as GetDeliveryFeeView, in one pass.
+        straight_line = haversine_many(
+            dest_lat, dest_lon,
+            [(vendor.location_latitude, vendor.location_longitude) for vendor in direct],
+        )
+        in_range = []
+        for vendor, distance_in_km in zip(direct, straight_line):
+            if distance_in_km is None or distance_in_km > float(vendor.delivery_radius_km):
+                errors[str(vendor.id)] = (
+                    f"This vendor cannot deliver to your location (distance too far). "
+                    f"Distance {round(distance_in_km or 0, 2)} km"
+                )
+            else:
+                in_range.append(vendor)
+
+        fee_infos = {}
+        for vendor_id, fee_info in calculate_delivery_fees_batch(
+            in_range, dest_lat, dest_lon, customer=user,
+            order_value=order_value, item_count=item_count, promo_code=promo_code,
+        ).items():
+            if fee_info.get('out_of_range'):
+                errors[vendor_id] = "This vendor cannot deliver to your location — it is too far."
+            elif 'total_fee' not in fee_info:
+                errors[vendor_id] = "Failed to calculate delivery fee."
+            else:
+                fee_infos[vendor_id] = {
+                    "total_fee": fee_info['total_fee'],
+                    "original_fee": fee_info.get('original_fee', fee_info['total_fee']),
+                    "service_fee": fee_info.get('service_fee', 0),
+                    "promo_details": fee_info.get('promo_details'),
+                }
+
+        for vendor_id in marketplace_vendor_ids:
+            if vendor_id in errors or vendor_id not in vendors:
+                continue
+            fee_info = vendors[vendor_id].calculate_delivery_fee_by_vendor(
+                item_count,
+                dest_lat=dest_lat,
+                dest_lon=dest_lon,
+                user=user,
+                promo_code=promo_code,
+                order_value=order_value,
+            )
+            fee_infos[vendor_id] = {
+                "total_fee": fee_info["total_fee"],
+                "original_fee": fee_info.get('original_fee', fee_info["total_fee"]),
+                "service_fee": fee_info.get('service_fee', 0),
+                "promo_details": fee_info.get("promo_info", {}),
+            }
+
+        records = DeliveryFee.objects.bulk_create([
+            DeliveryFee(
+                user=user,
+                amount=float(info['total_fee']),
+                original_amount=float(info['original_fee']),
+                service_fee=float(info['service_fee'] or 0),
+                vendor=vendors[vendor_id],
+            )
+            for vendor_id, info in fee_infos.items()
+        ])
+
+        results = []
+        for (vendor_id, info), record in zip(fee_infos.items(), records):
+            results.append({
+                "vendor_id": vendor_id,
+                "delivery_fee": record.amount,
+                "id": str(record.id),
+                "promo_details": info['promo_details'],
+            })
+        for vendor_id, message in errors.items():
+            results.append({"vendor_id": vendor_id, "error": message})
+
+        return success_response(data=results)
+
+
 class CustomerCreateOrderView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CreateOrderSerializer
@@ -1806,7 +1962,8 @@ class CustomerCreateOrderMobileView(generics.GenericAPIView):
                             user=order.user,
                             title="Order Placed!",
                             body="Your order has been sent to the vendor. We'll let you know as soon as they accept it 🧑‍🍳",
-                            data={"event": "order_created", "order_id": order.id}
+                            data={"event": "order_created", "order_id": order.id},
+                            dedup_key=f"order_created:{order.id}",
                         )
                     except Exception as e:
                         print(e)
@@ -0,0 +1,224 @@
+"""
+Fan-out of rider location fixes to order tracking rooms.
+
+Shared by the HTTP location endpoint (RiderViewSet.update_location) and the
+rider websocket (RiderConsumer's ``location`` action), so a fix reaches
+customers the same way whichever transport the rider app used.
+
+Every fix used to cost one group_send per active order, each behind its own
+async_to_sync, with a payload rebuilt through convert_decimals and a
+``rider.user`` lookup. broadcast_location_update now:
+
+- measures the fix against every active order in one haversine pass;
+- asks helpers/redis_tracking_rooms which rooms have a subscriber and are due
+  an update, so each room gets at most one location update per
+  RIDER_TRACKING_BROADCAST_INTERVAL_SECONDS and empty rooms get none;
+- serializes each payload once, as the JSON frame DeliveryTrackingConsumer
+  forwards verbatim, with the rider's name and email cached per process for
+  RIDER_IDENTITY_CACHE_SECONDS;
+- sends everything for the fix from one event-loop hop.
+
+The near-delivery transition is not throttled: it changes the order and is
+always announced.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from helpers.geo_distance import haversine_many
+from helpers.push_notification import notification_helper
+from helpers.redis_tracking_rooms import TrackingThrottle, claim_tracking_broadcasts
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_TRACKING_STATUSES = ['confirmed', 'ready_for_pickup', 'picked_up', 'in_transit', 'near_delivery']
+DEFAULT_BROADCAST_INTERVAL_SECONDS = 1
+RIDER_IDENTITY_CACHE_SECONDS = 300
+
+_local_throttle = TrackingThrottle()
+_identity_cache = {}
+_identity_lock = threading.Lock()
+
+
+def convert_decimals(obj):
+    if isinstance(obj, dict):
+        return {k: convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_decimals(i) for i in obj]
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    else:
+        return obj
+
+
+def calculate_eta(distance_km):
+    """Calculate estimated time of arrival in minutes"""
+    if distance_km == 0:
+        return 0
+
+    # Assume average speed of 25 km/h for delivery
+    average_speed = 25
+    eta_hours = distance_km / average_speed
+    return int(eta_hours * 60)  # Convert to minutes
+
+
+
+
+def _broadcast_interval():
+    return getattr(settings, 'RIDER_TRACKING_BROADCAST_INTERVAL_SECONDS', DEFAULT_BROADCAST_INTERVAL_SECONDS)
+
+
+def rider_identity(rider):
+    """The ``rider`` block of the tracking payload, cached per process."""
+    now = time.monotonic()
+    key = str(rider.id)
+    cached = _identity_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    identity = {
+        'id': key,
+        'name': rider.user.full_name,
+        'email': rider.user.email,
+    }
+    with _identity_lock:
+        if len(_identity_cache) >= 10000:
+            _identity_cache.clear()
+        _identity_cache[key] = (now + RIDER_IDENTITY_CACHE_SECONDS, identity)
+    return identity
+
+
+def _distance_fields(distance_km):
+    if distance_km < 1:
+        distance_value, distance_type = distance_km * 1000, "meter"
+    else:
+        distance_value, distance_type = distance_km, "kilometer"
+    return {
+        'distance_to_customer': round(distance_value, 3),
+        'distance_to_customer_type': distance_type,
+        'estimated_arrival': calculate_eta(distance_km),
+        'estimated_arrival_type': "minutes",
+    }
+
+
+def _is_near_delivery(order, distance_km):
+    # Only mark near delivery when the rider is actually in transit
+    # and close enough to the customer's destination.
+    pickup_grace_elapsed = (
+        order.actual_pickup_time and
+        timezone.now() - order.actual_pickup_time >= timedelta(minutes=3)
+    )
+    return bool(
+        order.delivery_latitude and order.delivery_longitude and
+        distance_km <= 0.2 and
+        order.status == 'in_transit' and
+        order.delivery_status == 'in_transit' and
+        pickup_grace_elapsed
+    )
+
+
+def _mark_near_delivery(order, distance_fields, messages):
+    order.status = 'near_delivery'
+    order.delivery_status = 'near_delivery'
+    order.save(update_fields=['status', 'delivery_status', 'updated_at'])
+
+    status_data = {
+        'order_id': str(order.id),
+        'status': 'near_delivery',
+        **distance_fields,
+        'updated_at': order.updated_at.isoformat(),
+    }
+    messages.append((f'delivery_{order.id}', {'type': 'order_status_update', 'data': status_data}))
+    messages.append((f'customer_{order.user_id}', {
+        'type': 'order_status_update',
+        'data': {**status_data, 'message': 'Your rider is outside and waiting for you.'},
+    }))
+
+    try:
+        notification_helper.send_to_users_with_executor(
+            users=[order.user],
+            title="Your rider is outside 📍",
+            body="Your rider is outside and waiting for you.",
+            data={
+                "event": "near_delivery",
+                "type": "order_status_update",
+                "order_id": str(order.id),
+                "status": "near_delivery",
+            },
+            dedup_key=f"near_delivery:{order.id}",
+            coalesce_key=f"order_status:{order.id}",
+        )
+    except Exception:
+        logger.exception("Near-delivery push failed for order %s", order.id)
+
+
+def _rooms_due(order_ids, interval):
+    due = claim_tracking_broadcasts(order_ids, interval)
+    if due is None:
+        due = {order_id for order_id in map(str, order_ids) if _local_throttle.claim(order_id, interval)}
+    return due
+
+
+async def _send_all(channel_layer, messages):
+    for group, message in messages:
+        try:
+            await channel_layer.group_send(group, message)
+        except Exception as exc:
+            logger.warning("Tracking broadcast to %s failed: %s", group, exc)
+
+
+def broadcast_location_update(rider, latitude, longitude, channel_layer=None):
+    """Broadcast rider location to the active order tracking rooms that are watched and due."""
+    channel_layer = channel_layer or get_channel_layer()
+    active_orders = list(rider.orders.filter(status__in=ACTIVE_TRACKING_STATUSES))
+    if not active_orders:
+        return
+
+    latitude, longitude = float(latitude), float(longitude)
+    distances = haversine_many(latitude, longitude, [
+        (order.delivery_latitude, order.delivery_longitude) if order.delivery_latitude and order.delivery_longitude
+        else (None, None)
+        for order in active_orders
+    ])
+
+    messages = []
+    distance_fields = {}
+    for order, distance_km in zip(active_orders, distances):
+        distance_km = distance_km or 0
+        distance_fields[str(order.id)] = fields = _distance_fields(distance_km)
+        if _is_near_delivery(order, distance_km):
+            _mark_near_delivery(order, fields, messages)
+
+    due = _rooms_due(distance_fields, _broadcast_interval())
+    if due:
+        rider_location = {
+            'latitude': latitude,
+            'longitude': longitude,
+            'updated_at': rider.location_updated_at.isoformat(),
+        }
+        identity = rider_identity(rider)
+        for order_id, fields in distance_fields.items():
+            if order_id not in due:
+                continue
+            data = {
+                'order_id': order_id,
+                'rider_location': rider_location,
+                'rider': identity,
+                **fields,
+            }
+            messages.append((f'delivery_{order_id}', {
+                'type': 'rider_location_update',
+                'text': json.dumps({'type': 'rider_location', 'data': data}),
+            }))
+
+    if messages:
+        async_to_sync(_send_all)(channel_layer, messages)
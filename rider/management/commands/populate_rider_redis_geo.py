@@ -11,14 +11,14 @@ from django.core.management.base import BaseCommand
 
 from account.models import Rider
 from helpers.redis_rider_geo import rebuild_rider_geo_index
-from helpers.redis_geo import _get_redis_client
+from helpers.redis_client import get_redis_client
 
 
 class Command(BaseCommand):
     help = "Rebuild the Redis geo index for rider dispatch proximity queries."
 
     def handle(self, *args, **kwargs):
-        client = _get_redis_client()
+        client = get_redis_client()
         if client is None:
             self.stderr.write(
                 self.style.ERROR('Cannot connect to Redis. Check CACHES["default"]["LOCATION"].')
@@ -0,0 +1,298 @@
+"""
+Weekly rider payouts through Paystack bulk transfers.
+
+process_weekly_rider_payouts used to walk the riders one at a time. Each
+rider cost a Wallet query, a withdrawal transaction and a
+PaystackManager.initiate_transfer call. That call fetched the bank list
+twice, resolved the account, created a transfer recipient and POSTed the
+transfer, all synchronously. A notification followed. A run grew linearly
+with the number of riders and could outlive the Celery task time limit.
+run_weekly_payouts instead:
+
+- loads every independent rider's wallet in one query and keeps those at or
+  above the payout minimum;
+- takes each rider's recipient code from the per-user cache
+  (PaystackManager.get_recipient_code), so Paystack is only asked for riders
+  paid for the first time or whose bank details changed. All recipient
+  codes are resolved before any money is held, and a rider whose lookup
+  fails is skipped without touching the others;
+- holds each payout with ledger.debit, whose conditional UPDATE cannot
+  overdraw a balance that moved since the wallet query;
+- submits the transfers to /transfer/bulk in chunks of BULK_TRANSFER_LIMIT.
+  A chunk Paystack rejects with a 4xx, or a transfer it reports as failed,
+  has its hold released at once. If the run stops before a chunk is
+  submitted, that chunk's holds are released too;
+- leaves the final outcome to the transfer.success / transfer.failed
+  webhooks (PaystackManager.handle_webhook), which complete or refund each
+  withdrawal by its reference. If the bulk request errors (network, a 5xx
+  such as a gateway timeout, an unreadable response), Paystack may or may
+  not have the chunk, so its withdrawals are not refunded blindly. The
+  ``rider.reconcile_unconfirmed_payouts`` task looks each one up with
+  /transfer/verify later: it completes what Paystack paid, releases what it
+  never received or failed, and leaves transfers still in flight to their
+  webhooks;
+- writes the in-app notifications with one bulk_create and queues the
+  pushes in the notification outbox.
+"""
+
+import logging
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+# Riders are paid out weekly for any balance at or above this amount.
+# Configurable via DeliveryConfiguration key 'rider_weekly_payout_minimum'.
+DEFAULT_WEEKLY_PAYOUT_MINIMUM = Decimal('1000.00')
+
+# How long after a run its unconfirmed transfers are looked up, and how many
+# times an unreachable lookup is retried.
+DEFAULT_RECONCILE_DELAY_SECONDS = 10 * 60
+DEFAULT_RECONCILE_MAX_ATTEMPTS = 6
+
+PAYOUT_NOTIFICATION_TITLE = 'Weekly payout on the way'
+PAYOUT_NOTIFICATION_BODY = (
+    'Your weekly earnings payout has been initiated and will arrive in your bank account shortly.'
+)
+
+
+def get_weekly_payout_minimum():
+    from helpers.models import ConfigurationManager
+    try:
+        configured = ConfigurationManager.get_config(
+            'rider_weekly_payout_minimum', int(DEFAULT_WEEKLY_PAYOUT_MINIMUM))
+        return Decimal(str(configured))
+    except Exception:
+        return DEFAULT_WEEKLY_PAYOUT_MINIMUM
+
+
+def _setting(name, default):
+    from django.conf import settings
+
+    return getattr(settings, name, default)
+
+
+def _payable_riders(riders, wallets, manager, summary):
+    """Riders with something to pay and a recipient code: [(rider, wallet, recipient)]."""
+    payable = []
+    for rider in riders:
+        wallet = wallets.get(rider.user_id)
+        if wallet is None or wallet.balance <= 0:
+            summary['skipped_count'] += 1
+            continue
+
+        try:
+            has_recipient, recipient = manager.get_recipient_code(rider.user)
+        except Exception as exc:
+            # Nothing is held yet, so one unreachable lookup only skips this rider.
+            logger.warning('Recipient lookup failed for rider %s: %s', rider.id, exc)
+            has_recipient, recipient = False, 'Could not reach Paystack to set up the transfer recipient.'
+        if not has_recipient:
+            summary['failed'].append({'rider_id': str(rider.id), 'reason': recipient})
+            continue
+        payable.append((rider, wallet, recipient))
+    return payable
+
+
+def _hold_payouts(payable, held, description, summary):
+    """Debit each payable rider's balance into ``held`` as (rider, wallet, txn, recipient)."""
+    from wallet import ledger
+
+    for rider, wallet, recipient in payable:
+        try:
+            txn = ledger.debit(wallet, wallet.balance, user=rider.user, description=description)
+        except ledger.InsufficientFunds:
+            # The balance dropped below what was read a moment ago.
+            summary['skipped_count'] += 1
+            continue
+        held.append((rider, wallet, txn, recipient))
+
+
+def _unconfirmed(rider, txn):
+    return {'rider_id': str(rider.id), 'reference': str(txn.id)}
+
+
+def _submit_chunk(chunk, manager, description, summary):
+    from wallet import ledger
+
+    transfers = [
+        {'amount': txn.amount, 'recipient': recipient, 'reference': txn.id, 'reason': description}
+        for _rider, _wallet, txn, recipient in chunk
+    ]
+    try:
+        accepted, results = manager.bulk_transfer(transfers)
+    except Exception as exc:
+        # A network error, a 5xx or an unreadable reply: Paystack may have the chunk.
+        logger.error('Weekly payout bulk transfer of %s riders did not complete: %s', len(chunk), exc)
+        summary['unconfirmed'].extend(_unconfirmed(rider, txn) for rider, _wallet, txn, _recipient in chunk)
+        return []
+
+    if not accepted:
+        for rider, wallet, txn, _recipient in chunk:
+            ledger.release(wallet, txn)
+            summary['failed'].append({'rider_id': str(rider.id), 'reason': results})
+        return []
+
+    by_reference = {str(result.get('reference')): result for result in results}
+    paid = []
+    for rider, wallet, txn, _recipient in chunk:
+        result = by_reference.get(str(txn.id))
+        if result is None:
+            # Accepted batch without this transfer in the echo: verify it later.
+            summary['unconfirmed'].append(_unconfirmed(rider, txn))
+            continue
+        try:
+            success, message = manager.apply_transfer_result(txn, result, {'data': result}, user=rider.user)
+        except Exception as exc:
+            logger.error('Could not record payout result for rider %s: %s', rider.id, exc)
+            summary['unconfirmed'].append(_unconfirmed(rider, txn))
+            continue
+        if success:
+            paid.append(rider)
+            summary['paid'].append(str(rider.id))
+        else:
+            ledger.release(wallet, txn)
+            summary['failed'].append({'rider_id': str(rider.id), 'reason': message})
+    return paid
+
+
+def schedule_reconciliation(references, attempt=1):
+    """
+    Queue ``rider.reconcile_unconfirmed_payouts`` for ``references`` once the
+    current transaction commits, unless they have used up their attempts.
+    """
+    references = list(references)
+    if not references:
+        return
+    if attempt > _setting('PAYOUT_RECONCILE_MAX_ATTEMPTS', DEFAULT_RECONCILE_MAX_ATTEMPTS):
+        logger.error('Payout transfers still unverified after %s attempts: %s', attempt - 1, references)
+        return
+    from django.db import transaction
+
+    def enqueue():
+        try:
+            from rider.tasks import reconcile_unconfirmed_payouts as reconcile_task
+
+            reconcile_task.apply_async(
+                args=[references, attempt],
+                countdown=_setting('PAYOUT_RECONCILE_DELAY_SECONDS', DEFAULT_RECONCILE_DELAY_SECONDS),
+            )
+        except Exception as exc:
+            logger.error('Could not schedule reconciliation of unconfirmed payouts %s: %s', references, exc)
+
+    transaction.on_commit(enqueue)
+
+
+def _notify_paid(riders):
+    from account.models import Notification
+    from helpers.notification_outbox import queue_push_to_users
+
+    if not riders:
+        return
+    try:
+        Notification.objects.bulk_create([
+            Notification(user=rider.user, title=PAYOUT_NOTIFICATION_TITLE, content=PAYOUT_NOTIFICATION_BODY)
+            for rider in riders
+        ])
+        queue_push_to_users(
+            [rider.user for rider in riders],
+            PAYOUT_NOTIFICATION_TITLE,
+            PAYOUT_NOTIFICATION_BODY,
+            data={'type': 'weekly_payout'},
+        )
+    except Exception as notify_error:
+        logger.warning('Weekly payout notifications failed: %s', notify_error)
+
+
+def run_weekly_payouts(minimum=None, description='Weekly payout'):
+    """
+    Pay every active independent rider their wallet balance, if it is at
+    least ``minimum``. In-house (salaried) riders are skipped. Returns a
+    summary of riders paid, failed, skipped and left unconfirmed; the
+    unconfirmed ones are verified by reconcile_unconfirmed_payouts.
+    """
+    from account.models import Rider
+    from helpers.paystack import BULK_TRANSFER_LIMIT, PaystackManager
+    from wallet import ledger
+    from wallet.models import Wallet
+
+    minimum = get_weekly_payout_minimum() if minimum is None else Decimal(str(minimum))
+    riders = list(Rider.objects.filter(is_in_house_rider=False).select_related('user'))
+    wallets = {
+        wallet.user_id: wallet
+        for wallet in Wallet.objects.filter(
+            user_id__in=[rider.user_id for rider in riders], balance__gte=minimum,
+        )
+    }
+
+    summary = {
+        'paid': [],
+        'failed': [],
+        'unconfirmed': [],
+        'skipped_count': 0,
+        'batches': 0,
+        'minimum': str(minimum),
+    }
+    manager = PaystackManager()
+    payable = _payable_riders(riders, wallets, manager, summary)
+
+    held, paid = [], []
+    submitted = 0
+    try:
+        _hold_payouts(payable, held, description, summary)
+        for start in range(0, len(held), BULK_TRANSFER_LIMIT):
+            chunk = held[start:start + BULK_TRANSFER_LIMIT]
+            summary['batches'] += 1
+            submitted = start + len(chunk)
+            paid.extend(_submit_chunk(chunk, manager, description, summary))
+    finally:
+        # Holds that never reached Paystack would otherwise stay pending with
+        # no webhook to settle them.
+        for rider, wallet, txn, _recipient in held[submitted:]:
+            ledger.release(wallet, txn)
+            summary['failed'].append({
+                'rider_id': str(rider.id), 'reason': 'Payout run stopped before the transfer was submitted.',
+            })
+        schedule_reconciliation(entry['reference'] for entry in summary['unconfirmed'])
+
+    _notify_paid(paid)
+    logger.info('Weekly rider payout run complete: %s', summary)
+    return summary
+
+
+def reconcile_unconfirmed_payouts(references):
+    """
+    Settle payout withdrawals whose bulk submission gave no answer, by
+    looking each one up at Paystack. Returns the references completed,
+    released, still in flight (left to their webhooks) and unreachable.
+    """
+    from helpers.paystack import PaystackManager
+    from wallet import ledger
+    from wallet.models import WalletTransaction
+
+    result = {'completed': [], 'released': [], 'in_flight': [], 'unreachable': []}
+    manager = PaystackManager()
+    withdrawals = WalletTransaction.objects.filter(
+        pk__in=references, transaction_type='withdrawal', status='pending',
+    ).select_related('wallet', 'user')
+    for txn in withdrawals:
+        reference = str(txn.id)
+        try:
+            transfer = manager.verify_transfer(reference)
+        except Exception as exc:
+            logger.warning('Could not verify payout transfer %s: %s', reference, exc)
+            result['unreachable'].append(reference)
+            continue
+
+        transfer_status = (transfer or {}).get('status')
+        if transfer is None or transfer_status in ('failed', 'reversed'):
+            # Paystack never took the transfer, or it did not go through.
+            ledger.release(txn.wallet, txn)
+            result['released'].append(reference)
+        elif transfer_status == 'success':
+            manager.apply_transfer_result(txn, transfer, {'data': transfer}, user=txn.user)
+            result['completed'].append(reference)
+        else:
+            result['in_flight'].append(reference)
+
+    logger.info('Unconfirmed payout reconciliation: %s', result)
+    return result
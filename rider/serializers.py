@@ -235,6 +235,8 @@ class DeliveryTrackingSerializer(serializers.ModelSerializer):
 class RiderLocationUpdateSerializer(serializers.Serializer):
     latitude = serializers.DecimalField(max_digits=10, decimal_places=7, required=True)
     longitude = serializers.DecimalField(max_digits=10, decimal_places=7, required=True)
+    speed = serializers.FloatField(required=False, allow_null=True, min_value=0)
+    heading = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=360)
 
 
 
@@ -323,6 +325,8 @@ class RiderRatingCreateSerializer(serializers.ModelSerializer):
 class RiderLocationUpdateSerializer(serializers.Serializer):
     latitude = serializers.DecimalField(max_digits=10, decimal_places=7, required=True)
     longitude = serializers.DecimalField(max_digits=10, decimal_places=7, required=True)
+    speed = serializers.FloatField(required=False, allow_null=True, min_value=0)
+    heading = serializers.FloatField(required=False, allow_null=True, min_value=0, max_value=360)
 
 
 class DeliveryTrackingSerializer(serializers.ModelSerializer):
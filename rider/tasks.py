@@ -2,23 +2,11 @@ import logging
 from decimal import Decimal
 
 from celery import shared_task
-from django.db import transaction as db_transaction
-
-logger = logging.getLogger(__name__)
-
-# Riders are paid out weekly for any balance at or above this amount.
-# Configurable via DeliveryConfiguration key 'rider_weekly_payout_minimum'.
-DEFAULT_WEEKLY_PAYOUT_MINIMUM = Decimal('1000.00')
 
+from rider import payouts
+from rider.payouts import get_weekly_payout_minimum, run_weekly_payouts  # noqa: F401
 
-def get_weekly_payout_minimum():
-    from helpers.models import ConfigurationManager
-    try:
-        configured = ConfigurationManager.get_config(
-            'rider_weekly_payout_minimum', int(DEFAULT_WEEKLY_PAYOUT_MINIMUM))
-        return Decimal(str(configured))
-    except Exception:
-        return DEFAULT_WEEKLY_PAYOUT_MINIMUM
+logger = logging.getLogger(__name__)
 
 
 def process_rider_payout(rider, amount=None, description='Weekly payout'):
@@ -28,7 +16,8 @@ def process_rider_payout(rider, amount=None, description='Weekly payout'):
     A failed initiation releases the held funds again.
     """
     from helpers.paystack import PaystackManager
-    from wallet.models import Wallet, WalletTransaction
+    from wallet import ledger
+    from wallet.models import Wallet
 
     wallet, _ = Wallet.objects.get_or_create(user=rider.user)
     payout_amount = Decimal(str(amount)) if amount is not None else wallet.balance
@@ -38,16 +27,10 @@ def process_rider_payout(rider, amount=None, description='Weekly payout'):
     if wallet.balance < payout_amount:
         return False, 'Insufficient balance.'
 
-    with db_transaction.atomic():
-        txn = WalletTransaction.objects.create(
-            wallet=wallet,
-            user=rider.user,
-            amount=payout_amount,
-            transaction_type='withdrawal',
-            status='pending',
-            description=description,
-        )
-        wallet.withdraw(payout_amount)
+    try:
+        txn = ledger.debit(wallet, payout_amount, user=rider.user, description=description)
+    except ledger.InsufficientFunds:
+        return False, 'Insufficient balance.'
 
     success, message = PaystackManager().initiate_transfer(
         user=rider.user,
@@ -57,10 +40,7 @@ def process_rider_payout(rider, amount=None, description='Weekly payout'):
         reason=description,
     )
     if not success:
-        txn.status = 'failed'
-        txn.save()
-        wallet.refresh_from_db()
-        wallet.deposit(payout_amount)
+        ledger.release(wallet, txn)
     return success, message
 
 
@@ -68,53 +48,58 @@ def process_rider_payout(rider, amount=None, description='Weekly payout'):
 def process_weekly_rider_payouts():
     """
     Weekly payout run: pays every active independent rider their accumulated
-    wallet balance. In-house (salaried) riders are skipped. Scheduled via
-    celery beat (see CELERY_BEAT_SCHEDULE in settings).
+    wallet balance through Paystack bulk transfers (rider/payouts.py).
+    In-house (salaried) riders are skipped. Scheduled via celery beat (see
+    CELERY_BEAT_SCHEDULE in settings).
     """
-    from account.models import Rider
-    from wallet.models import Wallet
+    return run_weekly_payouts()
+
+
+@shared_task(name='rider.reconcile_unconfirmed_payouts')
+def reconcile_unconfirmed_payouts(references, attempt=1):
+    """
+    Look up payout transfers whose bulk submission got no clear answer and
+    complete or release them (rider/payouts.py). Lookups Paystack did not
+    answer are queued again, up to PAYOUT_RECONCILE_MAX_ATTEMPTS runs.
+    """
+    result = payouts.reconcile_unconfirmed_payouts(references)
+    payouts.schedule_reconciliation(result['unreachable'], attempt + 1)
+    return result
+
+
+@shared_task(name='rider.cleanup_stale_rider_geo')
+def cleanup_stale_rider_geo():
+    """
+    Drop riders that stopped pinging from the Redis dispatch index.
+
+    Dispatch queries already ignore stale members (geo_nearby_rider_ids), so
+    this only keeps riders:geo from growing; it used to run on every query.
+    """
+    from helpers.redis_rider_geo import cleanup_stale_riders
 
-    minimum = get_weekly_payout_minimum()
-    riders = Rider.objects.filter(is_in_house_rider=False).select_related('user')
-
-    paid, skipped, failed = [], [], []
-    for rider in riders:
-        wallet = Wallet.objects.filter(user=rider.user).first()
-        if not wallet or wallet.balance < minimum:
-            skipped.append(str(rider.id))
-            continue
-
-        try:
-            success, message = process_rider_payout(rider, description='Weekly payout')
-        except Exception as error:
-            logger.exception('Weekly payout error for rider %s: %s', rider.id, error)
-            failed.append({'rider_id': str(rider.id), 'reason': str(error)})
-            continue
-
-        if success:
-            paid.append(str(rider.id))
-            try:
-                from account.models import Notification
-                from helpers.push_notification import notification_helper
-                title = 'Weekly payout on the way'
-                body = 'Your weekly earnings payout has been initiated and will arrive in your bank account shortly.'
-                Notification.objects.create(user=rider.user, title=title, content=body)
-                notification_helper.send_to_user_async(
-                    user=rider.user,
-                    title=title,
-                    body=body,
-                    data={'type': 'weekly_payout'},
-                )
-            except Exception as notify_error:
-                logger.warning('Weekly payout notification failed for rider %s: %s', rider.id, notify_error)
-        else:
-            failed.append({'rider_id': str(rider.id), 'reason': message})
-
-    summary = {
-        'paid': paid,
-        'failed': failed,
-        'skipped_count': len(skipped),
-        'minimum': str(minimum),
-    }
-    logger.info('Weekly rider payout run complete: %s', summary)
-    return summary
+    removed = cleanup_stale_riders()
+    if removed:
+        logger.info('Removed %s stale riders from the Redis geo index', removed)
+    return removed
+
+
+@shared_task(name='rider.rebuild_open_order_index')
+def rebuild_open_order_index():
+    """
+    Rebuild the Redis open-order index from the database.
+
+    Order saves keep it current (product/signals.py); this catches changes
+    made with queryset .update() and anything missed while Redis was down.
+    """
+    from helpers.redis_open_orders import OPEN_ORDER_STATUSES, rebuild_open_order_index as rebuild
+    from product.models import Order
+
+    orders = (
+        Order.objects
+        .filter(rider=None, status__in=OPEN_ORDER_STATUSES)
+        .select_related('vendor')
+        .only('id', 'status', 'rider_id', 'created_at', 'vendor__location_latitude', 'vendor__location_longitude')
+    )
+    indexed, skipped = rebuild(orders.iterator(chunk_size=500))
+    logger.info('Rebuilt open-order index: %s indexed, %s skipped', indexed, skipped)
+    return {'indexed': indexed, 'skipped': skipped}
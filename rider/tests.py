@@ -1,3 +1,546 @@
-from django.test import TestCase
+import json
+import threading
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, PropertyMock, patch
 
-# Create your tests here.
+import requests
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from account.models import Rider, User, Vendor
+from findmytaste.consumers import RiderConsumer
+from helpers.paystack import PaystackManager
+from product.models import DeclinedOrder, Order, SystemCategory
+from rider import location_broadcast
+from rider.location_broadcast import TrackingThrottle, broadcast_location_update
+from rider.payouts import run_weekly_payouts
+from wallet.models import Wallet, WalletTransaction
+
+
+@override_settings(
+    RIDER_WS_LOCATION_MIN_INTERVAL_SECONDS=60,
+    RIDER_WS_LOCATION_ACK_BATCH=3,
+    RIDER_WS_LOCATION_ACK_INTERVAL_SECONDS=60,
+)
+class RiderConsumerLocationTests(SimpleTestCase):
+    async def _connect(self, rider=SimpleNamespace(id="rider-1", user_id="user-1"), token_user="user-1"):
+        resolve = patch.object(
+            RiderConsumer, "_resolve_rider_group_ids", AsyncMock(return_value=({"user-1"}, rider)),
+        )
+        resolve.start()
+        self.addCleanup(resolve.stop)
+        authenticated = SimpleNamespace(pk=token_user, is_authenticated=True) if token_user else None
+        authenticate = patch.object(RiderConsumer, "_user_from_token", AsyncMock(return_value=authenticated))
+        authenticate.start()
+        self.addCleanup(authenticate.stop)
+        path = "/ws/riders/?user_id=user-1" + ("&token=access-token" if token_user else "")
+        communicator = WebsocketCommunicator(RiderConsumer.as_asgi(), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_fixes_are_rate_limited_and_acked_in_batches(self):
+        with patch.object(RiderConsumer, "_ingest_location", AsyncMock()) as ingest:
+            communicator = await self._connect()
+
+            await communicator.send_json_to({"action": "location", "latitude": 6.5, "longitude": 3.3, "seq": 1})
+            first_ack = await communicator.receive_json_from()
+            for seq in (2, 3, 4):
+                await communicator.send_json_to({"action": "location", "latitude": 6.5, "longitude": 3.3, "seq": seq})
+            batch_ack = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        self.assertEqual(ingest.await_count, 1)
+        self.assertEqual(first_ack, {"type": "location_ack", "seq": 1, "accepted": 1, "throttled": 0})
+        self.assertEqual(batch_ack, {"type": "location_ack", "seq": 4, "accepted": 0, "throttled": 3})
+
+    async def test_invalid_fix_is_rejected_without_ingesting(self):
+        with patch.object(RiderConsumer, "_ingest_location", AsyncMock()) as ingest:
+            communicator = await self._connect()
+
+            await communicator.send_json_to({"action": "location", "latitude": 123, "longitude": 3.3, "seq": 7})
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        ingest.assert_not_awaited()
+        self.assertEqual(response["type"], "location_error")
+        self.assertEqual(response["seq"], 7)
+
+    async def test_connections_without_a_rider_profile_cannot_report(self):
+        with patch.object(RiderConsumer, "_ingest_location", AsyncMock()) as ingest:
+            communicator = await self._connect(rider=None)
+
+            await communicator.send_json_to({"action": "location", "latitude": 6.5, "longitude": 3.3})
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        ingest.assert_not_awaited()
+        self.assertEqual(response, {"type": "location_error", "error": "Not a rider connection"})
+
+    async def test_anonymous_socket_cannot_report_for_a_rider(self):
+        with patch.object(RiderConsumer, "_ingest_location", AsyncMock()) as ingest:
+            communicator = await self._connect(token_user=None)
+
+            await communicator.send_json_to({"action": "location", "latitude": 6.5, "longitude": 3.3})
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        ingest.assert_not_awaited()
+        self.assertEqual(response, {"type": "location_error", "error": "Not a rider connection"})
+
+    async def test_token_for_another_user_cannot_report_for_the_rider(self):
+        with patch.object(RiderConsumer, "_ingest_location", AsyncMock()) as ingest:
+            communicator = await self._connect(token_user="someone-else")
+
+            await communicator.send_json_to({"action": "location", "latitude": 6.5, "longitude": 3.3})
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        ingest.assert_not_awaited()
+        self.assertEqual(response["type"], "location_error")
+
+
+class TrackingBroadcastTests(SimpleTestCase):
+    def setUp(self):
+        location_broadcast._identity_cache.clear()
+        throttle = patch.object(location_broadcast, "_local_throttle", TrackingThrottle())
+        throttle.start()
+        self.addCleanup(throttle.stop)
+
+    def _rider(self, *order_ids):
+        orders = [
+            SimpleNamespace(
+                id=order_id, status="picked_up", delivery_status="picked_up",
+                delivery_latitude="6.5300", delivery_longitude="3.3850", actual_pickup_time=None,
+            )
+            for order_id in order_ids
+        ]
+        user = Mock(email="rider@example.com")
+        full_name = PropertyMock(return_value="Ada Rider")
+        type(user).full_name = full_name
+        rider = SimpleNamespace(
+            id="rider-1",
+            user=user,
+            orders=Mock(filter=Mock(return_value=orders)),
+            location_updated_at=datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+        )
+        return rider, full_name
+
+    @patch("rider.location_broadcast.claim_tracking_broadcasts", return_value={"order-2"})
+    def test_only_watched_rooms_that_are_due_get_a_preserialized_frame(self, claim):
+        rider, _ = self._rider("order-1", "order-2")
+        channel_layer = Mock(group_send=AsyncMock())
+
+        broadcast_location_update(rider, "6.5244", "3.3792", channel_layer=channel_layer)
+
+        self.assertEqual(claim.call_args.args[0].keys(), {"order-1", "order-2"})
+        channel_layer.group_send.assert_awaited_once()
+        group, message = channel_layer.group_send.await_args.args
+        self.assertEqual(group, "delivery_order-2")
+        frame = json.loads(message["text"])
+        self.assertEqual(frame["type"], "rider_location")
+        self.assertEqual(frame["data"]["rider"], {"id": "rider-1", "name": "Ada Rider", "email": "rider@example.com"})
+        self.assertEqual(frame["data"]["distance_to_customer_type"], "meter")
+
+    @patch("rider.location_broadcast.claim_tracking_broadcasts", return_value={"order-1"})
+    def test_rider_identity_is_cached_between_fixes(self, claim):
+        rider, full_name = self._rider("order-1")
+        channel_layer = Mock(group_send=AsyncMock())
+
+        broadcast_location_update(rider, 6.5244, 3.3792, channel_layer=channel_layer)
+        broadcast_location_update(rider, 6.5245, 3.3793, channel_layer=channel_layer)
+
+        self.assertEqual(channel_layer.group_send.await_count, 2)
+        self.assertEqual(full_name.call_count, 1)
+
+    @override_settings(RIDER_TRACKING_BROADCAST_INTERVAL_SECONDS=60)
+    @patch("rider.location_broadcast.claim_tracking_broadcasts", return_value=None)
+    def test_without_redis_updates_are_throttled_per_process(self, claim):
+        rider, _ = self._rider("order-1")
+        channel_layer = Mock(group_send=AsyncMock())
+
+        for _ in range(3):
+            broadcast_location_update(rider, 6.5244, 3.3792, channel_layer=channel_layer)
+
+        self.assertEqual(channel_layer.group_send.await_count, 1)
+
+
+class AvailableOrderFeedTests(TestCase):
+    def setUp(self):
+        category = SystemCategory.objects.create(name="Food", name_key="food", description="Food", is_stock=False)
+        self.orders = []
+        for index, (lat, lon) in enumerate([("6.5244", "3.3792"), ("6.5300", "3.3850"), ("7.5000", "4.5000")]):
+            owner = User.objects.create_user(email=f"feed-vendor{index}@example.com", password="password", role="vendor")
+            vendor = Vendor.objects.create(
+                user=owner,
+                name=f"Feed Vendor {index}",
+                email=f"feed-vendor{index}@example.com",
+                category=category,
+                approval_status="approved",
+                is_active=True,
+                location_latitude=lat,
+                location_longitude=lon,
+            )
+            self.orders.append(Order.objects.create(vendor=vendor, status="looking_for_rider"))
+
+        user = User.objects.create_user(email="feed-rider@example.com", password="password", role="rider")
+        self.rider = Rider.objects.create(
+            user=user, mode_of_transport="bike", status="active", is_verified=True, is_online=True,
+        )
+        DeclinedOrder.objects.create(rider=self.rider, order=self.orders[1])
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.url = reverse("rider-available-order", args=[self.rider.id]) + "?latitude=6.5250&longitude=3.3800"
+
+    def _feed_ids(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_database_fallback_filters_by_radius_and_declines(self):
+        with patch("helpers.websocket_notification.nearby_open_orders", return_value=None):
+            self.assertEqual(self._feed_ids(), [str(self.orders[0].id)])
+
+    def test_redis_candidates_are_rechecked_in_sql(self):
+        claimed = self.orders[2]
+        claimed.rider = self.rider
+        claimed.status = "rider_assigned"
+        claimed.save()
+        created = int(self.orders[0].created_at.timestamp())
+        hits = [(str(order.id), 0.5, created) for order in self.orders]
+
+        with patch("helpers.websocket_notification.nearby_open_orders", return_value=hits) as search:
+            self.assertEqual(self._feed_ids(), [str(self.orders[0].id)])
+
+        self.assertEqual(search.call_args.args[2], 35)
+
+
+class FakePaystackServer:
+    """
+    A local stand-in for the Paystack endpoints the payout run calls. Every
+    request is recorded as (method, path, body). ``transfer_statuses`` maps a
+    recipient code to the status /transfer/bulk reports for its transfer
+    ('pending' otherwise); ``bulk_error`` makes /transfer/bulk answer
+    ``bulk_error_status`` (400 unless changed) and
+    ``bulk_garbled`` makes it answer 200 with a body that is not JSON.
+    /transfer/verify knows the references in ``verified`` (reference ->
+    status) and answers 404 for any other.
+    """
+
+    BANKS = [{'name': 'Test Bank', 'code': '058'}]
+
+    def __init__(self):
+        self.requests = []
+        self.transfer_statuses = {}
+        self.bulk_error = None
+        self.bulk_error_status = 400
+        self.bulk_garbled = False
+        self.verified = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                server.requests.append(('GET', path, None))
+                if path == '/bank':
+                    return self._reply(200, {'status': True, 'data': server.BANKS})
+                if path == '/bank/resolve':
+                    query = dict(part.split('=', 1) for part in self.path.split('?', 1)[1].split('&'))
+                    return self._reply(200, {'status': True, 'data': {
+                        'account_number': query['account_number'], 'account_name': 'Resolved Name',
+                    }})
+                if path.startswith('/transfer/verify/'):
+                    reference = path.rsplit('/', 1)[1]
+                    if reference not in server.verified:
+                        return self._reply(404, {'status': False, 'message': 'Transfer not found'})
+                    return self._reply(200, {'status': True, 'data': {
+                        'reference': reference, 'status': server.verified[reference], 'amount': 150000,
+                    }})
+                return self._reply(404, {'status': False, 'message': 'Not found'})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+                server.requests.append(('POST', self.path, body))
+                if self.path == '/transferrecipient':
+                    return self._reply(201, {'status': True, 'data': {
+                        'recipient_code': f"RCP_{body['account_number']}",
+                    }})
+                if self.path == '/transfer/bulk':
+                    if server.bulk_error:
+                        return self._reply(server.bulk_error_status, {'status': False, 'message': server.bulk_error})
+                    if server.bulk_garbled:
+                        self.send_response(200)
+                        self.send_header('Content-Length', '9')
+                        self.end_headers()
+                        self.wfile.write(b'<html>502')
+                        return
+                    return self._reply(200, {'status': True, 'data': [
+                        {
+                            'reference': transfer['reference'],
+                            'recipient': transfer['recipient'],
+                            'amount': transfer['amount'],
+                            'transfer_code': f"TRF_{index}",
+                            'status': server.transfer_statuses.get(transfer['recipient'], 'pending'),
+                        }
+                        for index, transfer in enumerate(body['transfers'])
+                    ]})
+                return self._reply(404, {'status': False, 'message': 'Not found'})
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def calls(self, method, path):
+        return [body for seen_method, seen_path, body in self.requests if (seen_method, seen_path) == (method, path)]
+
+
+class WeeklyPayoutTests(TestCase):
+    def setUp(self):
+        self.paystack = FakePaystackServer().start()
+        self.addCleanup(self.paystack.stop)
+        settings_override = override_settings(PAYSTACK_BASE_URL=self.paystack.url, PAYSTACK_SECRET_KEY='sk_test')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def _rider(self, index, balance, in_house=False):
+        user = User.objects.create_user(
+            email=f"payout-rider{index}@example.com",
+            password="password",
+            role="rider",
+            bank_name="Test Bank",
+            bank_account=f"01234567{index:02d}",
+            bank_account_name=f"Rider {index}",
+        )
+        Wallet.objects.filter(user=user).update(balance=Decimal(balance))
+        return Rider.objects.create(user=user, mode_of_transport="bike", is_in_house_rider=in_house)
+
+    def _balance(self, rider):
+        return Wallet.objects.get(user=rider.user).balance
+
+    def test_pays_eligible_riders_in_bulk_and_leaves_withdrawals_pending(self):
+        paid = self._rider(1, '2500.00')
+        low = self._rider(2, '500.00')
+        salaried = self._rider(3, '9000.00', in_house=True)
+
+        summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['paid'], [str(paid.id)])
+        self.assertEqual(summary['batches'], 1)
+        self.assertEqual(self._balance(paid), Decimal('0.00'))
+        self.assertEqual(self._balance(low), Decimal('500.00'))
+        self.assertEqual(self._balance(salaried), Decimal('9000.00'))
+
+        withdrawal = WalletTransaction.objects.get(user=paid.user, transaction_type='withdrawal')
+        self.assertEqual(withdrawal.status, 'pending')
+        self.assertEqual(withdrawal.amount, Decimal('2500.00'))
+        self.assertEqual(withdrawal.external_reference, str(withdrawal.id))
+
+        [bulk] = self.paystack.calls('POST', '/transfer/bulk')
+        self.assertEqual(bulk['transfers'], [{
+            'amount': 250000,
+            'recipient': 'RCP_0123456701',
+            'reference': str(withdrawal.id),
+            'reason': 'Weekly payout',
+        }])
+
+    def test_transfer_success_webhook_completes_the_withdrawal(self):
+        rider = self._rider(1, '2500.00')
+        run_weekly_payouts(minimum=1000)
+        withdrawal = WalletTransaction.objects.get(user=rider.user, transaction_type='withdrawal')
+
+        PaystackManager().handle_webhook(SimpleNamespace(data={
+            'event': 'transfer.success',
+            'data': {'reference': str(withdrawal.id), 'amount': 250000, 'status': 'success'},
+        }))
+
+        withdrawal.refresh_from_db()
+        self.assertEqual(withdrawal.status, 'completed')
+        self.assertEqual(self._balance(rider), Decimal('0.00'))
+
+    def test_submits_transfers_in_chunks_of_the_bulk_limit(self):
+        riders = [self._rider(index, '1500.00') for index in range(5)]
+
+        with patch("helpers.paystack.BULK_TRANSFER_LIMIT", 2):
+            summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['batches'], 3)
+        self.assertEqual(len(summary['paid']), len(riders))
+        self.assertEqual(
+            [len(body['transfers']) for body in self.paystack.calls('POST', '/transfer/bulk')], [2, 2, 1])
+
+    def test_recipient_codes_and_bank_list_are_cached_between_runs(self):
+        rider = self._rider(1, '1500.00')
+        run_weekly_payouts(minimum=1000)
+        Wallet.objects.filter(user=rider.user).update(balance=Decimal('1800.00'))
+
+        run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(len(self.paystack.calls('POST', '/transferrecipient')), 1)
+        self.assertEqual(len(self.paystack.calls('GET', '/bank')), 1)
+        self.assertEqual(len(self.paystack.calls('POST', '/transfer/bulk')), 2)
+
+    def test_transfer_reported_failed_is_released(self):
+        ok = self._rider(1, '1500.00')
+        failing = self._rider(2, '1700.00')
+        self.paystack.transfer_statuses = {'RCP_0123456702': 'failed'}
+
+        summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['paid'], [str(ok.id)])
+        self.assertEqual([row['rider_id'] for row in summary['failed']], [str(failing.id)])
+        self.assertEqual(self._balance(failing), Decimal('1700.00'))
+        self.assertEqual(
+            WalletTransaction.objects.get(user=failing.user, transaction_type='withdrawal').status, 'failed')
+        self.assertEqual(self._balance(ok), Decimal('0.00'))
+
+    def test_rejected_chunk_releases_every_hold(self):
+        riders = [self._rider(index, '1500.00') for index in range(2)]
+        self.paystack.bulk_error = 'Your balance is not enough to fulfil this request'
+
+        summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['paid'], [])
+        self.assertEqual(len(summary['failed']), 2)
+        self.assertEqual(summary['failed'][0]['reason'], self.paystack.bulk_error)
+        for rider in riders:
+            self.assertEqual(self._balance(rider), Decimal('1500.00'))
+        self.assertFalse(
+            WalletTransaction.objects.filter(transaction_type='withdrawal').exclude(status='failed').exists())
+
+    def _withdrawal(self, rider):
+        return WalletTransaction.objects.get(user=rider.user, transaction_type='withdrawal')
+
+    def _run_dropping_bulk(self):
+        real_post = requests.post
+
+        def drop_bulk(url, *args, **kwargs):
+            if url.endswith('/transfer/bulk'):
+                raise requests.ConnectionError('connection reset')
+            return real_post(url, *args, **kwargs)
+
+        with patch("helpers.paystack.requests.post", side_effect=drop_bulk), \
+                self.captureOnCommitCallbacks() as callbacks:
+            summary = run_weekly_payouts(minimum=1000)
+        return summary, callbacks
+
+    def test_network_error_leaves_the_chunk_pending_until_verified(self):
+        rider = self._rider(1, '1500.00')
+
+        summary, callbacks = self._run_dropping_bulk()
+
+        withdrawal = self._withdrawal(rider)
+        self.assertEqual(summary['unconfirmed'], [{'rider_id': str(rider.id), 'reference': str(withdrawal.id)}])
+        self.assertEqual(self._balance(rider), Decimal('0.00'))
+        self.assertEqual(withdrawal.status, 'pending')
+        self.assertEqual(len(callbacks), 1)
+
+    def test_unconfirmed_transfer_paystack_never_received_is_released(self):
+        rider = self._rider(1, '1500.00')
+        _summary, callbacks = self._run_dropping_bulk()
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self._balance(rider), Decimal('1500.00'))
+        self.assertEqual(self._withdrawal(rider).status, 'failed')
+        self.assertEqual(len(self.paystack.calls('GET', f"/transfer/verify/{self._withdrawal(rider).id}")), 1)
+
+    def test_unconfirmed_transfer_paystack_paid_is_completed(self):
+        paid = self._rider(1, '1500.00')
+        in_flight = self._rider(2, '1500.00')
+        _summary, callbacks = self._run_dropping_bulk()
+        self.paystack.verified = {
+            str(self._withdrawal(paid).id): 'success',
+            str(self._withdrawal(in_flight).id): 'pending',
+        }
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self._withdrawal(paid).status, 'completed')
+        self.assertEqual(self._withdrawal(in_flight).status, 'pending')
+        self.assertEqual(self._balance(paid), Decimal('0.00'))
+        self.assertEqual(self._balance(in_flight), Decimal('0.00'))
+
+    def test_gateway_error_leaves_the_chunk_for_verification(self):
+        rider = self._rider(1, '1500.00')
+        self.paystack.bulk_error = 'Gateway Timeout'
+        self.paystack.bulk_error_status = 504
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            summary = run_weekly_payouts(minimum=1000)
+
+        withdrawal = self._withdrawal(rider)
+        self.assertEqual(summary['failed'], [])
+        self.assertEqual(summary['unconfirmed'], [{'rider_id': str(rider.id), 'reference': str(withdrawal.id)}])
+        self.assertEqual(withdrawal.status, 'pending')
+        self.assertEqual(self._balance(rider), Decimal('0.00'))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_unreadable_bulk_reply_is_verified_instead_of_aborting(self):
+        riders = [self._rider(index, '1500.00') for index in range(3)]
+        self.paystack.bulk_garbled = True
+
+        with patch("helpers.paystack.BULK_TRANSFER_LIMIT", 2):
+            summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['batches'], 2)
+        self.assertEqual(len(summary['unconfirmed']), len(riders))
+        self.assertEqual(len(self.paystack.calls('POST', '/transfer/bulk')), 2)
+
+    def test_failed_recipient_lookup_only_skips_that_rider(self):
+        unreachable = self._rider(1, '1500.00')
+        paid = self._rider(2, '1500.00')
+        real_lookup = PaystackManager.get_recipient_code
+
+        def lookup(manager, user, *args, **kwargs):
+            if user.pk == unreachable.user_id:
+                raise requests.Timeout('read timed out')
+            return real_lookup(manager, user, *args, **kwargs)
+
+        with patch.object(PaystackManager, "get_recipient_code", lookup):
+            summary = run_weekly_payouts(minimum=1000)
+
+        self.assertEqual(summary['paid'], [str(paid.id)])
+        self.assertEqual([row['rider_id'] for row in summary['failed']], [str(unreachable.id)])
+        self.assertEqual(self._balance(unreachable), Decimal('1500.00'))
+        self.assertFalse(WalletTransaction.objects.filter(user=unreachable.user).exists())
+
+    def test_holds_are_released_when_the_run_stops_before_submitting(self):
+        riders = [self._rider(index, '1500.00') for index in range(2)]
+
+        with patch("rider.payouts._submit_chunk", side_effect=RuntimeError('worker lost')), \
+                patch("helpers.paystack.BULK_TRANSFER_LIMIT", 1), \
+                self.assertRaises(RuntimeError):
+            run_weekly_payouts(minimum=1000)
+
+        # The first chunk was handed over (its outcome is unknown); the second never was.
+        self.assertEqual(self._withdrawal(riders[0]).status, 'pending')
+        self.assertEqual(self._withdrawal(riders[1]).status, 'failed')
+        self.assertEqual(self._balance(riders[1]), Decimal('1500.00'))
@@ -5,9 +5,10 @@ import math
 import random
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from helpers.redis_open_orders import OPEN_ORDER_STATUSES
 from helpers.websocket_notification import (
+    get_available_order_ids_for_rider,
     get_order_dispatch_radius_km,
-    is_order_visible_to_rider,
     notify_rider_order_assignment,
     notify_order_unavailable_to_riders,
     send_order_accepted_notification_customer,
@@ -27,8 +28,10 @@ from helpers.paystack import PaystackManager
 from helpers.paystack_fees import record_collection_fee
 from helpers.response.response_format import success_response, bad_request_response, internal_server_error_response, paginate_success_response_with_serializer
 from product.models import DeliveryTracking, Order, DeclinedOrder, PlatformSettings
+from wallet import ledger
 from wallet.models import Wallet, WalletTransaction
 from wallet.serializers import get_minimum_withdrawal_for_user
+from .location_broadcast import broadcast_location_update, convert_decimals
 from .serializers import (
     AcceptOrderSerializer,
     OrderSerializer,
@@ -40,6 +43,7 @@ from .serializers import (
 )
 from helpers.push_notification import notification_helper, send_order_payment_success_notification
 from helpers.order_utils import get_distance_between_two_location
+from helpers.rider_location import current_rider_location
 from helpers.referral_logic import process_referral_reward
 from decimal import Decimal
 
@@ -492,7 +496,8 @@ class ConfirmOrderPaymentAPIView(generics.GenericAPIView):
                             data={
                                 "event": "new_order",
                                 "order_id": str({order.track_id}),
-                            }
+                            },
+                            dedup_key=f"vendor_new_order:{order.id}",
                         )
                         print(f"Vendor notification result: {result}")
                     except Exception as e:
@@ -512,7 +517,8 @@ class ConfirmOrderPaymentAPIView(generics.GenericAPIView):
                                 "order_id": str(order.id),
                                 "order_status": order.status,
                                 "delivery_code": order.delivery_otp or "",
-                            }
+                            },
+                            dedup_key=f"payment_success:{order.id}",
                         )
                         print(
                             f"Customer payment notification result: {result}")
@@ -620,7 +626,12 @@ class RiderViewSet(viewsets.ModelViewSet):
             latitude = serializer.validated_data['latitude']
             longitude = serializer.validated_data['longitude']
 
-            rider.update_location(latitude, longitude)
+            rider.update_location(
+                latitude,
+                longitude,
+                speed=serializer.validated_data.get('speed'),
+                heading=serializer.validated_data.get('heading'),
+            )
 
             self.broadcast_location_update(rider, latitude, longitude)
             return success_response(
@@ -731,7 +742,9 @@ class RiderViewSet(viewsets.ModelViewSet):
                         "type": "order_status_update",
                         "order_id": str(order.id),
                         "status": "near_delivery",
-                    }
+                    },
+                    dedup_key=f"near_delivery:{order.id}",
+                    coalesce_key=f"order_status:{order.id}",
                 )
             except Exception as e:
                 print(f"Direct near-delivery push error: {e}")
@@ -741,172 +754,9 @@ class RiderViewSet(viewsets.ModelViewSet):
             data={'order_id': str(order.id), 'status': new_status}
         )
 
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        """Calculate distance between two points in kilometers"""
-        if not all([lat1, lon1, lat2, lon2]):
-            return 0
-
-        R = 6371  # Earth's radius in kilometers
-
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * \
-            math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-        return R * c
-
-    def calculate_eta(self, distance_km):
-        """Calculate estimated time of arrival in minutes"""
-        print(distance_km)
-        if distance_km == 0:
-            return 0
-
-        # Assume average speed of 25 km/h for delivery
-        average_speed = 25
-        eta_hours = distance_km / average_speed
-        return int(eta_hours * 60)  # Convert to minutes
-
     def broadcast_location_update(self, rider, latitude, longitude):
         """Broadcast rider location to all active order tracking rooms"""
-        active_orders = rider.orders.filter(
-            status__in=['confirmed', 'ready_for_pickup',
-                        'picked_up', 'in_transit', 'near_delivery']
-        )
-
-        for order in active_orders:
-            room_group_name = f'delivery_{order.id}'
-
-            # Calculate distance to customer
-            distance_to_customer = self.calculate_distance(
-                latitude, longitude,
-                float(order.delivery_latitude) if order.delivery_latitude else 0,
-                float(order.delivery_longitude) if order.delivery_longitude else 0
-            )
-
-            # Update order status if near delivery
-            distance_value = distance_to_customer
-            if distance_value < 1:
-                distance_value = distance_value * 1000
-                distance_type = "meter"
-            else:
-                distance_type = "kilometer"
-
-            # Only mark near delivery when the rider is actually in transit
-            # and close enough to the customer's destination.
-            has_delivery_coordinates = bool(
-                order.delivery_latitude and order.delivery_longitude
-            )
-            pickup_grace_elapsed = (
-                order.actual_pickup_time and
-                timezone.now() - order.actual_pickup_time >= timedelta(minutes=3)
-            )
-
-            if (
-                has_delivery_coordinates and
-                distance_to_customer <= 0.2 and
-                order.status == 'in_transit' and
-                order.delivery_status == 'in_transit' and
-                pickup_grace_elapsed
-            ):
-                order.status = 'near_delivery'
-                order.delivery_status = 'near_delivery'
-                order.save(update_fields=['status', 'delivery_status', 'updated_at'])
-
-                # Send status update
-                async_to_sync(self.channel_layer.group_send)(
-                    room_group_name,
-                    {
-                        'type': 'order_status_update',
-                        'data': convert_decimals({
-                            'order_id': str(order.id),
-                            'status': 'near_delivery',
-                            'distance_to_customer': round(distance_value, 3),
-                            'distance_to_customer_type': distance_type,
-                            'estimated_arrival': self.calculate_eta(distance_value if distance_type == "kilometer" else distance_value / 1000),
-                            'estimated_arrival_type': "minutes",
-                            'updated_at': order.updated_at.isoformat()
-                        })
-                    }
-                )
-
-                try:
-                    customer_group_name = f'customer_{order.user.id}'
-                    async_to_sync(self.channel_layer.group_send)(
-                        customer_group_name,
-                        {
-                            'type': 'order_status_update',
-                            'data': convert_decimals({
-                                'order_id': str(order.id),
-                                'status': 'near_delivery',
-                                'distance_to_customer': round(distance_value, 3),
-                                'distance_to_customer_type': distance_type,
-                                'estimated_arrival': self.calculate_eta(distance_value if distance_type == "kilometer" else distance_value / 1000),
-                                'estimated_arrival_type': "minutes",
-                                'message': 'Your rider is outside and waiting for you.',
-                                'updated_at': order.updated_at.isoformat()
-                            })
-                        }
-                    )
-                except Exception as e:
-                    print(f"WebSocket near-delivery notification to customer error: {e}")
-
-                try:
-                    send_order_status_update_notification(
-                        order,
-                        'near_delivery',
-                        message='Your rider is outside and waiting for you.',
-                    )
-                except Exception as e:
-                    print(f"Push near-delivery notification error: {e}")
-                try:
-                    notification_helper.send_to_users_with_executor(
-                        users=[order.user],
-                        title="Your rider is outside 📍",
-                        body="Your rider is outside and waiting for you.",
-                        data={
-                            "event": "near_delivery",
-                            "type": "order_status_update",
-                            "order_id": str(order.id),
-                            "status": "near_delivery",
-                        }
-                    )
-                except Exception as e:
-                    print(f"Direct broadcast near-delivery push error: {e}")
-
-            try:
-                # Send location update
-                async_to_sync(self.channel_layer.group_send)(
-                    room_group_name,
-                    {
-                        'type': 'rider_location_update',
-                        'data': convert_decimals({
-                            'order_id': str(order.id),
-                            'rider_location': {
-                                'latitude': latitude,
-                                'longitude': longitude,
-                                'updated_at': rider.location_updated_at.isoformat()
-                            },
-                            "rider": {
-                                'id': str(rider.id),
-                                'name': rider.user.full_name,
-                                "email": rider.user.email
-                            },
-                            'distance_to_customer': round(distance_value, 3),
-                            'distance_to_customer_type': distance_type,
-                            'estimated_arrival': self.calculate_eta(distance_value if distance_type == "kilometer" else distance_value / 1000),
-                            'estimated_arrival_type': "minutes"
-                        })
-                    }
-                )
-            except:
-                pass
+        broadcast_location_update(rider, latitude, longitude, channel_layer=self.channel_layer)
 
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def request_withdrawal(self, request):
@@ -950,15 +800,12 @@ class RiderViewSet(viewsets.ModelViewSet):
 
         # Create a pending fund request and hold the funds so the rider
         # cannot double-spend the balance while the request is reviewed.
-        WalletTransaction.objects.create(
-            wallet=wallet,
-            user=rider.user,
-            amount=amount,
-            transaction_type='withdrawal',
-            status='pending',
-            description='Rider fund request',
-        )
-        wallet.withdraw(amount)
+        try:
+            ledger.debit(wallet, amount, user=rider.user, description='Rider fund request')
+        except ledger.InsufficientFunds:
+            return bad_request_response(
+                message='Insufficient balance.'
+            )
 
         return success_response(
             message='Fund request submitted. You will be paid once it is approved.',
@@ -981,8 +828,7 @@ class RiderViewSet(viewsets.ModelViewSet):
 
         # Determine which location to use (current location or address location)
         if not query_location_latitude or not query_location_longitude:
-            rider_lat = rider.current_latitude
-            rider_lon = rider.current_longitude
+            rider_lat, rider_lon, _ = current_rider_location(rider)
 
             # Use address location as fallback if current location is not available
             if not rider_lat or not rider_lon:
@@ -998,16 +844,16 @@ class RiderViewSet(viewsets.ModelViewSet):
                 message="Rider location not available. Please update your current location or address."
             )
 
-        declined_order_ids = rider.declined_orders.values_list(
-            'order_id', flat=True)
+        # Candidate ids come from the open-order geo index; only the page
+        # being returned is hydrated with items, products and images.
+        order_ids = get_available_order_ids_for_rider(rider, float(rider_lat), float(rider_lon))
 
-        # Fetch candidate orders with all relations needed by is_order_visible_to_rider
-        # and by the serializer — one DB round-trip for the loop, no N+1 after.
-        candidate_qs = Order.objects.filter(
+        queryset = Order.objects.filter(
+            id__in=order_ids,
             rider=None,
-            status__in=['looking_for_rider', 'awaiting_rider'],
+            status__in=OPEN_ORDER_STATUSES,
         ).exclude(
-            id__in=declined_order_ids
+            id__in=rider.declined_orders.values('order_id')
         ).exclude(
             Q(vendor__is_marketplace=True) | Q(vendor__marketplace__isnull=False)
         ).select_related(
@@ -1016,33 +862,7 @@ class RiderViewSet(viewsets.ModelViewSet):
             'items',
             'items__product',
             'items__product__productimage_set',
-        )
-
-        nearby_orders = []
-        for order in candidate_qs:
-            if is_order_visible_to_rider(
-                order,
-                rider,
-                latitude=float(rider_lat),
-                longitude=float(rider_lon),
-            ):
-                nearby_orders.append(order)
-
-        from django.db.models import Case, When
-
-        order_ids = [order.id for order in nearby_orders]
-
-        preserved_order = Case(
-            *[When(id=pk, then=pos) for pos, pk in enumerate(order_ids)]
-        )
-
-        queryset = Order.objects.filter(id__in=order_ids).select_related(
-            'vendor', 'vendor__user',
-        ).prefetch_related(
-            'items',
-            'items__product',
-            'items__product__productimage_set',
-        ).order_by(preserved_order).order_by('-created_at')
+        ).order_by('-created_at')
 
         return paginate_success_response_with_serializer(
             self.request,
@@ -1104,7 +924,9 @@ class RiderViewSet(viewsets.ModelViewSet):
                     "rider_id": str(rider.id),
                     "rider_name": rider.user.full_name or '',
                     "rider_phone": rider.user.phone_number or '',
-                }
+                },
+                dedup_key=f"order_accepted:{order.id}",
+                coalesce_key=f"order_status:{order.id}",
             )
             print(f"Customer order acceptance notification result: {result}")
         except Exception as e:
@@ -1137,7 +959,8 @@ class RiderViewSet(viewsets.ModelViewSet):
                 data={
                     "event": "order_accepted_by_rider",
                     "order_id": str(order.id)
-                }
+                },
+                dedup_key=f"order_accepted_by_rider:{order.id}",
             )
         except Exception as e:
             print(f"Vendor notification error: {e}")
@@ -1376,14 +1199,11 @@ class RiderViewSet(viewsets.ModelViewSet):
 
             try:
                 wallet, _ = Wallet.objects.get_or_create(user=rider.user)
-                wallet.deposit(rider_earning_amount)
-
-                WalletTransaction.objects.create(
-                    wallet=wallet,
-                    user=rider.user,
-                    amount=rider_earning_amount,
+                ledger.credit(
+                    wallet,
+                    rider_earning_amount,
                     transaction_type='earning',
-                    status='completed',
+                    user=rider.user,
                     description=f"Earning from Order #{order.track_id}",
                     order=order
                 )
@@ -1406,7 +1226,8 @@ class RiderViewSet(viewsets.ModelViewSet):
                     "event": "delivery_confirmed",
                     "order_id": str(order.id),
                     "rider_earning": str(order.rider_earning)
-                }
+                },
+                dedup_key=f"delivery_confirmed:{order.id}",
             )
         except Exception as e:
             print(f"Rider delivery confirmation notification error: {e}")
@@ -1423,7 +1244,9 @@ class RiderViewSet(viewsets.ModelViewSet):
                     "order_id": str(order.id),
                     "status": "delivered",
                     "delivery_status": "delivered",
-                }
+                },
+                dedup_key=f"order_delivered:{order.id}",
+                coalesce_key=f"order_status:{order.id}",
             )
         except Exception as e:
             print(f"Customer delivery confirmation notification error: {e}")
@@ -1438,7 +1261,8 @@ class RiderViewSet(viewsets.ModelViewSet):
                     "event": "order_delivered",
                     "order_id": str(order.id),
                     "order_status": "delivered"
-                }
+                },
+                dedup_key=f"vendor_order_delivered:{order.id}",
             )
         except Exception:
             print()
@@ -1557,17 +1381,6 @@ class RiderViewSet(viewsets.ModelViewSet):
         return self._complete_delivery(order, rider)
 
 
-def convert_decimals(obj):
-    if isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(i) for i in obj]
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    else:
-        return obj
-
-
 class EnhancedRiderViewSet(viewsets.ModelViewSet):
     queryset = Rider.objects.all()
     serializer_class = RiderSerializer
@@ -1589,7 +1402,12 @@ class EnhancedRiderViewSet(viewsets.ModelViewSet):
             longitude = serializer.validated_data['longitude']
 
             # Update rider location
-            rider.update_location(latitude, longitude)
+            rider.update_location(
+                latitude,
+                longitude,
+                speed=serializer.validated_data.get('speed'),
+                heading=serializer.validated_data.get('heading'),
+            )
 
             # Broadcast location update to all active orders
             self.broadcast_location_update(rider, latitude, longitude)
@@ -2150,6 +1968,9 @@ class OrderTrackingDetailView(generics.RetrieveAPIView):
 
             # Get tracking data
             tracking = DeliveryTracking.objects.filter(order=order).last()
+            rider_latitude, rider_longitude, rider_located_at = (
+                current_rider_location(order.rider) if order.rider else (None, None, None)
+            )
 
             response_data = {
                 'order_id': str(order.id),
@@ -2169,9 +1990,9 @@ class OrderTrackingDetailView(generics.RetrieveAPIView):
                     'name': order.rider.user.full_name if order.rider else None,
                     'phone': order.rider.user.phone_number if order.rider else None,
                     'current_location': {
-                        'latitude': float(order.rider.current_latitude) if order.rider and order.rider.current_latitude else None,
-                        'longitude': float(order.rider.current_longitude) if order.rider and order.rider.current_longitude else None,
-                        'updated_at': order.rider.location_updated_at.isoformat() if order.rider and order.rider.location_updated_at else None
+                        'latitude': rider_latitude,
+                        'longitude': rider_longitude,
+                        'updated_at': rider_located_at.isoformat() if rider_located_at else None
                     }
                 } if order.rider else None,
                 'estimated_delivery_time': tracking.estimated_delivery_time.isoformat() if tracking and tracking.estimated_delivery_time else None,
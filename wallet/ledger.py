@@ -0,0 +1,274 @@
+"""
+Atomic wallet balance changes.
+
+Wallet.deposit / Wallet.withdraw used to read ``self.balance``, add or
+subtract in Python and ``save()`` every column back. Two credits landing on
+the same vendor wallet at once (two orders delivered together, an earning
+and a withdrawal) could each read the old balance and the second save
+silently dropped the first; the only fix at that level was to
+select_for_update the wallet on every path and serialize its busiest
+vendors. Instead:
+
+- credit and debit apply the change as one conditional UPDATE,
+  ``balance = balance + x`` / ``balance = balance - x WHERE balance >= x``,
+  so the database does the arithmetic on the current row and an overdraft
+  is refused by the WHERE clause rather than by a Python check that may be
+  stale. No row is locked beyond the UPDATE itself.
+- The WalletTransaction row is written in the same database transaction, so
+  a balance never moves without its ledger entry (a withdrawal that fails
+  for insufficient funds no longer leaves a pending transaction behind).
+- batch_credit settles many earnings at once: one UPDATE with a CASE per
+  wallet for all the affected wallets and one bulk INSERT for the
+  transaction rows. credit_vendor_earnings uses it to settle a set of
+  orders.
+"""
+
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from wallet.settlement import record_earning_holds, to_amount
+
+BATCH_CREDIT_CHUNK_SIZE = 500
+
+
+class InsufficientFunds(ValueError):
+    """The wallet balance does not cover the debit."""
+
+
+def _apply(wallet_id, delta: Decimal, minimum: Optional[Decimal] = None) -> bool:
+    from wallet.models import Wallet
+
+    rows = Wallet.objects.filter(pk=wallet_id)
+    if minimum is not None:
+        rows = rows.filter(balance__gte=minimum)
+    return rows.update(balance=F('balance') + delta, updated_at=timezone.now()) == 1
+
+
+def _refresh_balance(wallet) -> None:
+    wallet.refresh_from_db(fields=['balance', 'updated_at'])
+
+
+def adjust_balance(wallet, amount, allow_negative: bool = True) -> None:
+    """
+    Move ``wallet``'s balance by ``amount`` (negative to debit) without a
+    ledger entry; Wallet.deposit and Wallet.withdraw are built on this.
+    """
+    amount = to_amount(amount)
+    minimum = None if allow_negative or amount >= 0 else -amount
+    if not _apply(wallet.pk, amount, minimum):
+        raise InsufficientFunds("Insufficient funds in wallet")
+    _refresh_balance(wallet)
+
+
+def credit(wallet, amount, transaction_type: str = 'deposit', status: str = 'completed', **fields):
+    """
+    Add ``amount`` to ``wallet`` and record it; returns the WalletTransaction.
+
+    ``fields`` go to the transaction row (description, order, user, ...);
+    ``user`` defaults to the wallet's owner.
+    """
+    from wallet.models import WalletTransaction
+
+    amount = to_amount(amount)
+    if amount <= 0:
+        raise ValueError("Amount to credit must be positive")
+    if 'user' not in fields:
+        fields.setdefault('user_id', wallet.user_id)
+
+    with db_transaction.atomic():
+        _apply(wallet.pk, amount)
+        entry = WalletTransaction.objects.create(
+            wallet=wallet, amount=amount, transaction_type=transaction_type, status=status, **fields
+        )
+    _refresh_balance(wallet)
+    return entry
+
+
+def debit(wallet, amount, transaction_type: str = 'withdrawal', status: str = 'pending', reserve=None, **fields):
+    """
+    Take ``amount`` out of ``wallet`` and record it; returns the
+    WalletTransaction. Raises InsufficientFunds, writing nothing, when the
+    balance does not cover it plus ``reserve`` (an amount that must stay in
+    the wallet, e.g. earnings still on settlement hold).
+    """
+    from wallet.models import WalletTransaction
+
+    amount = to_amount(amount)
+    if amount <= 0:
+        raise ValueError("Amount to debit must be positive")
+    reserve = max(to_amount(reserve or 0), Decimal('0.00'))
+    if 'user' not in fields:
+        fields.setdefault('user_id', wallet.user_id)
+
+    with db_transaction.atomic():
+        if not _apply(wallet.pk, -amount, minimum=amount + reserve):
+            raise InsufficientFunds("Insufficient funds in wallet")
+        entry = WalletTransaction.objects.create(
+            wallet=wallet, amount=amount, transaction_type=transaction_type, status=status, **fields
+        )
+    _refresh_balance(wallet)
+    return entry
+
+
+def release(wallet, entry, status: str = 'failed') -> bool:
+    """
+    Undo a held debit: mark the transaction ``status`` and put its amount
+    back. The status flip is a conditional UPDATE and the refund happens only
+    if it changed the row, so a release repeated concurrently (a re-delivered
+    webhook, a double-submitted rejection) refunds once. Returns whether this
+    call did the refund.
+    """
+    from wallet.models import WalletTransaction
+
+    with db_transaction.atomic():
+        released = WalletTransaction.objects.filter(pk=entry.pk).exclude(status=status).update(
+            status=status, updated_at=timezone.now(),
+        ) == 1
+        if released:
+            _apply(wallet.pk, to_amount(entry.amount))
+    entry.status = status
+    _refresh_balance(wallet)
+    return released
+
+
+def batch_credit(entries: Iterable[Dict], transaction_type: str = 'earning', status: str = 'completed') -> List:
+    """
+    Credit many wallets at once.
+
+    Each entry is a dict with ``wallet`` (a Wallet), ``amount`` and any
+    WalletTransaction fields. Amounts for the same wallet are summed into
+    one balance change. Returns the created transactions; the Wallet objects
+    passed in are not refreshed.
+    """
+    from wallet.models import Wallet, WalletTransaction
+
+    now = timezone.now()
+    totals: Dict = {}
+    rows = []
+    for entry in entries:
+        entry = dict(entry)
+        wallet = entry.pop('wallet')
+        amount = to_amount(entry.pop('amount'))
+        if amount <= 0:
+            continue
+        if 'user' not in entry:
+            entry.setdefault('user_id', wallet.user_id)
+        totals[wallet.pk] = totals.get(wallet.pk, Decimal('0.00')) + amount
+        rows.append(WalletTransaction(
+            wallet=wallet,
+            amount=amount,
+            transaction_type=transaction_type,
+            status=status,
+            # bulk_create skips save(), which is what normally fills this in.
+            reference_code=WalletTransaction.generate_reference_code(
+                WalletTransaction.TRANSACTION_PREFIXES.get(transaction_type, 'TXN')
+            ),
+            completed_at=now if status == 'completed' else None,
+            **entry,
+        ))
+    if not rows:
+        return []
+
+    wallet_ids = list(totals)
+    with db_transaction.atomic():
+        for start in range(0, len(wallet_ids), BATCH_CREDIT_CHUNK_SIZE):
+            chunk = wallet_ids[start:start + BATCH_CREDIT_CHUNK_SIZE]
+            Wallet.objects.filter(pk__in=chunk).update(
+                balance=F('balance') + Case(
+                    *[When(pk=wallet_id, then=Value(totals[wallet_id])) for wallet_id in chunk],
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                updated_at=now,
+            )
+        created = WalletTransaction.objects.bulk_create(rows, batch_size=BATCH_CREDIT_CHUNK_SIZE)
+        # bulk_create sends no post_save, so add vendor holds here.
+        record_earning_holds(created)
+    return created
+
+
+def completed_earnings():
+    """
+    Completed earning transactions, annotated with ``recipient``: the user,
+    or the wallet's owner for older rows written without a user.
+    """
+    from wallet.models import WalletTransaction
+
+    return WalletTransaction.objects.annotate(recipient=Coalesce('user', 'wallet__user')).filter(
+        transaction_type='earning', status='completed',
+    )
+
+
+def lock_orders(order_ids) -> None:
+    """
+    Row-lock orders for the rest of the current transaction, so a vendor
+    earning check and the credit that follows it cannot interleave with
+    another caller settling the same order.
+    """
+    from product.models import Order
+
+    list(Order.objects.select_for_update().filter(pk__in=order_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def credit_vendor_earnings(orders, description: Optional[str] = None) -> List:
+    """
+    Settle the vendor earning of every order in ``orders`` that has not been
+    credited yet, with one batch_credit. The batch counterpart of
+    Order.credit_vendor_earning_once; returns the new transactions.
+    """
+    orders = [order for order in orders if order.vendor_id and order.vendor.user_id]
+    if not orders:
+        return []
+    with db_transaction.atomic():
+        lock_orders([order.pk for order in orders])
+        return _credit_vendor_earnings(orders, description)
+
+
+def _credit_vendor_earnings(orders, description):
+    from wallet.models import Wallet
+
+    credited = set(
+        completed_earnings().filter(
+            order__in=orders, recipient=F('order__vendor__user'),
+        ).values_list('order_id', flat=True)
+    )
+
+    due = []
+    for order in orders:
+        if order.pk in credited:
+            continue
+        amount = order.apply_vendor_settlement()
+        if amount > 0:
+            due.append((order, amount))
+    if not due:
+        return []
+
+    from product.models import Order
+
+    now = timezone.now()
+    for order, _amount in due:
+        order.updated_at = now
+    Order.objects.bulk_update(
+        [order for order, _amount in due],
+        ['vendor_amount', 'platform_amount', 'platform_marketplace_delivery_amount', 'updated_at'],
+    )
+
+    vendor_user_ids = {order.vendor.user_id for order, _amount in due}
+    wallets = {wallet.user_id: wallet for wallet in Wallet.objects.filter(user_id__in=vendor_user_ids)}
+    for user_id in vendor_user_ids - set(wallets):
+        wallets[user_id] = Wallet.objects.get_or_create(user_id=user_id)[0]
+
+    return batch_credit(
+        {
+            'wallet': wallets[order.vendor.user_id],
+            'amount': amount,
+            'user_id': order.vendor.user_id,
+            'order': order,
+            'description': description or f"Earning from Order #{order.track_id}",
+        }
+        for order, amount in due
+    )
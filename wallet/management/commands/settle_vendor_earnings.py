@@ -0,0 +1,68 @@
+"""
+Credit vendor earnings that were never settled.
+
+Vendor earnings are credited one order at a time when an order is delivered
+(or its marketplace pickup is confirmed). An order whose credit failed, or
+that was marked delivered outside those endpoints, keeps its vendor's money
+out of the wallet. This command finds delivered, paid orders without a
+completed earning and settles them in batches with
+wallet.ledger.credit_vendor_earnings: one balance UPDATE and one transaction
+INSERT per batch.
+
+    python manage.py settle_vendor_earnings
+    python manage.py settle_vendor_earnings --since 2026-01-01 --dry-run
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from product.models import Order
+from wallet import ledger
+
+
+class Command(BaseCommand):
+    help = "Credit vendor earnings for delivered, paid orders that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=str, default=None,
+            help='Only settle orders created on/after this date (YYYY-MM-DD).')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Orders credited per batch.')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many orders would be settled without crediting them.')
+
+    def handle(self, *args, **options):
+        # Older earnings carry only a wallet, so match on its owner as well.
+        credited = ledger.completed_earnings().filter(
+            order=OuterRef('pk'),
+            recipient=OuterRef('vendor__user'),
+        )
+        orders = (
+            Order.objects
+            .filter(status='delivered', payment_status='paid', vendor__user__isnull=False)
+            .exclude(Exists(credited))
+            .select_related('vendor')
+            .order_by('created_at')
+        )
+        if options['since']:
+            since = timezone.make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+            orders = orders.filter(created_at__gte=since)
+
+        if options['dry_run']:
+            self.stdout.write(f"{orders.count()} delivered orders have no vendor earning.")
+            return
+
+        order_ids = list(orders.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        settled = 0
+        for start in range(0, len(order_ids), batch_size):
+            batch = Order.objects.filter(pk__in=order_ids[start:start + batch_size]).select_related('vendor')
+            settled += len(ledger.credit_vendor_earnings(batch))
+
+        self.stdout.write(self.style.SUCCESS(f"Credited {settled} vendor earnings."))
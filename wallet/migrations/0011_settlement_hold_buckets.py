@@ -0,0 +1,93 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+SETTLEMENT_HOLD_HOURS = 24
+
+
+def backfill_hold_buckets(apps, schema_editor):
+    """Bucket the vendor earnings that are still under the hold today."""
+    from collections import defaultdict
+    from datetime import timedelta
+
+    from django.db.models.functions import Coalesce
+    from django.utils import timezone
+
+    Vendor = apps.get_model('account', 'Vendor')
+    Wallet = apps.get_model('wallet', 'Wallet')
+    WalletTransaction = apps.get_model('wallet', 'WalletTransaction')
+    SettlementHoldBucket = apps.get_model('wallet', 'SettlementHoldBucket')
+
+    now = timezone.now()
+    hold = timedelta(hours=SETTLEMENT_HOLD_HOURS)
+    earnings = WalletTransaction.objects.filter(
+        transaction_type='earning', status='completed',
+    ).annotate(
+        clears_from=Coalesce('order__created_at', 'created_at'),
+    ).filter(clears_from__gt=now - hold).values_list('wallet_id', 'user_id', 'amount', 'clears_from')
+
+    vendor_users = set(Vendor.objects.values_list('user_id', flat=True))
+    wallet_owner = dict(Wallet.objects.filter(user_id__in=vendor_users).values_list('pk', 'user_id'))
+    wallet_for_user = {user_id: wallet_id for wallet_id, user_id in wallet_owner.items()}
+
+    buckets = defaultdict(list)
+    for wallet_id, user_id, amount, clears_from in earnings:
+        wallet_id = wallet_id or wallet_for_user.get(user_id)
+        if wallet_id not in wallet_owner:
+            continue
+        clears_at = clears_from + hold
+        buckets[(wallet_id, clears_at.replace(minute=0, second=0, microsecond=0))].append((amount, clears_at))
+
+    SettlementHoldBucket.objects.bulk_create([
+        SettlementHoldBucket(
+            wallet_id=wallet_id,
+            clears_hour=hour,
+            amount=sum(amount for amount, _clears_at in entries),
+            first_clears_at=min(clears_at for _amount, clears_at in entries),
+            last_clears_at=max(clears_at for _amount, clears_at in entries),
+        )
+        for (wallet_id, hour), entries in buckets.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0062_order_delivery_zone'),
+        ('wallet', '0010_paystackfeerecord'),
+        ('account', '0054_push_notification_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettlementHoldBucket',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('clears_hour', models.DateTimeField(help_text='Start of the hour these earnings clear in.')),
+                ('amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('first_clears_at', models.DateTimeField()),
+                ('last_clears_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', 'transaction_type', 'status', 'created_at'], name='wallet_txn_user_type_idx'),
+        ),
+        migrations.AddField(
+            model_name='settlementholdbucket',
+            name='wallet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hold_buckets', to='wallet.wallet'),
+        ),
+        migrations.AddIndex(
+            model_name='settlementholdbucket',
+            index=models.Index(fields=['last_clears_at'], name='wallet_hold_expiry_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='settlementholdbucket',
+            constraint=models.UniqueConstraint(fields=('wallet', 'clears_hour'), name='unique_hold_bucket_per_hour'),
+        ),
+        migrations.RunPython(backfill_hold_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:51
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    # updated_at is the best record there is of when older rows completed.
+    WalletTransaction = apps.get_model("wallet", "WalletTransaction")
+    WalletTransaction.objects.filter(status='completed', completed_at__isnull=True).update(
+        completed_at=F('updated_at'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0011_settlement_hold_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallettransaction',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, help_text='When the transaction first became completed; later saves leave it alone.', null=True),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
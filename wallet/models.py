@@ -1,5 +1,7 @@
 import uuid
+from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 from product.models import Order
@@ -23,21 +25,29 @@ class Wallet(models.Model):
     def deposit(self, amount):
         """
         Adds funds to the user's wallet.
+
+        The balance is changed with a single UPDATE, so concurrent credits
+        cannot overwrite each other; use wallet.ledger.credit to record the
+        transaction in the same step.
         """
+        from wallet import ledger
+
         if amount <= 0:
             raise ValueError("Amount to deposit must be positive")
-        self.balance += amount
-        self.save()
+        ledger.adjust_balance(self, amount)
 
     def withdraw(self, amount):
         """
         Deducts funds from the user's wallet.
+
+        Raises wallet.ledger.InsufficientFunds (a ValueError) when the
+        balance, as the database sees it, does not cover ``amount``.
         """
-        if self.balance >= amount:
-            self.balance -= amount
-            self.save()
-        else:
-            raise ValueError("Insufficient funds in wallet")
+        from wallet import ledger
+
+        if amount <= 0:
+            raise ValueError("Amount to withdraw must be positive")
+        ledger.adjust_balance(self, -Decimal(str(amount)), allow_negative=False)
 
     def get_balance(self):
         """
@@ -82,6 +92,9 @@ class WalletTransaction(models.Model):
         choices=TRANSACTION_STATUS, max_length=10, default='pending')  # New field
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="When the transaction first became completed; later saves leave it alone.")
     external_reference = models.TextField(null=True, blank=True)
     response_data = models.JSONField(null=True, blank=True)
     reference_code = models.CharField(
@@ -89,6 +102,16 @@ class WalletTransaction(models.Model):
     order = models.ForeignKey(
         Order, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Per-user ledger reads: settlement holds, earnings and withdrawal
+            # history all filter on these, newest first.
+            models.Index(
+                fields=['user', 'transaction_type', 'status', 'created_at'],
+                name='wallet_txn_user_type_idx',
+            ),
+        ]
+
     @staticmethod
     def generate_reference_code(prefix):
         random_part = uuid.uuid4().hex[:20].upper()
@@ -104,9 +127,44 @@ class WalletTransaction(models.Model):
                 self.transaction_type, 'TXN')
             self.reference_code = WalletTransaction.generate_reference_code(
                 prefix)
+        if self.status == 'completed' and self.completed_at is None:
+            self.completed_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'completed_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'completed_at']
         super().save(*args, **kwargs)
 
 
+class SettlementHoldBucket(models.Model):
+    """
+    Vendor earnings still under the settlement hold, summed per wallet per
+    hour in which they clear.
+
+    Maintained as earnings are credited (wallet/signals.py, ledger
+    batch_credit) and expired by the ``wallet.expire_settlement_holds`` task,
+    so the held part of a balance is read from a handful of rows instead of
+    aggregating WalletTransaction on every wallet screen. See
+    wallet.settlement.
+    """
+    id = models.BigAutoField(primary_key=True)
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='hold_buckets')
+    clears_hour = models.DateTimeField(help_text="Start of the hour these earnings clear in.")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    first_clears_at = models.DateTimeField()
+    last_clears_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'clears_hour'], name='unique_hold_bucket_per_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['last_clears_at'], name='wallet_hold_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} held on wallet {self.wallet_id} until {self.last_clears_at}"
+
+
 class PaystackFeeRecord(models.Model):
     """
     One row per Paystack money movement, holding the fee Paystack charged us.
@@ -15,13 +15,25 @@ SETTLEMENT_HOLD_HOURS, and held money cannot be withdrawn.
 
 Riders are deliberately out of scope — their payout rules live in the rider
 app and are not affected by this hold.
+
+The held amount used to be aggregated from WalletTransaction (an OR across
+user/wallet owner, a join to the order and a Coalesce) twice per wallet
+screen load. It is now kept in SettlementHoldBucket rows: each vendor
+earning adds its amount to its wallet's bucket for the hour it clears in, as
+it is credited, and the hourly ``wallet.expire_settlement_holds`` task
+deletes buckets that have fully cleared. A read sums at most
+SETTLEMENT_HOLD_HOURS + 1 bucket rows; only a bucket that is clearing right
+now (some of its earnings cleared, some not) is resolved exactly against
+WalletTransaction, over that one hour.
 """
 
+from collections import defaultdict
 from datetime import timedelta
 from decimal import Decimal
 
-from django.db.models import Min, Q, Sum
-from django.db.models.functions import Coalesce
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Q, Sum
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
 
 SETTLEMENT_HOLD_HOURS = 24
@@ -34,12 +46,6 @@ def to_amount(value):
     return Decimal(str(value or 0)).quantize(Decimal('0.01'))
 
 
-def user_is_vendor(user):
-    from account.models import Vendor
-
-    return Vendor.objects.filter(user=user).exists()
-
-
 def held_earnings_queryset(user, now=None):
     """
     Earnings that have not cleared yet.
@@ -65,24 +71,178 @@ def held_earnings_queryset(user, now=None):
     ).filter(clears_from__gt=cutoff)
 
 
+def clears_hour(clears_at):
+    return clears_at.replace(minute=0, second=0, microsecond=0)
+
+
+def _add_to_bucket(wallet_id, amount, first_clears_at, last_clears_at):
+    from wallet.models import SettlementHoldBucket
+
+    hour = clears_hour(first_clears_at)
+    updated = SettlementHoldBucket.objects.filter(wallet_id=wallet_id, clears_hour=hour).update(
+        amount=F('amount') + amount,
+        first_clears_at=Least('first_clears_at', first_clears_at),
+        last_clears_at=Greatest('last_clears_at', last_clears_at),
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            SettlementHoldBucket.objects.create(
+                wallet_id=wallet_id, clears_hour=hour, amount=amount,
+                first_clears_at=first_clears_at, last_clears_at=last_clears_at,
+            )
+    except IntegrityError:
+        # Another credit created this hour's bucket first.
+        _add_to_bucket(wallet_id, amount, first_clears_at, last_clears_at)
+
+
+def record_earning_holds(transactions, now=None):
+    """
+    Add freshly credited vendor earnings to their wallets' hold buckets.
+
+    Transactions that are not completed earnings, do not belong to a vendor
+    or have already cleared are ignored. Earnings for the same wallet and
+    hour are written as one bucket update.
+    """
+    from account.models import Vendor
+    from product.models import Order
+    from wallet.models import Wallet
+
+    now = now or timezone.now()
+    earnings = [
+        entry for entry in transactions
+        if entry.transaction_type == 'earning' and entry.status == 'completed'
+    ]
+    placed = dict(
+        Order.objects.filter(pk__in={entry.order_id for entry in earnings if entry.order_id})
+        .values_list('pk', 'created_at')
+    ) if any(entry.order_id for entry in earnings) else {}
+
+    held = []
+    for entry in earnings:
+        placed_at = placed.get(entry.order_id) or entry.created_at or now
+        clears_at = placed_at + timedelta(hours=SETTLEMENT_HOLD_HOURS)
+        if clears_at > now:
+            held.append((entry, clears_at))
+    if not held:
+        return
+
+    owners = {}
+    for entry, _clears_at in held:
+        if entry.wallet_id:
+            owners[entry.wallet_id] = None
+    owners.update(Wallet.objects.filter(pk__in=list(owners)).values_list('pk', 'user_id'))
+    walletless_users = {entry.user_id for entry, _clears_at in held if not entry.wallet_id and entry.user_id}
+    wallet_for_user = dict(
+        Wallet.objects.filter(user_id__in=walletless_users).values_list('user_id', 'pk')
+    ) if walletless_users else {}
+    for user_id, wallet_id in wallet_for_user.items():
+        owners[wallet_id] = user_id
+    vendors = set(
+        Vendor.objects.filter(user_id__in={user_id for user_id in owners.values() if user_id})
+        .values_list('user_id', flat=True)
+    )
+
+    buckets = defaultdict(lambda: [ZERO, None, None])
+    for entry, clears_at in held:
+        wallet_id = entry.wallet_id or wallet_for_user.get(entry.user_id)
+        if not wallet_id or owners.get(wallet_id) not in vendors:
+            continue
+        bucket = buckets[(wallet_id, clears_hour(clears_at))]
+        bucket[0] += to_amount(entry.amount)
+        bucket[1] = min(bucket[1] or clears_at, clears_at)
+        bucket[2] = max(bucket[2] or clears_at, clears_at)
+
+    _write_buckets(buckets)
+
+
+def _write_buckets(buckets):
+    """Add {(wallet_id, hour): [amount, first, last]} to the bucket table."""
+    from wallet.models import SettlementHoldBucket
+
+    if not buckets:
+        return
+    existing = set(
+        SettlementHoldBucket.objects.filter(
+            wallet_id__in={wallet_id for wallet_id, _hour in buckets},
+            clears_hour__in={hour for _wallet_id, hour in buckets},
+        ).values_list('wallet_id', 'clears_hour')
+    )
+    new = [key for key in buckets if key not in existing]
+    if new:
+        try:
+            with transaction.atomic():
+                SettlementHoldBucket.objects.bulk_create([
+                    SettlementHoldBucket(
+                        wallet_id=wallet_id, clears_hour=hour, amount=buckets[(wallet_id, hour)][0],
+                        first_clears_at=buckets[(wallet_id, hour)][1], last_clears_at=buckets[(wallet_id, hour)][2],
+                    )
+                    for wallet_id, hour in new
+                ])
+        except IntegrityError:
+            # A concurrent credit created one of them first; go row by row.
+            existing.update(new)
+    for key in buckets:
+        if key in existing:
+            _add_to_bucket(key[0], *buckets[key])
+
+
+def expire_hold_buckets(now=None):
+    """Delete buckets whose earnings have all cleared; returns how many."""
+    from wallet.models import SettlementHoldBucket
+
+    deleted, _ = SettlementHoldBucket.objects.filter(last_clears_at__lte=now or timezone.now()).delete()
+    return deleted
+
+
+def _wallet_hold(wallet_id, user, now):
+    """(held amount, next clearance time) for one wallet, from its buckets."""
+    from wallet.models import SettlementHoldBucket
+
+    held = ZERO
+    next_clear = None
+    buckets = SettlementHoldBucket.objects.filter(wallet_id=wallet_id, last_clears_at__gt=now)
+    for bucket in buckets:
+        if bucket.first_clears_at > now:
+            held += to_amount(bucket.amount)
+            clears_at = bucket.first_clears_at
+        else:
+            # Clearing right now: count only what has not cleared, exactly.
+            # clears_from is when the order was placed, a hold before clearing.
+            window_end = bucket.clears_hour + timedelta(hours=1 - SETTLEMENT_HOLD_HOURS)
+            partial = held_earnings_queryset(user, now).filter(clears_from__lt=window_end).aggregate(
+                total=Sum('amount'), earliest=Min('clears_from'),
+            )
+            held += to_amount(partial['total'])
+            if not partial['earliest']:
+                continue
+            clears_at = partial['earliest'] + timedelta(hours=SETTLEMENT_HOLD_HOURS)
+        if next_clear is None or clears_at < next_clear:
+            next_clear = clears_at
+    return held, next_clear
+
+
+def _wallet_id_for(user):
+    from wallet.models import Wallet
+
+    return Wallet.objects.filter(user=user).values_list('pk', flat=True).first()
+
+
 def held_amount(user, now=None):
     """Total still under the settlement hold for this user."""
-    if not user_is_vendor(user):
+    wallet_id = _wallet_id_for(user)
+    if not wallet_id:
         return ZERO
-    total = held_earnings_queryset(user, now).aggregate(total=Sum('amount'))['total']
-    return to_amount(total)
+    return _wallet_hold(wallet_id, user, now or timezone.now())[0]
 
 
 def next_clearance_at(user, now=None):
     """When the oldest held earning becomes withdrawable, or None if nothing is held."""
-    if not user_is_vendor(user):
-        return None
-    earliest = held_earnings_queryset(user, now).aggregate(
-        earliest=Min('clears_from'),
-    )['earliest']
-    if not earliest:
+    wallet_id = _wallet_id_for(user)
+    if not wallet_id:
         return None
-    return earliest + timedelta(hours=SETTLEMENT_HOLD_HOURS)
+    return _wallet_hold(wallet_id, user, now or timezone.now())[1]
 
 
 def withdrawable_balance(wallet, now=None):
@@ -90,12 +250,12 @@ def withdrawable_balance(wallet, now=None):
     The part of the wallet balance a vendor may withdraw right now.
 
     Withdrawals already debit the balance, so subtracting the currently held
-    earnings from the live balance is enough — no separate ledger is needed.
-    Clamped at zero to stay truthful for balances that predate this hold, where
-    a vendor may already have withdrawn against uncleared earnings.
+    earnings from the live balance is enough. Clamped at zero to stay
+    truthful for balances that predate this hold, where a vendor may already
+    have withdrawn against uncleared earnings.
     """
     balance = to_amount(wallet.balance)
-    held = held_amount(wallet.user, now)
+    held = _wallet_hold(wallet.pk, wallet.user_id, now or timezone.now())[0]
     if held <= ZERO:
         return balance
     return max(ZERO, balance - held)
@@ -105,13 +265,12 @@ def settlement_summary(wallet, now=None):
     """API-shaped view of the balance split, safe to expose to the vendor app."""
     now = now or timezone.now()
     balance = to_amount(wallet.balance)
-    held = held_amount(wallet.user, now)
+    held, clears_at = _wallet_hold(wallet.pk, wallet.user_id, now)
     available = max(ZERO, balance - held) if held > ZERO else balance
-    clears_at = next_clearance_at(wallet.user, now) if held > ZERO else None
 
     return {
         'available_balance': str(available),
         'pending_clearance': str(held),
         'clearance_hold_hours': SETTLEMENT_HOLD_HOURS,
-        'next_clearance_at': clears_at.isoformat() if clears_at else None,
+        'next_clearance_at': clears_at.isoformat() if held > ZERO and clears_at else None,
     }
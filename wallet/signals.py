@@ -0,0 +1,14 @@
+"""Wallet transaction signals."""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from wallet.models import WalletTransaction
+from wallet.settlement import record_earning_holds
+
+
+@receiver(post_save, sender=WalletTransaction)
+def hold_new_vendor_earning(sender, instance: WalletTransaction, created, **kwargs):
+    """Put a newly credited vendor earning under the settlement hold (wallet.settlement)."""
+    if created and instance.transaction_type == 'earning' and instance.status == 'completed':
+        record_earning_holds([instance])
@@ -0,0 +1,20 @@
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='wallet.expire_settlement_holds')
+def expire_settlement_holds():
+    """
+    Drop settlement hold buckets whose earnings have all cleared
+    (wallet/settlement.py). Reads already ignore them, so this only keeps
+    the table small. Scheduled hourly via celery beat.
+    """
+    from wallet.settlement import expire_hold_buckets
+
+    removed = expire_hold_buckets()
+    if removed:
+        logger.info('Expired %s settlement hold buckets', removed)
+    return removed
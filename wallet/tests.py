@@ -1,8 +1,12 @@
 from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
 from unittest.mock import patch
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase
 
@@ -10,11 +14,15 @@ from account.models import User, Vendor
 from helpers.paystack import PaystackManager
 from helpers.paystack_fees import import_payouts_from_transfers_api
 from product.models import Order, SystemCategory
-from wallet.models import PaystackFeeRecord, Wallet, WalletTransaction
+from wallet import ledger
+from wallet.models import PaystackFeeRecord, SettlementHoldBucket, Wallet, WalletTransaction
 from wallet.settlement import (
     SETTLEMENT_HOLD_HOURS,
+    clears_hour,
+    expire_hold_buckets,
     held_amount,
     next_clearance_at,
+    settlement_summary,
     withdrawable_balance,
 )
 
@@ -268,6 +276,33 @@ class VendorSettlementHoldTests(APITestCase):
             WalletTransaction.objects.filter(transaction_type='withdrawal').exists()
         )
 
+    def test_holds_are_read_from_hourly_buckets(self):
+        self.create_earning(3000, order_age_hours=2)
+        self.create_earning(2000, order_age_hours=2)
+        self.create_earning(8000, order_age_hours=48)
+        self.wallet.refresh_from_db()
+
+        self.assertEqual(SettlementHoldBucket.objects.filter(wallet=self.wallet).count(), 1)
+        with self.assertNumQueries(1):
+            summary = settlement_summary(self.wallet)
+        self.assertEqual(summary['pending_clearance'], '5000.00')
+        self.assertEqual(summary['available_balance'], '8000.00')
+
+    def test_a_bucket_clearing_now_only_holds_what_has_not_cleared(self):
+        hour = clears_hour(timezone.now()) + timedelta(hours=3)
+        for amount, minute in ((1000, 10), (2500, 40)):
+            placed_at = hour + timedelta(minutes=minute) - timedelta(hours=SETTLEMENT_HOLD_HOURS)
+            self.create_earning(amount, order_age_hours=(timezone.now() - placed_at).total_seconds() / 3600)
+
+        at = hour + timedelta(minutes=20)
+        self.assertEqual(SettlementHoldBucket.objects.get(wallet=self.wallet).amount, Decimal('3500.00'))
+        self.assertEqual(held_amount(self.vendor_user, now=at), Decimal('2500.00'))
+        clears_at = next_clearance_at(self.vendor_user, now=at)
+        self.assertLess(abs((clears_at - (hour + timedelta(minutes=40))).total_seconds()), 1)
+
+        self.assertEqual(expire_hold_buckets(now=at), 0)
+        self.assertEqual(expire_hold_buckets(now=hour + timedelta(minutes=41)), 1)
+
     def test_balance_payload_reports_the_cleared_split(self):
         self.create_earning(8000, order_age_hours=48)
         self.create_earning(3000, order_age_hours=2)
@@ -281,3 +316,167 @@ class VendorSettlementHoldTests(APITestCase):
         self.assertEqual(data['available_balance'], '8000.00')
         self.assertEqual(data['pending_clearance'], '3000.00')
         self.assertEqual(data['clearance_hold_hours'], SETTLEMENT_HOLD_HOURS)
+
+
+class WalletLedgerTests(TestCase):
+    def setUp(self):
+        self.category = SystemCategory.objects.create(
+            name='Ledger', name_key='ledger', description='Ledger vendors',
+        )
+        self.customer = User.objects.create_user(email='ledger-customer@example.com', password='password')
+        self.vendors = []
+        for index in range(2):
+            user = User.objects.create_user(
+                email=f'ledger-vendor-{index}@example.com', password='password', role='vendor',
+            )
+            self.vendors.append(Vendor.objects.create(
+                user=user, name=f'Ledger Vendor {index}', email=user.email,
+                category=self.category, approval_status='approved', is_active=True,
+            ))
+        self.wallet = Wallet.objects.get(user=self.vendors[0].user)
+
+    def create_order(self, vendor, amount):
+        return Order.objects.create(
+            user=self.customer, vendor=vendor, payment_status='paid', status='delivered',
+            delivery_status='delivered', total_amount=amount, vendor_amount=amount,
+        )
+
+    def test_credits_through_stale_instances_are_not_lost(self):
+        stale = Wallet.objects.get(pk=self.wallet.pk)
+
+        ledger.credit(self.wallet, '100.00')
+        ledger.credit(stale, '50.00')
+        stale.deposit(Decimal('25'))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('175.00'))
+        self.assertEqual(stale.balance, Decimal('175.00'))
+        self.assertEqual(WalletTransaction.objects.filter(wallet=self.wallet).count(), 2)
+
+    def test_debit_is_refused_by_the_database_balance(self):
+        ledger.credit(self.wallet, '100.00')
+        stale = Wallet.objects.get(pk=self.wallet.pk)
+        ledger.debit(self.wallet, '80.00')
+
+        # The stale copy still thinks 100 is available.
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(stale, '80.00')
+        with self.assertRaises(ValueError):
+            stale.withdraw(Decimal('80'))
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('20.00'))
+        self.assertEqual(WalletTransaction.objects.filter(transaction_type='withdrawal').count(), 1)
+
+    def test_release_returns_a_held_debit(self):
+        ledger.credit(self.wallet, '100.00')
+        hold = ledger.debit(self.wallet, '60.00')
+
+        ledger.release(self.wallet, hold)
+
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, 'failed')
+        self.assertEqual(self.wallet.balance, Decimal('100.00'))
+
+    def test_release_through_a_stale_instance_refunds_once(self):
+        ledger.credit(self.wallet, '100.00')
+        hold = ledger.debit(self.wallet, '60.00')
+        stale = WalletTransaction.objects.get(pk=hold.pk)
+
+        self.assertTrue(ledger.release(self.wallet, hold))
+        # A second delivery that read the transaction before the first release.
+        self.assertFalse(ledger.release(self.wallet, stale))
+
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('100.00'))
+
+    def test_transfer_failed_webhook_delivered_twice_refunds_once(self):
+        ledger.credit(self.wallet, '100.00')
+        hold = ledger.debit(self.wallet, '60.00')
+        payload = {'event': 'transfer.failed', 'data': {'reference': str(hold.id)}}
+
+        for _delivery in range(2):
+            PaystackManager().handle_webhook(SimpleNamespace(data=payload))
+
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, 'failed')
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('100.00'))
+
+    def test_debit_keeps_the_reserve_in_the_wallet(self):
+        ledger.credit(self.wallet, '100.00')
+
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(self.wallet, '50.00', reserve='60.00')
+        ledger.debit(self.wallet, '40.00', reserve='60.00')
+
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('60.00'))
+
+    def test_batch_credit_sums_per_wallet_in_one_update(self):
+        other = Wallet.objects.get(user=self.vendors[1].user)
+
+        with CaptureQueriesContext(connection) as queries:
+            entries = ledger.batch_credit([
+                {'wallet': self.wallet, 'amount': '10.00', 'description': 'a'},
+                {'wallet': other, 'amount': '5.00', 'description': 'b'},
+                {'wallet': self.wallet, 'amount': '2.50', 'description': 'c'},
+            ])
+
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "wallet_wallet"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "wallet_wallettransaction"')]), 1)
+        self.assertEqual(len(entries), 3)
+        self.assertTrue(all(entry.reference_code.startswith('ERN-') for entry in entries))
+        # Fresh vendor earnings go under the settlement hold as well.
+        self.assertEqual(held_amount(self.vendors[0].user), Decimal('12.50'))
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('12.50'))
+        self.assertEqual(Wallet.objects.get(pk=other.pk).balance, Decimal('5.00'))
+
+    def test_credit_vendor_earnings_settles_each_order_once(self):
+        orders = [
+            self.create_order(self.vendors[0], 1000),
+            self.create_order(self.vendors[0], 500),
+            self.create_order(self.vendors[1], 700),
+        ]
+        orders[1].credit_vendor_earning_once()
+
+        created = ledger.credit_vendor_earnings(
+            Order.objects.filter(pk__in=[order.pk for order in orders]).select_related('vendor'))
+        again = ledger.credit_vendor_earnings(
+            Order.objects.filter(pk__in=[order.pk for order in orders]).select_related('vendor'))
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(again, [])
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('1500.00'))
+        self.assertEqual(Wallet.objects.get(user=self.vendors[1].user).balance, Decimal('700.00'))
+        self.assertEqual(
+            WalletTransaction.objects.filter(transaction_type='earning', order__in=orders).count(), 3)
+
+    def test_settle_command_credits_only_missing_earnings(self):
+        from django.core.management import call_command
+
+        credited = self.create_order(self.vendors[0], 300)
+        credited.credit_vendor_earning_once()
+        self.create_order(self.vendors[0], 200)
+        self.create_order(self.vendors[1], 400)
+
+        call_command('settle_vendor_earnings', stdout=StringIO())
+
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('500.00'))
+        self.assertEqual(Wallet.objects.get(user=self.vendors[1].user).balance, Decimal('400.00'))
+
+    def test_settle_command_skips_unpaid_orders_and_wallet_only_earnings(self):
+        from django.core.management import call_command
+
+        legacy = self.create_order(self.vendors[0], 300)
+        # Older earnings were written with only the wallet set.
+        WalletTransaction.objects.create(
+            wallet=self.wallet, amount=Decimal('300.00'), transaction_type='earning',
+            status='completed', order=legacy,
+        )
+        unpaid = self.create_order(self.vendors[0], 200)
+        Order.objects.filter(pk=unpaid.pk).update(payment_status='pending')
+
+        call_command('settle_vendor_earnings', stdout=StringIO())
+
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).balance, Decimal('0.00'))
+        self.assertFalse(WalletTransaction.objects.filter(order=unpaid).exists())
+        self.assertEqual(legacy.credit_vendor_earning_once().user_id, None)
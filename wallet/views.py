@@ -6,6 +6,7 @@ from django.utils import timezone
 from django.utils.dateparse import parse_date
 from helpers.paystack import PaystackManager
 from helpers.response.response_format import internal_server_error_response, success_response, bad_request_response,paginate_success_response_with_serializer
+from wallet import ledger
 from wallet.models import Wallet, WalletTransaction
 from wallet.serializers import WalletSerializer, WalletTransactionSerializer, WithdrawalSerializer
 from wallet.settlement import (
@@ -176,31 +177,28 @@ class WithdrawalView(generics.GenericAPIView):
         vendor = Vendor.objects.filter(user=user).first()
 
         # Create a wallet transaction and hold the funds so the balance
-        # reflects the pending withdrawal immediately.
-        transaction = WalletTransaction.objects.create(
-            wallet=wallet,
-            user=user,
-            amount=amount,
-            transaction_type='withdrawal',
-            status='pending',
-            description='Withdrawal from wallet'
-        )
-        wallet.withdraw(amount)
+        # reflects the pending withdrawal immediately. The debit re-checks the
+        # balance in the UPDATE itself and keeps the held earnings in the
+        # wallet, so two concurrent withdrawals cannot together dip into
+        # funds that have not cleared.
+        try:
+            transaction = ledger.debit(
+                wallet, amount, reserve=to_amount(wallet.balance) - available,
+                user=user, description='Withdrawal from wallet',
+            )
+        except ledger.InsufficientFunds:
+            return bad_request_response(message="Insufficient funds in wallet.")
 
         # Validate bank if provided in request
         if bank_code:
             is_valid, bank_result = paystack_manager.validate_bank(bank_code)
             if not is_valid:
-                transaction.status = 'failed'
-                transaction.save()
-                wallet.deposit(amount)
+                ledger.release(wallet, transaction)
                 return bad_request_response(message=bank_result)
 
         # Process withdrawal
         response = paystack_manager.make_withdrawal(request, vendor, amount, transaction)
         if response.status_code >= 400:
             # Transfer could not be initiated — release the held funds.
-            transaction.status = 'failed'
-            transaction.save()
-            wallet.deposit(amount)
+            ledger.release(wallet, transaction)
         return response